@@ -0,0 +1,357 @@
+"""
+Module for reading the state of Nvidia GPUs directly from NVML.
+
+Instead of querying `nvidia-smi` with a query string and parsing nested dictionaries,
+the `NvmlDeviceHandler` requests all field values of a device with a single batched
+`nvmlDeviceGetFieldValues` call, complemented by one call per device query for the
+metrics NVML has no field id for, and stores the results in a fixed numeric layout:
+one row per device (in handle order) and one column per metric.
+
+The NVML library is pluggable. By default `pynvml` is used, setting the environment
+variable `GREEM_MOCK_NVML=<device count>` or passing a `MockNvml` replaces it with a
+simulated library, so the GPU monitoring can be built and tested without a GPU.
+
+Classes:
+    NvmlDeviceHandler: Reads the metrics of all GPUs into a numeric array.
+    MockNvml: Simulated NVML library with the subset of functions used by this module.
+
+Functions:
+    get_nvml() -> ModuleType | MockNvml:
+        Returns the NVML library selected by the environment.
+"""
+
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from types import ModuleType
+
+import numpy as np
+import pandas as pd
+import pynvml
+
+MOCK_NVML_ENV: str = "GREEM_MOCK_NVML"
+
+MIB: int = 1024 * 1024
+MOCK_SAMPLING_PERIOD_US: int = 167000
+
+# metrics read with one batched field value query, (column, NVML field id, scale to the unit of the column)
+FIELD_VALUE_METRICS: list[tuple[str, int, float]] = [
+    ("power.draw", pynvml.NVML_FI_DEV_POWER_INSTANT, 1e-3),  # mW -> W
+    ("power.average", pynvml.NVML_FI_DEV_POWER_AVERAGE, 1e-3),  # mW -> W
+    ("energy.total", pynvml.NVML_FI_DEV_TOTAL_ENERGY_CONSUMPTION, 1e-3),  # mJ -> J
+    ("temperature.memory", pynvml.NVML_FI_DEV_MEMORY_TEMP, 1.0),  # C
+]
+
+# metrics that have no NVML field id, (device query, columns filled by the query)
+# every query is one NVML call per device and sample, e.g. utilization returns the gpu and memory columns
+DEVICE_QUERIES: list[tuple[str, tuple[str, ...]]] = [
+    ("utilization", ("utilization.gpu", "utilization.memory")),
+    ("encoder", ("utilization.encoder",)),
+    ("decoder", ("utilization.decoder",)),
+    ("memory", ("memory.used", "memory.free")),
+    ("temperature", ("temperature.gpu",)),
+    ("clock.graphics", ("clocks.current.graphics",)),
+    ("clock.memory", ("clocks.current.memory",)),
+    ("fan", ("fan.speed",)),
+]
+DEVICE_QUERY_METRICS: list[str] = [column for _, columns in DEVICE_QUERIES for column in columns]
+
+# attribute of `c_nvmlValue_t` per NVML value type
+_VALUE_ATTRIBUTES: tuple[str, ...] = ("dVal", "uiVal", "ulVal", "ullVal", "sllVal", "siVal", "usVal")
+
+
+def get_nvml() -> "ModuleType | MockNvml":
+    """Returns `pynvml`, or a `MockNvml` if `GREEM_MOCK_NVML` is set to a number of devices"""
+    mock_device_count: str | None = os.environ.get(MOCK_NVML_ENV)
+    if mock_device_count is not None:
+        return MockNvml.with_devices(int(mock_device_count))
+
+    return pynvml
+
+
+def _get_field_value(field_value: pynvml.c_nvmlFieldValue_t) -> float:
+    if field_value.nvmlReturn != pynvml.NVML_SUCCESS:
+        return float("nan")
+
+    return float(getattr(field_value.value, _VALUE_ATTRIBUTES[field_value.valueType]))
+
+
+class NvmlDeviceHandler:
+    """Reads the metrics of all GPUs into a numeric array.
+
+    `values` has the shape `(device count, len(columns))`, its rows are ordered like
+    `handles` and `uuids`. Metrics a device does not support are `NaN` and are not
+    queried again, metrics whose query failed for another reason are `NaN` for the
+    current sample only.
+
+    Example:
+        >>> handler = NvmlDeviceHandler()
+        >>> handler.update()
+        >>> handler.get_value(0, 'power.draw')
+        35.2
+    """
+
+    def __init__(self, nvml: "ModuleType | MockNvml | None" = None) -> None:
+        self.nvml = nvml if nvml is not None else get_nvml()
+        self.nvml.nvmlInit()
+
+        self.handles: list = [
+            self.nvml.nvmlDeviceGetHandleByIndex(idx) for idx in range(self.nvml.nvmlDeviceGetCount())
+        ]
+        self.uuids: list[str] = [self.nvml.nvmlDeviceGetUUID(handle) for handle in self.handles]
+        self.columns: list[str] = [metric[0] for metric in FIELD_VALUE_METRICS] + DEVICE_QUERY_METRICS
+        self.values: np.ndarray = np.full((len(self.handles), len(self.columns)), np.nan)
+        self._column_index: dict[str, int] = {column: idx for idx, column in enumerate(self.columns)}
+        self._field_ids: list[int] = [metric[1] for metric in FIELD_VALUE_METRICS]
+        self._field_scales: np.ndarray = np.array([metric[2] for metric in FIELD_VALUE_METRICS])
+        self._query_slices: list[tuple[str, slice]] = []
+        query_start: int = len(FIELD_VALUE_METRICS)
+        for query, columns in DEVICE_QUERIES:
+            self._query_slices.append((query, slice(query_start, query_start + len(columns))))
+            query_start += len(columns)
+        self._unsupported_queries: set[tuple[int, str]] = set()
+
+    @property
+    def device_count(self) -> int:
+        return len(self.handles)
+
+    def shutdown(self) -> None:
+        self.nvml.nvmlShutdown()
+
+    def update(self) -> np.ndarray:
+        """Reads the current metrics of all devices into `values` and returns it"""
+        field_count: int = len(self._field_ids)
+        for device_idx, handle in enumerate(self.handles):
+            try:
+                field_values = self.nvml.nvmlDeviceGetFieldValues(handle, self._field_ids)
+                self.values[device_idx, :field_count] = [
+                    _get_field_value(field_value) for field_value in field_values
+                ]
+                self.values[device_idx, :field_count] *= self._field_scales
+            except pynvml.NVMLError:
+                self.values[device_idx, :field_count] = np.nan
+
+            for query, columns in self._query_slices:
+                if (device_idx, query) in self._unsupported_queries:
+                    continue
+                try:
+                    self.values[device_idx, columns] = self._query_device(handle, query)
+                except pynvml.NVMLError as err:
+                    # only a missing feature is permanent, other errors are retried on the next sample
+                    if err.value == pynvml.NVML_ERROR_NOT_SUPPORTED:
+                        self._unsupported_queries.add((device_idx, query))
+                    self.values[device_idx, columns] = np.nan
+
+        return self.values
+
+    def get_value(self, device_index: int, column: str) -> float:
+        """Returns the last read value of a metric of a device"""
+        return float(self.values[device_index, self._column_index[column]])
+
+    def get_update_as_rows(self) -> list[dict]:
+        """Reads the current metrics and returns one flat row per device"""
+        self.update()
+        return [
+            {"index": device_idx, "uuid": uuid, **dict(zip(self.columns, self.values[device_idx].tolist()))}
+            for device_idx, uuid in enumerate(self.uuids)
+        ]
+
+    def get_update_as_pandas_df(self) -> pd.DataFrame:
+        """Reads the current metrics and returns them as a DataFrame with one row per device"""
+        self.update()
+        df = pd.DataFrame(self.values.copy(), columns=self.columns)
+        df.insert(0, "uuid", self.uuids)
+        df.index = pd.Index([pd.Timestamp("now")] * len(df), name="date_time")
+
+        return df
+
+    def _query_device(self, handle, query: str) -> tuple[float, ...]:
+        if query == "utilization":
+            utilization = self.nvml.nvmlDeviceGetUtilizationRates(handle)
+            return utilization.gpu, utilization.memory
+        if query == "encoder":
+            return (self.nvml.nvmlDeviceGetEncoderUtilization(handle)[0],)
+        if query == "decoder":
+            return (self.nvml.nvmlDeviceGetDecoderUtilization(handle)[0],)
+        if query == "memory":
+            memory = self.nvml.nvmlDeviceGetMemoryInfo(handle)
+            return memory.used / MIB, memory.free / MIB
+        if query == "temperature":
+            return (self.nvml.nvmlDeviceGetTemperature(handle, pynvml.NVML_TEMPERATURE_GPU),)
+        if query == "clock.graphics":
+            return (self.nvml.nvmlDeviceGetClockInfo(handle, pynvml.NVML_CLOCK_GRAPHICS),)
+        if query == "clock.memory":
+            return (self.nvml.nvmlDeviceGetClockInfo(handle, pynvml.NVML_CLOCK_MEM),)
+        if query == "fan":
+            return (self.nvml.nvmlDeviceGetFanSpeed(handle),)
+
+        raise ValueError(f"unknown device query {query}")
+
+
+@dataclass
+class MockNvmlDevice:
+    """
+    Simulated GPU of a `MockNvml` library.
+
+    Attributes:
+        uuid (str): UUID of the device.
+        field_values (dict[int, float]): Raw values of the NVML field ids, in NVML units (e.g. mW, mJ).
+            Field ids that are missing are reported as not supported.
+        utilization (tuple[int, int]): GPU and memory utilization in percent. Defaults to (0, 0).
+        memory_used_bytes (int): Used device memory. Defaults to 0.
+        memory_free_bytes (int): Free device memory. Defaults to 8 GiB.
+        temperature (int): GPU temperature in degree Celsius. Defaults to 40.
+        clocks (tuple[int, int]): Graphics and memory clock in MHz. Defaults to (1500, 5000).
+        fan_speed (int | None): Fan speed in percent, `None` for passively cooled devices. Defaults to None.
+        power_watts (float): Power draw that increases the energy counter on every field value query. Defaults to 0.
+        encoder_utilization (int): NVENC utilization in percent. Defaults to 0.
+        decoder_utilization (int): NVDEC utilization in percent. Defaults to 0.
+        encoder_sessions (list[dict]): Active NVENC sessions with the fields of `c_nvmlEncoderSession_t`,
+            e.g. `{'sessionId': 1, 'pid': 4242, 'averageFps': 60, 'encodeLatency': 800}`. Defaults to [].
+        pending_errors (dict[str, int]): NVML error codes raised once by the next call of the named
+            library function, e.g. `{'nvmlDeviceGetFieldValues': pynvml.NVML_ERROR_GPU_IS_LOST}`. Defaults to {}.
+    """
+
+    uuid: str
+    field_values: dict[int, float] = field(default_factory=dict)
+    utilization: tuple[int, int] = (0, 0)
+    memory_used_bytes: int = 0
+    memory_free_bytes: int = 8 * 1024 * MIB
+    temperature: int = 40
+    clocks: tuple[int, int] = (1500, 5000)
+    fan_speed: int | None = None
+    power_watts: float = 0
+    encoder_utilization: int = 0
+    decoder_utilization: int = 0
+    encoder_sessions: list[dict] = field(default_factory=list)
+    pending_errors: dict[str, int] = field(default_factory=dict)
+
+
+class MockNvml:
+    """Simulated NVML library with the subset of functions used by `NvmlDeviceHandler`.
+
+    Handles are the indices of the `devices`. Every field value query advances the
+    energy counter of a device by `power_watts` times one second. `call_counts` counts
+    the calls of every device function by name.
+
+    Example:
+        >>> nvml = MockNvml([MockNvmlDevice('GPU-0', power_watts=120)])
+        >>> handler = NvmlDeviceHandler(nvml)
+    """
+
+    def __init__(self, devices: list[MockNvmlDevice]) -> None:
+        self.devices: list[MockNvmlDevice] = devices
+        self.is_initialized: bool = False
+        self.call_counts: Counter[str] = Counter()
+
+    @classmethod
+    def with_devices(cls, device_count: int) -> "MockNvml":
+        """Returns a library with `device_count` idle devices that draw 30 W each"""
+        return cls(
+            [
+                MockNvmlDevice(
+                    uuid=f"GPU-mock-{idx}",
+                    field_values={
+                        pynvml.NVML_FI_DEV_POWER_INSTANT: 30000,
+                        pynvml.NVML_FI_DEV_TOTAL_ENERGY_CONSUMPTION: 0,
+                    },
+                    power_watts=30,
+                )
+                for idx in range(device_count)
+            ]
+        )
+
+    def nvmlInit(self) -> None:
+        self.is_initialized = True
+
+    def nvmlShutdown(self) -> None:
+        self.is_initialized = False
+
+    def nvmlDeviceGetCount(self) -> int:
+        self._check_initialized()
+        return len(self.devices)
+
+    def nvmlDeviceGetHandleByIndex(self, index: int) -> int:
+        self._check_initialized()
+        if index >= len(self.devices):
+            raise pynvml.NVMLError(pynvml.NVML_ERROR_INVALID_ARGUMENT)
+        return index
+
+    def nvmlDeviceGetUUID(self, handle: int) -> str:
+        return self._get_device(handle, "nvmlDeviceGetUUID").uuid
+
+    def nvmlDeviceGetFieldValues(self, handle: int, field_ids: list[int]):
+        device = self._get_device(handle, "nvmlDeviceGetFieldValues")
+        energy_field: int = pynvml.NVML_FI_DEV_TOTAL_ENERGY_CONSUMPTION
+        if energy_field in device.field_values:
+            device.field_values[energy_field] += device.power_watts * 1000
+
+        values = (pynvml.c_nvmlFieldValue_t * len(field_ids))()
+        for idx, field_id in enumerate(field_ids):
+            values[idx].fieldId = field_id
+            if field_id in device.field_values:
+                values[idx].nvmlReturn = pynvml.NVML_SUCCESS
+                values[idx].valueType = pynvml.NVML_VALUE_TYPE_DOUBLE
+                values[idx].value.dVal = device.field_values[field_id]
+            else:
+                values[idx].nvmlReturn = pynvml.NVML_ERROR_NOT_SUPPORTED
+
+        return values
+
+    def nvmlDeviceGetUtilizationRates(self, handle: int) -> pynvml.c_nvmlUtilization_t:
+        gpu, memory = self._get_device(handle, "nvmlDeviceGetUtilizationRates").utilization
+        return pynvml.c_nvmlUtilization_t(gpu=gpu, memory=memory)
+
+    def nvmlDeviceGetMemoryInfo(self, handle: int) -> pynvml.c_nvmlMemory_t:
+        device = self._get_device(handle, "nvmlDeviceGetMemoryInfo")
+        return pynvml.c_nvmlMemory_t(
+            total=device.memory_used_bytes + device.memory_free_bytes,
+            free=device.memory_free_bytes,
+            used=device.memory_used_bytes,
+        )
+
+    def nvmlDeviceGetTemperature(self, handle: int, sensor: int) -> int:
+        return self._get_device(handle, "nvmlDeviceGetTemperature").temperature
+
+    def nvmlDeviceGetClockInfo(self, handle: int, clock_type: int) -> int:
+        graphics_clock, memory_clock = self._get_device(handle, "nvmlDeviceGetClockInfo").clocks
+        return memory_clock if clock_type == pynvml.NVML_CLOCK_MEM else graphics_clock
+
+    def nvmlDeviceGetFanSpeed(self, handle: int) -> int:
+        fan_speed: int | None = self._get_device(handle, "nvmlDeviceGetFanSpeed").fan_speed
+        if fan_speed is None:
+            raise pynvml.NVMLError(pynvml.NVML_ERROR_NOT_SUPPORTED)
+        return fan_speed
+
+    def nvmlDeviceGetEncoderUtilization(self, handle: int) -> list[int]:
+        device = self._get_device(handle, "nvmlDeviceGetEncoderUtilization")
+        return [device.encoder_utilization, MOCK_SAMPLING_PERIOD_US]
+
+    def nvmlDeviceGetDecoderUtilization(self, handle: int) -> list[int]:
+        device = self._get_device(handle, "nvmlDeviceGetDecoderUtilization")
+        return [device.decoder_utilization, MOCK_SAMPLING_PERIOD_US]
+
+    def nvmlDeviceGetEncoderSessions(self, handle: int) -> list[pynvml.c_nvmlEncoderSession_t]:
+        device = self._get_device(handle, "nvmlDeviceGetEncoderSessions")
+        return [pynvml.c_nvmlEncoderSession_t(**session) for session in device.encoder_sessions]
+
+    def nvmlDeviceGetEncoderStats(self, handle: int) -> tuple[int, int, int]:
+        sessions: list[dict] = self._get_device(handle, "nvmlDeviceGetEncoderStats").encoder_sessions
+        if len(sessions) == 0:
+            return 0, 0, 0
+
+        average_fps: int = sum(session.get("averageFps", 0) for session in sessions) // len(sessions)
+        average_latency: int = sum(session.get("encodeLatency", 0) for session in sessions) // len(sessions)
+        return len(sessions), average_fps, average_latency
+
+    def _get_device(self, handle: int, function_name: str) -> MockNvmlDevice:
+        self.call_counts[function_name] += 1
+        device = self.devices[handle]
+        error_code: int | None = device.pending_errors.pop(function_name, None)
+        if error_code is not None:
+            raise pynvml.NVMLError(error_code)
+        return device
+
+    def _check_initialized(self) -> None:
+        if not self.is_initialized:
+            raise pynvml.NVMLError(pynvml.NVML_ERROR_UNINITIALIZED)
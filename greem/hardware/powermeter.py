@@ -0,0 +1,236 @@
+"""
+Module for reading traces of external power meters, e.g. `Data_20220404_141207.csv`.
+
+A trace starts with a preamble that describes the measurement, followed by one
+reading per sample:
+
+    Serial number:,2101129
+    Function:,DCI,Unit:,A
+    Start date:,2022/04/04,Start time:,14:12:07
+    Sample:,0.005s
+    Reading #,Reading
+    0,6.58152e-01
+
+The readings are read in chunks, so traces of several hours at 200 Hz are processed
+in bounded memory. Current readings are converted into power with the supply voltage,
+and the energy of arbitrary job windows is integrated with the trapezoidal rule.
+
+Classes:
+    PowerMeterMetadata: Metadata from the preamble of a trace.
+    PowerMeterTrace: Reads the readings of a trace in chunks and integrates their energy.
+
+Functions:
+    parse_powermeter_preamble(lines: list[str]) -> PowerMeterMetadata:
+        Parses the preamble lines of a trace.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+HEADER_PREFIX: str = "Reading #"
+READING_COLUMNS: list[str] = ["reading_index", "reading"]
+
+# factor from the unit of the sample period to seconds
+_PERIOD_UNITS: dict[str, float] = {"us": 1e-6, "ms": 1e-3, "s": 1.0}
+
+
+@dataclass(frozen=True)
+class PowerMeterMetadata:
+    """
+    Metadata from the preamble of a power meter trace.
+
+    Attributes:
+        serial_number (str): Serial number of the power meter.
+        function (str): Measurement function, e.g. `DCI` for DC current.
+        unit (str): Unit of the readings, `A` or `W`.
+        start_time (datetime): Time of the first reading.
+        sample_period_seconds (float): Time between two readings.
+        preamble_line_count (int): Number of lines before the column header.
+    """
+
+    serial_number: str
+    function: str
+    unit: str
+    start_time: datetime
+    sample_period_seconds: float
+    preamble_line_count: int
+
+
+def _parse_sample_period(period: str) -> float:
+    for unit in sorted(_PERIOD_UNITS, key=len, reverse=True):
+        if period.endswith(unit):
+            return float(period.removesuffix(unit)) * _PERIOD_UNITS[unit]
+
+    return float(period)
+
+
+def parse_powermeter_preamble(lines: list[str]) -> PowerMeterMetadata:
+    """Parses the `key:,value` pairs of the lines before the column header of a trace"""
+    values: dict[str, str] = {}
+    for line in lines:
+        fields: list[str] = [value.strip() for value in line.strip().split(",")]
+        for key, value in zip(fields[::2], fields[1::2]):
+            values[key.removesuffix(":")] = value
+
+    try:
+        return PowerMeterMetadata(
+            serial_number=values.get("Serial number", ""),
+            function=values.get("Function", ""),
+            unit=values["Unit"],
+            start_time=datetime.strptime(f'{values["Start date"]} {values["Start time"]}', "%Y/%m/%d %H:%M:%S"),
+            sample_period_seconds=_parse_sample_period(values["Sample"]),
+            preamble_line_count=len(lines),
+        )
+    except KeyError as error:
+        raise ValueError(f"the power meter preamble does not contain {error}") from error
+
+
+class PowerMeterTrace:
+    """Reads the readings of a power meter trace in chunks and integrates their energy.
+
+    Every chunk is a DataFrame with the columns `reading_index`, `reading`, `seconds`
+    (time since `metadata.start_time`) and `power` in W. Readings in A are multiplied
+    by `voltage`.
+
+    Example:
+        >>> trace = PowerMeterTrace('Data_20220404_141207.csv', voltage=20)
+        >>> trace.integrate_energy([(0, 10), (10, 20)])
+        array([533.98, 524.83])
+    """
+
+    def __init__(self, file_path: str, voltage: float | None = None, chunk_size: int = 1_000_000) -> None:
+        if chunk_size < 2:
+            raise ValueError(f"chunk_size has to be at least 2, got {chunk_size}")
+
+        self.file_path: str = file_path
+        self.chunk_size: int = chunk_size
+        self.metadata: PowerMeterMetadata = self._read_metadata()
+
+        if self.metadata.unit == "A" and voltage is None:
+            raise ValueError(f"{file_path} contains currents, a voltage is required to compute the power")
+        if self.metadata.unit not in ("A", "W"):
+            raise ValueError(f"unsupported unit {self.metadata.unit} in {file_path}")
+        self.voltage: float | None = voltage
+
+    def iter_chunks(self) -> Iterator[pd.DataFrame]:
+        """Yields the readings in chunks of at most `chunk_size` rows"""
+        reader = pd.read_csv(
+            self.file_path,
+            skiprows=self.metadata.preamble_line_count + 1,
+            names=READING_COLUMNS,
+            dtype={"reading_index": np.int64, "reading": np.float64},
+            chunksize=self.chunk_size,
+        )
+        scale: float = self.voltage if self.metadata.unit == "A" else 1.0
+
+        for chunk in reader:
+            chunk["seconds"] = chunk["reading_index"] * self.metadata.sample_period_seconds
+            chunk["power"] = chunk["reading"] * scale
+            yield chunk
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Returns all readings, only for traces that fit into memory"""
+        return pd.concat(self.iter_chunks(), ignore_index=True)
+
+    def integrate_energy(self, windows) -> np.ndarray:
+        """Integrates the energy in J of each window with the trapezoidal rule.
+
+        The power is linearly interpolated between two readings, so window boundaries
+        do not have to coincide with readings. Windows that are not completely
+        covered by the trace are `NaN`.
+
+        Args:
+            windows: Sequence of `(start, end)` pairs, either in seconds since the start
+                of the trace or as datetimes, e.g. `JobResult.start_time` and `end_time`.
+
+        Returns:
+            np.ndarray: The energy of every window in J.
+        """
+        boundaries: np.ndarray = self._to_seconds(windows).reshape(-1, 2)
+        if boundaries.size == 0:
+            return np.empty(0)
+
+        flat_boundaries: np.ndarray = boundaries.ravel()
+        order: np.ndarray = np.argsort(flat_boundaries)
+        sorted_boundaries: np.ndarray = flat_boundaries[order]
+        # cumulative energy at every boundary
+        boundary_energy: np.ndarray = np.full(len(sorted_boundaries), np.nan)
+
+        previous_seconds, previous_power, previous_energy = None, None, 0.0
+        for chunk in self.iter_chunks():
+            seconds: np.ndarray = chunk["seconds"].to_numpy()
+            power: np.ndarray = chunk["power"].to_numpy()
+            if previous_seconds is not None:
+                # the segment between the last reading of the previous chunk and the first one of this chunk
+                seconds = np.concatenate(([previous_seconds], seconds))
+                power = np.concatenate(([previous_power], power))
+
+            segment_energy: np.ndarray = np.diff(seconds) * (power[1:] + power[:-1]) / 2
+            energy: np.ndarray = previous_energy + np.concatenate(([0.0], np.cumsum(segment_energy)))
+
+            first: int = np.searchsorted(sorted_boundaries, seconds[0], side="left")
+            last: int = np.searchsorted(sorted_boundaries, seconds[-1], side="right")
+            if last > first:
+                boundary_energy[first:last] = self._interpolate_energy(
+                    sorted_boundaries[first:last], seconds, power, energy
+                )
+
+            previous_seconds, previous_power, previous_energy = seconds[-1], power[-1], energy[-1]
+
+        window_energy: np.ndarray = np.empty(len(flat_boundaries))
+        window_energy[order] = boundary_energy
+        window_energy = window_energy.reshape(-1, 2)
+
+        return window_energy[:, 1] - window_energy[:, 0]
+
+    def total_energy(self) -> float:
+        """Integrates the energy in J of the whole trace"""
+        total: float = 0.0
+        previous_seconds, previous_power = None, None
+        for chunk in self.iter_chunks():
+            seconds: np.ndarray = chunk["seconds"].to_numpy()
+            power: np.ndarray = chunk["power"].to_numpy()
+            if previous_seconds is not None:
+                total += (seconds[0] - previous_seconds) * (power[0] + previous_power) / 2
+            total += float(np.sum(np.diff(seconds) * (power[1:] + power[:-1]) / 2))
+            previous_seconds, previous_power = seconds[-1], power[-1]
+
+        return total
+
+    @staticmethod
+    def _interpolate_energy(
+        boundaries: np.ndarray, seconds: np.ndarray, power: np.ndarray, energy: np.ndarray
+    ) -> np.ndarray:
+        """Cumulative energy at `boundaries`, which lie within `seconds`, for a linearly interpolated power"""
+        if len(seconds) == 1:
+            return np.full(len(boundaries), energy[0])
+
+        idx: np.ndarray = np.clip(np.searchsorted(seconds, boundaries, side="right") - 1, 0, len(seconds) - 2)
+
+        period: np.ndarray = seconds[idx + 1] - seconds[idx]
+        delta: np.ndarray = boundaries - seconds[idx]
+        slope: np.ndarray = (power[idx + 1] - power[idx]) / period
+
+        return energy[idx] + power[idx] * delta + slope * delta**2 / 2
+
+    def _to_seconds(self, windows) -> np.ndarray:
+        boundaries = np.asarray(windows)
+        if boundaries.dtype.kind in "iuf":
+            return boundaries.astype(np.float64)
+
+        timestamps = pd.to_datetime(boundaries.ravel())
+        return (timestamps - pd.Timestamp(self.metadata.start_time)).total_seconds().to_numpy()
+
+    def _read_metadata(self) -> PowerMeterMetadata:
+        preamble: list[str] = []
+        with open(self.file_path, "r", encoding="utf-8") as trace_file:
+            for line in trace_file:
+                if line.startswith(HEADER_PREFIX):
+                    return parse_powermeter_preamble(preamble)
+                preamble.append(line)
+
+        raise ValueError(f"{self.file_path} does not contain the column header '{HEADER_PREFIX}'")
@@ -0,0 +1,209 @@
+"""
+Module for reading the Intel RAPL (Running Average Power Limit) energy counters directly
+from the powercap sysfs interface.
+
+Every RAPL domain (package, core, uncore, dram, psys) exposes a cumulative `energy_uj`
+counter that wraps around at `max_energy_range_uj`. The `RaplReader` keeps the counter
+files open and reads them with a single `pread` each, so sampling every 10 ms costs only
+a few system calls per domain.
+
+Classes:
+    RaplDomain: A single RAPL energy counter.
+    RaplReader: Reads the energy consumed by all RAPL domains between two samples.
+
+Functions:
+    discover_rapl_domains(root: str = RAPL_ROOT) -> list[RaplDomain]:
+        Finds the RAPL domains of the powercap sysfs tree.
+    get_energy_delta_uj(previous_uj: int, current_uj: int, max_energy_range_uj: int) -> int:
+        Returns the energy between two counter values, handling a wraparound.
+"""
+
+import os
+import re
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+RAPL_ROOT: str = "/sys/class/powercap"
+
+# matches the zones `intel-rapl:<package>` and the sub-zones `intel-rapl:<package>:<index>`
+RAPL_ZONE_PATTERN = re.compile(r"^intel-rapl:(\d+)(?::(\d+))?$")
+
+# domains that contain the energy of the CPU respectively the memory,
+# `core` and `uncore` are part of `package` and `psys` covers the whole platform
+CPU_DOMAIN_PREFIX: str = "package"
+RAM_DOMAIN_PREFIX: str = "dram"
+
+JOULES_PER_KWH: float = 3.6e6
+
+
+@dataclass(frozen=True)
+class RaplDomain:
+    """
+    A single RAPL energy counter.
+
+    Attributes:
+        name (str): Name of the domain including the package index, e.g. `package-0` or `dram-0`.
+        path (str): Directory of the zone in the powercap sysfs tree.
+        max_energy_range_uj (int): Value at which `energy_uj` wraps around to zero.
+    """
+
+    name: str
+    path: str
+    max_energy_range_uj: int
+
+    @property
+    def energy_file_path(self) -> str:
+        return os.path.join(self.path, "energy_uj")
+
+
+def _read_int(file_path: str) -> int:
+    with open(file_path, "r", encoding="utf-8") as file:
+        return int(file.read().strip())
+
+
+def discover_rapl_domains(root: str = RAPL_ROOT) -> list[RaplDomain]:
+    """Finds the RAPL domains of the powercap sysfs tree.
+
+    Sub-zones are named after their `name` file and the index of their package,
+    e.g. the `dram` zone `intel-rapl:1:0` becomes `dram-1`.
+
+    Parameters
+    ----------
+    root : str, optional
+        powercap directory, by default `/sys/class/powercap`
+
+    Returns
+    -------
+    list[RaplDomain]
+        domains sorted by package and zone index, empty if RAPL is not available
+    """
+    if not os.path.isdir(root):
+        return []
+
+    zones: list[tuple[tuple[int, int], RaplDomain]] = []
+    for zone_dir in os.listdir(root):
+        match = RAPL_ZONE_PATTERN.match(zone_dir)
+        zone_path: str = os.path.join(root, zone_dir)
+        if match is None or not os.path.exists(os.path.join(zone_path, "energy_uj")):
+            continue
+
+        package_index, sub_zone_index = match.group(1), match.group(2)
+        with open(os.path.join(zone_path, "name"), "r", encoding="utf-8") as name_file:
+            name: str = name_file.read().strip()
+        if sub_zone_index is not None or not name.endswith(f"-{package_index}"):
+            name = f"{name}-{package_index}" if name != "psys" else name
+
+        domain = RaplDomain(
+            name=name,
+            path=zone_path,
+            max_energy_range_uj=_read_int(os.path.join(zone_path, "max_energy_range_uj")),
+        )
+        sort_key = (int(package_index), -1 if sub_zone_index is None else int(sub_zone_index))
+        zones.append((sort_key, domain))
+
+    return [domain for _, domain in sorted(zones, key=lambda zone: zone[0])]
+
+
+def get_energy_delta_uj(previous_uj: int, current_uj: int, max_energy_range_uj: int) -> int:
+    """Returns the energy between two counter values, handling a wraparound of the counter"""
+    if current_uj >= previous_uj:
+        return current_uj - previous_uj
+
+    return max_energy_range_uj - previous_uj + current_uj
+
+
+class RaplReader:
+    """Reads the energy consumed by all RAPL domains between two samples.
+
+    The columns of a sample are the energy of every domain in joules
+    (`rapl.<domain>.energy`), followed by the aggregated values in the units of
+    CodeCarbon, so the samples can replace its measurements:
+    `duration` (s), `cpu_power` and `ram_power` (W), `cpu_energy`, `ram_energy`
+    and `energy_consumed` (kWh).
+
+    Example:
+        >>> reader = RaplReader()
+        >>> reader.reset()
+        >>> row = np.full(len(reader.columns), np.nan)
+        >>> reader.read_sample(row)
+    """
+
+    def __init__(self, root: str = RAPL_ROOT, domains: list[RaplDomain] | None = None) -> None:
+        self.domains: list[RaplDomain] = discover_rapl_domains(root) if domains is None else domains
+        if len(self.domains) == 0:
+            raise FileNotFoundError(f"No RAPL domains found in {root}")
+
+        self.columns: list[str] = [f"rapl.{domain.name}.energy" for domain in self.domains] + [
+            "duration",
+            "cpu_power",
+            "ram_power",
+            "cpu_energy",
+            "ram_energy",
+            "energy_consumed",
+        ]
+        self._cpu_domains: list[int] = [
+            idx for idx, domain in enumerate(self.domains) if domain.name.startswith(CPU_DOMAIN_PREFIX)
+        ]
+        self._ram_domains: list[int] = [
+            idx for idx, domain in enumerate(self.domains) if domain.name.startswith(RAM_DOMAIN_PREFIX)
+        ]
+
+        try:
+            self._file_descriptors: list[int] = [
+                os.open(domain.energy_file_path, os.O_RDONLY) for domain in self.domains
+            ]
+        except PermissionError as err:
+            raise PermissionError(
+                f"{err.filename} is not readable, see `greem.hardware.intel.intel_rapl_workaround`"
+            ) from err
+
+        self._previous_uj: list[int] = [0] * len(self.domains)
+        self._previous_time: float = 0
+        self.reset()
+
+    def __del__(self) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the counter files"""
+        for file_descriptor in getattr(self, "_file_descriptors", []):
+            os.close(file_descriptor)
+        self._file_descriptors = []
+
+    def read_energy_uj(self) -> list[int]:
+        """Returns the current counter values of all domains in microjoules"""
+        return [int(os.pread(file_descriptor, 32, 0)) for file_descriptor in self._file_descriptors]
+
+    def reset(self) -> None:
+        """Starts a new measurement interval without returning the energy of the current one"""
+        self._previous_uj = self.read_energy_uj()
+        self._previous_time = time.monotonic()
+
+    def read_sample(self, row: np.ndarray) -> None:
+        """Writes the energy consumed since the previous sample (or `reset`) into `row`,
+        which is ordered like `columns`"""
+        current_uj: list[int] = self.read_energy_uj()
+        current_time: float = time.monotonic()
+
+        domain_count: int = len(self.domains)
+        for idx, domain in enumerate(self.domains):
+            delta_uj: int = get_energy_delta_uj(
+                self._previous_uj[idx], current_uj[idx], domain.max_energy_range_uj
+            )
+            row[idx] = delta_uj / 1e6
+
+        duration: float = current_time - self._previous_time
+        cpu_joules: float = sum(row[idx] for idx in self._cpu_domains)
+        ram_joules: float = sum(row[idx] for idx in self._ram_domains)
+
+        row[domain_count] = duration
+        row[domain_count + 1] = cpu_joules / duration if duration > 0 else np.nan
+        row[domain_count + 2] = ram_joules / duration if duration > 0 else np.nan
+        row[domain_count + 3] = cpu_joules / JOULES_PER_KWH
+        row[domain_count + 4] = ram_joules / JOULES_PER_KWH
+        row[domain_count + 5] = (cpu_joules + ram_joules) / JOULES_PER_KWH
+
+        self._previous_uj = current_uj
+        self._previous_time = current_time
@@ -0,0 +1,208 @@
+"""
+Module for sampling the NVENC and NVDEC usage of Nvidia GPUs per encoding job.
+
+The `EncoderSessionCollector` periodically reads the encoder and decoder utilization and
+the encoder statistics of every GPU, and the active NVENC sessions with the PID of the
+process that owns them. As `JobResult.pid` is the PID of the spawned ffmpeg process,
+the sessions are joined to the jobs that opened them, e.g. to see at which number of
+concurrent encodes the session limit of a GPU saturates.
+
+Classes:
+    EncoderSessionCollector: Thread that samples the NVENC/NVDEC usage and the encoder sessions of all GPUs.
+"""
+
+import threading
+import time
+from types import ModuleType
+
+import numpy as np
+import pandas as pd
+import pynvml
+
+from greem.hardware.nvml_backend import MockNvml, get_nvml
+from greem.utility.job_runner import JobResult
+from greem.utility.sampler import SampleRingBuffer
+
+DEVICE_SAMPLE_COLUMNS: list[str] = [
+    "monotonic_time",
+    "device",
+    "encoder_util",
+    "decoder_util",
+    "session_count",
+    "average_fps",
+    "average_latency_us",
+]
+
+SESSION_SAMPLE_COLUMNS: list[str] = [
+    "monotonic_time",
+    "device",
+    "session_id",
+    "pid",
+    "codec_type",
+    "width",
+    "height",
+    "average_fps",
+    "average_latency_us",
+]
+
+
+class EncoderSessionCollector:
+    """Thread that samples the NVENC/NVDEC usage and the encoder sessions of all GPUs.
+
+    Every `interval` seconds one row per GPU with the `DEVICE_SAMPLE_COLUMNS` and one
+    row per active encoder session with the `SESSION_SAMPLE_COLUMNS` are stored.
+    Queries that a GPU does not support are `NaN`.
+
+    Example:
+        >>> collector = EncoderSessionCollector(interval=0.25)
+        >>> with collector:
+        ...     results = JobRunner(max_concurrency=8).run(jobs)
+        >>> collector.summarize_jobs(results)
+    """
+
+    def __init__(
+        self,
+        nvml: "ModuleType | MockNvml | None" = None,
+        interval: float = 0.25,
+        capacity: int = 65536,
+    ) -> None:
+        if interval <= 0:
+            raise ValueError(f"The sampling interval has to be positive, got {interval}")
+
+        self.nvml = nvml if nvml is not None else get_nvml()
+        self.nvml.nvmlInit()
+        self.handles: list = [
+            self.nvml.nvmlDeviceGetHandleByIndex(idx) for idx in range(self.nvml.nvmlDeviceGetCount())
+        ]
+        self.interval: float = interval
+        self.device_buffer = SampleRingBuffer(DEVICE_SAMPLE_COLUMNS, capacity)
+        self.session_buffer = SampleRingBuffer(SESSION_SAMPLE_COLUMNS, capacity)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "EncoderSessionCollector":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """Starts the sampling thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="greem-encoder-sessions", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the sampling thread"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sample_once(self) -> None:
+        """Samples all GPUs immediately"""
+        with self._lock:
+            for device_idx, handle in enumerate(self.handles):
+                monotonic_time: float = time.monotonic()
+                encoder_util = self._query(self.nvml.nvmlDeviceGetEncoderUtilization, handle)
+                decoder_util = self._query(self.nvml.nvmlDeviceGetDecoderUtilization, handle)
+                encoder_stats = self._query(self.nvml.nvmlDeviceGetEncoderStats, handle)
+                sessions = self._query(self.nvml.nvmlDeviceGetEncoderSessions, handle) or []
+
+                row: np.ndarray = self.device_buffer.claim_row()
+                row[0:2] = monotonic_time, device_idx
+                if encoder_util is not None:
+                    row[2] = encoder_util[0]
+                if decoder_util is not None:
+                    row[3] = decoder_util[0]
+                if encoder_stats is not None:
+                    row[4:7] = encoder_stats
+
+                for session in sessions:
+                    self.session_buffer.append(
+                        [
+                            monotonic_time,
+                            device_idx,
+                            session.sessionId,
+                            session.pid,
+                            session.codecType,
+                            session.hResolution,
+                            session.vResolution,
+                            session.averageFps,
+                            session.encodeLatency,
+                        ]
+                    )
+
+    def clear(self) -> None:
+        """Removes all samples"""
+        with self._lock:
+            self.device_buffer.clear()
+            self.session_buffer.clear()
+
+    def get_device_dataframe(self) -> pd.DataFrame:
+        """Returns the samples of the GPUs, see `DEVICE_SAMPLE_COLUMNS`"""
+        with self._lock:
+            return self.device_buffer.to_dataframe()
+
+    def get_session_dataframe(self) -> pd.DataFrame:
+        """Returns the samples of the encoder sessions, see `SESSION_SAMPLE_COLUMNS`"""
+        with self._lock:
+            return self.session_buffer.to_dataframe()
+
+    def summarize_jobs(self, results: list[JobResult]) -> pd.DataFrame:
+        """Joins the encoder sessions to the jobs that own them.
+
+        The sessions of a job are the sessions of its PID sampled while it was running.
+        The GPU utilization and session count are taken from the GPUs the job had
+        sessions on, jobs without sessions only have a `nvenc.sessions` of zero.
+
+        Args:
+            results (list[JobResult]): The executed jobs.
+
+        Returns:
+            pd.DataFrame: One row per job, in the order of `results`, with the columns
+                `nvenc.sessions`, `nvenc.fps.mean`, `nvenc.latency_us.mean`,
+                `nvenc.util.mean`, `nvdec.util.mean` and `nvenc.device_sessions.max`.
+        """
+        device_df = self.get_device_dataframe()
+        session_df = self.get_session_dataframe()
+
+        rows: list[dict] = []
+        for result in results:
+            job_sessions = session_df[
+                (session_df["pid"] == result.pid)
+                & (session_df["monotonic_time"] >= result.start_monotonic)
+                & (session_df["monotonic_time"] <= result.end_monotonic)
+            ]
+            job_devices = device_df[
+                device_df["device"].isin(job_sessions["device"].unique())
+                & (device_df["monotonic_time"] >= result.start_monotonic)
+                & (device_df["monotonic_time"] <= result.end_monotonic)
+            ]
+            rows.append(
+                {
+                    "nvenc.sessions": job_sessions["session_id"].nunique(),
+                    "nvenc.fps.mean": job_sessions["average_fps"].mean(),
+                    "nvenc.latency_us.mean": job_sessions["average_latency_us"].mean(),
+                    "nvenc.util.mean": job_devices["encoder_util"].mean(),
+                    "nvdec.util.mean": job_devices["decoder_util"].mean(),
+                    "nvenc.device_sessions.max": job_devices["session_count"].max(),
+                }
+            )
+
+        return pd.DataFrame(rows)
+
+    def _query(self, query_function, handle):
+        try:
+            return query_function(handle)
+        except pynvml.NVMLError:
+            return None
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.sample_once()
@@ -2,11 +2,12 @@ from dataclasses import dataclass
 from codecarbon.core.util import suppress
 from codecarbon.external.scheduler import PeriodicScheduler
 from time import sleep
-from os import system
 import pandas as pd
 
-from greem.hardware import nvidia_smi_dataclasses
+from greem.hardware.nvml_backend import NvmlDeviceHandler
+from greem.utility.arrow_stream import ArrowStreamWriter
 from greem.utility.configuration_classes import Representation
+from greem.utility.job_runner import run_cmd
 
 
 @dataclass
@@ -35,25 +36,27 @@ class GpuMonitoring(BaseMonitoring):
     # https://stackoverflow.com/questions/8223811/a-top-like-utility-for-monitoring-cuda-activity-on-a-gpu
 
     def __init__(
-        self, monitoring_file_path: str, monitoring_interval_in_secs: float
+        self,
+        monitoring_file_path: str,
+        monitoring_interval_in_secs: float,
+        gpu_metadata_handler: NvmlDeviceHandler | None = None,
     ) -> None:
         super().__init__(monitoring_file_path, monitoring_interval_in_secs)
 
-        self.gpu_metadata_handler = (
-            nvidia_smi_dataclasses.NvidiaMetadataHandler.from_smi()
-        )
+        # reads all GPUs with batched NVML queries, set `GREEM_MOCK_NVML` to run without GPU
+        self.gpu_metadata_handler = gpu_metadata_handler or NvmlDeviceHandler()
 
         self.scheduler = PeriodicScheduler(
             function=self.monitor_gpu, interval=self.monitoring_interval_in_secs
         )
 
-        self.file_stream = open(
-            f"{self.monitoring_file_path}/monitoring_stream.csv", "a"
+        # samples are written in batches, read them with `greem.utility.arrow_stream.read_arrow_stream`
+        self.stream_writer = ArrowStreamWriter(
+            f"{self.monitoring_file_path}/monitoring_stream.arrows"
         )
         self.current_video: str = ""
         self.rendition = Representation.new()
-        self.__write_to_file("start", use_header=True)
-        self.gpu_metadata_handler.get_update_metadata()
+        self.__write_to_file("start")
 
     @suppress(Exception)
     def start(self) -> None:
@@ -66,21 +69,18 @@ class GpuMonitoring(BaseMonitoring):
     def stop(self):
         self.last_measured_time = pd.Timestamp("now")
         self.scheduler.stop()
+        self.stream_writer.flush()
 
     def get_utilisation(self) -> tuple[float, float]:
-        # metadata = self.gpu_metadata_handler.get_update_metadata()['gpu']
-
-        gpu_util: list[float] = list()
-        mem_util: list[float] = list()
+        """Returns the average GPU and memory utilization of all GPUs in percent"""
+        self.gpu_metadata_handler.update()
+        columns: list[str] = self.gpu_metadata_handler.columns
+        values = self.gpu_metadata_handler.values
 
-        for gpu in self.gpu_metadata_handler.gpu:
-            print(gpu)
+        gpu_avg = float(values[:, columns.index("utilization.gpu")].mean())
+        mem_avg = float(values[:, columns.index("utilization.memory")].mean())
 
-        # gpu_avg = sum(gpu_util) / len(gpu_util)
-        # mem_avg = sum(mem_util) / len(mem_util)
-
-        return 0, 0
-        # return gpu_avg, mem_avg
+        return gpu_avg, mem_avg
 
     def monitor_gpu(self):
         last_measurement_time_delta = pd.Timestamp("now") - self.last_measured_time
@@ -93,15 +93,21 @@ class GpuMonitoring(BaseMonitoring):
 
     def __exit__(self, exc_type, exc_value, tb) -> None:
         self.stop()
-
-    def __write_to_file(self, video_name: str, use_header: bool = False) -> None:
-        df: pd.DataFrame = self.gpu_metadata_handler.get_update_as_pandas_df()
-        df["current_video"] = video_name
-        df["bitrate"] = self.rendition.bitrate
-        df["width"] = self.rendition.width
-        df["height"] = self.rendition.height
-        df.to_csv(self.file_stream, header=use_header)
-        self.file_stream.flush()
+        self.stream_writer.close()
+
+    def __write_to_file(self, video_name: str) -> None:
+        date_time = pd.Timestamp("now")
+        for gpu in self.gpu_metadata_handler.get_update_as_rows():
+            self.stream_writer.append(
+                {
+                    "date_time": date_time,
+                    **gpu,
+                    "current_video": video_name,
+                    "bitrate": self.rendition.bitrate,
+                    "width": self.rendition.width,
+                    "height": self.rendition.height,
+                }
+            )
 
 
 class HardwareMonitoring(BaseMonitoring):
@@ -125,7 +131,7 @@ if __name__ == "__main__":
     # wget -O opengl-rotating-triangle.mp4 https://github.com/cirosantilli/media/blob/master/opengl-rotating-triangle.mp4?raw=true
 
     for i in range(REPETITIONS):
-        system(
+        run_cmd(
             """ffmpeg -y \
                 -hwaccel cuda \
                 -i opengl-rotating-triangle.mp4 \
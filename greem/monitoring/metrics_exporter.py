@@ -0,0 +1,220 @@
+"""
+Module for serving live metrics of a running campaign in the Prometheus text format.
+
+Campaigns run for hours or days, the results are only written once a video is
+finished. The `MetricsExporter` serves the current state of the campaign on a local
+HTTP endpoint (`/metrics`), so it can be scraped by Prometheus or inspected with
+`curl` while it is running: the progress of the job runner, the latest power and
+the cumulative energy of the `HardwareTracker`, the encoding speed of the running
+FFmpeg processes and the overhead of the sampler itself.
+
+The exporter only reads the latest values when it is scraped, it does not take
+any measurements on its own.
+
+Classes:
+    MetricsExporter: HTTP server that renders the campaign metrics on every request.
+"""
+
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from greem.utility.ffmpeg_progress import ProgressMonitor
+    from greem.utility.job_runner import JobResult
+    from greem.utility.monitoring import HardwareTracker
+
+METRICS_PATH: str = "/metrics"
+CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+# component label and the `HardwareTracker` column of its power in W
+POWER_COLUMNS: dict[str, str] = {"cpu": "cpu_power", "gpu": "gpu_power", "ram": "ram_power"}
+
+# name of the metric and the `Sampler` column of its latest sample
+SAMPLER_METRICS: dict[str, str] = {
+    "greem_sampler_sample_seconds": "sample_seconds",
+    "greem_sampler_sample_cpu_seconds": "sample_cpu_seconds",
+}
+
+
+class MetricsExporter:
+    """HTTP server that renders the metrics of a running campaign on every request.
+
+    The job counters are updated by a `JobRunner` created with this exporter, the
+    hardware and encoding metrics are read from the `hardware_tracker` and the
+    `progress_monitor` if they are provided. The server only listens on `host`,
+    by default the loopback interface; `port=0` picks a free port.
+
+    Example:
+        >>> exporter = MetricsExporter(port=9464, hardware_tracker=hardware_tracker)
+        >>> with exporter:
+        ...     results = JobRunner(max_concurrency=4, metrics_exporter=exporter).run(jobs)
+        $ curl http://127.0.0.1:9464/metrics
+    """
+
+    def __init__(
+        self,
+        port: int,
+        host: str = "127.0.0.1",
+        hardware_tracker: "HardwareTracker | None" = None,
+        progress_monitor: "ProgressMonitor | None" = None,
+    ) -> None:
+        self.host: str = host
+        self.port: int = port
+        self.hardware_tracker: "HardwareTracker | None" = hardware_tracker
+        self.progress_monitor: "ProgressMonitor | None" = progress_monitor
+        self.jobs_queued: int = 0
+        self.jobs_running: int = 0
+        self.jobs_completed: int = 0
+        self.jobs_failed: int = 0
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "MetricsExporter":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """Starts serving the metrics in a background thread"""
+        if self._server is not None:
+            return
+
+        self._server = ThreadingHTTPServer((self.host, self.port), self._create_handler())
+        self._server.daemon_threads = True
+        # the actual port if a free one was picked
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="greem-metrics-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the server"""
+        if self._server is None:
+            return
+
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+
+    def add_queued_jobs(self, count: int) -> None:
+        """Called by the `JobRunner` when jobs are submitted"""
+        with self._lock:
+            self.jobs_queued += count
+
+    def job_started(self) -> None:
+        """Called by the `JobRunner` when a queued job acquired a concurrency slot"""
+        with self._lock:
+            self.jobs_queued = max(0, self.jobs_queued - 1)
+            self.jobs_running += 1
+
+    def job_finished(self, result: "JobResult") -> None:
+        """Called by the `JobRunner` when a running job finished"""
+        with self._lock:
+            self.jobs_running = max(0, self.jobs_running - 1)
+            self.jobs_completed += 1
+            if not result.succeeded:
+                self.jobs_failed += 1
+
+    def render(self) -> str:
+        """Returns the current metrics in the Prometheus text format"""
+        lines: list[str] = []
+        with self._lock:
+            _add_metric(lines, "greem_jobs_completed_total", "counter", "Jobs that finished", self.jobs_completed)
+            _add_metric(lines, "greem_jobs_failed_total", "counter", "Jobs with a non-zero exit status", self.jobs_failed)
+            _add_metric(lines, "greem_jobs_queued", "gauge", "Jobs waiting for a concurrency slot", self.jobs_queued)
+            _add_metric(lines, "greem_jobs_running", "gauge", "Jobs that are currently running", self.jobs_running)
+
+        if self.hardware_tracker is not None:
+            self._render_hardware(lines)
+        if self.progress_monitor is not None:
+            self._render_progress(lines)
+
+        return "\n".join(lines) + "\n"
+
+    def _render_hardware(self, lines: list[str]) -> None:
+        sample: dict[str, float] = self.hardware_tracker.get_last_sample() or {}
+
+        power: dict[str, float] = {
+            component: sample[column] for component, column in POWER_COLUMNS.items() if column in sample
+        }
+        _add_samples(lines, "greem_power_watts", "gauge", "Power of the latest sample", "component", power)
+        _add_metric(
+            lines,
+            "greem_energy_consumed_kwh_total",
+            "counter",
+            "Energy measured since the start of the campaign",
+            self.hardware_tracker.energy_consumed_total,
+        )
+        for name, column in SAMPLER_METRICS.items():
+            if column in sample:
+                _add_metric(lines, name, "gauge", f"{column} of the latest sample", sample[column])
+        _add_metric(
+            lines,
+            "greem_sampler_skipped_ticks_total",
+            "counter",
+            "Samples skipped because sampling was too slow",
+            self.hardware_tracker.skipped_ticks,
+        )
+
+    def _render_progress(self, lines: list[str]) -> None:
+        running_fps: dict[int, float] = self.progress_monitor.get_running_fps()
+        _add_samples(
+            lines,
+            "greem_encoder_fps",
+            "gauge",
+            "Latest fps reported by each running FFmpeg process",
+            "pid",
+            {str(pid): fps for pid, fps in running_fps.items()},
+        )
+
+    def _create_handler(self) -> type[BaseHTTPRequestHandler]:
+        exporter: MetricsExporter = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != METRICS_PATH:
+                    self.send_error(404)
+                    return
+
+                body: bytes = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args) -> None:
+                # scrapes would flood the output of the testbed
+                pass
+
+        return MetricsHandler
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+
+    return repr(float(value))
+
+
+def _add_metric(lines: list[str], name: str, metric_type: str, description: str, value: float) -> None:
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    lines.append(f"{name} {_format_value(value)}")
+
+
+def _add_samples(
+    lines: list[str], name: str, metric_type: str, description: str, label: str, values: dict[str, float]
+) -> None:
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for label_value, value in values.items():
+        lines.append(f'{name}{{{label}="{label_value}"}} {_format_value(value)}')
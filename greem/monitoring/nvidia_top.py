@@ -1,21 +1,219 @@
 from nvitop import Device, ResourceMetricCollector
+import numpy as np
 import pandas as pd
+import time
 
-import os
+from greem.monitoring.metrics_exporter import MetricsExporter
+from greem.utility.job_runner import JobResult, run_cmd
+from greem.utility.sampler import Sampler
+from greem.utility.timeline import get_job_sample_indices
+
+COLLECTOR_TAG: str = 'nvitop'
+DEFAULT_PERCENTILES: tuple[int, ...] = (50, 95)
+# statistics the collector reports per interval, a job summary aggregates each one with the function of the same name
+INTERVAL_STATS: tuple[str, ...] = ('mean', 'min', 'max', 'last')
+
+
+def cleanup_key(key: str) -> str:
+    """Converts an nvitop metric key into a column name,
+    e.g. `nvitop/host/cpu_percent (%)/mean` into `host.cpu_percent.mean`"""
+    return key.removeprefix(f'{COLLECTOR_TAG}/').replace(' ', '').replace('(%)', '').replace('(C)', '').replace('(W)', '').replace('(', '.').replace(')', '').replace('/', '.')
 
 
 class NvidiaTop():
+    """Measures the host and GPU resources while commands are executed.
 
-    def __init__(self):
+    A single `ResourceMetricCollector` is started once and sampled by a `Sampler` thread
+    every `interval` seconds. Each sample contains the mean, min, max and last value of
+    every host and device metric within its interval, so the full time series is kept.
+    Executed commands are marked as tagged intervals of the time series, their summaries
+    are computed at once with `summarize_jobs`: `.min` and `.max` are the extremes of the
+    raw collector samples, the percentiles are taken over the interval means.
+
+    Metrics of individual GPU processes (`pid:<pid>/...`) are not part of the time series,
+    their keys change with every command.
+    """
+
+    def __init__(self, interval: float = 0.5, collector: ResourceMetricCollector | None = None):
         self.cuda_available: bool = True
         self.device: Device | None = Device.all() if self.cuda_available else None
-        self.resource_metric_collector: ResourceMetricCollector | None = ResourceMetricCollector() if self.cuda_available else None
+        self.interval: float = interval
+        self.resource_metric_collector: ResourceMetricCollector | None = collector or (
+            ResourceMetricCollector(interval=interval) if self.cuda_available else None
+        )
+        self._sampler: Sampler | None = None
+        self._metrics: list[str] = []
+        self._metric_columns: list[str] = []
+        self._column_index: dict[str, int] = {}
+        # tag, first and last monotonic time of the samples belonging to a command
+        self._job_intervals: list[tuple[str, float, float]] = []
+
+    def start(self) -> None:
+        """Starts the collector and the sampling thread, is called by the first measured command"""
+        if self._sampler is not None:
+            return
+
+        self.resource_metric_collector.start(tag=COLLECTOR_TAG)
+        # the metrics of the available devices define the columns of the time series
+        stat_keys: list[str] = [
+            key for key in self.resource_metric_collector.collect()
+            if key.rpartition('/')[2] in INTERVAL_STATS and '/pid:' not in key
+        ]
+        self.resource_metric_collector.clear(tag=COLLECTOR_TAG)
+
+        self._column_index = {key: idx for idx, key in enumerate(stat_keys)}
+        self._metric_columns = [cleanup_key(key) for key in stat_keys]
+        self._metrics = [column.removesuffix('.mean') for column in self._metric_columns if column.endswith('.mean')]
+        self._sampler = Sampler(
+            read_sample=self._read_sample,
+            columns=self._metric_columns,
+            interval=self.interval,
+        )
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """Stops the sampling thread and the collector"""
+        if self._sampler is None:
+            return
+
+        self._sampler.stop()
+        self.resource_metric_collector.stop(tag=COLLECTOR_TAG)
+        self._sampler = None
+
+    def run_tagged(
+        self, cmd: str | list[str], tag: str | None = None, metrics_exporter: MetricsExporter | None = None
+    ) -> JobResult:
+        """Executes `cmd` and marks the samples taken while it was running with `tag`.
+
+        A sample is taken right before and right after the command, so even commands that
+        are shorter than the sampling interval are covered by at least one sample. Without
+        a `tag`, the command is tagged `job-<index>`. The tag is the `job.name` of the result.
+        The command is counted by the `metrics_exporter` if one is provided.
+        """
+        self.start()
+        tag = tag if tag is not None else f'job-{len(self._job_intervals)}'
+
+        self._sampler.sample_once()
+        start_mark: float = time.monotonic()
+        result = run_cmd(cmd, name=tag, metrics_exporter=metrics_exporter)
+        self._sampler.sample_once()
+        self._job_intervals.append((tag, start_mark, time.monotonic()))
+
+        return result
+
+    def get_time_series(self) -> pd.DataFrame:
+        """Returns all samples, the `tags` column lists the commands that were running during a sample"""
+        series_df = self._sampler.to_dataframe() if self._sampler is not None else pd.DataFrame()
+        if len(series_df) == 0:
+            return series_df
+
+        sample_idx, job_idx = self._get_job_samples(series_df, self._job_intervals)
+        tags = pd.Series(
+            [self._job_intervals[idx][0] for idx in job_idx], index=sample_idx, dtype=object
+        )
+        series_df = series_df.copy()
+        series_df['tags'] = tags.groupby(level=0).agg(','.join).reindex(series_df.index, fill_value='')
+
+        return series_df
 
-        
+    def summarize_jobs(
+        self, percentiles: tuple[int, ...] = DEFAULT_PERCENTILES, tags: list[str] | None = None
+    ) -> pd.DataFrame:
+        """Summarizes the time series of the tagged commands.
 
-    def get_resource_metrics_as_dict(self, cmd: str) -> dict[str, float]:
+        Parameters
+        ----------
+        percentiles : tuple[int, ...], optional
+            percentiles of the interval means that are computed in addition to mean, min, max and last,
+            by default (50, 95)
+        tags : list[str] | None, optional
+            commands that are summarized, by default all of them
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per tag, indexed by tag, with the columns `<metric>.mean`, `<metric>.min`,
+            `<metric>.max`, `<metric>.last`, `<metric>.p<percentile>` and `sample.count`
+        """
+        series_df = self._sampler.to_dataframe() if self._sampler is not None else pd.DataFrame()
+        job_intervals = [interval for interval in self._job_intervals if tags is None or interval[0] in tags]
+
+        return self._summarize(series_df, job_intervals, percentiles)
+
+    def add_job_summaries(self, job_df: pd.DataFrame, tag_column: str = 'job_name') -> pd.DataFrame:
+        """Returns `job_df` with the summaries of all tagged commands (see `summarize_jobs`) joined on `tag_column`"""
+        summary_df = self.summarize_jobs()
+        if len(summary_df) == 0:
+            return job_df
+
+        return job_df.join(summary_df, on=tag_column)
+
+    def clear(self) -> None:
+        """Removes all samples and tagged commands"""
+        if self._sampler is not None:
+            self._sampler.clear()
+        self._job_intervals.clear()
+
+    def _read_sample(self, row: np.ndarray) -> None:
+        metrics: dict[str, float] = self.resource_metric_collector.collect()
+        self.resource_metric_collector.clear(tag=COLLECTOR_TAG)
+
+        for key, value in metrics.items():
+            idx = self._column_index.get(key)
+            if idx is not None:
+                row[idx] = value
+
+    def _summarize(
+        self,
+        series_df: pd.DataFrame,
+        job_intervals: list[tuple[str, float, float]],
+        percentiles: tuple[int, ...],
+    ) -> pd.DataFrame:
+        if len(series_df) == 0 or len(job_intervals) == 0:
+            return pd.DataFrame()
+
+        sample_idx, job_idx = self._get_job_samples(series_df, job_intervals)
+        job_samples = series_df.iloc[sample_idx][self._metric_columns]
+        job_samples.index = pd.Index([job_intervals[idx][0] for idx in job_idx], name='tag')
+
+        grouped = job_samples.groupby(level='tag', sort=False)
+        summaries: list[pd.DataFrame] = []
+        for stat in INTERVAL_STATS:
+            stat_columns = [f'{metric}.{stat}' for metric in self._metrics if f'{metric}.{stat}' in job_samples]
+            summaries.append(grouped[stat_columns].agg(stat))
+        mean_columns: list[str] = [f'{metric}.mean' for metric in self._metrics]
+        for percentile in percentiles:
+            percentile_df = grouped[mean_columns].quantile(percentile / 100)
+            percentile_df.columns = [column.removesuffix('.mean') + f'.p{percentile}' for column in mean_columns]
+            summaries.append(percentile_df)
+
+        summary_df = pd.concat(summaries, axis=1)
+        stats: list[str] = [*INTERVAL_STATS, *[f'p{percentile}' for percentile in percentiles]]
+        summary_df = summary_df[
+            [f'{metric}.{stat}' for metric in self._metrics for stat in stats if f'{metric}.{stat}' in summary_df]
+        ]
+        summary_df['sample.count'] = grouped.size()
+
+        return summary_df
+
+    @staticmethod
+    def _get_job_samples(
+        series_df: pd.DataFrame, job_intervals: list[tuple[str, float, float]]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the indices of all (sample, tagged command) pairs, commands may overlap"""
+        job_idx, sample_idx = get_job_sample_indices(
+            series_df['monotonic_time'].to_numpy(),
+            np.array([interval[1] for interval in job_intervals]),
+            np.array([interval[2] for interval in job_intervals]),
+        )
+        return sample_idx, job_idx
+
+    def get_resource_metrics_as_dict(self, cmd: str | list[str]) -> dict[str, float]:
         """Measures the resource hardware CPU, GPU and MEM while executing the provided `cmd`.
 
+        Only the samples of the `cmd` are summarized, campaigns that execute many commands should
+        use `run_tagged` and summarize all of them at once with `summarize_jobs`.
+
         Parameters
         ----------
         cmd : str
@@ -24,25 +222,22 @@ class NvidiaTop():
         Returns
         -------
         dict[str, float]
-            Returns a dictionary with the resource metrics provided by `nvitop.ResourceMetricCollector`
+            Returns a dictionary with the summary of the resource metrics of the `cmd` (see `summarize_jobs`)
+            and the `JobResult` of the `cmd` (see `JobResult.to_dict`), e.g. its `elapsed_seconds`
+            and its monotonic `start_monotonic` and `end_monotonic` to align it with other measurements
         """
-        metric_dict: [str, float] = dict()
-
-        def cleanup_key(key: str) -> str:
-            return key.removeprefix('<tag>/').replace(' ', '').replace('(%)', '').replace('(C)', '').replace('(W)', '').replace('(', '.').replace(')', '').replace('/', '.')
-
-        with self.resource_metric_collector.context(tag='<tag>') as collector:
-            os.system(cmd)
-            collect_dict = collector.collect()
+        self.start()
+        sample_count: int = len(self._sampler.buffer)
+        result = self.run_tagged(cmd)
+        tag: str = result.job.name
 
-            metric_dict = {cleanup_key(k): v for k, v in collect_dict.items()}
-            
-        # TODO find a better way to properly reset the collector
-        self.resource_metric_collector = ResourceMetricCollector() if self.cuda_available else None
+        job_df = self._sampler.get_last_samples(len(self._sampler.buffer) - sample_count)
+        summary_df = self._summarize(job_df, self._job_intervals[-1:], DEFAULT_PERCENTILES)
+        metric_dict: dict[str, float] = summary_df.loc[tag].to_dict() if tag in summary_df.index else {}
+        metric_dict.update(result.to_dict())
 
         return metric_dict
-    
-    
+
     def get_resource_metric_as_dataframe(self, cmd: str) -> pd.DataFrame:
         """Measures the resource hardware CPU, GPU and MEM while executing the provided `cmd`.
 
@@ -57,9 +252,9 @@ class NvidiaTop():
             Returns a dataframe with the resource metrics provided by `nvitop.ResourceMetricCollector`
         """
         metric_dict = self.get_resource_metrics_as_dict(cmd=cmd)
-        
+
         return pd.DataFrame.from_dict(metric_dict, orient='index').transpose()
-    
+
     @staticmethod
     def merge_resource_metric_dfs(metric_results: list[pd.DataFrame], exclude_timestamps: bool = False) -> pd.DataFrame:
         """Merges resource metrics collected via this nvidia top class
@@ -77,8 +272,8 @@ class NvidiaTop():
             returns a Dataframe that consists of all resource metrics
         """
         concat_df = pd.concat(metric_results, ignore_index=True)
-        
+
         if exclude_timestamps:
             concat_df.drop(['timestamp', 'last_timestamp'], axis=1)
-        
+
         return concat_df
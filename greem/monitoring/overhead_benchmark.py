@@ -0,0 +1,328 @@
+"""
+Module for measuring how much a monitoring backend perturbs the measurement it reports.
+
+A fixed reference workload is executed without monitoring and under every monitoring
+backend at several sampling intervals. The backends sample in threads of this process
+while the workload runs in a child process, so the CPU time and the context switches of
+this process during a run are the overhead of the monitoring itself. The energy of a
+run is read from the RAPL counters once before and once after the workload, which adds
+no sampling of its own. Comparing the runs with the unmonitored baseline yields the
+duration and energy error of each backend and interval, with a confidence interval
+from the repetitions.
+
+Classes:
+    MonitoringBackend: Frozen dataclass of a named factory for a monitor with `start()` and `stop()`.
+
+Functions:
+    get_reference_workload(iterations: int) -> Job:
+        Returns a CPU-bound job that always performs the same amount of work.
+    get_default_backends(cuda_enabled: bool, rapl_enabled: bool) -> list[MonitoringBackend]:
+        Returns the monitoring backends of GREEM that are available on this system.
+    measure_run(workload: Job, backend: MonitoringBackend | None, interval: float) -> dict:
+        Executes the workload once under a backend and returns its cost.
+    run_overhead_benchmark(backends: list[MonitoringBackend], intervals: list[float]) -> pd.DataFrame:
+        Executes the workload under every backend and interval, interleaved with unmonitored runs.
+    summarize_overhead(runs_df: pd.DataFrame) -> pd.DataFrame:
+        Returns the overhead of each backend and interval relative to the unmonitored runs.
+"""
+
+import random
+import resource
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from greem.hardware.rapl import JOULES_PER_KWH, RaplReader
+from greem.utility.job_runner import Job, run_cmd
+
+BASELINE_BACKEND: str = "none"
+
+# z-score of the two-sided 95% confidence interval
+Z_95: float = 1.96
+
+REFERENCE_WORKLOAD_SCRIPT: str = (
+    "import hashlib, sys\n"
+    "data = bytes(1 << 20)\n"
+    "for _ in range(int(sys.argv[1])):\n"
+    "    data = hashlib.sha256(data).digest() * (1 << 15)\n"
+)
+
+
+@dataclass(frozen=True)
+class MonitoringBackend:
+    """
+    A named factory for a monitor that samples in a thread of this process.
+
+    Attributes:
+        name (str): Name of the backend in the results.
+        create (Callable[[float], Any]): Returns a new monitor with the sampling interval in seconds,
+            the monitor has to provide `start()` and `stop()`.
+    """
+
+    name: str
+    create: Callable[[float], Any]
+
+
+def get_reference_workload(iterations: int = 2000) -> Job:
+    """Returns a CPU-bound job that hashes `iterations` MiB, about a millisecond per iteration"""
+    return Job(argv=[sys.executable, "-c", REFERENCE_WORKLOAD_SCRIPT, str(iterations)], name="reference")
+
+
+def _create_codecarbon(interval: float):
+    from codecarbon import OfflineEmissionsTracker
+
+    return OfflineEmissionsTracker(
+        measure_power_secs=interval, country_iso_code="AUT", save_to_file=False, log_level="error"
+    )
+
+
+def _create_hardware_tracker(interval: float, energy_source_name: str, cuda_enabled: bool = False):
+    from greem.utility.monitoring import EnergySource, HardwareTracker
+
+    return HardwareTracker(
+        measure_power_secs=interval, cuda_enabled=cuda_enabled, energy_source=EnergySource(energy_source_name)
+    )
+
+
+def _create_nvitop(interval: float):
+    from greem.monitoring.nvidia_top import NvidiaTop
+
+    return NvidiaTop(interval=interval)
+
+
+def _create_nvml_sampler(interval: float):
+    from greem.hardware.nvml_backend import NvmlDeviceHandler
+    from greem.utility.sampler import Sampler
+
+    handler = NvmlDeviceHandler()
+
+    def read_sample(row: np.ndarray) -> None:
+        handler.update()
+        row[:] = handler.values.ravel()
+
+    columns: list[str] = [f"{idx}.{column}" for idx in range(handler.device_count) for column in handler.columns]
+    return Sampler(read_sample=read_sample, columns=columns, interval=interval)
+
+
+def _create_process_accountant(interval: float):
+    from greem.utility.process_accounting import ProcessAccountant
+
+    return ProcessAccountant(interval=interval)
+
+
+def get_default_backends(cuda_enabled: bool = False, rapl_enabled: bool = False) -> list[MonitoringBackend]:
+    """Returns the monitoring backends of GREEM, the GPU and RAPL backends only if they are enabled"""
+    backends: list[MonitoringBackend] = [
+        MonitoringBackend("codecarbon", _create_codecarbon),
+        MonitoringBackend("hardware_tracker", lambda interval: _create_hardware_tracker(interval, "codecarbon")),
+        MonitoringBackend("process_accountant", _create_process_accountant),
+    ]
+    if rapl_enabled:
+        backends.append(
+            MonitoringBackend("hardware_tracker_rapl", lambda interval: _create_hardware_tracker(interval, "rapl"))
+        )
+    if cuda_enabled:
+        backends += [
+            MonitoringBackend(
+                "hardware_tracker_cuda",
+                lambda interval: _create_hardware_tracker(interval, "codecarbon", cuda_enabled=True),
+            ),
+            MonitoringBackend("nvitop", _create_nvitop),
+            MonitoringBackend("nvml", _create_nvml_sampler),
+        ]
+
+    return backends
+
+
+def _read_energy_joules(energy_reader: RaplReader | None) -> float:
+    """CPU and RAM energy since the last call"""
+    if energy_reader is None:
+        return float("nan")
+
+    row: np.ndarray = np.full(len(energy_reader.columns), np.nan)
+    energy_reader.read_sample(row)
+    sample: dict[str, float] = dict(zip(energy_reader.columns, row))
+
+    return (sample["cpu_energy"] + sample["ram_energy"]) * JOULES_PER_KWH
+
+
+def measure_run(
+    workload: Job,
+    backend: MonitoringBackend | None,
+    interval: float = float("nan"),
+    energy_reader: RaplReader | None = None,
+) -> dict:
+    """Executes the workload once while the monitor of `backend` is running.
+
+    Starting and stopping the monitor is not part of the measurement, only the
+    time the workload runs.
+
+    Parameters
+    ----------
+    workload : Job
+        The reference workload
+    backend : MonitoringBackend | None
+        The monitoring backend, `None` for an unmonitored run
+    interval : float, optional
+        Sampling interval of the backend in seconds
+    energy_reader : RaplReader | None, optional
+        Reader of the energy counters, without one the energy is `NaN`, by default None
+
+    Returns
+    -------
+    dict
+        `backend`, `interval`, `returncode`, `duration_seconds`, `workload_cpu_seconds`,
+        `monitor_cpu_seconds`, `voluntary_switches`, `involuntary_switches` and `energy_joules`
+    """
+    monitor = backend.create(interval) if backend is not None else None
+    if monitor is not None:
+        monitor.start()
+
+    try:
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        _read_energy_joules(energy_reader)
+        result = run_cmd(workload.argv, name=workload.name)
+        energy_joules: float = _read_energy_joules(energy_reader)
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    finally:
+        if monitor is not None:
+            monitor.stop()
+
+    return {
+        "backend": backend.name if backend is not None else BASELINE_BACKEND,
+        "interval": interval if backend is not None else float("nan"),
+        "returncode": result.returncode,
+        "duration_seconds": result.elapsed_seconds,
+        "workload_cpu_seconds": result.cpu_seconds,
+        "monitor_cpu_seconds": (usage_after.ru_utime + usage_after.ru_stime)
+        - (usage_before.ru_utime + usage_before.ru_stime),
+        # a sampling thread that sleeps until its next tick causes one voluntary switch per wakeup
+        "voluntary_switches": usage_after.ru_nvcsw - usage_before.ru_nvcsw,
+        "involuntary_switches": usage_after.ru_nivcsw - usage_before.ru_nivcsw,
+        "energy_joules": energy_joules,
+    }
+
+
+def run_overhead_benchmark(
+    backends: list[MonitoringBackend],
+    intervals: list[float],
+    repetitions: int = 5,
+    workload: Job | None = None,
+    energy_reader: RaplReader | None = None,
+    cooldown_seconds: float = 0.0,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """Executes the workload under every backend and interval.
+
+    Every repetition starts with an unmonitored run, followed by all backend and
+    interval combinations in a shuffled order, so drifts of the system (temperature,
+    background load) are spread over all combinations. The first run is a warm-up
+    and is discarded.
+
+    Parameters
+    ----------
+    backends : list[MonitoringBackend]
+        The backends to compare, see `get_default_backends`
+    intervals : list[float]
+        Sampling intervals in seconds
+    repetitions : int, optional
+        Runs per backend and interval, by default 5
+    workload : Job | None, optional
+        The reference workload, by default `get_reference_workload()`
+    energy_reader : RaplReader | None, optional
+        Reader of the energy counters, without one the energy is `NaN`, by default None
+    cooldown_seconds : float, optional
+        Pause between two runs, by default 0
+    seed : int, optional
+        Seed of the order of the runs, by default 0
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per run, see `measure_run`, with the `repetition`
+    """
+    if repetitions < 1:
+        raise ValueError(f"repetitions must be bigger than zero, got {repetitions}")
+
+    workload = workload if workload is not None else get_reference_workload()
+    order_generator = random.Random(seed)
+
+    measure_run(workload, None, energy_reader=energy_reader)
+
+    runs: list[dict] = []
+    for repetition in range(repetitions):
+        combinations: list[tuple[MonitoringBackend, float]] = [
+            (backend, interval) for backend in backends for interval in intervals
+        ]
+        order_generator.shuffle(combinations)
+
+        for backend, interval in [(None, float("nan")), *combinations]:
+            run: dict = measure_run(workload, backend, interval, energy_reader)
+            run["repetition"] = repetition
+            runs.append(run)
+            time.sleep(cooldown_seconds)
+
+    return pd.DataFrame(runs)
+
+
+def _delta(values: pd.Series, baseline: pd.Series) -> tuple[float, float]:
+    """Difference of the means and the half width of its 95% confidence interval"""
+    standard_error: float = np.sqrt(
+        values.var(ddof=1) / len(values) + baseline.var(ddof=1) / len(baseline)
+    )
+    return values.mean() - baseline.mean(), Z_95 * standard_error
+
+
+def summarize_overhead(runs_df: pd.DataFrame) -> pd.DataFrame:
+    """Returns the overhead of each backend and interval relative to the unmonitored runs.
+
+    Parameters
+    ----------
+    runs_df : pd.DataFrame
+        The runs of `run_overhead_benchmark`
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per backend and interval with the mean and standard deviation of the
+        monitor CPU time, the wakeups per second and the difference of the duration and
+        the energy to the unmonitored runs (`*_delta`) with the half width of their 95%
+        confidence interval (`*_delta_ci95`) and relative to the unmonitored mean
+    """
+    baseline_df = runs_df[runs_df["backend"] == BASELINE_BACKEND]
+    if len(baseline_df) == 0:
+        raise ValueError("the runs do not contain unmonitored runs")
+
+    wakeups_per_second: pd.Series = runs_df["voluntary_switches"] / runs_df["duration_seconds"]
+    baseline_wakeups: pd.Series = wakeups_per_second[baseline_df.index]
+
+    rows: list[dict] = []
+    for (backend, interval), group_df in runs_df.drop(baseline_df.index).groupby(["backend", "interval"]):
+        duration_delta, duration_ci95 = _delta(group_df["duration_seconds"], baseline_df["duration_seconds"])
+        energy_delta, energy_ci95 = _delta(group_df["energy_joules"], baseline_df["energy_joules"])
+        monitor_cpu_delta, _ = _delta(group_df["monitor_cpu_seconds"], baseline_df["monitor_cpu_seconds"])
+        wakeups_delta, _ = _delta(wakeups_per_second[group_df.index], baseline_wakeups)
+        rows.append(
+            {
+                "backend": backend,
+                "interval": interval,
+                "runs": len(group_df),
+                "monitor_cpu_seconds.mean": group_df["monitor_cpu_seconds"].mean(),
+                "monitor_cpu_seconds.std": group_df["monitor_cpu_seconds"].std(),
+                "monitor_cpu_seconds_delta": monitor_cpu_delta,
+                "wakeups_per_second.mean": wakeups_per_second[group_df.index].mean(),
+                "wakeups_per_second_delta": wakeups_delta,
+                "duration_delta": duration_delta,
+                "duration_delta_ci95": duration_ci95,
+                "duration_delta_relative": duration_delta / baseline_df["duration_seconds"].mean(),
+                "energy_delta": energy_delta,
+                "energy_delta_ci95": energy_ci95,
+                "energy_delta_relative": energy_delta / baseline_df["energy_joules"].mean(),
+            }
+        )
+
+    return pd.DataFrame(rows)
@@ -2,13 +2,14 @@ import os
 from datetime import datetime
 from pathlib import Path
 
-import pandas as pd
-from codecarbon import track_emissions
-
 from greem.hardware.intel import intel_rapl_workaround
+from greem.monitoring.metrics_exporter import MetricsExporter
 from greem.utility.cli_parser import CLI_PARSER
 from greem.utility.configuration_classes import DecodingConfig, DecodingConfigDTO
-from greem.utility.dataframe import get_dataframe_from_csv
+from greem.utility.dataframe import integrate_monitoring_over_intervals
+from greem.utility.job_runner import run_cmd
+from greem.utility.monitoring import EnergySource, HardwareTracker
+from greem.utility.timeline import PhaseRecorder
 from greem.utility.timing import IdleTimeEnergyMeasurement
 
 # from greem.benchmark.decoding.decoding_utils import get_all_possible_video_files, get_input_files
@@ -22,28 +23,30 @@ RESULT_ROOT = "decoding_results"
 
 DRY_RUN: bool = CLI_PARSER.is_dry_run()
 USE_CUDA: bool = CLI_PARSER.is_cuda_enabled()
-INCLUDE_CODE_CARBON: bool = CLI_PARSER.is_code_carbon_enabled()
 IS_QUIET: bool = CLI_PARSER.is_quiet_ffmpeg()
+ENERGY_SOURCE: EnergySource = (
+    EnergySource.RAPL if CLI_PARSER.is_rapl_enabled() else EnergySource.CODECARBON
+)
 
-if USE_CUDA:
-    from greem.monitoring.nvidia_top import NvidiaTop
+MEASUREMENT_INTERVAL: float = 0.5
 
 CLEANUP_AFTER_DECODE: bool = False
 
-nvidia_top = None
-
-try:
-    if USE_CUDA:
-        nvidia_top = NvidiaTop()
-        metric_results: list[pd.DataFrame] = []
-
-    intel_rapl_workaround()
-    IdleTimeEnergyMeasurement.measure_idle_energy_consumption(
-        result_path=f"{RESULT_ROOT}/decoding_idle_time.csv", idle_time_in_seconds=1
-    )
-
-except Exception as err:
-    print("err", err)
+# one tracker measures the whole benchmark, the energy of every demux, decode and scale
+# phase is integrated afterwards from its continuous samples
+hardware_tracker = HardwareTracker(
+    cuda_enabled=USE_CUDA,
+    measure_power_secs=MEASUREMENT_INTERVAL,
+    energy_source=ENERGY_SOURCE,
+)
+phase_recorder = PhaseRecorder()
+# live job and power metrics of the benchmark (enable with --metrics-port <port>)
+METRICS_PORT: int | None = CLI_PARSER.get_metrics_port()
+metrics_exporter: MetricsExporter | None = (
+    MetricsExporter(METRICS_PORT, hardware_tracker=hardware_tracker)
+    if METRICS_PORT is not None
+    else None
+)
 
 
 def prepare_data_directories(
@@ -68,58 +71,48 @@ def get_video_name_from_path(video_path: str) -> str:
 
 
 def execute_decoding_cmd(
-    cmd: str, decoding_dto: DecodingConfigDTO, input_file_path: str
+    cmd: str, phase: str, decoding_dto: DecodingConfigDTO, input_file_path: str
 ) -> None:
-    global metric_results, nvidia_top
-
-    if USE_CUDA:
-        # executes the cmd with nvidia monitoring
-        result_df = nvidia_top.get_resource_metric_as_dataframe(cmd)
-        video_name = get_video_name_from_path(input_file_path)
-
-        rendition = decoding_dto.encoding_representation
-
-        result_df[["encoded_preset", "encoded_codec", "duration"]] = (
-            decoding_dto.encoding_preset,
-            decoding_dto.encoding_codec,
-            "4s",
-        )
-        result_df[["encoded_bitrate", "encoded_width", "encoded_height"]] = (
-            rendition.bitrate,
-            rendition.width,
-            rendition.height,
-        )
-        result_df["video_name"] = video_name
-        result_df["decoding_scale"] = (
-            decoding_dto.scaling_resolution.get_resolution_dir_representation()
-        )
-        result_df["output_path"] = decoding_dto.get_output_dir(RESULT_ROOT, video_name)
-
-        metric_results.append(result_df)
-
-    elif DRY_RUN:
+    """Executes the command of a decoding phase and marks its begin and end"""
+    if DRY_RUN:
         print(cmd)
-    else:
-        os.system(cmd)
+        return
+
+    video_name = get_video_name_from_path(input_file_path)
+    rendition = decoding_dto.encoding_representation
+
+    with phase_recorder.phase(
+        phase,
+        video_name=video_name,
+        encoded_preset=decoding_dto.encoding_preset,
+        encoded_codec=decoding_dto.encoding_codec,
+        duration="4s",
+        encoded_bitrate=rendition.bitrate,
+        encoded_width=rendition.width,
+        encoded_height=rendition.height,
+        decoding_scale=decoding_dto.scaling_resolution.get_resolution_dir_representation(),
+        output_path=decoding_dto.get_output_dir(RESULT_ROOT, video_name),
+    ) as metadata:
+        result = run_cmd(cmd, name=phase, metrics_exporter=metrics_exporter)
+        metadata.update(
+            returncode=result.returncode,
+            peak_rss_kb=result.peak_rss_kb,
+            cpu_seconds=result.cpu_seconds,
+        )
 
 
 def write_decoding_results_to_csv():
-    global nvidia_top, metric_results
+    # closes the measurement interval of the last phase
+    hardware_tracker._fetch_hardware_metrics()
+    monitoring_df = hardware_tracker.to_dataframe()
 
     current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    result_path = f"{RESULT_ROOT}/encoding_results_{current_time}.csv"
-    if INCLUDE_CODE_CARBON:
-        emission_df = get_dataframe_from_csv(f"{RESULT_ROOT}/emissions.csv")
-        # merge codecarbon and timing_df results
-
-        if USE_CUDA:
-            nvitop_df = NvidiaTop.merge_resource_metric_dfs(
-                metric_results, exclude_timestamps=True
-            )
-            merged_df = pd.concat([emission_df, nvitop_df], axis=1)
-            # save to disk
-            merged_df.to_csv(result_path)
-            os.system(f"rm {RESULT_ROOT}/emissions.csv")
+    phase_df = integrate_monitoring_over_intervals(
+        monitoring_df, phase_recorder.to_dataframe()
+    )
+    phase_df.to_csv(f"{RESULT_ROOT}/decoding_results_{current_time}.csv")
+    # continuous samples, e.g. to slice the GPU metrics by phase with `slice_by_jobs`
+    monitoring_df.to_parquet(f"{RESULT_ROOT}/decoding_monitoring_{current_time}.parquet")
 
 
 def start_demuxing(
@@ -131,7 +124,7 @@ def start_demuxing(
         f"ffmpeg -y {cuvid_codec} -i {input_file_path} {demuxed_output_path}"
     )
 
-    execute_decoding_cmd(demuxing_cmd, dto, input_file_path)
+    execute_decoding_cmd(demuxing_cmd, "demuxing", dto, input_file_path)
 
     return demuxed_output_path
 
@@ -145,7 +138,7 @@ def start_decoding(
         f"ffmpeg -y {cuvid_codec} -i {input_file_path} {decoding_output_path}"
     )
 
-    execute_decoding_cmd(decoding_cmd, dto, input_file_path)
+    execute_decoding_cmd(decoding_cmd, "decoding", dto, input_file_path)
 
     return decoding_output_path
 
@@ -165,7 +158,7 @@ def start_scaling(
         f"-y {scaling_output_path}"
     )
 
-    execute_decoding_cmd(scaling_cmd, dto, input_file_path)
+    execute_decoding_cmd(scaling_cmd, "scaling", dto, input_file_path)
 
     return scaling_output_path
 
@@ -177,15 +170,6 @@ def get_cuda_decoding_codec(dto: DecodingConfigDTO) -> str:
     return f"-hwaccel cuda -c:v {codec}_cuvid"
 
 
-@track_emissions(
-    offline=True,
-    country_iso_code="AUT",
-    log_level="error" if CLI_PARSER.is_quiet_ffmpeg() else "debug",
-    measure_power_secs=1,
-    output_dir=RESULT_ROOT,
-    save_to_file=True,
-    project_name="scaling",
-)
 def execute_decoding_benchmark():
     global CLEANUP_AFTER_DECODE
     decoding_configs: list[DecodingConfig] = [
@@ -230,19 +214,23 @@ if __name__ == "__main__":
     Path(RESULT_ROOT).mkdir(parents=True, exist_ok=True)
 
     try:
-        if USE_CUDA:
-            nvidia_top = NvidiaTop()
-            metric_results: list[pd.DataFrame] = []
-
         intel_rapl_workaround()
-        IdleTimeEnergyMeasurement.measure_idle_energy_consumption(
-            result_path=f"{RESULT_ROOT}/decoding_idle_time.csv", idle_time_in_seconds=1
+        IdleTimeEnergyMeasurement.get_idle_baseline(
+            result_path=f"{RESULT_ROOT}/decoding_idle_baseline.json",
+            cuda_enabled=USE_CUDA,
+            energy_source=ENERGY_SOURCE,
         )
 
+        hardware_tracker.start()
+        if metrics_exporter is not None:
+            metrics_exporter.start()
         execute_decoding_benchmark()
 
     except Exception as err:
         print("err", err)
 
     finally:
+        if metrics_exporter is not None:
+            metrics_exporter.stop()
+        hardware_tracker.stop()
         print("finished decoding benchmark")
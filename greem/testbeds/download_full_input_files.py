@@ -1,6 +1,8 @@
 import os
 
 from greem.testbeds.download_utility import download_parallel
+from greem.utility.cli_parser import CLI_PARSER
+from greem.utility.job_runner import Job, JobRunner
 
 # Source: https://www.cablelabs.com/4k
 
@@ -18,14 +20,17 @@ all_video_urls: dict[str, str] = {
 }
 
 
-def convert_webm_to_mp4() -> None:
+def convert_webm_to_mp4(max_concurrency: int = 1) -> None:
     video_file_paths = [video for video in os.listdir() if video.endswith("webm")]
+    jobs: list[Job] = []
 
     for video in video_file_paths:
         output_name: str = video.split(" HEVC")[0].replace(" ", "_")
-        ffmpeg_call = f'ffmpeg -hwaccel cuda -y -i "{video}" {output_name}.mp4'
+        ffmpeg_argv = ["ffmpeg", "-hwaccel", "cuda", "-y", "-i", video, f"{output_name}.mp4"]
 
-        os.system(ffmpeg_call)
+        jobs.append(Job(ffmpeg_argv, name=output_name))
+
+    JobRunner(max_concurrency=max_concurrency).run(jobs)
 
 
 def rename_videos(dir_path: str = ".") -> None:
@@ -43,5 +48,5 @@ def rename_videos(dir_path: str = ".") -> None:
 
 if __name__ == "__main__":
     download_parallel(list(all_video_urls.values()))
-    convert_webm_to_mp4()
+    convert_webm_to_mp4(max_concurrency=CLI_PARSER.get_max_concurrent_jobs())
     rename_videos()
@@ -139,8 +139,9 @@ def encode_batch(
 
 if __name__ == "__main__":
     intel_rapl_workaround()
-    IdleTimeEnergyMeasurement.measure_idle_energy_consumption(
-        result_path="encoding_idle_time.csv", idle_time_in_seconds=1
+    IdleTimeEnergyMeasurement.get_idle_baseline(
+        result_path="encoding_idle_baseline.json",
+        cuda_enabled=True,
     )
 
     configs: list[EncodingConfig] = [
@@ -0,0 +1,158 @@
+"""
+Compares the wall time and energy of the different ways to encode a bitrate ladder
+of one video with a single FFmpeg process:
+
+    separate: every output scales and converts the framerate on its own (`-s`, `-filter:v fps=`)
+    split:    the video is decoded once and a `split` filter graph feeds one scaler per output
+    cascade:  like split, but every representation is scaled from the next larger one
+
+With CUDA all variants decode on the GPU and scale with `scale_cuda`.
+
+The variants are interleaved per input video and repetition, so thermal effects and
+background load are spread over all variants.
+"""
+
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from greem.testbeds.encoding.parallel_encoding.parallel_utils import (
+    prepare_data_directories,
+)
+from greem.utility.cli_parser import CLI_PARSER
+from greem.utility.configuration_classes import EncodingConfig
+from greem.utility.dataframe import ENERGY_COLUMNS, apportion_monitoring_to_jobs
+from greem.utility.ffmpeg import create_one_video_multiple_representation_command
+from greem.utility.monitoring import EnergySource, HardwareTracker
+from greem.utility.video_file_utility import remove_media_extension
+
+ENCODING_CONFIG_PATHS: list[str] = [
+    "config_files/parallel_encoding_h264.yaml",
+]
+
+INPUT_FILE_DIR: str = "../../dataset/Inter4K/60fps/HEVC"
+RESULT_ROOT: str = "results"
+
+# if True, no encoding will be executed
+DRY_RUN: bool = CLI_PARSER.is_dry_run()
+USE_CUDA: bool = CLI_PARSER.is_cuda_enabled()
+ENERGY_SOURCE: EnergySource = (
+    EnergySource.RAPL if CLI_PARSER.is_rapl_enabled() else EnergySource.CODECARBON
+)
+HOST_NAME: str = os.uname()[1]
+
+TEST_REPETITIONS: int = 3
+assert TEST_REPETITIONS > 0, "must be bigger than zero"
+
+# variant name -> (use_filter_complex, cascade_scaling)
+LADDER_VARIANTS: dict[str, tuple[bool, bool]] = {
+    "separate": (False, False),
+    "split": (True, False),
+    "cascade": (True, True),
+}
+
+hardware_tracker = HardwareTracker(
+    cuda_enabled=USE_CUDA, measure_power_secs=0.5, energy_source=ENERGY_SOURCE
+)
+
+
+def encode_ladder(
+    encoding_config: EncodingConfig,
+    input_file: str,
+    variant: str,
+    repetition: int,
+    input_dir: str = INPUT_FILE_DIR,
+) -> dict | None:
+    """Encodes all representations of `encoding_config` with one of the `LADDER_VARIANTS`
+    and returns the measured wall time and energy as a result row"""
+    use_filter_complex, cascade_scaling = LADDER_VARIANTS[variant]
+
+    cmd = create_one_video_multiple_representation_command(
+        f"{input_dir}/{input_file}",
+        RESULT_ROOT,
+        encoding_config,
+        USE_CUDA,
+        quiet_mode=True,
+        use_filter_complex=use_filter_complex,
+        cascade_scaling=cascade_scaling,
+    )
+
+    if DRY_RUN:
+        print(cmd)
+        return None
+
+    hardware_tracker.clear()
+    result = hardware_tracker.monitor_process(cmd)
+    energy_df = apportion_monitoring_to_jobs(hardware_tracker.to_dataframe(), [result])
+    hardware_tracker.clear()
+
+    row: dict = {
+        "variant": variant,
+        "repetition": repetition,
+        "video": remove_media_extension(input_file),
+        "codec": encoding_config.codecs[0],
+        "preset": encoding_config.presets[0],
+        "framerate": encoding_config.framerate[0],
+        "num_representations": len(encoding_config.representations),
+        "use_gpu": USE_CUDA,
+        "returncode": result.returncode,
+        "elapsed_seconds": result.elapsed_seconds,
+        "peak_rss_kb": result.peak_rss_kb,
+    }
+    for column in ENERGY_COLUMNS:
+        row[column] = (
+            energy_df[column].iloc[0] if column in energy_df.columns else float("nan")
+        )
+
+    return row
+
+
+def execute_ladder_benchmark(encoding_configuration: list[EncodingConfig]) -> pd.DataFrame:
+    input_files = sorted(
+        [
+            file
+            for file in os.listdir(INPUT_FILE_DIR)
+            if file.endswith(".mp4") or file.endswith(".265")
+        ]
+    )
+
+    assert len(input_files) > 0, "no input files detected"
+
+    rows: list[dict] = []
+    for encoding_config in encoding_configuration:
+        prepare_data_directories(encoding_config, result_root=RESULT_ROOT)
+
+        for repetition in range(TEST_REPETITIONS):
+            for input_file in input_files:
+                for variant in LADDER_VARIANTS:
+                    row = encode_ladder(encoding_config, input_file, variant, repetition)
+                    if row is not None:
+                        rows.append(row)
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    Path(RESULT_ROOT).mkdir(parents=True, exist_ok=True)
+
+    encoding_configs: list[EncodingConfig] = [
+        EncodingConfig.from_file(file_path) for file_path in ENCODING_CONFIG_PATHS
+    ]
+
+    hardware_tracker.start()
+    result_df = execute_ladder_benchmark(encoding_configs)
+    hardware_tracker.stop()
+
+    if len(result_df) > 0:
+        current_time = datetime.now().strftime("%Y-%m-%d_%H-%M")
+        result_df.to_parquet(
+            f"{RESULT_ROOT}/ladder_benchmark_{current_time}_{HOST_NAME}.parquet",
+            index=False,
+        )
+        print(
+            result_df.groupby("variant")[["elapsed_seconds", "energy_consumed"]]
+            .agg(["mean", "std"])
+            .to_string()
+        )
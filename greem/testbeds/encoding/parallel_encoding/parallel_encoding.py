@@ -5,8 +5,10 @@ from pathlib import Path
 import pandas as pd
 
 from greem.testbeds.encoding.parallel_encoding.parallel_utils import (
+    ConcurrencyMode,
     ParallelMode,
     get_gpu_count,
+    get_unpaced_encoding_dtos,
     prepare_data_directories,
 )
 from greem.utility.cli_parser import CLI_PARSER
@@ -14,8 +16,24 @@ from greem.utility.configuration_classes import EncodingConfig, EncodingConfigDT
 from greem.utility.ffmpeg import (
     create_multi_video_ffmpeg_command,
     create_one_video_multiple_representation_command,
+    create_split_multiple_representation_command,
 )
-from greem.utility.monitoring import HardwareTracker
+from greem.monitoring.encoder_sessions import EncoderSessionCollector
+from greem.monitoring.metrics_exporter import MetricsExporter
+from greem.utility.cgroups import CgroupManager
+from greem.utility.dataframe import (
+    add_energy_per_progress,
+    add_realtime_factor,
+    apportion_monitoring_by_cpu_time,
+)
+from greem.utility.ffmpeg_progress import ProgressMonitor
+from greem.utility.job_runner import Job, JobResult, JobRunner
+from greem.utility.journal import CampaignJournal, JournalKey
+from greem.utility.monitoring import EnergySource, HardwareTracker
+from greem.utility.perf_counters import PerfCounterCapture
+from greem.utility.process_accounting import ProcessAccountant
+from greem.utility.video_catalog import VideoCatalog
+from greem.video.video_info import VideoInfo
 from greem.utility.video_file_utility import (
     abbreviate_video_name,
     remove_media_extension,
@@ -36,6 +54,9 @@ COUNTRY_ISO_CODE: str = "AUT"
 # if True, no encoding will be executed
 DRY_RUN: bool = CLI_PARSER.is_dry_run()
 USE_CUDA: bool = CLI_PARSER.is_cuda_enabled()
+ENERGY_SOURCE: EnergySource = (
+    EnergySource.RAPL if CLI_PARSER.is_rapl_enabled() else EnergySource.CODECARBON
+)
 SMALL_TESTBED: bool = True
 HOST_NAME: str = os.uname()[1]
 
@@ -44,13 +65,49 @@ assert TEST_REPETITIONS > 0, "must be bigger than zero"
 
 GPU_COUNT: int = get_gpu_count()
 
-hardware_tracker = HardwareTracker(cuda_enabled=USE_CUDA, measure_power_secs=0.5)
+# completed encodes are journaled, a restarted campaign skips them (disable with --no-resume)
+JOURNAL_PATH: str = f"{RESULT_ROOT}/journal_{HOST_NAME}.jsonl"
+
+hardware_tracker = HardwareTracker(
+    cuda_enabled=USE_CUDA, measure_power_secs=0.5, energy_source=ENERGY_SOURCE
+)
+# CPU time of every concurrently running encode, used to share the CPU energy between them
+process_accountant = ProcessAccountant(interval=0.25)
+# live frame, fps, bitrate and speed of every running FFmpeg encode
+progress_monitor = ProgressMonitor()
+# NVENC/NVDEC utilization and encoder sessions of every GPU encode
+encoder_session_collector: EncoderSessionCollector | None = (
+    EncoderSessionCollector(interval=0.25) if USE_CUDA and GPU_COUNT > 0 else None
+)
+campaign_journal = CampaignJournal(JOURNAL_PATH, resume=CLI_PARSER.is_resume_enabled())
+# CPU, memory and I/O of every encode from its own cgroup v2 (enable with --cgroups),
+# `--job-cpus` and `--job-cpuset` constrain the CPU budget of every encode
+cgroup_manager: CgroupManager | None = (
+    CgroupManager.try_create(limits=CLI_PARSER.get_job_cgroup_limits())
+    if CLI_PARSER.is_cgroups_enabled()
+    else None
+)
+# instructions, cycles, cache and branch misses of every encode (enable with --perf-counters)
+perf_capture: PerfCounterCapture | None = (
+    PerfCounterCapture() if CLI_PARSER.is_perf_counters_enabled() else None
+)
+# live job, power and fps metrics of the campaign (enable with --metrics-port <port>)
+METRICS_PORT: int | None = CLI_PARSER.get_metrics_port()
+metrics_exporter: MetricsExporter | None = (
+    MetricsExporter(METRICS_PORT, hardware_tracker=hardware_tracker, progress_monitor=progress_monitor)
+    if METRICS_PORT is not None
+    else None
+)
 
 
 # Change to encode in a different parallel mode
 parallel_mode = ParallelMode.MULTIPLE_VIDEOS_ONE_REPRESENTATION
+# Change to ConcurrencyMode.WORK_STEALING to keep N MVOR encodes in flight instead of fixed batches
+concurrency_mode = ConcurrencyMode.BATCH
 
 monitoring_results: list = []
+# progress samples of the encodes, one DataFrame per executed set of jobs
+progress_results: list[pd.DataFrame] = []
 
 
 def one_video_multiple_representations_encoding(
@@ -107,6 +164,7 @@ def multiple_video_one_representation_encoding(
     window_size_end: int,
     input_files: list[str],
     input_dir: str = INPUT_FILE_DIR,
+    repetition: int = 0,
 ) -> None:
     """
     Encodes multiple video files in batches, applying a single representation
@@ -126,6 +184,8 @@ def multiple_video_one_representation_encoding(
             processed, located in `input_dir`.
         input_dir (str, optional): The directory where the input video files are
             located. Defaults to the globally defined `INPUT_FILE_DIR`.
+        repetition (int, optional): Index of the test repetition, used for the campaign journal.
+            Defaults to 0.
 
     Returns:
         None: This function does not return any value. It processes the video files
@@ -151,7 +211,7 @@ def multiple_video_one_representation_encoding(
     assert window_size_start > 0
     assert window_size_start < window_size_end
 
-    encoding_dtos: list[EncodingConfigDTO] = encoding_config.get_encoding_dtos()
+    encoding_dtos: list[EncodingConfigDTO] = get_unpaced_encoding_dtos(encoding_config)
     gpu_count = GPU_COUNT if USE_CUDA and GPU_COUNT > 0 else 1
 
     for window_size in range(window_size_start, window_size_end + 1):
@@ -169,6 +229,16 @@ def multiple_video_one_representation_encoding(
 
             for dto in encoding_dtos[:1]:
                 output_directory: str = f"{RESULT_ROOT}/{dto.get_output_directory()}"
+                journal_key = JournalKey.create(
+                    encoding_config,
+                    ",".join(input_files[idx_offset:window_idx]),
+                    dto,
+                    repetition,
+                    run=f"mvor:{step_size}",
+                )
+                if campaign_journal.is_completed(journal_key):
+                    monitoring_results.append(campaign_journal.get_measurements(journal_key))
+                    continue
 
                 cmd = create_multi_video_ffmpeg_command(
                     input_slice,
@@ -181,8 +251,10 @@ def multiple_video_one_representation_encoding(
                 )
 
                 if not DRY_RUN:
-                    hardware_tracker.monitor_process(cmd)
+                    result = hardware_tracker.monitor_process(cmd)
                     _add_mvor_monitoring_results(dto, input_slice)
+                    if result.succeeded:
+                        campaign_journal.record(journal_key, monitoring_results[-1])
                     hardware_tracker.clear()
 
                 else:
@@ -197,8 +269,9 @@ def reduced_multiple_video_one_representation_encoding(
     encoding_config: EncodingConfig,
     input_files: list[str],
     input_dir: str = INPUT_FILE_DIR,
+    repetition: int = 0,
 ) -> None:
-    encoding_dtos: list[EncodingConfigDTO] = encoding_config.get_encoding_dtos()
+    encoding_dtos: list[EncodingConfigDTO] = get_unpaced_encoding_dtos(encoding_config)
     gpu_count = GPU_COUNT if USE_CUDA and GPU_COUNT > 0 else 1
 
     num_videos_in_parallel: list[int] = [1, 2, 5, 10, 15, 20]
@@ -221,6 +294,16 @@ def reduced_multiple_video_one_representation_encoding(
 
             for dto in encoding_dtos:
                 output_directory: str = f"{RESULT_ROOT}/{dto.get_output_directory()}"
+                journal_key = JournalKey.create(
+                    encoding_config,
+                    ",".join(input_files[idx_offset:window_idx]),
+                    dto,
+                    repetition,
+                    run=f"mvor:{step_size}",
+                )
+                if campaign_journal.is_completed(journal_key):
+                    monitoring_results.append(campaign_journal.get_measurements(journal_key))
+                    continue
 
                 cmd = create_multi_video_ffmpeg_command(
                     input_slice,
@@ -233,8 +316,10 @@ def reduced_multiple_video_one_representation_encoding(
                 )
 
                 if not DRY_RUN:
-                    hardware_tracker.monitor_process(cmd)
+                    result = hardware_tracker.monitor_process(cmd)
                     _add_mvor_monitoring_results(dto, input_slice)
+                    if result.succeeded:
+                        campaign_journal.record(journal_key, monitoring_results[-1])
 
                 else:
                     print(cmd)
@@ -245,9 +330,195 @@ def reduced_multiple_video_one_representation_encoding(
         )
 
 
-def multiple_video_multiple_representations_encoding() -> None:
-    # TODO
-    pass
+def work_stealing_multiple_video_one_representation_encoding(
+    encoding_config: EncodingConfig,
+    input_files: list[str],
+    input_dir: str = INPUT_FILE_DIR,
+    num_videos_in_parallel: list[int] | None = None,
+    repetition: int = 0,
+) -> None:
+    """
+    Encodes every video with its own FFmpeg command while keeping exactly N encodes in flight.
+
+    In contrast to the batch variants no window waits for its slowest video, a new video
+    starts as soon as a running one finishes. Therefore the measured throughput is the
+    sustained throughput for N concurrent encodes. The energy measured by the hardware
+    tracker is shared between the concurrently running videos, resulting in one row per
+    video in the `_add_mvor_monitoring_results` schema.
+
+    Args:
+        encoding_config (EncodingConfig): The encoding configuration.
+        input_files (list[str]): A list of video file names located in `input_dir`.
+        input_dir (str, optional): The directory of the input video files. Defaults to `INPUT_FILE_DIR`.
+        num_videos_in_parallel (list[int], optional): Number of encodes in flight per GPU for each run.
+            Defaults to the values of `reduced_multiple_video_one_representation_encoding`.
+        repetition (int, optional): Index of the test repetition, videos that are already
+            journaled for it are skipped. Defaults to 0.
+    """
+    if num_videos_in_parallel is None:
+        num_videos_in_parallel = [1, 2, 5, 10, 15, 20]
+
+    encoding_dtos: list[EncodingConfigDTO] = get_unpaced_encoding_dtos(encoding_config)
+    gpu_count = GPU_COUNT if USE_CUDA and GPU_COUNT > 0 else 1
+
+    for window_size in num_videos_in_parallel:
+        concurrency: int = window_size * gpu_count
+        job_runner = JobRunner(
+            max_concurrency=concurrency,
+            process_accountant=process_accountant,
+            progress_monitor=progress_monitor,
+            metrics_exporter=metrics_exporter,
+            cgroup_manager=cgroup_manager,
+            perf_capture=perf_capture,
+        )
+
+        for dto in encoding_dtos:
+            output_directory: str = f"{RESULT_ROOT}/{dto.get_output_directory()}"
+
+            jobs: list[Job] = []
+            journal_keys: list[JournalKey] = []
+            for idx, input_file in enumerate(input_files):
+                journal_key = JournalKey.create(
+                    encoding_config, input_file, dto, repetition, run=f"mvor-ws:{concurrency}"
+                )
+                if campaign_journal.is_completed(journal_key):
+                    monitoring_results.append(campaign_journal.get_measurements(journal_key))
+                    continue
+
+                cmd = create_multi_video_ffmpeg_command(
+                    [f"{input_dir}/{input_file}"],
+                    [output_directory],
+                    dto,
+                    cuda_mode=USE_CUDA,
+                    gpu_count=gpu_count,
+                    quiet_mode=CLI_PARSER.is_quiet_ffmpeg(),
+                    pretty_print=DRY_RUN,
+                    gpu_offset=idx,
+                )
+                jobs.append(
+                    Job.from_cmd(
+                        cmd,
+                        name=input_file,
+                        gpu_index=idx % gpu_count,
+                        content_seconds=_get_content_seconds(input_dir, input_file),
+                    )
+                )
+                journal_keys.append(journal_key)
+
+            if len(jobs) == 0:
+                continue
+
+            if not DRY_RUN:
+                hardware_tracker.clear()
+                process_accountant.clear()
+                progress_monitor.clear()
+                if encoder_session_collector is not None:
+                    encoder_session_collector.clear()
+                results: list[JobResult] = job_runner.run(jobs)
+                hardware_tracker._fetch_hardware_metrics()
+                result_df = _add_mvor_job_results(dto, results, concurrency)
+                _record_job_results(journal_keys, results, result_df)
+
+            else:
+                print("\n".join(str(job) for job in jobs))
+
+        store_monitoring_results(reset_monitoring_results=True, window_size=concurrency)
+
+
+def multiple_video_multiple_representations_encoding(
+    encoding_config: EncodingConfig,
+    input_files: list[str],
+    input_dir: str = INPUT_FILE_DIR,
+    num_videos_in_parallel: list[int] | None = None,
+    repetition: int = 0,
+) -> None:
+    """
+    Encodes multiple videos in parallel, each into all representations of the encoding configuration.
+
+    Each video is decoded once and fanned out through a `split` filter graph to every
+    representation. Like the work-stealing MVOR variant, N videos are kept in flight and
+    spread across the available GPUs, resulting in one row per video.
+
+    Args:
+        encoding_config (EncodingConfig): The encoding configuration.
+        input_files (list[str]): A list of video file names located in `input_dir`.
+        input_dir (str, optional): The directory of the input video files. Defaults to `INPUT_FILE_DIR`.
+        num_videos_in_parallel (list[int], optional): Number of videos in flight per GPU for each run.
+            Defaults to `[1, 2, 5, 10]`.
+        repetition (int, optional): Index of the test repetition, videos that are already
+            journaled for it are skipped. Defaults to 0.
+    """
+    if num_videos_in_parallel is None:
+        num_videos_in_parallel = [1, 2, 5, 10]
+
+    # only the representation differs between the DTOs that are encoded by the same command
+    base_dtos: list[EncodingConfigDTO] = [
+        dto
+        for dto in get_unpaced_encoding_dtos(encoding_config)
+        if dto.representation == encoding_config.representations[0]
+    ]
+    gpu_count = GPU_COUNT if USE_CUDA and GPU_COUNT > 0 else 1
+
+    for window_size in num_videos_in_parallel:
+        concurrency: int = window_size * gpu_count
+        job_runner = JobRunner(
+            max_concurrency=concurrency,
+            process_accountant=process_accountant,
+            progress_monitor=progress_monitor,
+            metrics_exporter=metrics_exporter,
+            cgroup_manager=cgroup_manager,
+            perf_capture=perf_capture,
+        )
+
+        for dto in base_dtos:
+            jobs: list[Job] = []
+            journal_keys: list[JournalKey] = []
+            for idx, input_file in enumerate(input_files):
+                journal_key = JournalKey.create(
+                    encoding_config, input_file, dto, repetition, run=f"mvmr:{concurrency}"
+                )
+                if campaign_journal.is_completed(journal_key):
+                    monitoring_results.append(campaign_journal.get_measurements(journal_key))
+                    continue
+
+                cmd = create_split_multiple_representation_command(
+                    f"{input_dir}/{input_file}",
+                    RESULT_ROOT,
+                    dto,
+                    encoding_config.representations,
+                    cuda_mode=USE_CUDA,
+                    gpu_index=idx % gpu_count,
+                    quiet_mode=CLI_PARSER.is_quiet_ffmpeg(),
+                    pretty_print=DRY_RUN,
+                )
+                jobs.append(
+                    Job.from_cmd(
+                        cmd,
+                        name=input_file,
+                        gpu_index=idx % gpu_count,
+                        content_seconds=_get_content_seconds(input_dir, input_file),
+                    )
+                )
+                journal_keys.append(journal_key)
+
+            if len(jobs) == 0:
+                continue
+
+            if not DRY_RUN:
+                hardware_tracker.clear()
+                process_accountant.clear()
+                progress_monitor.clear()
+                if encoder_session_collector is not None:
+                    encoder_session_collector.clear()
+                results: list[JobResult] = job_runner.run(jobs)
+                hardware_tracker._fetch_hardware_metrics()
+                result_df = _add_mvmr_job_results(dto, encoding_config, results, concurrency)
+                _record_job_results(journal_keys, results, result_df)
+
+            else:
+                print("\n".join(str(job) for job in jobs))
+
+        store_monitoring_results(reset_monitoring_results=True, window_size=concurrency)
 
 
 def store_monitoring_results(
@@ -256,10 +527,17 @@ def store_monitoring_results(
     if len(monitoring_results) > 0:
         current_time = datetime.now().strftime("%Y-%m-%d_%H-%M")
 
+        mode: str = parallel_mode.get_abbreviation()
+        if (
+            parallel_mode == ParallelMode.MULTIPLE_VIDEOS_ONE_REPRESENTATION
+            and concurrency_mode == ConcurrencyMode.WORK_STEALING
+        ):
+            mode = f"{mode}-{concurrency_mode.get_abbreviation()}"
+
         result_path = f"{RESULT_ROOT}/" + "_".join(
             [
                 "encoding_results",
-                parallel_mode.get_abbreviation(),
+                mode,
                 str(window_size),
                 "vids",
                 current_time,
@@ -268,26 +546,27 @@ def store_monitoring_results(
         )
         df = pd.concat(monitoring_results)
         df.to_parquet(f"{result_path}.parquet", index=True)
+        if len(progress_results) > 0:
+            pd.concat(progress_results).to_parquet(f"{result_path}_progress.parquet", index=False)
+        campaign_journal.sync()
 
         if reset_monitoring_results:
             monitoring_results.clear()
+            progress_results.clear()
     else:
         print("no monitoring results found")
 
 
 def execute_encoding_benchmark(encoding_configuration: list[EncodingConfig]) -> None:
     input_dir = INPUT_FILE_DIR
-    input_files = sorted(
-        [
-            file
-            for file in os.listdir(INPUT_FILE_DIR)
-            if file.endswith(".mp4") or file.endswith(".265")
-        ]
+    # the catalog is only probed for new or modified videos
+    input_files = VideoCatalog.from_directory(INPUT_FILE_DIR).get_file_names(
+        extensions=(".mp4", ".265")
     )
 
     assert len(input_files) > 0, "no input files detected"
 
-    for _ in range(TEST_REPETITIONS):
+    for repetition in range(TEST_REPETITIONS):
         for _, encoding_config in enumerate(encoding_configuration):
             output_files = [
                 remove_media_extension(out_file) for out_file in input_files
@@ -296,13 +575,21 @@ def execute_encoding_benchmark(encoding_configuration: list[EncodingConfig]) ->
             prepare_data_directories(encoding_config, video_names=output_files)
 
             if parallel_mode == ParallelMode.MULTIPLE_VIDEOS_ONE_REPRESENTATION:
-                if SMALL_TESTBED:
+                if concurrency_mode == ConcurrencyMode.WORK_STEALING:
+                    work_stealing_multiple_video_one_representation_encoding(
+                        encoding_config,
+                        input_files,
+                        input_dir,
+                        None if SMALL_TESTBED else list(range(1, 21)),
+                        repetition,
+                    )
+                elif SMALL_TESTBED:
                     reduced_multiple_video_one_representation_encoding(
-                        encoding_config, input_files, input_dir
+                        encoding_config, input_files, input_dir, repetition
                     )
                 else:
                     multiple_video_one_representation_encoding(
-                        encoding_config, 1, 20, input_files, input_dir
+                        encoding_config, 1, 20, input_files, input_dir, repetition
                     )
 
             elif parallel_mode == ParallelMode.ONE_VIDEO_MULTIPLE_REPRESENTATIONS:
@@ -311,9 +598,13 @@ def execute_encoding_benchmark(encoding_configuration: list[EncodingConfig]) ->
                 )
 
             elif parallel_mode == ParallelMode.MULTIPLE_VIDEOS_MULTIPLE_REPRESENTATIONS:
-                # TODO
-                raise NotImplementedError("MVMR not implemented yet")
-                # multiple_video_multiple_representations_encoding()
+                multiple_video_multiple_representations_encoding(
+                    encoding_config,
+                    input_files,
+                    input_dir,
+                    None if SMALL_TESTBED else list(range(1, 11)),
+                    repetition,
+                )
 
     store_monitoring_results()
 
@@ -357,6 +648,102 @@ def _add_mvor_monitoring_results(
     hardware_tracker.clear()
 
 
+def _add_mvor_job_results(
+    dto: EncodingConfigDTO, results: list[JobResult], num_videos: int
+) -> pd.DataFrame:
+    """Adds one row per encoded video to the monitoring results.
+
+    Uses the same columns as `_add_mvor_monitoring_results`, the `video_list` of each
+    row only contains the encoded video and `num_videos` is the number of encodes in flight.
+    """
+    result_df = _get_job_results_dataframe(results, num_videos)
+    preset, codec, rendition = dto.preset, dto.codec, dto.representation
+    result_df[["preset", "codec"]] = preset, codec
+
+    framerate, segment_duration = dto.framerate, dto.segment_duration
+    result_df[["framerate", "segment_duration"]] = framerate, segment_duration
+
+    bitrate, width, height = rendition.bitrate, rendition.width, rendition.height
+    result_df[["bitrate", "width", "height"]] = bitrate, width, height
+
+    monitoring_results.append(result_df)
+    hardware_tracker.clear()
+
+    return result_df
+
+
+def _add_mvmr_job_results(
+    dto: EncodingConfigDTO,
+    enc_config: EncodingConfig,
+    results: list[JobResult],
+    num_videos: int,
+) -> pd.DataFrame:
+    """Adds one row per encoded video to the monitoring results.
+
+    Uses the columns of `_add_mvor_job_results`, but like `_add_ovmr_monitoring_results`
+    the representations are stored in the `representations` column.
+    """
+    result_df = _get_job_results_dataframe(results, num_videos)
+    result_df[["preset", "codec"]] = dto.preset, dto.codec
+    result_df[["framerate", "segment_duration"]] = dto.framerate, dto.segment_duration
+
+    representations: list[str] = [
+        r.get_representation_dir_string() for r in enc_config.representations
+    ]
+    result_df["representations"] = ",".join(representations)
+
+    monitoring_results.append(result_df)
+    hardware_tracker.clear()
+
+    return result_df
+
+
+def _record_job_results(
+    journal_keys: list[JournalKey], results: list[JobResult], result_df: pd.DataFrame
+) -> None:
+    """Journals the row of every successfully encoded video, failed videos are encoded again on resume"""
+    for idx, (journal_key, result) in enumerate(zip(journal_keys, results)):
+        if result.succeeded:
+            campaign_journal.record(journal_key, result_df.iloc[[idx]])
+
+
+def _get_content_seconds(input_dir: str, input_file: str) -> float:
+    """Duration of an input video, used for the realtime factor of its encoding"""
+    return VideoInfo(f"{input_dir}/{input_file}").get_total_duration_in_sec()
+
+
+def _get_job_results_dataframe(results: list[JobResult], num_videos: int) -> pd.DataFrame:
+    """Shares the energy measured by the hardware tracker between the concurrently executed
+    jobs, the CPU energy by the CPU time of each job, and adds the video and GPU columns of the MVOR schema"""
+    result_df = apportion_monitoring_by_cpu_time(
+        hardware_tracker.to_dataframe(), results, process_accountant.to_dataframe()
+    )
+    add_realtime_factor(result_df, result_df["content_seconds"])
+    progress_df = progress_monitor.to_dataframe()
+    add_energy_per_progress(result_df, progress_df)
+    progress_results.append(progress_df.assign(num_videos=num_videos))
+
+    video_names: list[str] = [
+        abbreviate_video_name(result.job.name) for result in results
+    ]
+
+    if USE_CUDA and GPU_COUNT > 0:
+        result_df["use_gpu"] = True
+        result_df["gpu_count"] = GPU_COUNT
+        session_df = encoder_session_collector.summarize_jobs(results)
+        result_df[session_df.columns] = session_df.to_numpy()
+        for gpu_idx in range(GPU_COUNT):
+            result_df[f"video_list_gpu:{gpu_idx}"] = [
+                name if result.job.metadata["gpu_index"] == gpu_idx else ""
+                for name, result in zip(video_names, results)
+            ]
+    else:
+        result_df["video_list"] = video_names
+    result_df["num_videos"] = num_videos
+
+    return result_df
+
+
 def _add_ovmr_monitoring_results(
     enc_config: EncodingConfig, input_slice: list[str]
 ) -> None:
@@ -415,7 +802,25 @@ if __name__ == "__main__":
     ]
 
     hardware_tracker.start()
-
-    execute_encoding_benchmark(encoding_configs)
-
-    hardware_tracker.stop()
+    process_accountant.start()
+    if encoder_session_collector is not None:
+        encoder_session_collector.start()
+    if metrics_exporter is not None:
+        metrics_exporter.start()
+    if perf_capture is not None:
+        perf_capture.start()
+
+    try:
+        execute_encoding_benchmark(encoding_configs)
+    finally:
+        campaign_journal.close()
+        if metrics_exporter is not None:
+            metrics_exporter.stop()
+        if cgroup_manager is not None:
+            cgroup_manager.close()
+        if perf_capture is not None:
+            perf_capture.stop()
+        if encoder_session_collector is not None:
+            encoder_session_collector.stop()
+        process_accountant.stop()
+        hardware_tracker.stop()
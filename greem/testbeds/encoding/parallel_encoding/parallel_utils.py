@@ -3,7 +3,7 @@ from enum import Enum
 import os
 from pathlib import Path
 
-from greem.utility.configuration_classes import EncodingConfig
+from greem.utility.configuration_classes import EncodingConfig, EncodingConfigDTO
 
 
 class ParallelMode(Enum):
@@ -41,6 +41,61 @@ class ParallelMode(Enum):
         return "mvmr"
 
 
+class ConcurrencyMode(Enum):
+    """
+    Enumeration representing how parallel encodes are scheduled.
+
+    Attributes:
+        BATCH (int):
+            A fixed window of videos is encoded by one FFmpeg command, the next window starts
+            once the slowest video of the current window is finished.
+        WORK_STEALING (int):
+            One FFmpeg command per video, exactly N encodes are kept in flight and a new video
+            starts as soon as a running one finishes.
+    """
+
+    BATCH = 1
+    WORK_STEALING = 2
+
+    def get_abbreviation(self) -> str:
+        """
+        Get the abbreviation for the concurrency mode.
+
+        Returns:
+            str: 'batch' for BATCH and 'ws' for WORK_STEALING.
+        """
+        if self == ConcurrencyMode.BATCH:
+            return "batch"
+
+        return "ws"
+
+
+def get_unpaced_encoding_dtos(encoding_config: EncodingConfig) -> list[EncodingConfigDTO]:
+    """
+    Returns the encoding DTOs of the parallel testbed, which reads its inputs unpaced.
+
+    The parallel commands ignore the pacing, DTOs that only differ by their pacing would
+    run identical jobs, so only the DTOs of the first configured pacing are returned.
+
+    Args:
+        encoding_config (EncodingConfig): config whose DTOs are encoded in parallel.
+
+    Returns:
+        list[EncodingConfigDTO]: one DTO per combination of the remaining values.
+    """
+    if len(set(encoding_config.pacing)) > 1:
+        print(
+            f"the parallel testbed does not pace its inputs, ignoring the pacings "
+            f"{[pacing.value for pacing in encoding_config.pacing[1:]]}"
+        )
+
+    return [
+        dto
+        for dto in encoding_config.get_encoding_dtos()
+        if dto.pacing == encoding_config.pacing[0]
+    ]
+
+
 def get_gpu_count() -> int:
     """
     Returns the number of NVIDIA GPUs installed on the system.
@@ -2,10 +2,9 @@ import os
 from pathlib import Path
 import pandas as pd
 from datetime import datetime
-from codecarbon import track_emissions
 
 from math import ceil
-from greem.video.video_info import VideoInfo
+from greem.video.video_info import PROBE_CACHE, VideoInfo
 
 from greem.utility.ffmpeg import CUDA_ENC_FLAG, QUIET_FLAG, get_lib_codec
 from greem.utility.configuration_classes import (
@@ -15,9 +14,18 @@ from greem.utility.configuration_classes import (
 )
 
 from greem.utility.timing import IdleTimeEnergyMeasurement
-from greem.utility.dataframe import get_dataframe_from_csv
+from greem.utility.dataframe import (
+    add_realtime_factor,
+    integrate_monitoring_over_intervals,
+)
+from greem.utility.job_runner import run_cmd
+from greem.utility.monitoring import EnergySource, HardwareTracker
+from greem.utility.timeline import PhaseRecorder
+from greem.utility.journal import CampaignJournal, JournalKey
+from greem.utility.video_catalog import VideoCatalog
 
 from greem.hardware.intel import intel_rapl_workaround
+from greem.monitoring.metrics_exporter import MetricsExporter
 from greem.monitoring.nvidia_top import NvidiaTop
 
 from greem.utility.cli_parser import CLI_PARSER
@@ -38,7 +46,33 @@ USE_SLICED_VIDEOS: bool = CLI_PARSER.is_sliced_encoding()
 # if True, no encoding will be executed
 DRY_RUN: bool = CLI_PARSER.is_dry_run()
 USE_CUDA: bool = CLI_PARSER.is_cuda_enabled()
-INCLUDE_CODE_CARBON: bool = CLI_PARSER.is_code_carbon_enabled()
+ENERGY_SOURCE: EnergySource = (
+    EnergySource.RAPL if CLI_PARSER.is_rapl_enabled() else EnergySource.CODECARBON
+)
+
+MEASUREMENT_INTERVAL: float = 0.5
+# every video is encoded this often with every DTO, the journal resumes each repetition on its own
+TEST_REPETITIONS: int = 1
+
+# one tracker measures the whole benchmark, the energy of every stage and command
+# is integrated afterwards from its continuous samples
+hardware_tracker = HardwareTracker(
+    cuda_enabled=USE_CUDA,
+    measure_power_secs=MEASUREMENT_INTERVAL,
+    energy_source=ENERGY_SOURCE,
+)
+phase_recorder = PhaseRecorder()
+# live job and power metrics of the benchmark (enable with --metrics-port <port>)
+METRICS_PORT: int | None = CLI_PARSER.get_metrics_port()
+metrics_exporter: MetricsExporter | None = (
+    MetricsExporter(METRICS_PORT, hardware_tracker=hardware_tracker)
+    if METRICS_PORT is not None
+    else None
+)
+
+# completed encodes are journaled, a restarted campaign skips them (disable with --no-resume)
+JOURNAL_PATH: str = f"{RESULT_ROOT}/journal_{os.uname()[1]}.jsonl"
+campaign_journal = CampaignJournal(JOURNAL_PATH, resume=CLI_PARSER.is_resume_enabled())
 
 """
 def encoding(input_ffmpeg: str,
@@ -90,8 +124,10 @@ def create_ffmpeg_encoding_command(
         cmd.append(CUDA_ENC_FLAG)
     if quiet_mode:
         cmd.append(QUIET_FLAG)
+    if dto.pacing.get_input_flag():
+        cmd.append(dto.pacing.get_input_flag())
 
-    cmd.append(f"-re -i {input_file_path}")
+    cmd.append(f"-i {input_file_path}")
 
     if constant_rate_factor > -1:
         cmd.append(f"-crf {constant_rate_factor}")
@@ -169,8 +205,10 @@ def create_ffmpeg_scaling_command(
         cmd.append(CUDA_ENC_FLAG)
     if quiet_mode:
         cmd.append(QUIET_FLAG)
+    if dto.pacing.get_input_flag():
+        cmd.append(dto.pacing.get_input_flag())
 
-    cmd.append(f"-re -i {output_dir}/encoding_output.mp4")
+    cmd.append(f"-i {output_dir}/encoding_output.mp4")
 
     cmd.extend(
         [
@@ -263,9 +301,8 @@ def execute_encoding_benchmark():
     input_dir = INPUT_FILE_DIR
 
     for en_idx, encoding_config in enumerate(encoding_configs):
-        input_files = sorted(
-            [file for file in os.listdir(
-                INPUT_FILE_DIR) if file.endswith(".265")]
+        input_files = VideoCatalog.from_directory(INPUT_FILE_DIR).get_file_names(
+            extensions=(".265",)
         )
 
         # encode for each duration defined in the config file
@@ -277,116 +314,120 @@ def execute_encoding_benchmark():
         )
         duration = 4
         # encode each video found in the input files corresponding to the duration
-        for video_idx, video_name in enumerate(input_files):
-            for dto_idx, dto in enumerate(encoding_dtos):
-                output_dir = f'{RESULT_ROOT}/{dto.get_output_directory(video_name.removesuffix(".265"))}'
-
-                # send_ntfy(
-                #     NTFY_TOPIC,
-                #     f'''
-                #     - video sequence {video_name} - ({video_idx + 1}/{len(input_files)})
-                #     --- config - ({en_idx + 1}/{len(encoding_configs)})
-                #     --- {dto} - ({dto_idx + 1}/{len(encoding_dtos)})
-                #     ''')
-
-                encoding_cmd = create_ffmpeg_encoding_command(
-                    f"{input_dir}/{video_name}",
-                    output_dir,
-                    dto,
-                    constant_rate_factor=-1,
-                    cuda_enabled=USE_CUDA,
-                    quiet_mode=CLI_PARSER.is_quiet_ffmpeg(),
-                )
-                # encoding_cmd = create_ffmpeg_encoding_command(
-                #     f'{input_dir}/{video_name}',
-                #     output_dir,
-                #     dto,
-                #     constant_rate_factor=-1,
-                #     cuda_enabled=USE_CUDA,
-                #     quiet_mode=CLI_PARSER.is_quiet_ffmpeg()
-                # ) if not DRY_RUN else 'sleep 0.1'
-
-                execute_encoding_stage(encoding_cmd, dto, video_name)
-
-                scaling_cmd: str = create_ffmpeg_scaling_command(
-                    output_dir, dto, cuda_enabled=USE_CUDA
-                )
-
-                # execute_encoding_cmd(cmd, dto, video_name)
-                execute_scaling_stage(scaling_cmd, dto, video_name)
+        for repetition in range(TEST_REPETITIONS):
+            for video_idx, video_name in enumerate(input_files):
+                for dto_idx, dto in enumerate(encoding_dtos):
+                    output_dir = f'{RESULT_ROOT}/{dto.get_output_directory(video_name.removesuffix(".265"))}'
+
+                    journal_key = JournalKey.create(
+                        encoding_config, video_name, dto, repetition=repetition, run="segment_encoding"
+                    )
+                    if campaign_journal.is_completed(journal_key):
+                        journaled_results.append(
+                            campaign_journal.get_measurements(journal_key))
+                        continue
+                    num_metric_results: int = len(metric_results)
+
+                    # send_ntfy(
+                    #     NTFY_TOPIC,
+                    #     f'''
+                    #     - video sequence {video_name} - ({video_idx + 1}/{len(input_files)})
+                    #     --- config - ({en_idx + 1}/{len(encoding_configs)})
+                    #     --- {dto} - ({dto_idx + 1}/{len(encoding_dtos)})
+                    #     ''')
+
+                    encoding_cmd = create_ffmpeg_encoding_command(
+                        f"{input_dir}/{video_name}",
+                        output_dir,
+                        dto,
+                        constant_rate_factor=-1,
+                        cuda_enabled=USE_CUDA,
+                        quiet_mode=CLI_PARSER.is_quiet_ffmpeg(),
+                    )
+                    # encoding_cmd = create_ffmpeg_encoding_command(
+                    #     f'{input_dir}/{video_name}',
+                    #     output_dir,
+                    #     dto,
+                    #     constant_rate_factor=-1,
+                    #     cuda_enabled=USE_CUDA,
+                    #     quiet_mode=CLI_PARSER.is_quiet_ffmpeg()
+                    # ) if not DRY_RUN else 'sleep 0.1'
+
+                    execute_encoding_stage(encoding_cmd, dto, video_name)
+
+                    scaling_cmd: str = create_ffmpeg_scaling_command(
+                        output_dir, dto, cuda_enabled=USE_CUDA
+                    )
+
+                    # execute_encoding_cmd(cmd, dto, video_name)
+                    execute_scaling_stage(scaling_cmd, dto, video_name)
+                    for result_df in metric_results[num_metric_results:]:
+                        result_df["repetition"] = repetition
+
+                    if not DRY_RUN:
+                        # a failed encode or scaling is executed again by a resumed campaign
+                        campaign_journal.record_if_succeeded(
+                            journal_key,
+                            pd.concat(metric_results[num_metric_results:], ignore_index=True),
+                        )
 
     write_encoding_results_to_csv()
 
 
-@track_emissions(
-    offline=True,
-    country_iso_code="AUT",
-    log_level="error" if CLI_PARSER.is_quiet_ffmpeg() else "debug",
-    measure_power_secs=1,
-    output_dir=RESULT_ROOT,
-    save_to_file=True,
-    project_name="encoding_stage",
-)
 def execute_encoding_stage(
     cmd: str, encoding_dto: EncodingConfigDTO, video_name: str
 ) -> None:
-    execute_encoding_cmd(cmd, encoding_dto, video_name)
+    with phase_recorder.phase("encoding_stage", video_name=video_name):
+        execute_encoding_cmd(cmd, encoding_dto, video_name)
 
 
-@track_emissions(
-    offline=True,
-    country_iso_code="AUT",
-    log_level="error" if CLI_PARSER.is_quiet_ffmpeg() else "debug",
-    measure_power_secs=1,
-    output_dir=RESULT_ROOT,
-    save_to_file=True,
-    project_name="scaling_stage",
-)
 def execute_scaling_stage(
     cmd: str, encoding_dto: EncodingConfigDTO, video_name: str
 ) -> None:
-    execute_encoding_cmd(cmd, encoding_dto, video_name)
+    with phase_recorder.phase("scaling_stage", video_name=video_name):
+        execute_encoding_cmd(cmd, encoding_dto, video_name)
 
 
-@track_emissions(
-    offline=True,
-    country_iso_code="AUT",
-    log_level="error" if CLI_PARSER.is_quiet_ffmpeg() else "debug",
-    measure_power_secs=1,
-    output_dir=RESULT_ROOT,
-    save_to_file=True,
-)
 def execute_encoding_cmd(
     cmd: str, encoding_dto: EncodingConfigDTO, video_name: str
 ) -> None:
     global metric_results, nvidia_top
 
-    if USE_CUDA:
-        # executes the cmd with nvidia monitoring
-        result_df = nvidia_top.get_resource_metric_as_dataframe(cmd)
-
-        rendition = encoding_dto.representation
+    if DRY_RUN:
+        print(cmd)
+        return
 
-        result_df[["preset", "codec", "duration"]] = (
-            encoding_dto.preset,
-            encoding_dto.codec,
-            encoding_dto.segment_duration,
-        )
-        result_df[["bitrate", "width", "height"]] = (
-            rendition.bitrate,
-            rendition.width,
-            rendition.height,
+    if USE_CUDA:
+        # executes the cmd with nvidia monitoring, its resource metrics are summarized with
+        # the ones of all other encodes by `write_encoding_results_to_csv`
+        result_df = pd.DataFrame(
+            [nvidia_top.run_tagged(cmd, metrics_exporter=metrics_exporter).to_dict()]
         )
-        result_df["video_name"] = video_name
-        result_df["output_path"] = encoding_dto.get_output_directory(
-            video_name)
+    else:
+        result_df = pd.DataFrame([run_cmd(cmd, metrics_exporter=metrics_exporter).to_dict()])
 
-        metric_results.append(result_df)
+    rendition = encoding_dto.representation
 
-    elif DRY_RUN:
-        print(cmd)
-    else:
-        os.system(cmd)
+    result_df[["preset", "codec", "duration"]] = (
+        encoding_dto.preset,
+        encoding_dto.codec,
+        encoding_dto.segment_duration,
+    )
+    result_df[["bitrate", "width", "height"]] = (
+        rendition.bitrate,
+        rendition.width,
+        rendition.height,
+    )
+    result_df["video_name"] = video_name
+    result_df["output_path"] = encoding_dto.get_output_directory(
+        video_name)
+    result_df["pacing"] = encoding_dto.pacing.value
+    add_realtime_factor(
+        result_df,
+        VideoInfo(f"{INPUT_FILE_DIR}/{video_name}").get_total_duration_in_sec(),
+    )
+
+    metric_results.append(result_df)
 
 
 def write_encoding_results_to_csv():
@@ -394,18 +435,31 @@ def write_encoding_results_to_csv():
 
     current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     result_path = f"{RESULT_ROOT}/encoding_results_{current_time}.csv"
-    if INCLUDE_CODE_CARBON:
-        emission_df = get_dataframe_from_csv(f"{RESULT_ROOT}/emissions.csv")
-        # merge codecarbon and timing_df results
+    if len(metric_results) > 0:
+        # closes the measurement interval of the last encode
+        hardware_tracker._fetch_hardware_metrics()
+        monitoring_df = hardware_tracker.to_dataframe()
 
+        job_df = NvidiaTop.merge_resource_metric_dfs(
+            metric_results, exclude_timestamps=True
+        )
         if USE_CUDA:
-            nvitop_df = NvidiaTop.merge_resource_metric_dfs(
-                metric_results, exclude_timestamps=True
-            )
-            merged_df = pd.concat([emission_df, nvitop_df], axis=1)
-            # save to disk
-            merged_df.to_csv(result_path)
-            os.system(f"rm {RESULT_ROOT}/emissions.csv")
+            # the resource metrics of all encodes are summarized at once
+            job_df = nvidia_top.add_job_summaries(job_df)
+        integrate_monitoring_over_intervals(
+            monitoring_df, phase_recorder.to_dataframe()
+        ).to_csv(f"{RESULT_ROOT}/encoding_stages_{current_time}.csv")
+        # journaled rows were measured by a previous run, their monotonic times are not comparable
+        pd.concat(
+            [integrate_monitoring_over_intervals(monitoring_df, job_df), *journaled_results],
+            ignore_index=True,
+        ).to_csv(result_path)
+    if USE_CUDA:
+        # raw resource samples of all encodes, the result rows only contain their summaries
+        nvidia_top.get_time_series().to_parquet(
+            f"{RESULT_ROOT}/nvitop_time_series_{current_time}.parquet"
+        )
+        nvidia_top.clear()
 
 
 if __name__ == "__main__":
@@ -421,20 +475,29 @@ if __name__ == "__main__":
         Path(RESULT_ROOT).mkdir(parents=True, exist_ok=True)
 
         gpu_monitoring = None
+        metric_results: list[pd.DataFrame] = list()
+        # measurements of encodes that were completed by a previous run
+        journaled_results: list[pd.DataFrame] = list()
         if USE_CUDA:
             nvidia_top = NvidiaTop()
-            metric_results: list[pd.DataFrame] = list()
 
         intel_rapl_workaround()
-        IdleTimeEnergyMeasurement.measure_idle_energy_consumption(
-            result_path=f"{RESULT_ROOT}/encoding_idle_time.csv", idle_time_in_seconds=1
+        IdleTimeEnergyMeasurement.get_idle_baseline(
+            result_path=f"{RESULT_ROOT}/encoding_idle_baseline.json",
+            cuda_enabled=USE_CUDA,
+            energy_source=ENERGY_SOURCE,
         )
 
         encoding_configs: list[EncodingConfig] = [
             EncodingConfig.from_file(file_path) for file_path in ENCODING_CONFIG_PATHS
         ]
+        # probe all videos once instead of once per encoding command
+        PROBE_CACHE.warm(INPUT_FILE_DIR)
         timing_metadata: dict[int, dict] = dict()
 
+        hardware_tracker.start()
+        if metrics_exporter is not None:
+            metrics_exporter.start()
         execute_encoding_benchmark()
 
     except Exception as err:
@@ -444,5 +507,11 @@ if __name__ == "__main__":
         )
 
     finally:
+        if metrics_exporter is not None:
+            metrics_exporter.stop()
+        hardware_tracker.stop()
+        campaign_journal.close()
+        if USE_CUDA:
+            nvidia_top.stop()
         print("done")
         send_ntfy(NTFY_TOPIC, "finished benchmark")
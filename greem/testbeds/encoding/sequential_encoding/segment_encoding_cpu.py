@@ -2,7 +2,6 @@ import os
 from pathlib import Path
 import pandas as pd
 from datetime import datetime
-from codecarbon import track_emissions
 
 from greem.utility.ffmpeg import create_ffmpeg_encoding_command
 from greem.utility.configuration_classes import (
@@ -11,11 +10,14 @@ from greem.utility.configuration_classes import (
 )
 
 from greem.utility.timing import IdleTimeEnergyMeasurement
-from greem.utility.dataframe import get_dataframe_from_csv
+from greem.utility.dataframe import integrate_monitoring_over_intervals
+from greem.utility.job_runner import run_cmd
+from greem.utility.monitoring import EnergySource, HardwareTracker
 
 from greem.utility.ntfy import send_ntfy
 
 from greem.hardware.intel import intel_rapl_workaround
+from greem.monitoring.metrics_exporter import MetricsExporter
 from greem.monitoring.nvidia_top import NvidiaTop
 
 from greem.utility.cli_parser import CLI_PARSER
@@ -36,7 +38,24 @@ USE_SLICED_VIDEOS: bool = CLI_PARSER.is_sliced_encoding()
 # if True, no encoding will be executed
 DRY_RUN: bool = CLI_PARSER.is_dry_run()
 USE_CUDA: bool = True
-INCLUDE_CODE_CARBON: bool = CLI_PARSER.is_code_carbon_enabled()
+ENERGY_SOURCE: EnergySource = (
+    EnergySource.RAPL if CLI_PARSER.is_rapl_enabled() else EnergySource.CODECARBON
+)
+
+MEASUREMENT_INTERVAL: float = 0.5
+
+# one tracker measures the whole benchmark, the energy of every encode is integrated
+# afterwards from its continuous samples
+hardware_tracker = HardwareTracker(
+    measure_power_secs=MEASUREMENT_INTERVAL, energy_source=ENERGY_SOURCE
+)
+# live job and power metrics of the benchmark (enable with --metrics-port <port>)
+METRICS_PORT: int | None = CLI_PARSER.get_metrics_port()
+metrics_exporter: MetricsExporter | None = (
+    MetricsExporter(METRICS_PORT, hardware_tracker=hardware_tracker)
+    if METRICS_PORT is not None
+    else None
+)
 
 
 def prepare_data_directories(
@@ -160,22 +179,17 @@ def execute_encoding_benchmark():
     write_encoding_results_to_csv()
 
 
-@track_emissions(
-    offline=True,
-    country_iso_code="AUT",
-    log_level="error" if CLI_PARSER.is_quiet_ffmpeg() else "debug",
-    measure_power_secs=1,
-    output_dir=RESULT_ROOT,
-    save_to_file=True,
-)
 def execute_encoding_cmd(
     cmd: str, encoding_dto: EncodingConfigDTO, video_name: str
 ) -> None:
     global metric_results, nvidia_top
 
     if USE_CUDA:
-        # executes the cmd with nvidia monitoring
-        result_df = nvidia_top.get_resource_metric_as_dataframe(cmd)
+        # executes the cmd with nvidia monitoring, its resource metrics are summarized with
+        # the ones of all other encodes by `write_encoding_results_to_csv`
+        result_df = pd.DataFrame(
+            [nvidia_top.run_tagged(cmd, metrics_exporter=metrics_exporter).to_dict()]
+        )
 
         rendition = encoding_dto.representation
 
@@ -197,7 +211,7 @@ def execute_encoding_cmd(
     elif DRY_RUN:
         print(cmd)
     else:
-        os.system(cmd)
+        run_cmd(cmd, metrics_exporter=metrics_exporter)
 
 
 def write_encoding_results_to_csv():
@@ -205,17 +219,16 @@ def write_encoding_results_to_csv():
 
     current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     result_path = f"{RESULT_ROOT}/encoding_results_{current_time}.csv"
-    if INCLUDE_CODE_CARBON and USE_CUDA:
-        emission_df = get_dataframe_from_csv(f"{RESULT_ROOT}/emissions.csv")
-        # merge codecarbon and timing_df results
-
-        nvitop_df = NvidiaTop.merge_resource_metric_dfs(
-            metric_results, exclude_timestamps=True
+    if USE_CUDA and len(metric_results) > 0:
+        # closes the measurement interval of the last encode
+        hardware_tracker._fetch_hardware_metrics()
+        monitoring_df = hardware_tracker.to_dataframe()
+
+        # the resource metrics of all encodes are summarized at once
+        nvitop_df = nvidia_top.add_job_summaries(
+            NvidiaTop.merge_resource_metric_dfs(metric_results, exclude_timestamps=True)
         )
-        merged_df = pd.concat([emission_df, nvitop_df], axis=1)
-        # save to disk
-        merged_df.to_csv(result_path)
-        os.system(f"rm {RESULT_ROOT}/emissions.csv")
+        integrate_monitoring_over_intervals(monitoring_df, nvitop_df).to_csv(result_path)
 
 
 if __name__ == "__main__":
@@ -236,8 +249,10 @@ if __name__ == "__main__":
             metric_results: list[pd.DataFrame] = list()
 
         intel_rapl_workaround()
-        IdleTimeEnergyMeasurement.measure_idle_energy_consumption(
-            result_path=f"{RESULT_ROOT}/encoding_idle_time.csv", idle_time_in_seconds=1
+        IdleTimeEnergyMeasurement.get_idle_baseline(
+            result_path=f"{RESULT_ROOT}/encoding_idle_baseline.json",
+            cuda_enabled=USE_CUDA,
+            energy_source=ENERGY_SOURCE,
         )
 
         encoding_configs: list[EncodingConfig] = [
@@ -245,6 +260,9 @@ if __name__ == "__main__":
         ]
         timing_metadata: dict[int, dict] = dict()
 
+        hardware_tracker.start()
+        if metrics_exporter is not None:
+            metrics_exporter.start()
         execute_encoding_benchmark()
 
     except Exception as err:
@@ -254,5 +272,8 @@ if __name__ == "__main__":
         )
 
     finally:
+        if metrics_exporter is not None:
+            metrics_exporter.stop()
+        hardware_tracker.stop()
         print("done")
         send_ntfy(NTFY_TOPIC, "finished benchmark")
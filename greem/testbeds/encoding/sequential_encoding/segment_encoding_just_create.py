@@ -11,6 +11,7 @@ from greem.utility.configuration_classes import (
 )
 
 from greem.utility.dataframe import get_dataframe_from_csv
+from greem.utility.job_runner import Job, JobRunner
 
 from greem.utility.ntfy import send_ntfy
 
@@ -33,6 +34,8 @@ USE_SLICED_VIDEOS: bool = CLI_PARSER.is_sliced_encoding()
 DRY_RUN: bool = CLI_PARSER.is_dry_run()
 USE_CUDA: bool = True
 INCLUDE_CODE_CARBON: bool = CLI_PARSER.is_code_carbon_enabled()
+# the encodes are only created, not measured one by one, so they may run concurrently (--jobs)
+job_runner = JobRunner(max_concurrency=CLI_PARSER.get_max_concurrent_jobs())
 
 
 def prepare_data_directories(
@@ -107,6 +110,7 @@ def execute_encoding_benchmark():
         duration = 4
         # encode each video found in the input files corresponding to the duration
         for video_idx, video_name in enumerate(input_files):
+            jobs: list[Job] = []
             for dto_idx, dto in enumerate(encoding_dtos):
                 
                 output_dir = f'{RESULT_ROOT}/{dto.get_output_directory(video_name.removesuffix(".265"))}'
@@ -135,8 +139,9 @@ def execute_encoding_benchmark():
                     if not DRY_RUN
                     else "sleep 0.1"
                 )
-            
-                execute_encoding_cmd(cmd, dto, video_name)     
+                jobs.append(Job.from_cmd(cmd, name=video_name))
+
+            execute_encoding_jobs(jobs)
 
 @track_emissions(
     offline=True,
@@ -146,12 +151,8 @@ def execute_encoding_benchmark():
     output_dir=RESULT_ROOT,
     save_to_file=True,
 )
-def execute_encoding_cmd(
-    cmd: str,
-    encoding_dto: EncodingConfigDTO,
-    video_name: str
-) -> None:
-    os.system(cmd)
+def execute_encoding_jobs(jobs: list[Job]) -> None:
+    job_runner.run(jobs)
         
 
 
@@ -4,19 +4,26 @@ from pathlib import Path
 from datetime import datetime
 
 import pandas as pd
-from codecarbon import track_emissions
 from websockets import InvalidState
 
 from greem.utility.ffmpeg import create_sequential_encoding_cmd
 from greem.utility.configuration_classes import EncodingConfig, EncodingConfigDTO
 
 from greem.utility.timing import IdleTimeEnergyMeasurement
-from greem.utility.dataframe import get_dataframe_from_csv
+from greem.utility.dataframe import (
+    add_realtime_factor,
+    integrate_monitoring_over_intervals,
+)
+from greem.utility.job_runner import run_cmd
+from greem.utility.monitoring import EnergySource, HardwareTracker
+from greem.utility.timeline import PhaseRecorder
 
 from greem.hardware.intel import intel_rapl_workaround
+from greem.monitoring.metrics_exporter import MetricsExporter
 from greem.monitoring.nvidia_top import NvidiaTop
 
 from greem.utility.cli_parser import CLI_PARSER
+from greem.video.video_info import VideoInfo
 
 NTFY_TOPIC: str = "aws_encoding"
 
@@ -35,11 +42,28 @@ USE_SLICED_VIDEOS: bool = CLI_PARSER.is_sliced_encoding()
 # if True, no encoding will be executed
 DRY_RUN: bool = CLI_PARSER.is_dry_run()
 USE_CUDA: bool = CLI_PARSER.is_cuda_enabled()
-INCLUDE_CODE_CARBON: bool = CLI_PARSER.is_code_carbon_enabled()
+ENERGY_SOURCE: EnergySource = (
+    EnergySource.RAPL if CLI_PARSER.is_rapl_enabled() else EnergySource.CODECARBON
+)
+
+MEASUREMENT_INTERVAL: float = 0.5
 
 metric_results: list[pd.DataFrame] = []
 
 nvidia_top = NvidiaTop() if USE_CUDA else None
+# one tracker measures the whole benchmark, the energy of every stage and command
+# is integrated afterwards from its continuous samples
+hardware_tracker = HardwareTracker(
+    measure_power_secs=MEASUREMENT_INTERVAL, energy_source=ENERGY_SOURCE
+)
+phase_recorder = PhaseRecorder()
+# live job and power metrics of the benchmark (enable with --metrics-port <port>)
+METRICS_PORT: int | None = CLI_PARSER.get_metrics_port()
+metrics_exporter: MetricsExporter | None = (
+    MetricsExporter(METRICS_PORT, hardware_tracker=hardware_tracker)
+    if METRICS_PORT is not None
+    else None
+)
 
 
 """
@@ -308,92 +332,85 @@ def execute_encoding_benchmark(encoding_configs: list[EncodingConfig]):
     # write_encoding_results_to_csv()
 
 
-@track_emissions(
-    offline=True,
-    country_iso_code="AUT",
-    log_level="error" if CLI_PARSER.is_quiet_ffmpeg() else "debug",
-    measure_power_secs=1,
-    output_dir=RESULT_ROOT,
-    save_to_file=True,
-    project_name="encoding_stage",
-)  # type: ignore
 def execute_encoding_stage(
     cmd: str, encoding_dto: EncodingConfigDTO, video_name: str
 ) -> None:
-    execute_encoding_cmd(cmd, encoding_dto, video_name)
-
-
-@track_emissions(
-    offline=True,
-    country_iso_code="AUT",
-    log_level="error" if CLI_PARSER.is_quiet_ffmpeg() else "debug",
-    measure_power_secs=1,
-    output_dir=RESULT_ROOT,
-    save_to_file=True,
-    project_name="scaling_stage",
-)  # type: ignore
+    with phase_recorder.phase("encoding_stage", video_name=video_name):
+        execute_encoding_cmd(cmd, encoding_dto, video_name)
+
+
 def execute_scaling_stage(
     cmd: str, encoding_dto: EncodingConfigDTO, video_name: str
 ) -> None:
-    execute_scaling_stage(cmd, encoding_dto, video_name)
+    with phase_recorder.phase("scaling_stage", video_name=video_name):
+        execute_encoding_cmd(cmd, encoding_dto, video_name)
 
 
-@track_emissions(
-    offline=True,
-    country_iso_code="AUT",
-    log_level="error" if CLI_PARSER.is_quiet_ffmpeg() else "debug",
-    measure_power_secs=1,
-    output_dir=RESULT_ROOT,
-    save_to_file=True,
-)  # type: ignore
 def execute_encoding_cmd(
     cmd: str, encoding_dto: EncodingConfigDTO, video_name: str
 ) -> None:
-    if USE_CUDA:
-        # executes the cmd with nvidia monitoring
-        result_df = nvidia_top.get_resource_metric_as_dataframe(cmd)
-
-        rendition = encoding_dto.representation
+    if DRY_RUN:
+        print(cmd)
+        return
 
-        result_df[["preset", "codec", "duration"]] = (
-            encoding_dto.preset,
-            encoding_dto.codec,
-            encoding_dto.segment_duration,
-        )
-        result_df[["bitrate", "width", "height"]] = (
-            rendition.bitrate,
-            rendition.width,
-            rendition.height,
+    if USE_CUDA:
+        # executes the cmd with nvidia monitoring, its resource metrics are summarized with
+        # the ones of all other encodes by `write_encoding_results_to_csv`
+        result_df = pd.DataFrame(
+            [nvidia_top.run_tagged(cmd, metrics_exporter=metrics_exporter).to_dict()]
         )
-        result_df["video_name"] = video_name
-        result_df["output_path"] = encoding_dto.get_output_directory()
-
-        metric_results.append(result_df)
-
-    elif DRY_RUN:
-        print(cmd)
     else:
-        os.system(cmd)
+        result_df = pd.DataFrame([run_cmd(cmd, metrics_exporter=metrics_exporter).to_dict()])
+
+    rendition = encoding_dto.representation
+
+    result_df[["preset", "codec", "duration"]] = (
+        encoding_dto.preset,
+        encoding_dto.codec,
+        encoding_dto.segment_duration,
+    )
+    result_df[["bitrate", "width", "height"]] = (
+        rendition.bitrate,
+        rendition.width,
+        rendition.height,
+    )
+    result_df["video_name"] = video_name
+    result_df["output_path"] = encoding_dto.get_output_directory()
+    result_df["pacing"] = encoding_dto.pacing.value
+    add_realtime_factor(
+        result_df,
+        VideoInfo(f"{INPUT_FILE_DIR}/{video_name}").get_total_duration_in_sec(),
+    )
+
+    metric_results.append(result_df)
 
 
 def write_encoding_results_to_csv():
     current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     result_path = f"{RESULT_ROOT}/encoding_results_{current_time}.csv"
-    if INCLUDE_CODE_CARBON:
-        emission_df = get_dataframe_from_csv(f"{RESULT_ROOT}/emissions.csv").dropna(
-            axis=1, how="all"
-        )
+    if len(metric_results) > 0:
+        # closes the measurement interval of the last encode
+        hardware_tracker._fetch_hardware_metrics()
+        monitoring_df = hardware_tracker.to_dataframe()
 
-        # merge codecarbon and timing_df results
+        job_df = NvidiaTop.merge_resource_metric_dfs(
+            metric_results, exclude_timestamps=True
+        )
         if USE_CUDA:
-            nvitop_df = NvidiaTop.merge_resource_metric_dfs(
-                metric_results, exclude_timestamps=True
-            ).dropna(axis=1, how="all")
-            merged_df = pd.concat([emission_df, nvitop_df], axis=1)
-
-            # save to disk
-            merged_df.to_csv(result_path)
-            os.system(f"rm {RESULT_ROOT}/emissions.csv")
+            # the resource metrics of all encodes are summarized at once
+            job_df = nvidia_top.add_job_summaries(job_df)
+        integrate_monitoring_over_intervals(
+            monitoring_df, job_df.dropna(axis=1, how="all")
+        ).to_csv(result_path)
+        integrate_monitoring_over_intervals(
+            monitoring_df, phase_recorder.to_dataframe()
+        ).to_csv(f"{RESULT_ROOT}/encoding_stages_{current_time}.csv")
+    if USE_CUDA:
+        # raw resource samples of all encodes, the result rows only contain their summaries
+        nvidia_top.get_time_series().to_parquet(
+            f"{RESULT_ROOT}/nvitop_time_series_{current_time}.parquet"
+        )
+        nvidia_top.clear()
 
 
 if __name__ == "__main__":
@@ -404,8 +421,10 @@ if __name__ == "__main__":
             nvidia_top = NvidiaTop()
 
         intel_rapl_workaround()
-        IdleTimeEnergyMeasurement.measure_idle_energy_consumption(
-            result_path=f"{RESULT_ROOT}/encoding_idle_time.csv", idle_time_in_seconds=1
+        IdleTimeEnergyMeasurement.get_idle_baseline(
+            result_path=f"{RESULT_ROOT}/encoding_idle_baseline.json",
+            cuda_enabled=USE_CUDA,
+            energy_source=ENERGY_SOURCE,
         )
 
         encoding_configurations: list[EncodingConfig] = [
@@ -418,10 +437,19 @@ if __name__ == "__main__":
         metric_results: list[pd.DataFrame] = []
         timing_metadata: dict[int, dict] = {}
 
+        hardware_tracker.start()
+        if metrics_exporter is not None:
+            metrics_exporter.start()
         execute_encoding_benchmark(encoding_configurations)
+        write_encoding_results_to_csv()
 
     except InvalidState as err:
         print(err)
 
     finally:
+        if metrics_exporter is not None:
+            metrics_exporter.stop()
+        hardware_tracker.stop()
+        if USE_CUDA:
+            nvidia_top.stop()
         print("done")
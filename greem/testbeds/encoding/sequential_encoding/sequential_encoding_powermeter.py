@@ -12,6 +12,7 @@ from greem.utility.configuration_classes import EncodingConfig, EncodingConfigDT
 
 from greem.utility.timing import IdleTimeEnergyMeasurement
 from greem.utility.dataframe import get_dataframe_from_csv
+from greem.utility.job_runner import run_cmd
 
 from greem.hardware.intel import intel_rapl_workaround
 from greem.monitoring.nvidia_top import NvidiaTop
@@ -186,7 +187,7 @@ def execute_encoding_cmd(
     elif DRY_RUN:
         print(cmd)
     else:
-        os.system(cmd)
+        run_cmd(cmd)
 
 
 def write_encoding_results_to_csv():
@@ -219,8 +220,9 @@ if __name__ == "__main__":
             nvidia_top = NvidiaTop()
 
         intel_rapl_workaround()
-        IdleTimeEnergyMeasurement.measure_idle_energy_consumption(
-            result_path=f"{RESULT_ROOT}/encoding_idle_time.csv", idle_time_in_seconds=1
+        IdleTimeEnergyMeasurement.get_idle_baseline(
+            result_path=f"{RESULT_ROOT}/encoding_idle_baseline.json",
+            cuda_enabled=USE_CUDA,
         )
 
         encoding_configurations: list[EncodingConfig] = [
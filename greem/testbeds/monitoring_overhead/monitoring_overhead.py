@@ -0,0 +1,63 @@
+"""
+Measures the overhead of every monitoring backend at several sampling intervals.
+
+The sampling intervals of the testbeds (e.g. `measure_power_secs=0.5` of the parallel
+encoding or `MEASUREMENT_INTERVAL = 0.25` of the power meter testbed) trade resolution
+against the perturbation of the measurement. This testbed runs a fixed reference
+workload without monitoring and under CodeCarbon, the `HardwareTracker`, the
+`ProcessAccountant` and, with `--cuda`, nvitop and the NVML handler, see
+`greem.monitoring.overhead_benchmark`. With `--rapl`, the energy of every run is read
+from the RAPL counters, otherwise only the CPU time, wakeups and duration are compared.
+"""
+
+import os
+from datetime import datetime
+from pathlib import Path
+
+from greem.hardware.rapl import RaplReader
+from greem.monitoring.overhead_benchmark import (
+    get_default_backends,
+    get_reference_workload,
+    run_overhead_benchmark,
+    summarize_overhead,
+)
+from greem.utility.cli_parser import CLI_PARSER
+from greem.utility.job_runner import Job
+
+RESULT_ROOT: str = "results"
+HOST_NAME: str = os.uname()[1]
+
+USE_CUDA: bool = CLI_PARSER.is_cuda_enabled()
+USE_RAPL: bool = CLI_PARSER.is_rapl_enabled()
+
+SAMPLING_INTERVALS: list[float] = [0.1, 0.25, 0.5, 1.0]
+TEST_REPETITIONS: int = 5
+assert TEST_REPETITIONS > 1, "at least two repetitions are required for the confidence intervals"
+COOLDOWN_SECONDS: float = 5.0
+
+# Change to benchmark an encode instead of the synthetic CPU workload
+REFERENCE_WORKLOAD: Job = get_reference_workload(iterations=10000)
+# REFERENCE_WORKLOAD: Job = Job.from_cmd(
+#     "ffmpeg -f lavfi -i testsrc2=duration=20:size=1920x1080:rate=30 -c:v libx264 -preset medium -f null -",
+#     name="reference",
+# )
+
+
+if __name__ == "__main__":
+    Path(RESULT_ROOT).mkdir(parents=True, exist_ok=True)
+
+    energy_reader: RaplReader | None = RaplReader() if USE_RAPL else None
+    runs_df = run_overhead_benchmark(
+        get_default_backends(cuda_enabled=USE_CUDA, rapl_enabled=USE_RAPL),
+        SAMPLING_INTERVALS,
+        repetitions=TEST_REPETITIONS,
+        workload=REFERENCE_WORKLOAD,
+        energy_reader=energy_reader,
+        cooldown_seconds=COOLDOWN_SECONDS,
+    )
+    summary_df = summarize_overhead(runs_df)
+
+    current_time = datetime.now().strftime("%Y-%m-%d_%H-%M")
+    runs_df.to_csv(f"{RESULT_ROOT}/monitoring_overhead_runs_{current_time}_{HOST_NAME}.csv", index=False)
+    summary_df.to_csv(f"{RESULT_ROOT}/monitoring_overhead_{current_time}_{HOST_NAME}.csv", index=False)
+    print(summary_df.to_string())
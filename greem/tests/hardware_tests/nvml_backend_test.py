@@ -0,0 +1,124 @@
+import numpy as np
+import pynvml
+import pytest
+
+from greem.hardware.nvml_backend import (
+    MOCK_NVML_ENV,
+    MockNvml,
+    MockNvmlDevice,
+    NvmlDeviceHandler,
+    get_nvml,
+)
+from greem.monitoring.hardware_monitoring import GpuMonitoring
+from greem.utility.arrow_stream import read_arrow_stream
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def get_mock_nvml() -> MockNvml:
+    return MockNvml(
+        [
+            MockNvmlDevice(
+                uuid="GPU-a",
+                field_values={
+                    pynvml.NVML_FI_DEV_POWER_INSTANT: 120000,
+                    pynvml.NVML_FI_DEV_TOTAL_ENERGY_CONSUMPTION: 0,
+                },
+                utilization=(80, 40),
+                memory_used_bytes=512 * 1024 * 1024,
+                fan_speed=55,
+                power_watts=120,
+            ),
+            MockNvmlDevice(uuid="GPU-b", utilization=(20, 10)),
+        ]
+    )
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_nvml_device_handler_update():
+    handler = NvmlDeviceHandler(get_mock_nvml())
+    handler.update()
+
+    assert handler.uuids == ["GPU-a", "GPU-b"]
+    assert handler.values.shape == (2, len(handler.columns))
+    assert handler.get_value(0, "power.draw") == pytest.approx(120.0)
+    assert handler.get_value(0, "energy.total") == pytest.approx(120.0)
+    assert handler.get_value(0, "memory.used") == pytest.approx(512.0)
+    assert handler.get_value(0, "fan.speed") == 55
+    assert handler.get_value(1, "utilization.gpu") == 20
+    # unsupported fields and queries are not available
+    assert np.isnan(handler.get_value(0, "temperature.memory"))
+    assert np.isnan(handler.get_value(1, "power.draw"))
+    assert np.isnan(handler.get_value(1, "fan.speed"))
+
+    # the energy counter is read again, the unsupported fan query is skipped
+    handler.update()
+    assert handler.get_value(0, "energy.total") == pytest.approx(240.0)
+    assert (1, "fan") in handler._unsupported_queries
+
+
+def test_nvml_device_handler_reads_each_query_once_per_sample():
+    nvml = get_mock_nvml()
+    handler = NvmlDeviceHandler(nvml)
+    handler.update()
+
+    assert nvml.call_counts["nvmlDeviceGetFieldValues"] == 2
+    assert nvml.call_counts["nvmlDeviceGetUtilizationRates"] == 2
+    assert nvml.call_counts["nvmlDeviceGetMemoryInfo"] == 2
+    assert handler.get_value(0, "utilization.memory") == 40
+    assert handler.get_value(0, "memory.free") == pytest.approx(8 * 1024)
+
+
+def test_nvml_device_handler_transient_errors():
+    nvml = get_mock_nvml()
+    handler = NvmlDeviceHandler(nvml)
+    nvml.devices[0].pending_errors = {
+        "nvmlDeviceGetFieldValues": pynvml.NVML_ERROR_GPU_IS_LOST,
+        "nvmlDeviceGetUtilizationRates": pynvml.NVML_ERROR_TIMEOUT,
+    }
+    handler.update()
+
+    # the failed reads are NaN for this sample, the other metrics of the device are still read
+    assert np.isnan(handler.get_value(0, "power.draw"))
+    assert np.isnan(handler.get_value(0, "utilization.gpu"))
+    assert np.isnan(handler.get_value(0, "utilization.memory"))
+    assert handler.get_value(0, "memory.used") == pytest.approx(512.0)
+    assert handler._unsupported_queries == {(1, "fan")}
+
+    # a transient error is retried on the next sample
+    handler.update()
+    assert handler.get_value(0, "power.draw") == pytest.approx(120.0)
+    assert handler.get_value(0, "utilization.gpu") == 80
+
+
+def test_get_nvml_mock_from_environment(monkeypatch):
+    monkeypatch.setenv(MOCK_NVML_ENV, "3")
+    assert isinstance(get_nvml(), MockNvml)
+    assert NvmlDeviceHandler().device_count == 3
+
+    monkeypatch.delenv(MOCK_NVML_ENV)
+    assert get_nvml() is pynvml
+
+
+def test_gpu_monitoring_with_mock_nvml(tmp_path):
+    handler = NvmlDeviceHandler(get_mock_nvml())
+
+    with GpuMonitoring(str(tmp_path), 0.05, gpu_metadata_handler=handler) as monitoring:
+        assert monitoring.get_utilisation() == pytest.approx((50.0, 25.0))
+
+    stream_df = read_arrow_stream(f"{tmp_path}/monitoring_stream.arrows")
+    assert set(stream_df["uuid"]) == {"GPU-a", "GPU-b"}
+    assert stream_df.loc[stream_df["current_video"] == "start", "power.draw"].iloc[0] == pytest.approx(120.0)
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from greem.hardware.powermeter import PowerMeterTrace, parse_powermeter_preamble
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+PREAMBLE: str = (
+    "Serial number:,2101129\r\n"
+    "Function:,DCI,Unit:,A\r\n"
+    "Start date:,2022/04/04,Start time:,14:12:07\r\n"
+    "Sample:,0.005s\r\n"
+    "Reading #,Reading\r\n"
+)
+
+
+def write_trace(file_path: str, readings: np.ndarray) -> None:
+    with open(file_path, "w", encoding="utf-8", newline="") as trace_file:
+        trace_file.write(PREAMBLE)
+        for idx, reading in enumerate(readings):
+            trace_file.write(f"{idx},{reading:.6e}\r\n")
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_parse_powermeter_preamble():
+    metadata = parse_powermeter_preamble(PREAMBLE.splitlines()[:-1])
+
+    assert metadata.serial_number == "2101129"
+    assert metadata.function == "DCI"
+    assert metadata.unit == "A"
+    assert metadata.start_time == datetime(2022, 4, 4, 14, 12, 7)
+    assert metadata.sample_period_seconds == pytest.approx(0.005)
+    assert metadata.preamble_line_count == 4
+
+    with pytest.raises(ValueError):
+        parse_powermeter_preamble(["Serial number:,2101129"])
+
+
+def test_powermeter_trace_integrate_energy(tmp_path):
+    # the current rises linearly from 0 A to 2 A within 10 s, the power at 20 V from 0 W to 40 W
+    readings = np.linspace(0, 2, 2001)
+    write_trace(f"{tmp_path}/trace.csv", readings)
+    trace = PowerMeterTrace(f"{tmp_path}/trace.csv", voltage=20, chunk_size=300)
+
+    chunks = list(trace.iter_chunks())
+    assert max(len(chunk) for chunk in chunks) == 300
+    assert chunks[-1]["power"].iloc[-1] == pytest.approx(40.0)
+    assert trace.total_energy() == pytest.approx(200.0)
+
+    # windows do not have to coincide with readings or chunks
+    energy = trace.integrate_energy([(0, 10), (2.5, 7.5), (1.0001, 1.0002), (9, 11)])
+    assert energy[:2] == pytest.approx([200.0, 100.0])
+    assert energy[2] == pytest.approx(4 * 1.00015 * 0.0001)
+    assert np.isnan(energy[3])
+
+    start_time = trace.metadata.start_time
+    energy = trace.integrate_energy([(start_time, start_time + timedelta(seconds=5))])
+    assert energy == pytest.approx([50.0])
+
+
+def test_powermeter_trace_requires_voltage_for_currents(tmp_path):
+    write_trace(f"{tmp_path}/trace.csv", np.ones(10))
+
+    with pytest.raises(ValueError):
+        PowerMeterTrace(f"{tmp_path}/trace.csv")
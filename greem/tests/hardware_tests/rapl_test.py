@@ -0,0 +1,164 @@
+import numpy as np
+import pytest
+
+from greem.hardware.rapl import (
+    JOULES_PER_KWH,
+    RaplReader,
+    discover_rapl_domains,
+    get_energy_delta_uj,
+)
+from greem.utility.monitoring import EnergySource, HardwareTracker
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+MAX_ENERGY_RANGE_UJ: int = 262143328850
+
+
+def create_zone(root, zone: str, name: str, energy_uj: int) -> None:
+    zone_dir = root / zone
+    zone_dir.mkdir(parents=True)
+    (zone_dir / "name").write_text(f"{name}\n")
+    (zone_dir / "energy_uj").write_text(f"{energy_uj}\n")
+    (zone_dir / "max_energy_range_uj").write_text(f"{MAX_ENERGY_RANGE_UJ}\n")
+
+
+def set_energy(root, zone: str, energy_uj: int) -> None:
+    (root / zone / "energy_uj").write_text(f"{energy_uj}\n")
+
+
+def create_fake_sysfs(root):
+    """Creates a powercap tree with two packages, the first one with core, uncore and dram zones"""
+    create_zone(root, "intel-rapl:0", "package-0", 1_000_000)
+    create_zone(root, "intel-rapl:0:0", "core", 500_000)
+    create_zone(root, "intel-rapl:0:1", "uncore", 100_000)
+    create_zone(root, "intel-rapl:0:2", "dram", 200_000)
+    create_zone(root, "intel-rapl:1", "package-1", MAX_ENERGY_RANGE_UJ - 1_000_000)
+    # not a RAPL domain and a duplicate of the package zone
+    (root / "intel-rapl").mkdir()
+    create_zone(root, "intel-rapl-mmio:0", "package-0", 0)
+
+    return root
+
+
+class FakeGpuCollector:
+    """Collector of two GPUs that draw 100 W and 50 W"""
+
+    def start(self, tag: str) -> None:
+        pass
+
+    def collect(self) -> dict[str, float]:
+        return {
+            "nvitop/cuda:0 (gpu:0)/power_usage (W)/mean": 100.0,
+            "nvitop/cuda:1 (gpu:1)/power_usage (W)/mean": 50.0,
+            "nvitop/host/cpu_percent (%)/mean": 10.0,
+        }
+
+    def clear(self, tag: str | None = None) -> None:
+        pass
+
+    def deactivate(self) -> None:
+        pass
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_discover_rapl_domains(tmp_path):
+    domains = discover_rapl_domains(str(create_fake_sysfs(tmp_path)))
+
+    assert [domain.name for domain in domains] == [
+        "package-0",
+        "core-0",
+        "uncore-0",
+        "dram-0",
+        "package-1",
+    ]
+    assert domains[0].max_energy_range_uj == MAX_ENERGY_RANGE_UJ
+    assert discover_rapl_domains(str(tmp_path / "missing")) == []
+
+
+def test_energy_delta_handles_wraparound():
+    assert get_energy_delta_uj(100, 250, MAX_ENERGY_RANGE_UJ) == 150
+    assert get_energy_delta_uj(MAX_ENERGY_RANGE_UJ - 100, 50, MAX_ENERGY_RANGE_UJ) == 150
+
+
+def test_rapl_reader_sample(tmp_path):
+    root = create_fake_sysfs(tmp_path)
+    reader = RaplReader(str(root))
+
+    set_energy(root, "intel-rapl:0", 3_000_000)
+    set_energy(root, "intel-rapl:0:2", 700_000)
+    # the counter of the second package wraps around
+    set_energy(root, "intel-rapl:1", 1_000_000)
+
+    row = np.full(len(reader.columns), np.nan)
+    reader.read_sample(row)
+    sample = dict(zip(reader.columns, row))
+
+    assert sample["rapl.package-0.energy"] == pytest.approx(2.0)
+    assert sample["rapl.core-0.energy"] == 0
+    assert sample["rapl.dram-0.energy"] == pytest.approx(0.5)
+    assert sample["rapl.package-1.energy"] == pytest.approx(2.0)
+    assert sample["cpu_energy"] == pytest.approx(4.0 / JOULES_PER_KWH)
+    assert sample["energy_consumed"] == pytest.approx(4.5 / JOULES_PER_KWH)
+    assert sample["duration"] > 0
+
+    # the next sample only contains the energy consumed since the previous one
+    reader.read_sample(row)
+    assert row[0] == 0
+    reader.close()
+
+    with pytest.raises(FileNotFoundError):
+        RaplReader(str(tmp_path / "missing"))
+
+
+def test_hardware_tracker_with_rapl(tmp_path):
+    root = create_fake_sysfs(tmp_path)
+    hardware_tracker = HardwareTracker(
+        tracker=object(), energy_source=EnergySource.RAPL, rapl_root=str(root)
+    )
+
+    hardware_tracker.clear()
+    set_energy(root, "intel-rapl:0", 4_600_000)
+    hardware_tracker._fetch_hardware_metrics()
+    df = hardware_tracker.to_dataframe()
+
+    assert df["rapl.package-0.energy"].tolist() == [pytest.approx(3.6)]
+    assert df["cpu_energy"].tolist() == [pytest.approx(1e-6)]
+
+
+def test_hardware_tracker_with_rapl_includes_gpu_energy(tmp_path):
+    root = create_fake_sysfs(tmp_path)
+    hardware_tracker = HardwareTracker(
+        tracker=object(),
+        energy_source=EnergySource.RAPL,
+        rapl_root=str(root),
+        cuda_enabled=True,
+        gpu_collector=FakeGpuCollector(),
+        measure_power_secs=3600,
+    )
+    hardware_tracker.start()
+    hardware_tracker.stop()
+
+    set_energy(root, "intel-rapl:0", 4_600_000)
+    hardware_tracker._fetch_hardware_metrics()
+    sample = hardware_tracker.to_dataframe().iloc[-1]
+
+    # like with CodeCarbon, the energy consumed contains the energy of the GPUs
+    assert sample["gpu_power"] == pytest.approx(150.0)
+    assert sample["gpu_energy"] == pytest.approx(150.0 * sample["duration"] / JOULES_PER_KWH)
+    assert sample["energy_consumed"] == pytest.approx(
+        sample["cpu_energy"] + sample["ram_energy"] + sample["gpu_energy"]
+    )
+    assert hardware_tracker.energy_consumed_total == pytest.approx(sample["energy_consumed"])
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import pynvml
+import pytest
+
+from greem.hardware.nvml_backend import MockNvml, MockNvmlDevice, NvmlDeviceHandler
+from greem.monitoring.encoder_sessions import EncoderSessionCollector
+from greem.utility.job_runner import Job, JobResult
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def get_session(session_id: int, pid: int, fps: int) -> dict:
+    return {
+        "sessionId": session_id,
+        "pid": pid,
+        "codecType": pynvml.NVML_ENCODER_QUERY_HEVC,
+        "hResolution": 3840,
+        "vResolution": 2160,
+        "averageFps": fps,
+        "encodeLatency": 1000,
+    }
+
+
+def get_job_result(pid: int, start: float, end: float) -> JobResult:
+    return JobResult(
+        job=Job(argv=["ffmpeg"], name=str(pid)),
+        pid=pid,
+        returncode=0,
+        start_monotonic=start,
+        end_monotonic=end,
+        start_time=datetime(2024, 1, 1),
+        end_time=datetime(2024, 1, 1),
+        peak_rss_kb=0,
+        stderr="",
+    )
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_encoder_session_collector_joins_sessions_to_jobs():
+    busy_gpu = MockNvmlDevice(
+        uuid="GPU-a",
+        encoder_utilization=90,
+        decoder_utilization=30,
+        encoder_sessions=[get_session(1, pid=100, fps=60), get_session(2, pid=200, fps=30)],
+    )
+    nvml = MockNvml([busy_gpu, MockNvmlDevice(uuid="GPU-b")])
+    collector = EncoderSessionCollector(nvml)
+
+    collector.sample_once()
+    busy_gpu.encoder_sessions.pop()
+    collector.sample_once()
+
+    device_df = collector.get_device_dataframe()
+    assert device_df["session_count"].tolist() == [2, 0, 1, 0]
+    assert len(collector.get_session_dataframe()) == 3
+
+    job_df = collector.summarize_jobs(
+        [get_job_result(100, 0, float("inf")), get_job_result(200, 0, float("inf")), get_job_result(300, 0, float("inf"))]
+    )
+    assert job_df["nvenc.sessions"].tolist() == [1, 1, 0]
+    assert job_df["nvenc.fps.mean"].tolist()[:2] == [60, 30]
+    assert job_df.loc[0, "nvenc.util.mean"] == pytest.approx(90)
+    assert job_df.loc[0, "nvenc.device_sessions.max"] == 2
+    assert job_df["nvenc.util.mean"].isna().tolist() == [False, False, True]
+
+    collector.clear()
+    assert len(collector.get_device_dataframe()) == 0
+
+
+def test_nvml_device_handler_encoder_utilization():
+    nvml = MockNvml([MockNvmlDevice(uuid="GPU-a", encoder_utilization=75, decoder_utilization=20)])
+    handler = NvmlDeviceHandler(nvml)
+    handler.update()
+
+    assert handler.get_value(0, "utilization.encoder") == 75
+    assert handler.get_value(0, "utilization.decoder") == 20
@@ -0,0 +1,113 @@
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+
+import pytest
+
+from greem.monitoring.metrics_exporter import MetricsExporter
+from greem.utility.ffmpeg_progress import ProgressMonitor
+from greem.utility.job_runner import Job, JobRunner, run_cmd
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+@dataclass
+class FakeHardwareTracker:
+    last_sample: dict[str, float] | None = field(default_factory=dict)
+    energy_consumed_total: float = 0.0
+    skipped_ticks: int = 0
+
+    def get_last_sample(self) -> dict[str, float] | None:
+        return self.last_sample
+
+
+def fetch(exporter: MetricsExporter, path: str = "/metrics") -> str:
+    with urllib.request.urlopen(f"http://{exporter.host}:{exporter.port}{path}", timeout=5) as response:
+        return response.read().decode("utf-8")
+
+
+def get_values(metrics: str) -> dict[str, float]:
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in metrics.splitlines()
+        if line and not line.startswith("#")
+    }
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_job_counters_follow_the_job_runner():
+    exporter = MetricsExporter(port=0)
+    runner = JobRunner(max_concurrency=2, log_failures=False, metrics_exporter=exporter)
+
+    runner.run([Job.from_cmd("true"), Job.from_cmd("true"), Job.from_cmd("false")])
+
+    values = get_values(exporter.render())
+    assert values["greem_jobs_completed_total"] == 3
+    assert values["greem_jobs_failed_total"] == 1
+    assert values["greem_jobs_queued"] == 0
+    assert values["greem_jobs_running"] == 0
+
+
+def test_job_counters_follow_run_cmd():
+    exporter = MetricsExporter(port=0)
+
+    run_cmd("true", metrics_exporter=exporter)
+    run_cmd("false", metrics_exporter=exporter)
+
+    values = get_values(exporter.render())
+    assert values["greem_jobs_completed_total"] == 2
+    assert values["greem_jobs_failed_total"] == 1
+    assert values["greem_jobs_running"] == 0
+
+
+def test_hardware_and_progress_metrics():
+    tracker = FakeHardwareTracker(
+        last_sample={"cpu_power": 35.5, "ram_power": 4.0, "sample_seconds": 0.002, "sample_cpu_seconds": 0.001},
+        energy_consumed_total=0.125,
+        skipped_ticks=2,
+    )
+    progress_monitor = ProgressMonitor()
+    progress_monitor.record(100, {"frame": "60", "fps": "30.0", "progress": "continue"})
+    progress_monitor.record(200, {"frame": "90", "fps": "45.0", "progress": "continue"})
+    progress_monitor.record(200, {"frame": "120", "fps": "40.0", "progress": "end"})
+    exporter = MetricsExporter(port=0, hardware_tracker=tracker, progress_monitor=progress_monitor)
+
+    values = get_values(exporter.render())
+
+    assert values['greem_power_watts{component="cpu"}'] == 35.5
+    assert values['greem_power_watts{component="ram"}'] == 4.0
+    assert 'greem_power_watts{component="gpu"}' not in values
+    assert values["greem_energy_consumed_kwh_total"] == 0.125
+    assert values["greem_sampler_sample_seconds"] == 0.002
+    assert values["greem_sampler_skipped_ticks_total"] == 2
+    # the finished process is no longer reported
+    assert values['greem_encoder_fps{pid="100"}'] == 30.0
+    assert 'greem_encoder_fps{pid="200"}' not in values
+
+
+def test_serves_metrics_over_http():
+    tracker = FakeHardwareTracker(last_sample=None)
+    with MetricsExporter(port=0, hardware_tracker=tracker) as exporter:
+        exporter.add_queued_jobs(3)
+        exporter.job_started()
+        metrics = fetch(exporter)
+
+        with pytest.raises(urllib.error.HTTPError):
+            fetch(exporter, "/other")
+
+    assert "# TYPE greem_jobs_queued gauge" in metrics
+    assert get_values(metrics)["greem_jobs_queued"] == 2
+    assert get_values(metrics)["greem_jobs_running"] == 1
@@ -0,0 +1,100 @@
+import sys
+
+import pandas as pd
+
+from greem.monitoring.nvidia_top import NvidiaTop, cleanup_key
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def get_sleep_cmd(seconds: float) -> list[str]:
+    return [sys.executable, "-c", f"import time; time.sleep({seconds})"]
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_cleanup_key():
+    assert cleanup_key("nvitop/host/cpu_percent (%)/mean") == "host.cpu_percent.mean"
+    assert cleanup_key("nvitop/cuda:0 (gpu:0)/power_usage (W)/max") == "cuda:0.gpu:0.power_usage.max"
+
+
+def test_nvidia_top_keeps_time_series_per_job():
+    nvidia_top = NvidiaTop(interval=0.05)
+    try:
+        first_result = nvidia_top.run_tagged(get_sleep_cmd(0.3), tag="video_1")
+        nvidia_top.run_tagged(get_sleep_cmd(0.01), tag="video_2")
+
+        series_df = nvidia_top.get_time_series()
+        summary_df = nvidia_top.summarize_jobs(percentiles=(95,))
+    finally:
+        nvidia_top.stop()
+
+    assert first_result.succeeded
+    assert {"host.cpu_percent.mean", "host.cpu_percent.min", "host.cpu_percent.max"}.issubset(series_df.columns)
+    # the longer job is covered by multiple samples, the short one by the sample after it
+    assert (series_df["tags"] == "video_1").sum() > 1
+    assert (series_df["tags"] == "video_2").sum() >= 1
+
+    assert list(summary_df.index) == ["video_1", "video_2"]
+    assert {
+        "host.cpu_percent.mean",
+        "host.cpu_percent.max",
+        "host.cpu_percent.p95",
+    }.issubset(summary_df.columns)
+    assert summary_df.loc["video_1", "sample.count"] > 1
+    # min and max are the extremes of the raw collector samples, not of the interval means
+    video_1_df = series_df[series_df["tags"] == "video_1"]
+    assert summary_df.loc["video_1", "host.cpu_percent.min"] == video_1_df["host.cpu_percent.min"].min()
+    assert summary_df.loc["video_1", "host.cpu_percent.max"] == video_1_df["host.cpu_percent.max"].max()
+    assert summary_df.loc["video_1", "host.cpu_percent.last"] == video_1_df["host.cpu_percent.last"].dropna().iloc[-1]
+
+
+def test_nvidia_top_resource_metrics_as_dict():
+    nvidia_top = NvidiaTop(interval=0.05)
+    try:
+        metric_dict = nvidia_top.get_resource_metrics_as_dict(get_sleep_cmd(0.1))
+    finally:
+        nvidia_top.stop()
+
+    assert metric_dict["elapsed_seconds"] >= 0.1
+    assert {"host.memory_percent.mean", "host.memory_percent.last"}.issubset(metric_dict)
+
+
+def test_nvidia_top_resource_metrics_as_dict_summarizes_its_own_samples():
+    nvidia_top = NvidiaTop(interval=0.05)
+    try:
+        nvidia_top.run_tagged(get_sleep_cmd(0.2), tag="previous")
+        metric_dict = nvidia_top.get_resource_metrics_as_dict(get_sleep_cmd(0.1))
+        summary_df = nvidia_top.summarize_jobs()
+    finally:
+        nvidia_top.stop()
+
+    # the summary of the last samples equals the summary computed from the whole time series
+    job_summary = summary_df.loc["job-1"]
+    assert metric_dict["sample.count"] == job_summary["sample.count"]
+    assert metric_dict["host.cpu_percent.max"] == job_summary["host.cpu_percent.max"]
+
+
+def test_nvidia_top_adds_job_summaries_to_results():
+    nvidia_top = NvidiaTop(interval=0.05)
+    try:
+        results = [nvidia_top.run_tagged(get_sleep_cmd(0.05)) for _ in range(3)]
+        job_df = nvidia_top.add_job_summaries(pd.DataFrame([result.to_dict() for result in results]))
+    finally:
+        nvidia_top.stop()
+
+    assert job_df["job_name"].tolist() == ["job-0", "job-1", "job-2"]
+    assert job_df["sample.count"].ge(1).all()
+    assert job_df["host.cpu_percent.mean"].notna().all()
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from greem.monitoring.overhead_benchmark import (
+    BASELINE_BACKEND,
+    MonitoringBackend,
+    get_reference_workload,
+    measure_run,
+    run_overhead_benchmark,
+    summarize_overhead,
+)
+from greem.utility.job_runner import Job
+from greem.utility.sampler import Sampler
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def create_busy_sampler(interval: float) -> Sampler:
+    def read_sample(row: np.ndarray) -> None:
+        row[0] = sum(range(10000))
+
+    return Sampler(read_sample=read_sample, columns=["value"], interval=interval)
+
+
+def get_run(backend: str, interval: float, duration: float, energy: float) -> dict:
+    return {
+        "backend": backend,
+        "interval": interval,
+        "returncode": 0,
+        "duration_seconds": duration,
+        "workload_cpu_seconds": duration,
+        "monitor_cpu_seconds": 0.01,
+        "voluntary_switches": 10,
+        "involuntary_switches": 0,
+        "energy_joules": energy,
+    }
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_reference_workload_runs():
+    run = measure_run(get_reference_workload(iterations=5), None)
+
+    assert run["backend"] == BASELINE_BACKEND
+    assert run["returncode"] == 0
+    assert run["workload_cpu_seconds"] > 0
+    assert np.isnan(run["energy_joules"])
+
+
+def test_monitor_overhead_is_measured():
+    workload = Job(argv=["sleep", "0.3"], name="reference")
+    backend = MonitoringBackend("busy", create_busy_sampler)
+
+    baseline = measure_run(workload, None)
+    monitored = measure_run(workload, backend, interval=0.01)
+
+    assert monitored["backend"] == "busy"
+    assert monitored["interval"] == 0.01
+    # the sampling thread wakes up about 30 times while the workload is sleeping
+    assert monitored["voluntary_switches"] > baseline["voluntary_switches"] + 10
+    assert monitored["monitor_cpu_seconds"] > 0
+
+
+def test_runs_are_interleaved_with_baseline_runs():
+    backends = [MonitoringBackend("busy", create_busy_sampler)]
+
+    runs_df = run_overhead_benchmark(
+        backends, [0.05, 0.1], repetitions=2, workload=Job(argv=["true"], name="reference")
+    )
+
+    assert len(runs_df) == 2 * 3
+    assert list(runs_df[runs_df["repetition"] == 0]["backend"])[0] == BASELINE_BACKEND
+    assert sorted(runs_df["interval"].dropna().unique()) == [0.05, 0.1]
+
+
+def test_summarize_overhead():
+    runs_df = pd.DataFrame(
+        [
+            get_run(BASELINE_BACKEND, np.nan, 10.0, 100.0),
+            get_run(BASELINE_BACKEND, np.nan, 10.2, 102.0),
+            get_run("codecarbon", 1.0, 10.5, 110.0),
+            get_run("codecarbon", 1.0, 10.7, 112.0),
+        ]
+    )
+
+    summary_df = summarize_overhead(runs_df)
+
+    assert len(summary_df) == 1
+    row = summary_df.iloc[0]
+    assert row["backend"] == "codecarbon"
+    assert row["runs"] == 2
+    assert row["energy_delta"] == pytest.approx(10.0)
+    assert row["energy_delta_relative"] == pytest.approx(10.0 / 101.0)
+    assert row["duration_delta"] == pytest.approx(0.5)
+    # both groups have a variance of 2 J², so the standard error is sqrt(2/2 + 2/2)
+    assert row["energy_delta_ci95"] == pytest.approx(1.96 * np.sqrt(2))
+
+
+def test_summarize_overhead_requires_baseline():
+    with pytest.raises(ValueError):
+        summarize_overhead(pd.DataFrame([get_run("codecarbon", 1.0, 10.0, 100.0)]))
@@ -0,0 +1,68 @@
+import pyarrow as pa
+import pytest
+
+from greem.utility.arrow_stream import ArrowStreamWriter, read_arrow_stream
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_arrow_stream_writes_in_batches(tmp_path):
+    file_path = str(tmp_path / "monitoring" / "monitoring_stream.arrows")
+
+    with ArrowStreamWriter(file_path, max_rows=3) as writer:
+        for idx in range(7):
+            writer.append({"power.draw": 100.0 + idx, "current_video": f"video_{idx}"})
+
+        # the seventh row is still buffered
+        assert writer.written_rows == 6
+        assert len(read_arrow_stream(file_path)) == 6
+
+    df = read_arrow_stream(file_path)
+    assert df["power.draw"].tolist() == [100.0 + idx for idx in range(7)]
+    assert df["current_video"].iloc[-1] == "video_6"
+
+    with pytest.raises(ValueError):
+        writer.append({"power.draw": 0.0})
+
+
+def test_arrow_stream_flushes_by_age(tmp_path):
+    file_path = str(tmp_path / "monitoring_stream.arrows")
+    writer = ArrowStreamWriter(file_path, max_rows=1000, max_age_seconds=0)
+
+    writer.append({"power.draw": 1.0})
+    assert writer.written_rows == 1
+    writer.close()
+
+
+def test_arrow_stream_schema(tmp_path):
+    file_path = str(tmp_path / "monitoring_stream.arrows")
+
+    with ArrowStreamWriter(file_path, max_rows=1) as writer:
+        writer.append({"power.draw": 1.0, "fan.speed": 30})
+        # missing columns are null, unknown ones are rejected
+        writer.append({"power.draw": 2.0})
+        with pytest.raises(ValueError):
+            writer.append({"power.draw": 3.0, "temperature.gpu": 60})
+
+    df = read_arrow_stream(file_path)
+    assert df["power.draw"].tolist() == [1.0, 2.0]
+    assert df["fan.speed"].isna().tolist() == [False, True]
+    assert writer.schema.field("fan.speed").type == pa.int64()
+
+
+def test_read_truncated_arrow_stream(tmp_path):
+    file_path = tmp_path / "monitoring_stream.arrows"
+    with ArrowStreamWriter(str(file_path), max_rows=2) as writer:
+        writer.append_rows([{"power.draw": float(idx)} for idx in range(4)])
+
+    # simulate a crash while the second batch was written
+    data = file_path.read_bytes()
+    file_path.write_bytes(data[:-20])
+
+    assert read_arrow_stream(str(file_path))["power.draw"].tolist() == [0.0, 1.0]
@@ -0,0 +1,174 @@
+import math
+import os
+
+import pytest
+
+from greem.utility.cgroups import (
+    CGROUP_STAT_COLUMNS,
+    CgroupLimits,
+    CgroupManager,
+    find_cgroup2_mount,
+    get_own_cgroup,
+    parse_io_stat,
+    parse_pressure,
+)
+from greem.utility.job_runner import Job, JobRunner
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+CPU_STAT: str = "usage_usec 1500000\nuser_usec 1000000\nsystem_usec 500000\nnr_periods 10\nnr_throttled 4\nthrottled_usec 250000\n"
+IO_STAT: str = "8:0 rbytes=4096 wbytes=8192 rios=1 wios=2 dbytes=0 dios=0\n259:0 rbytes=4096 wbytes=0 rios=1 wios=0 dbytes=0 dios=0\n"
+CPU_PRESSURE: str = "some avg10=1.50 avg60=0.50 avg300=0.10 total=2000000\nfull avg10=0.00 avg60=0.00 avg300=0.00 total=500000\n"
+
+
+def create_cgroup_tree(root: str, controllers: str = "cpu cpuset memory io") -> None:
+    """A directory that mimics a delegated cgroup, the job cgroups are plain directories"""
+    manager_path = os.path.join(root, f"greem-{os.getpid()}")
+    os.makedirs(manager_path)
+    for path in (root, manager_path):
+        with open(os.path.join(path, "cgroup.controllers"), "w", encoding="utf-8") as file:
+            file.write(controllers)
+
+
+def use_fake_own_cgroup(mount_point, parent, monkeypatch, controllers: str = "cpu cpuset memory io") -> None:
+    """Makes `parent` the cgroup of the current process, the process is moved out of it into its runner cgroup"""
+    create_cgroup_tree(str(parent), controllers)
+    monkeypatch.setattr("greem.utility.cgroups.find_cgroup2_mount", lambda: str(mount_point))
+    monkeypatch.setattr("greem.utility.cgroups.get_own_cgroup", lambda: f"/{parent.name}")
+
+    # the interface files of a real cgroup do not keep it from being removed
+    rmdir = os.rmdir
+
+    def remove_cgroup(path):
+        for file_name in ("cgroup.procs", "cgroup.controllers", "cgroup.subtree_control"):
+            if os.path.exists(os.path.join(path, file_name)):
+                os.remove(os.path.join(path, file_name))
+        rmdir(path)
+
+    monkeypatch.setattr("greem.utility.cgroups.os.rmdir", remove_cgroup)
+
+
+def write(path: str, content: str) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(content)
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_parse_cgroup_files(tmp_path):
+    assert parse_io_stat(IO_STAT) == {"rbytes": 8192, "wbytes": 8192, "rios": 2, "wios": 2, "dbytes": 0, "dios": 0}
+    assert parse_pressure(CPU_PRESSURE)["some.total"] == 2000000
+    assert parse_pressure(CPU_PRESSURE)["some.avg10"] == 1.5
+
+    mountinfo = tmp_path / "mountinfo"
+    mountinfo.write_text(
+        "22 1 0:20 / /proc rw,nosuid shared:12 - proc proc rw\n"
+        "35 25 0:30 / /sys/fs/cgroup rw,nosuid shared:9 - cgroup2 cgroup2 rw,nsdelegate\n"
+    )
+    proc_cgroup = tmp_path / "cgroup"
+    proc_cgroup.write_text("0::/user.slice/user-1000.slice/session-1.scope\n")
+
+    assert find_cgroup2_mount(str(mountinfo)) == "/sys/fs/cgroup"
+    assert find_cgroup2_mount(str(tmp_path / "missing")) is None
+    assert get_own_cgroup(str(proc_cgroup)) == "/user.slice/user-1000.slice/session-1.scope"
+
+
+def test_limits():
+    assert CgroupLimits().get_files() == {}
+    limits = CgroupLimits(cpus=2.5, cpuset="0-3", memory_max=1 << 30)
+
+    assert limits.get_files() == {"cpu.max": "250000 100000", "cpuset.cpus": "0-3", "memory.max": str(1 << 30)}
+    assert limits.get_controllers() == {"cpu", "cpuset", "memory"}
+    with pytest.raises(ValueError):
+        CgroupLimits(cpus=0).get_files()
+
+
+def test_job_cgroup(tmp_path):
+    create_cgroup_tree(str(tmp_path))
+    manager = CgroupManager(parent=str(tmp_path), limits=CgroupLimits(cpus=2))
+
+    assert manager.controllers == {"cpu", "cpuset", "memory", "io"}
+    path = manager.create_job_cgroup()
+    assert open(os.path.join(path, "cpu.max"), encoding="utf-8").read() == "200000 100000"
+    path = manager.create_job_cgroup(CgroupLimits(cpuset="1"))
+    assert open(os.path.join(path, "cpuset.cpus"), encoding="utf-8").read() == "1"
+
+    write(os.path.join(path, "cpu.stat"), CPU_STAT)
+    write(os.path.join(path, "memory.peak"), "104857600\n")
+    write(os.path.join(path, "io.stat"), IO_STAT)
+    stats = manager.read_stats(path)
+
+    assert list(stats) == CGROUP_STAT_COLUMNS
+    assert stats["cgroup.cpu_seconds"] == 1.5
+    assert stats["cgroup.cpu_throttled_count"] == 4
+    assert stats["cgroup.cpu_throttled_seconds"] == 0.25
+    assert stats["cgroup.memory_peak_bytes"] == 104857600
+    assert stats["cgroup.io_read_bytes"] == 8192
+    # kernels without pressure stall information
+    assert math.isnan(stats["cgroup.cpu_pressure_some_seconds"])
+
+
+def test_missing_controllers(tmp_path):
+    create_cgroup_tree(str(tmp_path), controllers="memory")
+
+    with pytest.raises(PermissionError):
+        CgroupManager(parent=str(tmp_path), limits=CgroupLimits(cpus=2))
+    assert CgroupManager.try_create(parent=str(tmp_path), limits=CgroupLimits(cpus=2)) is None
+
+    manager = CgroupManager(parent=str(tmp_path))
+    with pytest.raises(PermissionError):
+        manager.create_job_cgroup(CgroupLimits(cpuset="0"))
+
+
+def test_job_runner_moves_jobs_into_their_cgroup(tmp_path):
+    create_cgroup_tree(str(tmp_path))
+    manager = CgroupManager(parent=str(tmp_path))
+    runner = JobRunner(max_concurrency=2, cgroup_manager=manager)
+
+    results = runner.run([Job.from_cmd("true"), Job.from_cmd("sh -c 'exit 3'", name="failing")])
+
+    # the spawned shell writes its PID and is replaced by the job
+    for idx, result in enumerate(results):
+        procs_path = os.path.join(manager.path, f"job-{idx + 1}", "cgroup.procs")
+        assert int(open(procs_path, encoding="utf-8").read()) == result.pid
+        assert "cgroup.cpu_seconds" in result.to_dict()
+    assert [result.returncode for result in results] == [0, 3]
+
+
+def test_runner_returns_to_its_cgroup_on_close(tmp_path, monkeypatch):
+    parent = tmp_path / "session.scope"
+    use_fake_own_cgroup(tmp_path, parent, monkeypatch)
+
+    manager = CgroupManager()
+    runner_path = parent / f"greem-runner-{os.getpid()}"
+    assert (runner_path / "cgroup.procs").read_text() == str(os.getpid())
+
+    manager.close()
+
+    assert (parent / "cgroup.procs").read_text() == str(os.getpid())
+    assert (parent / "cgroup.subtree_control").read_text().startswith("-")
+    assert not runner_path.exists()
+
+
+def test_runner_returns_to_its_cgroup_if_limits_are_not_delegated(tmp_path, monkeypatch):
+    parent = tmp_path / "session.scope"
+    use_fake_own_cgroup(tmp_path, parent, monkeypatch, controllers="memory")
+
+    assert CgroupManager.try_create(limits=CgroupLimits(cpus=2)) is None
+
+    assert (parent / "cgroup.procs").read_text() == str(os.getpid())
+    assert (parent / "cgroup.subtree_control").read_text() == "-memory"
+    assert not (parent / f"greem-runner-{os.getpid()}").exists()
+    assert not (parent / f"greem-{os.getpid()}").exists()
@@ -6,6 +6,7 @@ from greem.utility.configuration_classes import (
     Representation,
     EncodingConfigDTO,
     EncodingConfig,
+    Pacing,
 )
 
 BITRATE: str = "bitrate"
@@ -322,6 +323,35 @@ def test_encoding_config_get_encoding_dtos() -> None:
         assert dto.framerate in [24, 30]
 
 
+def test_encoding_config_get_encoding_dtos_pacing() -> None:
+    config = EncodingConfig.from_file(
+        "greem/tests/utility_tests/test_datasets/test_config_file.yaml"
+    )
+
+    # real-time pacing is the default
+    assert all(dto.pacing == Pacing.LIVE for dto in config.get_encoding_dtos())
+
+    config.pacing = [Pacing("live"), Pacing("vod")]
+    encoding_dtos: list[EncodingConfigDTO] = config.get_encoding_dtos()
+
+    # pacing is an additional dimension of the encoding configuration
+    assert len(encoding_dtos) == 480
+    assert sum(dto.pacing == Pacing.VOD for dto in encoding_dtos) == 240
+
+    assert Pacing.LIVE.get_input_flag() == "-re"
+    assert Pacing.VOD.get_input_flag() == ""
+
+    # the encodes of both pacings are written to different directories
+    output_dirs = {dto.get_output_directory() for dto in encoding_dtos}
+    assert len(output_dirs) == 480
+    live_dto = encoding_dtos[0]
+    assert live_dto.get_output_directory().split("/")[-1] != "live"
+    assert (
+        live_dto.model_copy(update={"pacing": Pacing.VOD}).get_output_directory()
+        == f"{live_dto.get_output_directory()}/vod"
+    )
+
+
 def test_encoding_config_from_file_raises_error() -> None:
     with pytest.raises(FileNotFoundError):
         EncodingConfig.from_file("your_file_is_in_another_castle")
@@ -0,0 +1,94 @@
+import math
+import sys
+
+import pandas as pd
+import pytest
+
+from greem.utility.dataframe import add_energy_per_progress
+from greem.utility.ffmpeg_progress import (
+    PROGRESS_ARGS,
+    ProgressMonitor,
+    ProgressParser,
+    add_progress_args,
+    parse_progress_block,
+)
+from greem.utility.job_runner import Job, JobRunner
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+FAKE_FFMPEG: str = """
+import sys, time
+assert sys.argv[1:4] == ["-progress", "pipe:1", "-nostats"], sys.argv
+for frame in (30, 60):
+    print(f"frame={frame}\\nfps=60.0\\nbitrate=1024.5kbits/s\\ntotal_size={frame * 1000}", flush=True)
+    print(f"out_time_us={frame * 20000}\\nspeed=2.5x\\nprogress={'end' if frame == 60 else 'continue'}", flush=True)
+    print("encoder log line", file=sys.stderr, flush=True)
+    time.sleep(0.05)
+"""
+
+
+def create_fake_ffmpeg(tmp_path) -> str:
+    ffmpeg_path = tmp_path / "ffmpeg"
+    ffmpeg_path.write_text(f"#!{sys.executable}\n{FAKE_FFMPEG}")
+    ffmpeg_path.chmod(0o755)
+    return str(ffmpeg_path)
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_progress_parser_handles_split_chunks():
+    parser = ProgressParser()
+
+    assert parser.feed(b"frame=12\nfps=2") == []
+    blocks = parser.feed(b"4.0\nbitrate=N/A\nprogress=continue\nframe=13\n")
+
+    assert blocks == [{"frame": "12", "fps": "24.0", "bitrate": "N/A", "progress": "continue"}]
+    values = parse_progress_block(blocks[0])
+    assert values[:2] == [12.0, 24.0]
+    assert math.isnan(values[2])
+    assert add_progress_args(["ffmpeg", "-i", "in.mp4"]) == ["ffmpeg", *PROGRESS_ARGS, "-i", "in.mp4"]
+
+
+def test_job_runner_streams_ffmpeg_progress(tmp_path):
+    progress_monitor = ProgressMonitor()
+    runner = JobRunner(max_concurrency=2, progress_monitor=progress_monitor)
+
+    results = runner.run([Job(argv=[create_fake_ffmpeg(tmp_path)], name=str(idx)) for idx in range(2)])
+    progress_df = progress_monitor.to_dataframe()
+
+    assert all(result.succeeded for result in results)
+    assert "encoder log line" in results[0].stderr
+    assert len(progress_df) == 4
+    assert set(progress_df["pid"]) == {result.pid for result in results}
+    assert progress_df["bitrate_kbps"].tolist() == [1024.5] * 4
+    assert progress_monitor.get_final_progress()["is_end"].tolist() == [1.0, 1.0]
+
+    # jobs that do not run FFmpeg are executed unchanged
+    assert runner.run_job(Job(argv=[sys.executable, "-c", "print('no progress')"])).succeeded
+    assert len(progress_monitor.to_dataframe()) == 4
+
+
+def test_add_energy_per_progress():
+    result_df = pd.DataFrame({"pid": [1, 2, 3], "energy_consumed": [0.6, 1.2, 1.0]})
+    progress_df = pd.DataFrame(
+        {"pid": [1.0, 1.0, 2.0], "frame": [30.0, 60.0, 120.0], "out_time_seconds": [0.5, 1.0, 2.0]}
+    )
+
+    add_energy_per_progress(result_df, progress_df)
+
+    assert result_df["frames"].tolist()[:2] == [60.0, 120.0]
+    assert result_df["energy_per_frame"].tolist()[:2] == pytest.approx([0.01, 0.01])
+    assert result_df["energy_per_encoded_second"].tolist()[:2] == pytest.approx([0.6, 0.6])
+    assert math.isnan(result_df["energy_per_frame"].iloc[2])
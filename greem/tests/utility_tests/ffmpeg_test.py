@@ -6,9 +6,16 @@ from greem.utility.configuration_classes import (
     Representation,
     EncodingConfigDTO,
     EncodingConfig,
+    Pacing,
 )
 
-from greem.utility.ffmpeg import CodecProcessing, get_lib_codec
+from greem.utility.ffmpeg import (
+    CodecProcessing,
+    create_one_video_multiple_representation_command,
+    create_split_multiple_representation_command,
+    get_lib_codec,
+    get_split_filter_complex,
+)
 
 BITRATE: str = 'bitrate'
 BITRATE_BASE_VALUE: int = 1000
@@ -192,3 +199,92 @@ def test_codec_processing_create_sequential_cmd():
     assert str(dto.representation.bitrate) in sequential_cmd
     assert str(dto.representation.height) in sequential_cmd
     assert str(dto.representation.width) in sequential_cmd
+
+
+def test_codec_processing_sequential_cmd_pacing():
+    cp = CodecProcessing()
+    dto = get_base_encoding_config_dto()
+
+    live_cmd = cp.create_sequential_encoding_cmd('input_file_path', 'input_file_name', 'output_dir_path', dto)
+    assert '-re -i input_file_path' in live_cmd
+
+    vod_dto = dto.model_copy(update={'pacing': Pacing.VOD})
+    vod_cmd = cp.create_sequential_encoding_cmd('input_file_path', 'input_file_name', 'output_dir_path', vod_dto)
+    assert '-re' not in vod_cmd.split()
+    # only the output directory differs, so the VOD encode does not overwrite the LIVE one
+    assert vod_cmd == live_cmd.replace('-re ', '').replace('/10fps/', '/10fps/vod/')
+
+
+def test_split_filter_complex_decodes_once():
+    representations = [get_base_rendition(), Representation(bitrate=500, height=50, width=100)]
+
+    filter_complex, output_labels = get_split_filter_complex(representations, framerate=30)
+
+    assert output_labels == ['[v0]', '[v1]']
+    # framerate is converted once before the split
+    assert filter_complex.count('fps=30') == 1
+    assert filter_complex.startswith('[0:v]fps=30,split=2[s0][s1]')
+    assert f'[s0]scale={WIDTH_BASE_VALUE}:{HEIGHT_BASE_VALUE}[v0]' in filter_complex
+    assert '[s1]scale=100:50[v1]' in filter_complex
+
+    filter_complex, _ = get_split_filter_complex(representations, framerate=0, cuda_mode=True)
+    assert 'fps' not in filter_complex
+    assert 'scale_cuda' in filter_complex
+
+
+def test_split_multiple_representation_cmd():
+    dto = get_base_encoding_config_dto()
+    representations = [get_base_rendition(), Representation(bitrate=500, height=50, width=100)]
+
+    cmd = create_split_multiple_representation_command(
+        'input_dir/input_video.265', 'output_dir_path', dto, representations)
+
+    # one input, one output per representation
+    assert cmd.count(' -i ') == 1
+    for representation in representations:
+        output_dto = dto.model_copy(update={'representation': representation})
+        assert f'output_dir_path/{output_dto.get_output_directory()}/input_video.mp4' in cmd
+
+
+def test_split_filter_complex_cascade():
+    representations = [Representation(bitrate=500, height=50, width=100), get_base_rendition()]
+
+    filter_complex, output_labels = get_split_filter_complex(representations, framerate=30, cascade=True)
+
+    # labels keep the order of the representations, scaling starts with the largest one
+    assert output_labels == ['[v0]', '[v1]']
+    assert filter_complex.startswith(f'[0:v]fps=30,scale={WIDTH_BASE_VALUE}:{HEIGHT_BASE_VALUE},split=2[v1][c0]')
+    assert filter_complex.endswith('[c0]scale=100:50[v0]')
+
+
+def test_one_video_multiple_representation_cmd_filter_complex():
+    encoding_config = get_base_encoding_config()
+
+    default_cmd = create_one_video_multiple_representation_command(
+        'input_dir/input_video.265', 'output_dir_path', encoding_config)
+    assert '-filter_complex' not in default_cmd
+    assert default_cmd.count('-filter:v fps=24') == len(encoding_config.representations)
+
+    cmd = create_one_video_multiple_representation_command(
+        'input_dir/input_video.265', 'output_dir_path', encoding_config, use_filter_complex=True)
+
+    assert cmd.count(' -i ') == 1
+    assert cmd.count('-filter_complex') == 1
+    assert '-filter:v' not in cmd
+    assert ' -s ' not in cmd
+    assert cmd.count('-map "[v') == len(encoding_config.representations)
+
+
+def test_one_video_multiple_representation_cmd_cuda_variants():
+    encoding_config = get_base_encoding_config()
+
+    separate_cmd = create_one_video_multiple_representation_command(
+        'input_dir/input_video.265', 'output_dir_path', encoding_config, cuda_mode=True)
+    split_cmd = create_one_video_multiple_representation_command(
+        'input_dir/input_video.265', 'output_dir_path', encoding_config, cuda_mode=True, use_filter_complex=True)
+
+    # every variant decodes on the GPU and scales with scale_cuda
+    for cmd in (separate_cmd, split_cmd):
+        assert '-hwaccel cuda -hwaccel_output_format cuda -i input_dir/input_video.265' in cmd
+        assert ' -s ' not in cmd
+    assert separate_cmd.count(',scale_cuda=') == len(encoding_config.representations)
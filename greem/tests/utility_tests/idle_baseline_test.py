@@ -0,0 +1,122 @@
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from greem.utility.dataframe import add_idle_energy_to_encoding_results
+from greem.utility.idle_baseline import (
+    BaselineKey,
+    IdleBaseline,
+    IdleBaselineStore,
+    get_cpu_governor,
+)
+from greem.hardware.rapl import JOULES_PER_KWH
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+KEY = BaselineKey(
+    host="encoder-1", hardware_fingerprint="abc", governor="performance", gpu_count=0, energy_source="codecarbon"
+)
+
+
+def get_baseline(key: BaselineKey = KEY) -> IdleBaseline:
+    samples_df = pd.DataFrame({"cpu_power": [10.0, 12.0, 11.0], "ram_power": [3.0, 3.0, 3.0]})
+    return IdleBaseline.from_samples(key, samples_df, duration_seconds=3)
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_idle_baseline_from_samples():
+    baseline = get_baseline()
+
+    assert baseline.power == {"cpu": 11.0, "gpu": 0.0, "ram": 3.0}
+    assert baseline.power_variance["cpu"] == pytest.approx(1.0)
+    assert baseline.sample_count == 3
+    assert baseline.get_energy_per_second("cpu") == pytest.approx(11.0 / JOULES_PER_KWH)
+    assert IdleBaseline.from_dict(baseline.to_dict()) == baseline
+
+
+def test_idle_baseline_store_reuses_valid_baselines(tmp_path):
+    measured_keys: list[BaselineKey] = []
+
+    def measure(key: BaselineKey) -> IdleBaseline:
+        measured_keys.append(key)
+        return get_baseline(key)
+
+    store = IdleBaselineStore(f"{tmp_path}/baselines.json")
+    baseline = store.get_or_measure(KEY, measure)
+
+    # a new store loads the baseline from disk instead of measuring again
+    reloaded_store = IdleBaselineStore(f"{tmp_path}/baselines.json")
+    assert reloaded_store.get_or_measure(KEY, measure) == baseline
+    assert measured_keys == [KEY]
+
+    # another governor is another system state
+    reloaded_store.get_or_measure(replace(KEY, governor="powersave"), measure)
+    assert len(measured_keys) == 2
+    assert len(reloaded_store) == 2
+
+    # a RAPL baseline is never subtracted from CodeCarbon measurements and vice versa
+    reloaded_store.get_or_measure(replace(KEY, energy_source="rapl"), measure)
+    assert len(measured_keys) == 3
+
+
+def test_idle_baseline_store_staleness(tmp_path):
+    store = IdleBaselineStore(f"{tmp_path}/baselines.json", max_age=timedelta(days=1), max_relative_std=0.5)
+    baseline = get_baseline()
+    assert not store.is_stale(baseline)
+
+    assert store.is_stale(replace(baseline, measured_at=datetime.now() - timedelta(days=2)))
+    assert store.is_stale(replace(baseline, boot_id="previous-boot"))
+    assert store.is_stale(replace(baseline, power_variance={"cpu": 100.0, "gpu": 0.0, "ram": 0.0}))
+
+    store.put(replace(baseline, boot_id="previous-boot"))
+    assert store.get(KEY) is None
+
+
+@pytest.mark.parametrize(
+    "store_content",
+    ['{"baselines": [{"key": {"hardware', '{"baselines": [{"key": {}, "power": {}}]}', '[{"cpu": 10.0}]'],
+)
+def test_idle_baseline_store_ignores_unreadable_store(tmp_path, store_content):
+    store_path = tmp_path / "baselines.json"
+    store_path.write_text(store_content)
+
+    # a truncated or outdated store is treated as empty and overwritten by the next measurement
+    store = IdleBaselineStore(str(store_path))
+    assert len(store) == 0
+    assert store.get_or_measure(KEY, get_baseline).key == KEY
+    assert len(IdleBaselineStore(str(store_path))) == 1
+
+
+def test_get_cpu_governor(tmp_path):
+    for cpu, governor in (("cpu0", "performance"), ("cpu1", "performance"), ("cpu2", "powersave")):
+        (tmp_path / cpu / "cpufreq").mkdir(parents=True)
+        (tmp_path / cpu / "cpufreq" / "scaling_governor").write_text(f"{governor}\n")
+
+    assert get_cpu_governor(str(tmp_path)) == "performance,powersave"
+    assert get_cpu_governor(str(tmp_path / "missing")) == "unknown"
+
+
+def test_add_idle_energy_to_encoding_results():
+    encoding_results_df = pd.DataFrame({"duration": [10.0, 20.0]})
+
+    add_idle_energy_to_encoding_results(encoding_results_df, get_baseline())
+
+    assert encoding_results_df["idle_energy.duration.cpu"].tolist() == pytest.approx(
+        [110 / JOULES_PER_KWH, 220 / JOULES_PER_KWH]
+    )
+    assert encoding_results_df["idle_energy.duration.gpu"].tolist() == [0.0, 0.0]
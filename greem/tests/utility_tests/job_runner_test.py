@@ -0,0 +1,76 @@
+import sys
+
+import pytest
+
+from greem.utility.job_runner import Job, JobRunner, run_cmd
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_job_from_cmd_resolves_quotes():
+    job = Job.from_cmd('ffmpeg -i input.mp4 -filter:v "scale=200:100,fps=10" output.mp4')
+
+    assert job.argv == [
+        "ffmpeg",
+        "-i",
+        "input.mp4",
+        "-filter:v",
+        "scale=200:100,fps=10",
+        "output.mp4",
+    ]
+
+    with pytest.raises(ValueError):
+        Job.from_cmd("")
+
+
+def test_job_runner_invalid_concurrency():
+    with pytest.raises(ValueError):
+        JobRunner(max_concurrency=0)
+
+
+def test_run_cmd_records_exit_status_and_stderr():
+    result = run_cmd([sys.executable, "-c", "import sys; sys.stderr.write('err'); sys.exit(3)"])
+
+    assert result.returncode == 3
+    assert not result.succeeded
+    assert result.stderr == "err"
+    assert result.peak_rss_kb > 0
+    assert result.end_monotonic >= result.start_monotonic
+    assert result.end_time >= result.start_time
+
+
+def test_run_cmd_missing_executable():
+    result = run_cmd(["greem-executable-that-does-not-exist"])
+
+    assert result.returncode == 127
+    assert result.pid == -1
+
+
+def test_job_runner_runs_jobs_concurrently():
+    sleep_cmd = [sys.executable, "-c", "import time; time.sleep(0.3)"]
+    jobs = [Job(sleep_cmd, name=str(idx), metadata={"idx": idx}) for idx in range(4)]
+
+    results = JobRunner(max_concurrency=2).run(jobs)
+
+    # results keep the order of the jobs
+    assert [r.job.name for r in results] == ["0", "1", "2", "3"]
+    assert all(r.succeeded for r in results)
+    assert results[2].to_dict()["idx"] == 2
+
+    # at most two jobs are running whenever a job is started
+    for result in results:
+        running = [
+            other
+            for other in results
+            if other.start_monotonic <= result.start_monotonic < other.end_monotonic
+        ]
+        assert len(running) <= 2
+
+    # the third job starts as soon as one of the first two finished
+    assert results[2].start_monotonic >= min(r.end_monotonic for r in results[:2])
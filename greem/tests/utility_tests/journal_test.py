@@ -0,0 +1,141 @@
+import sys
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from greem.utility.configuration_classes import (
+    EncodingConfig,
+    EncodingConfigDTO,
+    Representation,
+)
+from greem.utility.job_runner import run_cmd
+from greem.utility.journal import CampaignJournal, JournalKey, get_config_hash
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def get_encoding_config() -> EncodingConfig:
+    return EncodingConfig(
+        codecs=["h264"],
+        presets=["fast"],
+        representations=[Representation(height=100, width=200, bitrate=1000)],
+        segment_duration=[4],
+        framerate=[30],
+    )
+
+
+def get_journal_key(video: str = "video_1", repetition: int = 0) -> JournalKey:
+    encoding_config = get_encoding_config()
+    dto: EncodingConfigDTO = encoding_config.get_encoding_dtos()[0]
+
+    return JournalKey.create(encoding_config, video, dto, repetition, run="mvor-ws:2")
+
+
+def get_measurements() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "timestamp": [datetime(2024, 1, 1, 12, 0, 0)],
+            "energy_consumed": [0.5],
+            "returncode": [0],
+            "video_list": ["video_1"],
+        }
+    )
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_config_hash_changes_with_config():
+    encoding_config = get_encoding_config()
+
+    assert get_config_hash(encoding_config) == get_config_hash(get_encoding_config())
+    assert get_config_hash(encoding_config) != get_config_hash(
+        encoding_config.model_copy(update={"presets": ["slow"]})
+    )
+
+
+def test_journal_resumes_completed_work(tmp_path):
+    journal_path = str(tmp_path / "journal" / "journal.jsonl")
+
+    with CampaignJournal(journal_path) as journal:
+        journal.record(get_journal_key(), get_measurements())
+        assert journal.is_completed(get_journal_key())
+
+    resumed_journal = CampaignJournal(journal_path)
+
+    assert len(resumed_journal) == 1
+    assert resumed_journal.is_completed(get_journal_key())
+    assert not resumed_journal.is_completed(get_journal_key(repetition=1))
+    assert not resumed_journal.is_completed(get_journal_key(video="video_2"))
+
+    # column types survive the JSON round trip
+    pd.testing.assert_frame_equal(
+        resumed_journal.get_measurements(get_journal_key()), get_measurements()
+    )
+
+    fresh_journal = CampaignJournal(journal_path, resume=False)
+    assert len(fresh_journal) == 0
+
+
+def test_journal_ignores_incomplete_last_line(tmp_path):
+    journal_path = str(tmp_path / "journal.jsonl")
+
+    with CampaignJournal(journal_path) as journal:
+        journal.record(get_journal_key(), {"video_name": "video_1"})
+
+    # simulate a crash while the second entry was written
+    with open(journal_path, "a", encoding="utf-8") as journal_file:
+        journal_file.write('{"key": {"host": ')
+
+    with CampaignJournal(journal_path) as journal:
+        assert len(journal) == 1
+        journal.record(get_journal_key(video="video_2"), {"video_name": "video_2"})
+
+    assert len(CampaignJournal(journal_path)) == 2
+
+
+def test_journal_does_not_record_failed_commands(tmp_path):
+    journal = CampaignJournal(str(tmp_path / "journal.jsonl"))
+    succeeded_df = pd.DataFrame([run_cmd([sys.executable, "-c", "pass"]).to_dict()])
+    failed_df = pd.DataFrame([run_cmd([sys.executable, "-c", "raise SystemExit(1)"]).to_dict()])
+
+    # e.g. the encode of a video succeeded but its scaling failed
+    assert not journal.record_if_succeeded(
+        get_journal_key(video="video_1"), pd.concat([succeeded_df, failed_df], ignore_index=True)
+    )
+    assert journal.record_if_succeeded(get_journal_key(video="video_2"), succeeded_df)
+    journal.close()
+
+    resumed_journal = CampaignJournal(str(tmp_path / "journal.jsonl"))
+    assert not resumed_journal.is_completed(get_journal_key(video="video_1"))
+    assert resumed_journal.is_completed(get_journal_key(video="video_2"))
+
+
+def test_journal_syncs_in_batches(tmp_path):
+    journal_path = tmp_path / "journal.jsonl"
+
+    journal = CampaignJournal(str(journal_path), sync_every=2, sync_interval_seconds=3600)
+
+    journal.record(get_journal_key(video="video_1"), {"video_name": "video_1"})
+    assert journal._unsynced_records == 1
+
+    journal.record(get_journal_key(video="video_2"), {"video_name": "video_2"})
+    assert journal._unsynced_records == 0
+    assert len(journal_path.read_text().splitlines()) == 2
+
+    journal.close()
+
+    with pytest.raises(ValueError):
+        CampaignJournal(str(journal_path), sync_every=0)
@@ -0,0 +1,133 @@
+import math
+import subprocess
+import sys
+import time
+
+import pytest
+
+from greem.utility.job_runner import Job, JobRunner
+from greem.utility.perf_counters import (
+    SCHEDSTAT_COLUMNS,
+    PerfCounterCapture,
+    get_child_pids,
+    parse_perf_stat_csv,
+    parse_schedstat,
+)
+from greem.utility.process_accounting import ProcessAccountant
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+PERF_STAT_CSV: str = """# started on Mon Apr  4 14:12:07 2022
+
+1523.45,msec,task-clock,1523450000,100.00,3.912,CPUs utilized
+4000000000,,cycles:u,1523450000,100.00,2.626,GHz
+8000000000,,instructions:u,1523450000,100.00,2.00,insn per cycle
+200000000,,cache-references:u,1523450000,100.00,131.280,M/sec
+50000000,,cache-misses:u,1523450000,100.00,25.00,of all cache refs
+<not supported>,,branches:u,0,100.00,,
+1000000,,branch-misses:u,1523450000,100.00,,
+"""
+
+
+def write_fake_perf(tmp_path) -> str:
+    """A `perf` that forks the command after `--` like `perf stat` and writes a fixed output file"""
+    perf_path = tmp_path / "perf"
+    perf_path.write_text(
+        f"#!{sys.executable}\n"
+        "import subprocess, sys\n"
+        "args = sys.argv[1:]\n"
+        "returncode = subprocess.run(args[args.index('--') + 1:]).returncode\n"
+        "with open(args[args.index('-o') + 1], 'w') as output_file:\n"
+        f"    output_file.write({PERF_STAT_CSV!r})\n"
+        "sys.exit(returncode)\n"
+    )
+    perf_path.chmod(0o755)
+
+    return str(perf_path)
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_parse_perf_stat_csv():
+    counts = parse_perf_stat_csv(PERF_STAT_CSV)
+
+    assert counts["perf.instructions"] == 8e9
+    assert counts["perf.task_clock"] == 1523.45
+    assert counts["perf.ipc"] == pytest.approx(2.0)
+    assert counts["perf.cache_miss_rate"] == pytest.approx(0.25)
+    assert math.isnan(counts["perf.branches"])
+    assert math.isnan(counts["perf.branch_miss_rate"])
+
+
+def test_parse_schedstat():
+    assert parse_schedstat("2000000000 500000000 42\n") == (2000000000, 500000000, 42)
+
+
+def test_perf_counters_of_jobs(tmp_path):
+    perf_capture = PerfCounterCapture(use_perf=True, perf_executable=write_fake_perf(tmp_path))
+    runner = JobRunner(max_concurrency=2, perf_capture=perf_capture)
+
+    results = runner.run([Job.from_cmd("true"), Job.from_cmd("sh -c 'exit 2'")])
+
+    assert [result.returncode for result in results] == [0, 2]
+    assert results[0].to_dict()["perf.ipc"] == pytest.approx(2.0)
+    assert results[1].perf_counters["perf.cycles"] == 4e9
+
+
+def test_perf_counters_follow_forked_job(tmp_path):
+    perf_capture = PerfCounterCapture(use_perf=True, perf_executable=write_fake_perf(tmp_path))
+    accountant = ProcessAccountant(interval=0.02)
+    pid_path = tmp_path / "pid"
+
+    with accountant:
+        result = JobRunner(process_accountant=accountant, perf_capture=perf_capture).run_job(
+            Job.from_cmd(["sh", "-c", f"echo $$ > {pid_path} && exec sleep 0.2"])
+        )
+
+    # the PID of the job, not of the perf process that forked it
+    assert result.pid == int(pid_path.read_text())
+    assert result.perf_counters["perf.ipc"] == pytest.approx(2.0)
+    process_df = accountant.to_dataframe()
+    assert (process_df["pid"] == result.pid).any()
+
+
+def test_schedstat_fallback():
+    perf_capture = PerfCounterCapture(use_perf=False, interval=0.02)
+    assert perf_capture.source == "schedstat"
+    assert perf_capture.wrap_argv(["true"]) == (["true"], None)
+
+    with perf_capture:
+        result = JobRunner(perf_capture=perf_capture).run_job(
+            Job.from_cmd([sys.executable, "-c", "import time\nend = time.time() + 0.3\nwhile time.time() < end: pass"])
+        )
+
+    assert list(result.perf_counters) == SCHEDSTAT_COLUMNS
+    # the busy loop runs almost the whole time, at most one sampling interval is lost
+    assert result.perf_counters["schedstat.run_seconds"] == pytest.approx(result.cpu_seconds, abs=0.1)
+    assert result.perf_counters["schedstat.timeslices"] > 0
+    # a process that was never sampled
+    assert math.isnan(perf_capture.collect(-1)["schedstat.run_seconds"])
+
+
+def test_get_child_pids():
+    process = subprocess.Popen(["sh", "-c", "sleep 1 & wait"])
+    try:
+        deadline = time.monotonic() + 5
+        while len(child_pids := get_child_pids(process.pid)) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(child_pids) == 1
+    finally:
+        process.kill()
+        process.wait()
@@ -0,0 +1,109 @@
+import sys
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from greem.utility.dataframe import apportion_monitoring_by_cpu_time
+from greem.utility.job_runner import Job, JobResult, JobRunner
+from greem.utility.process_accounting import (
+    CLOCK_TICKS_PER_SECOND,
+    ProcessAccountant,
+    parse_proc_io,
+    parse_proc_stat,
+)
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def get_job_result(name: str, pid: int, start: float, end: float, cpu_seconds: float) -> JobResult:
+    return JobResult(
+        job=Job(argv=["ffmpeg"], name=name),
+        pid=pid,
+        returncode=0,
+        start_monotonic=start,
+        end_monotonic=end,
+        start_time=datetime(2024, 1, 1),
+        end_time=datetime(2024, 1, 1),
+        peak_rss_kb=0,
+        stderr="",
+        cpu_seconds=cpu_seconds,
+    )
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_parse_proc_files():
+    stat = (
+        "4242 (ffmpeg (enc) 1) R 1 4242 4242 0 -1 4194304 1000 0 0 0 "
+        f"{3 * CLOCK_TICKS_PER_SECOND} {CLOCK_TICKS_PER_SECOND} 0 0 20 0 9 0 100"
+    )
+    assert parse_proc_stat(stat) == pytest.approx(4.0)
+
+    io = "rchar: 100\nwchar: 50\nsyscr: 3\nsyscw: 2\nread_bytes: 4096\nwrite_bytes: 8192\ncancelled_write_bytes: 0"
+    assert parse_proc_io(io) == (4096, 8192)
+
+
+def test_job_runner_registers_processes():
+    accountant = ProcessAccountant(interval=0.01)
+    runner = JobRunner(max_concurrency=2, process_accountant=accountant)
+    busy_loop = "import time\nend = time.monotonic() + 0.3\nwhile time.monotonic() < end: pass"
+
+    with accountant:
+        results = runner.run([Job(argv=[sys.executable, "-c", busy_loop]) for _ in range(2)])
+    process_df = accountant.to_dataframe()
+
+    assert set(process_df["pid"]) == {result.pid for result in results}
+    assert process_df["cpu_seconds"].max() > 0
+    for result in results:
+        assert result.cpu_seconds >= process_df.loc[process_df["pid"] == result.pid, "cpu_seconds"].max()
+
+    # reaped processes are no longer sampled
+    accountant.sample_once()
+    assert len(accountant.to_dataframe()) == len(process_df)
+
+
+def test_apportion_monitoring_by_cpu_time():
+    # two jobs run during both intervals, the first one uses three times the CPU time
+    results = [
+        get_job_result("busy", pid=1, start=0.0, end=2.0, cpu_seconds=3.0),
+        get_job_result("idle", pid=2, start=0.0, end=2.0, cpu_seconds=1.0),
+    ]
+    monitoring_df = pd.DataFrame(
+        {
+            "monotonic_time": [1.0, 2.0],
+            "duration": [1.0, 1.0],
+            "cpu_energy": [4.0, 4.0],
+            "ram_energy": [1.0, 1.0],
+            "energy_consumed": [5.0, 5.0],
+        }
+    )
+    process_df = pd.DataFrame(
+        {
+            "monotonic_time": [1.0, 1.0],
+            "pid": [1, 2],
+            "cpu_seconds": [1.5, 0.5],
+            "read_bytes": [100, 200],
+            "write_bytes": [10, 20],
+        }
+    )
+
+    job_df = apportion_monitoring_by_cpu_time(monitoring_df, results, process_df)
+
+    assert job_df["cpu_energy"].tolist() == pytest.approx([6.0, 2.0])
+    # the other values are shared by the overlap of the jobs with the intervals
+    assert job_df["ram_energy"].tolist() == pytest.approx([1.0, 1.0])
+    assert job_df["energy_consumed"].tolist() == pytest.approx([7.0, 3.0])
+    assert job_df["io_read_bytes"].tolist() == [100, 200]
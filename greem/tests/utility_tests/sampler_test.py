@@ -0,0 +1,141 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from greem.utility.monitoring import CODECARBON_COLUMNS, HardwareTracker
+from greem.utility.sampler import SAMPLER_COLUMNS, SampleRingBuffer, Sampler
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+class FakeEmissionsTracker:
+    def __init__(self) -> None:
+        self.samples: int = 0
+
+    def _prepare_emissions_data(self, delta: bool = True) -> SimpleNamespace:
+        self.samples += 1
+        values = {column: 0.0 for column in CODECARBON_COLUMNS}
+        values["energy_consumed"] = float(self.samples)
+        return SimpleNamespace(timestamp="", project_name="test", **values)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+def create_filled_buffer(sample_count: int, capacity: int, spill_path: str | None = None) -> SampleRingBuffer:
+    buffer = SampleRingBuffer(["index", "value"], capacity=capacity, spill_path=spill_path)
+    for idx in range(sample_count):
+        buffer.append([idx, idx * 10])
+
+    return buffer
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_ring_buffer_dataframe_is_zero_copy():
+    buffer = create_filled_buffer(3, capacity=8)
+    df = buffer.to_dataframe()
+
+    assert df["value"].tolist() == [0, 10, 20]
+    assert np.shares_memory(df.to_numpy(), buffer._buffer)
+
+    # the returned dataframe is not overwritten by later samples
+    buffer.clear()
+    buffer.append([7, 70])
+    assert df["index"].tolist() == [0, 1, 2]
+    assert buffer.to_dataframe()["index"].tolist() == [7]
+
+
+def test_ring_buffer_overwrites_oldest_samples():
+    buffer = create_filled_buffer(6, capacity=4)
+
+    assert buffer.to_dataframe()["index"].tolist() == [2, 3, 4, 5]
+    assert buffer.dropped_samples == 2
+
+    with pytest.raises(ValueError):
+        SampleRingBuffer(["index", "index"])
+
+
+def test_ring_buffer_last_rows_after_wrap_around():
+    buffer = SampleRingBuffer(["value"], capacity=4)
+    for value in range(6):
+        buffer.append([value])
+
+    assert buffer.get_last_rows(3)[:, 0].tolist() == [3, 4, 5]
+    # at most the samples in the buffer are returned
+    assert buffer.get_last_rows(10)[:, 0].tolist() == [2, 3, 4, 5]
+
+
+def test_ring_buffer_spills_to_disk(tmp_path):
+    buffer = create_filled_buffer(10, capacity=4, spill_path=str(tmp_path / "samples.bin"))
+
+    assert len(buffer) == 10
+    assert buffer.dropped_samples == 0
+    assert buffer.to_dataframe()["index"].tolist() == list(range(10))
+
+    buffer.clear()
+    assert len(buffer.to_dataframe()) == 0
+
+
+def test_sampler_records_overhead():
+    sampler = Sampler(lambda row: row.fill(1.0), ["value"], interval=0.01, capacity=1024)
+
+    with sampler:
+        time.sleep(0.1)
+    sampler.sample_once()
+    df = sampler.to_dataframe()
+
+    assert list(df.columns) == ["value", *SAMPLER_COLUMNS]
+    assert len(df) >= 2
+    assert (df["value"] == 1.0).all()
+    assert df["monotonic_time"].is_monotonic_increasing
+    assert (df["sample_seconds"] >= 0).all()
+    assert not sampler.is_running
+
+
+def test_sampler_reset_does_not_overlap_samples():
+    state = {"reading": False, "overlaps": 0}
+
+    def read_sample(row: np.ndarray) -> None:
+        state["reading"] = True
+        time.sleep(0.002)
+        state["reading"] = False
+
+    def reset_state() -> None:
+        state["overlaps"] += state["reading"]
+
+    with Sampler(read_sample, ["value"], interval=0.001, capacity=1024) as sampler:
+        for _ in range(50):
+            sampler.reset(reset_state)
+            time.sleep(0.001)
+
+    assert state["overlaps"] == 0
+
+
+def test_hardware_tracker_samples_codecarbon_values():
+    hardware_tracker = HardwareTracker(tracker=FakeEmissionsTracker(), measure_power_secs=0.5)
+
+    hardware_tracker.clear()
+    hardware_tracker._fetch_hardware_metrics()
+    hardware_tracker._fetch_hardware_metrics()
+    df = hardware_tracker.to_dataframe()
+
+    assert list(df.columns) == [*CODECARBON_COLUMNS, *SAMPLER_COLUMNS]
+    assert df["energy_consumed"].tolist() == [2.0, 3.0]
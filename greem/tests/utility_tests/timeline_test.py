@@ -0,0 +1,154 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from greem.utility.dataframe import integrate_monitoring_over_intervals
+from greem.utility.timeline import (
+    ClockReference,
+    PhaseRecorder,
+    add_monotonic_time,
+    align_streams,
+    get_job_sample_indices,
+    slice_by_jobs,
+)
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+CLOCK = ClockReference(monotonic=1000.0, wall_time=datetime(2024, 1, 1, 12, 0, 0))
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_add_monotonic_time():
+    stream_df = pd.DataFrame(
+        {"date_time": ["2024-01-01T12:00:05", "2024-01-01T11:59:59"], "power.draw": [100.0, 50.0]}
+    )
+
+    timeline_df = add_monotonic_time(stream_df, "date_time", CLOCK)
+
+    assert timeline_df["monotonic_time"].tolist() == [999.0, 1005.0]
+    assert timeline_df["power.draw"].tolist() == [50.0, 100.0]
+
+
+def test_align_streams_with_tolerance():
+    tracker_df = pd.DataFrame({"monotonic_time": [1.0, 2.0, 3.0], "energy_consumed": [1.0, 2.0, 3.0]})
+    nvml_df = pd.DataFrame({"monotonic_time": [2.9, 1.1], "power.draw": [30.0, 10.0]})
+
+    aligned_df = align_streams({"tracker": tracker_df, "nvml": nvml_df}, tolerance=0.2)
+
+    assert aligned_df["nvml.power.draw"].tolist()[0::2] == [10.0, 30.0]
+    assert np.isnan(aligned_df["nvml.power.draw"].iloc[1])
+    assert aligned_df["nvml.monotonic_time"].iloc[2] == pytest.approx(2.9)
+
+    resampled_df = align_streams({"tracker": tracker_df, "nvml": nvml_df}, period=2.0)
+    assert resampled_df["monotonic_time"].tolist() == [2.0, 4.0]
+    assert resampled_df["tracker.energy_consumed"].tolist() == [1.0, 2.5]
+    assert resampled_df["nvml.power.draw"].tolist() == [10.0, 30.0]
+
+
+def test_slice_by_jobs():
+    samples_df = pd.DataFrame({"monotonic_time": [1.0, 2.0, 3.0, 4.0], "power": [1, 2, 3, 4]})
+
+    sliced_df = slice_by_jobs(samples_df, [("a", 0.5, 2.0), ("b", 1.5, 3.5)])
+
+    assert sliced_df["job"].tolist() == ["a", "a", "b", "b"]
+    assert sliced_df["power"].tolist() == [1, 2, 2, 3]
+    assert len(slice_by_jobs(samples_df, [])) == 0
+
+
+def test_get_job_sample_indices_matches_dense_comparison():
+    rng = np.random.default_rng(7)
+    sample_times = rng.permutation(np.arange(0.0, 50.0, 0.25))
+    job_starts = rng.uniform(0, 50, size=40)
+    job_ends = job_starts + rng.uniform(-1, 5, size=40)
+
+    job_idx, sample_idx = get_job_sample_indices(sample_times, job_starts, job_ends)
+
+    is_job_sample = (sample_times[None, :] > job_starts[:, None]) & (sample_times[None, :] <= job_ends[:, None])
+    assert sorted(zip(job_idx, sample_idx)) == sorted(zip(*np.nonzero(is_job_sample)))
+    # ordered by job, then by sample time
+    assert all(np.diff(job_idx) >= 0)
+
+
+def test_phase_recorder():
+    phase_recorder = PhaseRecorder()
+
+    with phase_recorder.phase("demuxing", video_name="Beauty") as metadata:
+        metadata["returncode"] = 0
+    with pytest.raises(RuntimeError):
+        with phase_recorder.phase("decoding", video_name="Beauty"):
+            raise RuntimeError("ffmpeg failed")
+
+    phase_df = phase_recorder.to_dataframe()
+    assert phase_df["phase"].tolist() == ["demuxing", "decoding"]
+    assert phase_df["video_name"].tolist() == ["Beauty", "Beauty"]
+    assert phase_df.loc[0, "returncode"] == 0
+    assert (phase_df["end_monotonic"] >= phase_df["start_monotonic"]).all()
+    assert [marker[0] for marker in phase_recorder.get_markers()] == ["demuxing", "decoding"]
+
+    phase_recorder.begin("scaling")
+    with pytest.raises(ValueError):
+        phase_recorder.begin("scaling")
+    with pytest.raises(ValueError):
+        phase_recorder.end("encoding")
+
+
+def test_integrate_monitoring_over_intervals():
+    # samples of 1 kWh per second, each covering the second before its time
+    monitoring_df = pd.DataFrame(
+        {"monotonic_time": [1.0, 2.0, 3.0, 4.0], "duration": [1.0] * 4, "energy_consumed": [1.0, 1.0, 2.0, 2.0]}
+    )
+    phase_df = pd.DataFrame(
+        {"phase": ["demuxing", "decoding", "scaling"], "start_monotonic": [0.5, 1.5, 3.5], "end_monotonic": [1.5, 3.0, 5.0]}
+    )
+
+    result_df = integrate_monitoring_over_intervals(monitoring_df, phase_df)
+
+    # the gap between the samples of the phases is not assigned to any phase
+    assert result_df["energy_consumed"].tolist() == pytest.approx([1.0, 2.5, 1.0])
+    assert result_df["sample.count"].tolist() == [2, 2, 1]
+    # the end of the last phase is not covered by a sample yet
+    assert result_df["sample.coverage"].tolist() == pytest.approx([1.0, 1.0, 0.5 / 1.5])
+    assert len(integrate_monitoring_over_intervals(monitoring_df, phase_df.iloc[0:0])) == 0
+
+
+def test_integrate_monitoring_over_intervals_matches_dense_overlap():
+    rng = np.random.default_rng(7)
+    sample_duration = rng.uniform(0.2, 0.8, 400)
+    monitoring_df = pd.DataFrame(
+        {
+            "monotonic_time": np.cumsum(sample_duration),
+            "duration": sample_duration,
+            "energy_consumed": rng.uniform(0, 1, 400),
+        }
+    )
+    phase_start = np.sort(rng.uniform(0, monitoring_df["monotonic_time"].iloc[-1], 60))
+    phase_df = pd.DataFrame({"start_monotonic": phase_start, "end_monotonic": phase_start + rng.uniform(0, 5, 60)})
+
+    result_df = integrate_monitoring_over_intervals(monitoring_df, phase_df)
+
+    # reference with the overlap of every sample and every phase
+    sample_end = monitoring_df["monotonic_time"].to_numpy()[:, None]
+    overlap = np.clip(
+        np.minimum(sample_end, phase_df["end_monotonic"].to_numpy()[None, :])
+        - np.maximum(sample_end - sample_duration[:, None], phase_start[None, :]),
+        0,
+        None,
+    )
+    expected_energy = (overlap / sample_duration[:, None]).T @ monitoring_df["energy_consumed"].to_numpy()
+    assert result_df["energy_consumed"].to_numpy() == pytest.approx(expected_energy)
+    assert result_df["sample.count"].tolist() == (overlap > 0).sum(axis=0).tolist()
@@ -0,0 +1,136 @@
+import json
+import math
+
+from greem.utility.video_catalog import (
+    VideoCatalog,
+    find_catalog_row,
+    parse_ffprobe_output,
+)
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def get_ffprobe_output(codec: str = "hevc", with_duration: bool = True) -> dict:
+    video_format: dict = {"format_name": "hevc", "bit_rate": "8000"}
+    if with_duration:
+        video_format["duration"] = "5.000000"
+
+    return {
+        "streams": [
+            {"codec_type": "audio", "codec_name": "aac"},
+            {
+                "codec_type": "video",
+                "codec_name": codec,
+                "width": 3840,
+                "height": 2160,
+                "avg_frame_rate": "60000/1001",
+                "r_frame_rate": "60/1",
+            },
+        ],
+        "format": video_format,
+    }
+
+
+class FakeProbe:
+    def __init__(self) -> None:
+        self.probed_files: list[str] = []
+
+    def __call__(self, file_path: str) -> dict:
+        self.probed_files.append(file_path)
+        return parse_ffprobe_output(get_ffprobe_output(), file_path)
+
+
+def create_dataset(video_dir, names: list[str]) -> None:
+    video_dir.mkdir(exist_ok=True)
+    for name in names:
+        (video_dir / name).write_bytes(b"x" * 1000)
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_parse_ffprobe_output(tmp_path):
+    create_dataset(tmp_path, ["video_1.265"])
+    video_path = str(tmp_path / "video_1.265")
+
+    row = parse_ffprobe_output(get_ffprobe_output(), video_path)
+
+    assert row["codec"] == "hevc"
+    assert (row["width"], row["height"]) == (3840, 2160)
+    assert math.isclose(row["fps"], 59.94, abs_tol=0.01)
+    assert row["duration"] == 5.0
+    assert row["frames"] == 300
+    assert row["size"] == 1000
+    assert row["probe_error"] is None
+
+    # raw bitstreams do not report a duration, it is derived from size and bitrate
+    row = parse_ffprobe_output(get_ffprobe_output(with_duration=False), video_path)
+    assert row["duration"] == 1.0
+
+    row = parse_ffprobe_output({}, video_path)
+    assert row["probe_error"] is not None
+    assert math.isnan(row["fps"])
+
+
+def test_catalog_only_probes_new_videos(tmp_path):
+    video_dir = tmp_path / "videos"
+    create_dataset(video_dir, ["video_1.265", "video_2.265", "notes.txt"])
+
+    probe = FakeProbe()
+    catalog = VideoCatalog.from_directory(str(video_dir), probe=probe)
+
+    assert len(catalog) == 2
+    assert len(probe.probed_files) == 2
+    assert (video_dir / "catalog.parquet").exists()
+
+    create_dataset(video_dir, ["video_3.mp4"])
+    probe = FakeProbe()
+    catalog = VideoCatalog.from_directory(str(video_dir), probe=probe)
+
+    assert probe.probed_files == [str(video_dir / "video_3.mp4")]
+    assert catalog.get_file_names() == ["video_1.265", "video_2.265", "video_3.mp4"]
+    assert catalog.get_file_names(extensions=(".265",), min_duration=5) == [
+        "video_1.265",
+        "video_2.265",
+    ]
+    assert catalog.get_file_names(min_height=4320) == []
+
+
+def test_find_catalog_row(tmp_path):
+    create_dataset(tmp_path, ["video_1.265"])
+    video_path = str(tmp_path / "video_1.265")
+
+    assert find_catalog_row(video_path) is None
+
+    VideoCatalog.from_directory(str(tmp_path), probe=FakeProbe())
+
+    row = find_catalog_row(video_path)
+    assert row["codec"] == "hevc"
+    assert json.loads(row["ffprobe_json"]) == get_ffprobe_output()
+
+
+def test_catalog_probes_failed_videos_again(tmp_path):
+    create_dataset(tmp_path, ["video_1.265"])
+    video_path = str(tmp_path / "video_1.265")
+
+    VideoCatalog.from_directory(str(tmp_path), probe=lambda path: parse_ffprobe_output({}, path))
+    # a failed probe is not used instead of running ffprobe
+    assert find_catalog_row(video_path) is None
+
+    probe = FakeProbe()
+    catalog = VideoCatalog.from_directory(str(tmp_path), probe=probe)
+
+    assert probe.probed_files == [video_path]
+    assert catalog.get_file_names(codec="hevc") == ["video_1.265"]
+    assert find_catalog_row(video_path)["codec"] == "hevc"
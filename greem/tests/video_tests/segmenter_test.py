@@ -0,0 +1,154 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from greem.video.segmenter import (
+    SegmentPart,
+    VideoKeyframes,
+    _get_manifest_rows,
+    get_copy_cut_times,
+    get_copy_pass_job,
+    parse_keyframes,
+    plan_segments,
+    slice_videos,
+)
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def create_test_video(path: str) -> None:
+    """Creates a 10 s H.264 video with keyframes at 0, 3 and 4 s and an audio stream"""
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", "testsrc=duration=10:size=320x240:rate=30",
+            "-f", "lavfi", "-i", "sine=duration=10",
+            "-c:v", "libx264", "-g", "300", "-sc_threshold", "0",
+            "-force_key_frames", "expr:eq(n,0)+eq(n,90)+eq(n,120)",
+            "-c:a", "aac", path,
+        ],
+        check=True,
+    )
+
+
+def probe_frames(path: str) -> tuple[list[dict], str]:
+    """Decodes all frames of a video and returns them and the decoding errors"""
+    process = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_frames", "-show_entries", "frame=media_type,pict_type",
+         "-print_format", "json", path],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(process.stdout)["frames"], process.stderr
+
+
+def get_keyframes(keyframes: list[float], duration: float = 10.0) -> VideoKeyframes:
+    return VideoKeyframes(keyframes=keyframes, duration=duration, fps=30, codec="hevc")
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_plan_segments_aligned_keyframes_are_copied():
+    plans = plan_segments(get_keyframes([0.0, 2.0, 4.0, 6.0, 8.0]), segment_duration=4)
+
+    assert [(plan.start, plan.end) for plan in plans] == [(0, 4), (4, 8), (8, 10)]
+    for plan in plans:
+        assert plan.parts == [SegmentPart(plan.start, plan.end, stream_copy=True)]
+        assert plan.reencoded_duration == 0
+
+    # only the segment boundaries are cut
+    assert get_copy_cut_times(plans) == [4.0, 8.0]
+
+
+def test_plan_segments_reencodes_segments_with_partial_gops():
+    plans = plan_segments(get_keyframes([0.0, 3.0, 4.0, 6.0, 8.5]), segment_duration=4)
+
+    assert plans[0].parts == [SegmentPart(0.0, 4.0, stream_copy=True)]
+    # the end of the segment is not a keyframe, copied and re-encoded parts are never joined
+    assert plans[1].parts == [SegmentPart(4.0, 8.0, stream_copy=False)]
+    assert plans[2].parts == [SegmentPart(8.0, 10.0, stream_copy=False)]
+
+    for plan in plans:
+        assert plan.copied_duration + plan.reencoded_duration == pytest.approx(plan.duration)
+    assert get_copy_cut_times(plans) == [4.0]
+
+
+def test_plan_segments_tolerates_rounded_keyframes():
+    plans = plan_segments(get_keyframes([0.0, 4.0001, 8.0]), segment_duration=4)
+
+    assert all(len(plan.parts) == 1 and plan.parts[0].stream_copy for plan in plans)
+    # the boundaries are the timestamps of the keyframes
+    assert [(plan.start, plan.end) for plan in plans] == [(0.0, 4.0001), (4.0001, 8.0), (8.0, 10.0)]
+    assert get_copy_cut_times(plans) == [4.0001, 8.0]
+
+    with pytest.raises(ValueError):
+        plan_segments(get_keyframes([0.0]), segment_duration=0)
+
+
+def test_parse_keyframes_of_raw_bitstream():
+    packets = [{"flags": "K__" if idx % 30 == 0 else "___"} for idx in range(90)]
+
+    keyframes = parse_keyframes(
+        {"streams": [{"codec_name": "hevc", "avg_frame_rate": "30/1"}], "packets": packets}
+    )
+
+    assert keyframes.keyframes == [0.0, 1.0, 2.0]
+    assert keyframes.duration == pytest.approx(3.0)
+    assert keyframes.codec == "hevc"
+
+
+def test_copy_pass_is_one_ffmpeg_process():
+    plans = plan_segments(get_keyframes([0.0, 2.0, 4.0, 6.0, 8.0]), segment_duration=4)
+
+    job = get_copy_pass_job("input.265", plans, "tmp")
+
+    assert job.argv.count("-i") == 1
+    assert job.argv[job.argv.index("-map") + 1] == "0"
+    assert job.argv[job.argv.index("-c") + 1] == "copy"
+    assert job.argv[job.argv.index("-segment_times") + 1] == "4.000000,8.000000"
+
+
+def test_copy_pass_cuts_at_the_keyframe_timestamps():
+    plans = plan_segments(get_keyframes([0.0, 3.999967, 8.0001, 9.5]), segment_duration=4)
+
+    job = get_copy_pass_job("input.265", plans, "tmp")
+
+    assert job.argv[job.argv.index("-segment_times") + 1] == "3.999967,8.000100"
+    assert _get_manifest_rows("input", "tmp", 4, plans)[1]["start_pts"] == 3.999967
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_sliced_segments_decode_completely(tmp_path):
+    input_path = f"{tmp_path}/video.mp4"
+    create_test_video(input_path)
+
+    manifest_df = slice_videos([input_path], f"{tmp_path}/segments", segment_durations=[3])
+
+    assert manifest_df["succeeded"].all()
+    # only the first segment ends at a keyframe, all others contain partial GOPs
+    assert (manifest_df["copied_duration"] > 0).any()
+    assert (manifest_df["reencoded_duration"] > 0).any()
+    for row in manifest_df.itertuples():
+        frames, errors = probe_frames(row.file_path)
+        video_frames = [frame for frame in frames if frame["media_type"] == "video"]
+
+        assert errors == ""
+        assert len(video_frames) == pytest.approx(row.duration * 30, abs=1)
+        assert video_frames[0]["pict_type"] == "I"
+        # the audio is kept
+        assert any(frame["media_type"] == "audio" for frame in frames)
@@ -0,0 +1,100 @@
+import os
+
+from greem.video.video_info import ProbeCache, ProbedVideoInfo, VideoInfo
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                HELPER FUNCTIONS
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+class CountingProbe:
+    def __init__(self) -> None:
+        self.probed_files: list[str] = []
+
+    def __call__(self, file_path: str) -> ProbedVideoInfo:
+        self.probed_files.append(file_path)
+        return ProbedVideoInfo(fps=29.97, width=3840, height=2160, frame_count=300)
+
+
+def create_video_files(video_dir, names: list[str]) -> list[str]:
+    video_dir.mkdir(exist_ok=True)
+    paths: list[str] = []
+    for name in names:
+        path = video_dir / name
+        path.write_bytes(b"not a real video")
+        paths.append(str(path))
+
+    return paths
+
+
+# '''
+#    --------------------------------------------------------------------------------------------------
+
+#                                                TEST CASES
+#    --------------------------------------------------------------------------------------------------
+# '''
+
+
+def test_probe_cache_probes_video_once(tmp_path):
+    probe = CountingProbe()
+    cache = ProbeCache(str(tmp_path / "cache.jsonl"), probe=probe)
+    (video_path,) = create_video_files(tmp_path / "videos", ["video_1.265"])
+
+    video_info = VideoInfo(video_path, probe_cache=cache)
+    assert video_info.get_fps() == 30
+    assert video_info.get_total_frame_count() == 300
+    assert VideoInfo(video_path, probe_cache=cache).get_width() == 3840
+
+    assert probe.probed_files == [video_path]
+
+    # a new process reads the metadata from disk
+    second_probe = CountingProbe()
+    second_cache = ProbeCache(str(tmp_path / "cache.jsonl"), probe=second_probe)
+    assert second_cache.get(video_path).height == 2160
+    assert second_probe.probed_files == []
+
+
+def test_probe_cache_detects_modified_video(tmp_path):
+    probe = CountingProbe()
+    cache = ProbeCache(str(tmp_path / "cache.jsonl"), probe=probe)
+    (video_path,) = create_video_files(tmp_path / "videos", ["video_1.265"])
+
+    cache.get(video_path)
+    with open(video_path, "ab") as video_file:
+        video_file.write(b"more frames")
+    os.utime(video_path, ns=(0, 0))
+    cache.get(video_path)
+
+    assert len(probe.probed_files) == 2
+
+
+def test_probe_cache_warm(tmp_path):
+    probe = CountingProbe()
+    cache = ProbeCache(str(tmp_path / "cache.jsonl"), probe=probe)
+    video_paths = create_video_files(
+        tmp_path / "videos", ["video_1.265", "video_2.mp4", "notes.txt"]
+    )
+
+    assert cache.warm(str(tmp_path / "videos")) == 2
+    assert sorted(probe.probed_files) == sorted(video_paths[:2])
+
+    # warming again or looking up a warmed video does not probe again
+    cache.warm(str(tmp_path / "videos"))
+    cache.get(video_paths[1])
+    assert len(probe.probed_files) == 2
+
+
+def test_probe_cache_probes_missing_video_without_caching(tmp_path):
+    probe = CountingProbe()
+    cache = ProbeCache(str(tmp_path / "cache.jsonl"), probe=probe)
+    missing_path = str(tmp_path / "not_created_yet.mp4")
+
+    assert cache.get(missing_path).fps == 29.97
+    cache.get(missing_path)
+
+    assert probe.probed_files == [missing_path, missing_path]
+    assert not os.path.exists(tmp_path / "cache.jsonl")
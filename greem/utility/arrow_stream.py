@@ -0,0 +1,132 @@
+"""
+Module for writing monitoring samples to disk as an Arrow IPC stream.
+
+Instead of converting every sample into a DataFrame and appending it to a CSV file,
+samples are buffered in memory and written as one Arrow record batch once the buffer
+holds `max_rows` samples or its oldest sample is older than `max_age_seconds`.
+The whole stream is read back with a single call to `read_arrow_stream`. A stream that
+was not closed properly (e.g. after a crash) is read up to its last complete batch.
+
+Classes:
+    ArrowStreamWriter: Append-only writer that buffers rows and writes them in batches.
+
+Functions:
+    read_arrow_stream(file_path: str) -> pd.DataFrame:
+        Reads all complete record batches of an Arrow IPC stream file.
+"""
+
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+class ArrowStreamWriter:
+    """Append-only writer that buffers rows and writes them in batches to an Arrow IPC stream.
+
+    The schema of the stream is inferred from the first written batch, unless it is
+    provided. Columns missing in later rows are written as nulls, columns that are
+    not part of the schema raise a `ValueError`.
+
+    Example:
+        >>> with ArrowStreamWriter('results/monitoring_stream.arrows', max_rows=1024) as writer:
+        ...     writer.append({'date_time': pd.Timestamp('now'), 'power.draw': 120.5})
+        >>> read_arrow_stream('results/monitoring_stream.arrows')
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        max_rows: int = 4096,
+        max_age_seconds: float = 30.0,
+        schema: pa.Schema | None = None,
+    ) -> None:
+        if max_rows < 1:
+            raise ValueError(f"max_rows has to be positive, got {max_rows}")
+
+        self.file_path: str = file_path
+        self.max_rows: int = max_rows
+        self.max_age_seconds: float = max_age_seconds
+        self.schema: pa.Schema | None = schema
+        self.written_rows: int = 0
+        self._rows: list[dict] = []
+        self._oldest_row_time: float = 0
+        self._sink: pa.OSFile | None = None
+        self._writer: pa.ipc.RecordBatchStreamWriter | None = None
+        self._is_closed: bool = False
+
+    def __enter__(self) -> "ArrowStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb) -> None:
+        self.close()
+
+    def append(self, row: dict) -> None:
+        """Buffers a row and writes the buffer if it is full or too old"""
+        if self._is_closed:
+            raise ValueError(f"{self.file_path} was already closed")
+        if self.schema is not None and not set(row).issubset(self.schema.names):
+            unknown_columns: list[str] = sorted(set(row) - set(self.schema.names))
+            raise ValueError(f"columns {unknown_columns} are not part of the stream schema")
+        if len(self._rows) == 0:
+            self._oldest_row_time = time.monotonic()
+        self._rows.append(row)
+
+        if (
+            len(self._rows) >= self.max_rows
+            or time.monotonic() - self._oldest_row_time >= self.max_age_seconds
+        ):
+            self.flush()
+
+    def append_rows(self, rows: list[dict]) -> None:
+        """Buffers multiple rows, see `append`"""
+        for row in rows:
+            self.append(row)
+
+    def flush(self) -> None:
+        """Writes all buffered rows as one record batch"""
+        if len(self._rows) == 0:
+            return
+
+        if self.schema is not None:
+            batch = pa.RecordBatch.from_pylist(self._rows, schema=self.schema)
+        else:
+            # the schema consists of the columns of all buffered rows, not only of the first one
+            columns: dict[str, None] = dict.fromkeys(key for row in self._rows for key in row)
+            batch = pa.RecordBatch.from_pydict(
+                {column: [row.get(column) for row in self._rows] for column in columns}
+            )
+
+        if self._writer is None:
+            self.schema = batch.schema
+            os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+            self._sink = pa.OSFile(self.file_path, "wb")
+            self._writer = pa.ipc.new_stream(self._sink, self.schema)
+
+        self._writer.write_batch(batch)
+        self.written_rows += len(self._rows)
+        self._rows = []
+
+    def close(self) -> None:
+        """Writes the remaining rows and the end of the stream"""
+        self.flush()
+        self._is_closed = True
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer, self._sink = None, None
+
+
+def read_arrow_stream(file_path: str) -> pd.DataFrame:
+    """Reads all complete record batches of an Arrow IPC stream file as a DataFrame"""
+    batches: list[pa.RecordBatch] = []
+    with pa.OSFile(file_path, "rb") as source:
+        reader = pa.ipc.open_stream(source)
+        try:
+            for batch in reader:
+                batches.append(batch)
+        except (OSError, pa.ArrowInvalid):
+            # the last batch was not completely written
+            pass
+
+        return pa.Table.from_batches(batches, schema=reader.schema).to_pandas()
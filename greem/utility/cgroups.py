@@ -0,0 +1,341 @@
+"""
+Module for isolating and accounting jobs of the `JobRunner` in transient cgroup v2 groups.
+
+Every job is started in its own cgroup below a cgroup of the runner. When the job is
+reaped, its `cpu.stat`, `memory.peak`, `io.stat` and `cpu.pressure` are read before the
+cgroup is removed, so the resources of concurrently running encodes are accounted
+exactly instead of being apportioned. The cgroup of a job can limit its CPU bandwidth
+(`cpu.max`), its CPUs (`cpuset.cpus`) and its memory (`memory.max`), e.g. to measure the
+throughput of an encode under the CPU budget of a container.
+
+Creating cgroups requires a writable cgroup v2 hierarchy, e.g. as root or in a
+delegated scope (`systemd-run --user --scope -p Delegate=yes ...`). Controllers that
+can not be enabled are skipped, `CgroupManager.try_create` returns `None` if no cgroup
+can be created at all, so the jobs run without isolation.
+
+Classes:
+    CgroupLimits: Frozen dataclass of the resource limits of a job cgroup.
+    CgroupManager: Creates, reads and removes the cgroups of jobs.
+
+Functions:
+    find_cgroup2_mount(mountinfo_path: str) -> str | None:
+        Returns the mount point of the cgroup v2 hierarchy.
+    get_own_cgroup(proc_cgroup_path: str) -> str | None:
+        Returns the cgroup v2 path of the current process.
+    parse_flat_keyed(content: str) -> dict[str, int]:
+        Parses `key value` lines, e.g. of `cpu.stat`.
+    parse_io_stat(content: str) -> dict[str, int]:
+        Sums the values of all devices of an `io.stat` file.
+    parse_pressure(content: str) -> dict[str, float]:
+        Parses the `some` and `full` lines of a PSI file, e.g. `cpu.pressure`.
+"""
+
+import os
+from dataclasses import dataclass
+
+MOUNTINFO_PATH: str = "/proc/self/mountinfo"
+PROC_CGROUP_PATH: str = "/proc/self/cgroup"
+
+DEFAULT_CONTROLLERS: tuple[str, ...] = ("cpu", "cpuset", "memory", "io")
+
+# columns of `CgroupManager.read_stats`, they are added to `JobResult.to_dict`
+CGROUP_STAT_COLUMNS: list[str] = [
+    "cgroup.cpu_seconds",
+    "cgroup.cpu_user_seconds",
+    "cgroup.cpu_system_seconds",
+    "cgroup.cpu_throttled_count",
+    "cgroup.cpu_throttled_seconds",
+    "cgroup.memory_peak_bytes",
+    "cgroup.io_read_bytes",
+    "cgroup.io_write_bytes",
+    "cgroup.io_read_ops",
+    "cgroup.io_write_ops",
+    "cgroup.cpu_pressure_some_seconds",
+    "cgroup.cpu_pressure_full_seconds",
+]
+
+# moves the shell into the cgroup `$0` and replaces it with the job, so the job is
+# accounted from its first instruction and keeps the PID of the spawned process
+_SPAWN_SCRIPT: str = 'echo $$ > "$0" && exec "$@"'
+
+
+def find_cgroup2_mount(mountinfo_path: str = MOUNTINFO_PATH) -> str | None:
+    """Returns the mount point of the cgroup v2 hierarchy or `None` if it is not mounted"""
+    try:
+        with open(mountinfo_path, "r", encoding="utf-8") as mountinfo:
+            for line in mountinfo:
+                # the filesystem type follows the separator ' - '
+                mount_fields, _, filesystem_fields = line.partition(" - ")
+                if filesystem_fields.split(" ", 1)[0] == "cgroup2":
+                    return mount_fields.split(" ")[4]
+    except OSError:
+        pass
+
+    return None
+
+
+def get_own_cgroup(proc_cgroup_path: str = PROC_CGROUP_PATH) -> str | None:
+    """Returns the cgroup v2 path of the current process relative to the mount point, e.g. `/user.slice`"""
+    try:
+        with open(proc_cgroup_path, "r", encoding="utf-8") as proc_cgroup:
+            for line in proc_cgroup:
+                if line.startswith("0::"):
+                    return line.strip().removeprefix("0::")
+    except OSError:
+        pass
+
+    return None
+
+
+def parse_flat_keyed(content: str) -> dict[str, int]:
+    """Parses `key value` lines, e.g. of `cpu.stat`"""
+    values: dict[str, int] = {}
+    for line in content.splitlines():
+        key, _, value = line.strip().partition(" ")
+        if value:
+            values[key] = int(value)
+
+    return values
+
+
+def parse_io_stat(content: str) -> dict[str, int]:
+    """Sums the values of all devices of an `io.stat` file, e.g. `8:0 rbytes=4096 wbytes=0 rios=1 ...`"""
+    values: dict[str, int] = {}
+    for line in content.splitlines():
+        for pair in line.split()[1:]:
+            key, _, value = pair.partition("=")
+            values[key] = values.get(key, 0) + int(value)
+
+    return values
+
+
+def parse_pressure(content: str) -> dict[str, float]:
+    """Parses the `some` and `full` lines of a PSI file into e.g. `some.avg10` and `full.total`"""
+    values: dict[str, float] = {}
+    for line in content.splitlines():
+        kind, *pairs = line.split()
+        for pair in pairs:
+            key, _, value = pair.partition("=")
+            values[f"{kind}.{key}"] = float(value)
+
+    return values
+
+
+def _read_file(file_path: str) -> str | None:
+    try:
+        with open(file_path, "r", encoding="utf-8") as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def _write_file(file_path: str, value: str) -> None:
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write(value)
+
+
+@dataclass(frozen=True)
+class CgroupLimits:
+    """
+    Resource limits of a job cgroup, limits that are `None` are not set.
+
+    Attributes:
+        cpus (float | None): CPU bandwidth in CPUs, e.g. 2.5, written to `cpu.max`. Defaults to None.
+        cpuset (str | None): CPUs the job may run on, e.g. '0-3,8', written to `cpuset.cpus`. Defaults to None.
+        memory_max (int | None): Memory limit in bytes, written to `memory.max`. Defaults to None.
+        cpu_period_us (int): Period of the CPU bandwidth limit in microseconds. Defaults to 100000.
+    """
+
+    cpus: float | None = None
+    cpuset: str | None = None
+    memory_max: int | None = None
+    cpu_period_us: int = 100000
+
+    def get_files(self) -> dict[str, str]:
+        """Returns the interface files of the limits and their values"""
+        files: dict[str, str] = {}
+        if self.cpus is not None:
+            if self.cpus <= 0:
+                raise ValueError(f"the CPU limit has to be positive, got {self.cpus}")
+            files["cpu.max"] = f"{round(self.cpus * self.cpu_period_us)} {self.cpu_period_us}"
+        if self.cpuset is not None:
+            files["cpuset.cpus"] = self.cpuset
+        if self.memory_max is not None:
+            files["memory.max"] = str(self.memory_max)
+
+        return files
+
+    def get_controllers(self) -> set[str]:
+        """Returns the controllers that are required to enforce the limits"""
+        return {file_name.split(".")[0] for file_name in self.get_files()}
+
+
+class CgroupManager:
+    """Creates, reads and removes the transient cgroups of jobs.
+
+    The manager creates the cgroup `greem-<pid>` below `parent` and enables the available
+    `controllers` for it. Without a `parent`, the cgroup of the current process is used;
+    as a cgroup with processes can not pass controllers to its children, the current
+    process is moved into the leaf cgroup `greem-runner-<pid>` first and moved back
+    by `close`.
+
+    Example:
+        >>> cgroup_manager = CgroupManager.try_create(limits=CgroupLimits(cpus=4))
+        >>> results = JobRunner(max_concurrency=2, cgroup_manager=cgroup_manager).run(jobs)
+        >>> results[0].to_dict()['cgroup.cpu_seconds']
+        61.2
+    """
+
+    def __init__(
+        self,
+        parent: str | None = None,
+        limits: CgroupLimits | None = None,
+        controllers: tuple[str, ...] = DEFAULT_CONTROLLERS,
+    ) -> None:
+        if parent is None:
+            mount_point: str | None = find_cgroup2_mount()
+            own_cgroup: str | None = get_own_cgroup()
+            if mount_point is None or own_cgroup is None:
+                raise FileNotFoundError("no cgroup v2 hierarchy is mounted")
+            parent = os.path.join(mount_point, own_cgroup.lstrip("/"))
+            # only the root cgroup may contain processes and pass controllers to its children
+            move_self: bool = own_cgroup != "/"
+        else:
+            move_self = False
+
+        self.parent: str = parent
+        self.limits: CgroupLimits = limits if limits is not None else CgroupLimits()
+        self.path: str = os.path.join(parent, f"greem-{os.getpid()}")
+        self._job_count: int = 0
+        self._runner_path: str | None = None
+        self._parent_controllers: set[str] = set()
+        self.controllers: set[str] = set()
+
+        wanted: set[str] = set(controllers) | self.limits.get_controllers()
+        try:
+            if move_self and len(wanted & self._read_controllers(parent)) > 0:
+                self._runner_path = os.path.join(parent, f"greem-runner-{os.getpid()}")
+                os.makedirs(self._runner_path, exist_ok=True)
+                _write_file(os.path.join(self._runner_path, "cgroup.procs"), str(os.getpid()))
+
+            self._parent_controllers = self._enable_controllers(parent, wanted)
+            os.makedirs(self.path, exist_ok=True)
+            self.controllers = self._enable_controllers(self.path, wanted)
+
+            missing: set[str] = self.limits.get_controllers() - self.controllers
+            if len(missing) > 0:
+                raise PermissionError(f"the controllers {sorted(missing)} required by {self.limits} are not delegated")
+        except OSError:
+            # the jobs run without isolation, the process returns to its cgroup
+            self.close()
+            raise
+
+    @classmethod
+    def try_create(cls, **kwargs) -> "CgroupManager | None":
+        """Returns a new manager or `None` if cgroups are not available, see `CgroupManager`"""
+        try:
+            return cls(**kwargs)
+        except OSError as err:
+            print(f"cgroup v2 isolation is not available, jobs run without it: {err}")
+            return None
+
+    def create_job_cgroup(self, limits: CgroupLimits | None = None) -> str:
+        """Creates the cgroup of a job with `limits` (by default the limits of the manager) and returns its path"""
+        limits = limits if limits is not None else self.limits
+        missing: set[str] = limits.get_controllers() - self.controllers
+        if len(missing) > 0:
+            raise PermissionError(f"the controllers {sorted(missing)} required by {limits} are not delegated")
+
+        self._job_count += 1
+        path: str = os.path.join(self.path, f"job-{self._job_count}")
+        os.mkdir(path)
+        for file_name, value in limits.get_files().items():
+            _write_file(os.path.join(path, file_name), value)
+
+        return path
+
+    def wrap_argv(self, path: str, argv: list[str]) -> list[str]:
+        """Returns an argv that moves itself into the cgroup `path` before it executes `argv`"""
+        return ["/bin/sh", "-c", _SPAWN_SCRIPT, os.path.join(path, "cgroup.procs"), *argv]
+
+    def read_stats(self, path: str) -> dict[str, float]:
+        """Returns the resource usage of a job cgroup with the `CGROUP_STAT_COLUMNS`, missing files are `NaN`"""
+        stats: dict[str, float] = dict.fromkeys(CGROUP_STAT_COLUMNS, float("nan"))
+
+        cpu_stat: str | None = _read_file(os.path.join(path, "cpu.stat"))
+        if cpu_stat is not None:
+            cpu_values: dict[str, int] = parse_flat_keyed(cpu_stat)
+            stats["cgroup.cpu_seconds"] = cpu_values.get("usage_usec", float("nan")) / 1e6
+            stats["cgroup.cpu_user_seconds"] = cpu_values.get("user_usec", float("nan")) / 1e6
+            stats["cgroup.cpu_system_seconds"] = cpu_values.get("system_usec", float("nan")) / 1e6
+            stats["cgroup.cpu_throttled_count"] = cpu_values.get("nr_throttled", float("nan"))
+            stats["cgroup.cpu_throttled_seconds"] = cpu_values.get("throttled_usec", float("nan")) / 1e6
+
+        memory_peak: str | None = _read_file(os.path.join(path, "memory.peak"))
+        if memory_peak is not None:
+            stats["cgroup.memory_peak_bytes"] = float(memory_peak.strip())
+
+        io_stat: str | None = _read_file(os.path.join(path, "io.stat"))
+        if io_stat is not None:
+            io_values: dict[str, int] = parse_io_stat(io_stat)
+            stats["cgroup.io_read_bytes"] = io_values.get("rbytes", 0)
+            stats["cgroup.io_write_bytes"] = io_values.get("wbytes", 0)
+            stats["cgroup.io_read_ops"] = io_values.get("rios", 0)
+            stats["cgroup.io_write_ops"] = io_values.get("wios", 0)
+
+        # pressure stall information requires CONFIG_PSI
+        cpu_pressure: str | None = _read_file(os.path.join(path, "cpu.pressure"))
+        if cpu_pressure is not None:
+            pressure_values: dict[str, float] = parse_pressure(cpu_pressure)
+            stats["cgroup.cpu_pressure_some_seconds"] = pressure_values.get("some.total", float("nan")) / 1e6
+            stats["cgroup.cpu_pressure_full_seconds"] = pressure_values.get("full.total", float("nan")) / 1e6
+
+        return stats
+
+    def remove_job_cgroup(self, path: str) -> None:
+        """Removes the cgroup of a finished job"""
+        try:
+            os.rmdir(path)
+        except OSError:
+            # e.g. a child process that outlived the job is still running in it
+            pass
+
+    def close(self) -> None:
+        """Removes the cgroup of the manager, all job cgroups have to be removed before.
+
+        If the current process was moved into `greem-runner-<pid>`, the controllers enabled for
+        the parent are disabled again, so the process can return to its original cgroup.
+        """
+        try:
+            os.rmdir(self.path)
+        except OSError:
+            pass
+
+        if self._runner_path is None:
+            return
+
+        try:
+            for controller in sorted(self._parent_controllers):
+                _write_file(os.path.join(self.parent, "cgroup.subtree_control"), f"-{controller}")
+            _write_file(os.path.join(self.parent, "cgroup.procs"), str(os.getpid()))
+            os.rmdir(self._runner_path)
+        except OSError as err:
+            # e.g. another process enabled controllers for the parent in the meantime
+            print(f"The runner could not leave its cgroup {self._runner_path}: {err}")
+        self._runner_path = None
+
+    def _read_controllers(self, path: str) -> set[str]:
+        return set((_read_file(os.path.join(path, "cgroup.controllers")) or "").split())
+
+    def _enable_controllers(self, path: str, controllers: set[str]) -> set[str]:
+        """Enables the available controllers for the children of `path` and returns the enabled ones"""
+        enabled: set[str] = set()
+        for controller in sorted(controllers & self._read_controllers(path)):
+            try:
+                _write_file(os.path.join(path, "cgroup.subtree_control"), f"+{controller}")
+                enabled.add(controller)
+            except OSError:
+                # e.g. the cgroup still contains processes or the controller is not delegated
+                pass
+
+        return enabled
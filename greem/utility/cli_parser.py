@@ -1,4 +1,5 @@
 import argparse
+from greem.utility.cgroups import CgroupLimits
 from greem.utility.ffmpeg import QUIET_FLAG, CUDA_ENC_FLAG
 
 
@@ -61,6 +62,55 @@ class CLIParser():
             default=False,
             help='Enable/Disable sending notifications via NTFY'
         )
+        self.parser.add_argument(
+            '--jobs',
+            '--j',
+            type=int,
+            default=1,
+            help='Maximum number of FFMPEG jobs that are executed concurrently'
+        )
+        self.parser.add_argument(
+            '--resume',
+            action=argparse.BooleanOptionalAction,
+            default=True,
+            help='Enable/Disable skipping work that was already recorded in the campaign journal'
+        )
+        self.parser.add_argument(
+            '--rapl',
+            action=argparse.BooleanOptionalAction,
+            default=False,
+            help='Reads the CPU and RAM energy directly from the Intel RAPL counters instead of code carbon'
+        )
+        self.parser.add_argument(
+            '--metrics-port',
+            type=int,
+            default=None,
+            help='Serves live campaign metrics in the Prometheus text format on this local port'
+        )
+        self.parser.add_argument(
+            '--cgroups',
+            action=argparse.BooleanOptionalAction,
+            default=False,
+            help='Runs every FFMPEG job in its own cgroup v2 to account its CPU, memory and I/O'
+        )
+        self.parser.add_argument(
+            '--job-cpus',
+            type=float,
+            default=None,
+            help='Limits the CPU bandwidth of every FFMPEG job to this number of CPUs (requires --cgroups)'
+        )
+        self.parser.add_argument(
+            '--job-cpuset',
+            type=str,
+            default=None,
+            help='Restricts every FFMPEG job to these CPUs, e.g. 0-3 (requires --cgroups)'
+        )
+        self.parser.add_argument(
+            '--perf-counters',
+            action=argparse.BooleanOptionalAction,
+            default=False,
+            help='Captures the hardware performance counters of every FFMPEG job with perf stat'
+        )
 
     def is_cuda_enabled(self) -> bool:
         """Cuda Enabled is used to add the flag for GPU hardware acceleration.
@@ -112,6 +162,125 @@ class CLIParser():
     def is_ntfy_enabled(self) -> bool:
         return self.arguments.ntfy
 
+    def get_max_concurrent_jobs(self) -> int:
+        """Maximum number of FFMPEG jobs the job runner executes at the same time.
+
+        Used by the testbeds that only produce files, e.g. `segment_encoding_just_create.py`
+        and `download_full_input_files.py`. The measuring sequential testbeds always run one
+        job at a time, so that every sample belongs to exactly one encode.
+
+        Flags:
+            * `--jobs <n>`
+            * `--j <n>`
+
+        Default:
+            `1`
+
+        Usage:
+            `$ python <python_file_name>.py --jobs 4`
+
+        Returns:
+            `int`: number of concurrent jobs, at least `1`
+        """
+        return max(1, self.arguments.jobs)
+
+    def is_resume_enabled(self) -> bool:
+        """Resume is used to continue a campaign from its journal instead of starting from zero.
+
+        Flags:
+            * `--resume` -> `True`
+            * `--no-resume` -> `False`
+
+        Default:
+            `True`
+
+        Returns:
+            `bool`: `False` if an existing journal should be discarded
+        """
+        return self.arguments.resume
+
+    def is_rapl_enabled(self) -> bool:
+        """RAPL is used to measure the CPU and RAM energy with the native RAPL reader,
+        which supports much shorter measurement intervals than code carbon.
+
+        Flags:
+            * `--rapl` -> `True`
+            * `--no-rapl` -> `False`
+
+        Default:
+            `False`
+
+        Returns:
+            `bool`: `True` if the energy counters should be read directly
+        """
+        return self.arguments.rapl
+
+    def get_metrics_port(self) -> int | None:
+        """Port of the local metrics exporter, see `greem.monitoring.metrics_exporter`.
+
+        Flags:
+            * `--metrics-port <port>`
+
+        Default:
+            `None`, no metrics are served
+
+        Usage:
+            `$ python <python_file_name>.py --metrics-port 9464`
+
+        Returns:
+            `int | None`: the port or `None` if the exporter is disabled
+        """
+        return self.arguments.metrics_port
+
+    def is_cgroups_enabled(self) -> bool:
+        """Cgroups are used to run every job in its own cgroup v2, see `greem.utility.cgroups`.
+
+        Flags:
+            * `--cgroups` -> `True`
+            * `--no-cgroups` -> `False`
+
+        Default:
+            `False`
+
+        Returns:
+            `bool`: `True` if the jobs should be isolated and accounted by cgroups
+        """
+        return self.arguments.cgroups
+
+    def get_job_cgroup_limits(self) -> CgroupLimits:
+        """Limits of the cgroup of every job.
+
+        Flags:
+            * `--job-cpus <cpus>`: CPU bandwidth, e.g. `2.5`
+            * `--job-cpuset <cpus>`: CPUs, e.g. `0-3`
+
+        Default:
+            no limits
+
+        Usage:
+            `$ python <python_file_name>.py --cgroups --job-cpus 4`
+
+        Returns:
+            `CgroupLimits`: the limits of the job cgroups
+        """
+        return CgroupLimits(cpus=self.arguments.job_cpus, cpuset=self.arguments.job_cpuset)
+
+    def is_perf_counters_enabled(self) -> bool:
+        """Perf counters are used to capture the instructions, cycles, cache and branch misses of every job
+        with `perf stat`, or its scheduler statistics if perf events are not available.
+
+        Flags:
+            * `--perf-counters` -> `True`
+            * `--no-perf-counters` -> `False`
+
+        Default:
+            `False`
+
+        Returns:
+            `bool`: `True` if the counters should be captured
+        """
+        return self.arguments.perf_counters
+
     def get_ffmpeg_cuda_flag(self) -> str:
         return CUDA_ENC_FLAG if self.is_cuda_enabled() else ''
 
@@ -7,6 +7,7 @@ representing resolutions and representations, and generating encoding and decodi
 
 Classes:
     EncodingVariant: Enum representing encoding variants (SEQUENTIAL, BATCH).
+    Pacing: Enum representing how fast the input is read (LIVE, VOD).
     Resolution: Pydantic BaseModel representing a video resolution.
     Representation: Pydantic BaseModel representing a video representation, inheriting from Resolution.
     EncodingConfigDTO: Pydantic BaseModel representing a single encoding configuration.
@@ -36,6 +37,22 @@ class EncodingVariant(Enum):
     BATCH = 2
 
 
+class Pacing(str, Enum):
+    """Pacing: Enum representing how fast the input of an encoding is read.
+
+    LIVE reads the input at its native frame rate (`-re`), like a live stream.
+    The encoder is throttled to wall clock speed, so the energy includes idle time.
+    VOD reads the input as fast as possible, like a video on demand transcode.
+    """
+
+    LIVE = "live"
+    VOD = "vod"
+
+    def get_input_flag(self) -> str:
+        """Returns the FFmpeg input flag of the pacing, e.g. `-re` for LIVE"""
+        return "-re" if self == Pacing.LIVE else ""
+
+
 # Sources:
 # * https://stackoverflow.com/questions/51286748/make-the-python-json-encoder-support-pythons-new-dataclasses
 
@@ -151,6 +168,7 @@ class EncodingConfigDTO(BaseModel):
         segment_duration(int): The segment duration for encoding. Defaults to 4.
         framerate(int): The frame rate to be used during encoding. Defaults to 0.
         is_dash(bool): Flag indicating if DASH(Dynamic Adaptive Streaming over HTTP) is used. Defaults to False.
+        pacing(Pacing): Whether the input is read in real time or as fast as possible. Defaults to LIVE.
 
     Methods:
         get_output_directory(self) -> str:
@@ -163,6 +181,7 @@ class EncodingConfigDTO(BaseModel):
     segment_duration: int = 4
     framerate: int = 0
     is_dash: bool = False
+    pacing: Pacing = Pacing.LIVE
 
     def get_output_directory(
         self,
@@ -173,6 +192,9 @@ class EncodingConfigDTO(BaseModel):
 
         if self.framerate is not None and self.framerate > 0:
             output_dir = f"{output_dir}/{self.framerate}fps"
+        # LIVE keeps the paths of the encodes that were created before the pacing existed
+        if self.pacing != Pacing.LIVE:
+            output_dir = f"{output_dir}/{self.pacing.value}"
 
         return output_dir
 
@@ -188,6 +210,7 @@ class EncodingConfig(BaseModel):
         segment_duration(list[int]): List of segment durations for encoding.
         framerate(list[int]): List of frame rates to be used during encoding.
         is_dash(bool): Flag indicating if DASH(Dynamic Adaptive Streaming over HTTP) is used. Defaults to False.
+        pacing(list[Pacing]): List of pacings the videos are encoded with. Defaults to `[Pacing.LIVE]`.
 
     Methods:
         from_file(cls, file_path: str) -> 'EncodingConfig':
@@ -207,6 +230,7 @@ class EncodingConfig(BaseModel):
     segment_duration: list[int]
     framerate: list[int]
     is_dash: bool = False
+    pacing: list[Pacing] = [Pacing.LIVE]
 
     @classmethod
     def from_file(cls: Type["EncodingConfig"], file_path: str) -> "EncodingConfig":
@@ -235,7 +259,7 @@ class EncodingConfig(BaseModel):
 
         segment_duration: list[int] = self.segment_duration if self.is_dash else [4]
 
-        for duration, preset, representation, codec, fr in itertools.product(
+        for duration, preset, representation, codec, fr, pacing in itertools.product(
             segment_duration,
             self.presets,
             self.representations,
@@ -243,6 +267,7 @@ class EncodingConfig(BaseModel):
             self.framerate
             if self.framerate is not None and len(self.framerate) > 0
             else [],
+            self.pacing,
         ):
             enc_dto = EncodingConfigDTO(
                 codec=codec,
@@ -251,6 +276,7 @@ class EncodingConfig(BaseModel):
                 segment_duration=duration,
                 framerate=fr,
                 is_dash=self.is_dash,
+                pacing=pacing,
             )
             encoding_dtos.append(enc_dto)
 
@@ -1,5 +1,25 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
 import pandas as pd
 
+from greem.utility.job_runner import JobResult
+from greem.utility.timeline import get_job_sample_indices
+
+if TYPE_CHECKING:
+    from greem.utility.idle_baseline import IdleBaseline
+
+ENERGY_COLUMNS: list[str] = [
+    'cpu_energy', 'gpu_energy', 'ram_energy', 'energy_consumed', 'emissions'
+]
+
+# energy of the CPU package, it is shared by CPU time in `apportion_monitoring_by_cpu_time`
+CPU_ENERGY_COLUMNS: list[str] = ['cpu_energy']
+RAPL_PACKAGE_COLUMN_PREFIX: str = 'rapl.package-'
+
+# components that add up to `energy_consumed`
+ENERGY_COMPONENT_COLUMNS: list[str] = ['cpu_energy', 'gpu_energy', 'ram_energy']
+
 def get_dataframe_from_csv(csv_path: str) -> pd.DataFrame:
     '''Returns a pandas dataframe from a CSV file'''
     return pd.read_csv(csv_path)
@@ -63,16 +83,346 @@ def merge_benchmark_and_monitoring_dataframes(
     merge_df = pd.merge(encoding_results, copy_df, left_index=True, right_index=True)
     return merge_df
 
+def apportion_monitoring_to_jobs(
+    monitoring_df: pd.DataFrame,
+    job_results: list[JobResult],
+    value_columns: list[str] = ENERGY_COLUMNS,
+    time_column: str = 'monotonic_time',
+    duration_column: str = 'duration',
+) -> pd.DataFrame:
+    """Splits interval measurements (e.g. the energy of a `HardwareTracker` sample) between concurrently running jobs.
+
+    Every measurement covers the interval `[time - duration, time]`. Its values are shared between
+    all jobs overlapping that interval, weighted by the length of each job's overlap, so the
+    returned values of all jobs add up to the measured values while any job was running.
+
+    Parameters
+    ----------
+    monitoring_df : pd.DataFrame
+        Measurements, e.g. from `HardwareTracker.to_dataframe()`
+    job_results : list[JobResult]
+        The jobs that were executed while the measurements were taken
+    value_columns : list[str], optional
+        Additive columns that are apportioned, by default `ENERGY_COLUMNS`
+    time_column : str, optional
+        Monotonic end time of each measurement interval, by default 'monotonic_time'
+    duration_column : str, optional
+        Length of each measurement interval in seconds, by default 'duration'
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per job, containing `JobResult.to_dict()` and the apportioned values
+    """
+    if len(job_results) == 0:
+        return pd.DataFrame()
+
+    value_columns = [col for col in value_columns if col in monitoring_df.columns]
+
+    sample_end = monitoring_df[time_column].to_numpy(dtype=float)
+    sample_start = sample_end - monitoring_df[duration_column].to_numpy(dtype=float)
+    job_start = np.array([r.start_monotonic for r in job_results], dtype=float)
+    job_end = np.array([r.end_monotonic for r in job_results], dtype=float)
+
+    # overlap between each sample interval and each job, shape: (samples, jobs)
+    overlap = np.clip(
+        np.minimum(sample_end[:, None], job_end[None, :])
+        - np.maximum(sample_start[:, None], job_start[None, :]),
+        0,
+        None,
+    )
+    overlap_sum = overlap.sum(axis=1, keepdims=True)
+    weights = np.divide(overlap, overlap_sum, out=np.zeros_like(overlap), where=overlap_sum > 0)
+
+    values = monitoring_df[value_columns].to_numpy(dtype=float)
+    job_values = weights.T @ np.nan_to_num(values)
+
+    job_df = pd.DataFrame([r.to_dict() for r in job_results])
+    job_df[value_columns] = job_values
+    job_df['sample.count'] = (overlap > 0).sum(axis=0)
+
+    return job_df
+
+
+def integrate_monitoring_over_intervals(
+    monitoring_df: pd.DataFrame,
+    interval_df: pd.DataFrame,
+    value_columns: list[str] = ENERGY_COLUMNS,
+    start_column: str = 'start_monotonic',
+    end_column: str = 'end_monotonic',
+    time_column: str = 'monotonic_time',
+    duration_column: str = 'duration',
+) -> pd.DataFrame:
+    """Integrates interval measurements of a continuous monitor over the phases or jobs of a testbed.
+
+    Every measurement covers the interval `[time - duration, time]` and its values are assumed
+    to be spread evenly over it. A phase receives the share of every measurement that overlaps
+    it, so the phase boundaries do not have to coincide with the measurements. In contrast to
+    `apportion_monitoring_to_jobs`, time between the phases is not assigned to any phase.
+    A measurement has to be taken after the last phase ended, otherwise its end is not covered.
+
+    Parameters
+    ----------
+    monitoring_df : pd.DataFrame
+        Measurements, e.g. from `HardwareTracker.to_dataframe()`
+    interval_df : pd.DataFrame
+        Phases or jobs, e.g. from `PhaseRecorder.to_dataframe()` or rows of `JobResult.to_dict()`
+    value_columns : list[str], optional
+        Additive columns that are integrated, by default `ENERGY_COLUMNS`
+    start_column : str, optional
+        Monotonic start of each phase, by default 'start_monotonic'
+    end_column : str, optional
+        Monotonic end of each phase, by default 'end_monotonic'
+    time_column : str, optional
+        Monotonic end time of each measurement interval, by default 'monotonic_time'
+    duration_column : str, optional
+        Length of each measurement interval in seconds, by default 'duration'
+
+    Returns
+    -------
+    pd.DataFrame
+        A copy of `interval_df` with the integrated values, the number of overlapping measurements
+        (`sample.count`) and the share of the phase that is covered by measurements (`sample.coverage`)
+    """
+    value_columns = [col for col in value_columns if col in monitoring_df.columns]
+    result_df = interval_df.copy()
+    if len(interval_df) == 0:
+        return result_df.assign(**{col: pd.Series(dtype=float) for col in [*value_columns, 'sample.count', 'sample.coverage']})
+
+    sample_end = monitoring_df[time_column].to_numpy(dtype=float)
+    sample_duration = monitoring_df[duration_column].to_numpy(dtype=float)
+    sample_start = sample_end - sample_duration
+    phase_start = interval_df[start_column].to_numpy(dtype=float)
+    phase_end = interval_df[end_column].to_numpy(dtype=float)
+
+    # only samples that end within a phase or at most one measurement interval after it can overlap it,
+    # so the overlaps are computed for these (phase, sample) pairs instead of all samples times all phases
+    finite_durations = sample_duration[np.isfinite(sample_duration)]
+    max_duration: float = max(float(finite_durations.max()), 0.0) if len(finite_durations) > 0 else 0.0
+    phase_idx, sample_idx = get_job_sample_indices(sample_end, phase_start, phase_end + max_duration)
+    overlap = np.nan_to_num(np.clip(
+        np.minimum(sample_end[sample_idx], phase_end[phase_idx])
+        - np.maximum(sample_start[sample_idx], phase_start[phase_idx]),
+        0,
+        None,
+    ))
+    pair_duration = sample_duration[sample_idx]
+    weights = np.divide(overlap, pair_duration, out=np.zeros_like(overlap), where=pair_duration > 0)
+
+    values = np.nan_to_num(monitoring_df[value_columns].to_numpy(dtype=float))
+    phase_values = np.zeros((len(interval_df), len(value_columns)))
+    np.add.at(phase_values, phase_idx, weights[:, None] * values[sample_idx])
+    result_df[value_columns] = phase_values
+    result_df['sample.count'] = np.bincount(phase_idx[overlap > 0], minlength=len(interval_df))
+    phase_length = phase_end - phase_start
+    result_df['sample.coverage'] = np.divide(
+        np.bincount(phase_idx, weights=overlap, minlength=len(interval_df)),
+        phase_length,
+        out=np.ones_like(phase_length),
+        where=phase_length > 0,
+    )
+
+    return result_df
+
+
+def apportion_monitoring_by_cpu_time(
+    monitoring_df: pd.DataFrame,
+    job_results: list[JobResult],
+    process_df: pd.DataFrame,
+    value_columns: list[str] = ENERGY_COLUMNS,
+    time_column: str = 'monotonic_time',
+    duration_column: str = 'duration',
+) -> pd.DataFrame:
+    """Splits interval measurements between concurrently running jobs, the CPU energy by CPU time.
+
+    Like `apportion_monitoring_to_jobs`, but the CPU energy (`CPU_ENERGY_COLUMNS` and the RAPL
+    package columns) of every measurement is shared by the CPU time each job consumed in its
+    interval. The CPU time of a job is interpolated from the samples of a `ProcessAccountant`,
+    starting at zero when the job is spawned and ending at `JobResult.cpu_seconds`.
+    Intervals without any CPU time fall back to the overlap weights, the other values are
+    always shared by overlap. `energy_consumed` is the sum of the apportioned energy components.
+
+    Parameters
+    ----------
+    monitoring_df : pd.DataFrame
+        Measurements, e.g. from `HardwareTracker.to_dataframe()`
+    job_results : list[JobResult]
+        The jobs that were executed while the measurements were taken
+    process_df : pd.DataFrame
+        Samples of the jobs' processes, e.g. from `ProcessAccountant.to_dataframe()`
+    value_columns : list[str], optional
+        Additive columns that are apportioned, by default `ENERGY_COLUMNS`
+    time_column : str, optional
+        Monotonic end time of each measurement interval, by default 'monotonic_time'
+    duration_column : str, optional
+        Length of each measurement interval in seconds, by default 'duration'
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per job, containing `JobResult.to_dict()`, the apportioned values and the
+        bytes each job read from (`io_read_bytes`) and wrote to (`io_write_bytes`) storage
+    """
+    cpu_columns: list[str] = [
+        col for col in monitoring_df.columns
+        if (col in CPU_ENERGY_COLUMNS and col in value_columns)
+        or col.startswith(RAPL_PACKAGE_COLUMN_PREFIX)
+    ]
+    job_df = apportion_monitoring_to_jobs(
+        monitoring_df,
+        job_results,
+        [col for col in value_columns if col not in cpu_columns],
+        time_column,
+        duration_column,
+    )
+    if len(job_results) == 0:
+        return job_df
+
+    sample_end = monitoring_df[time_column].to_numpy(dtype=float)
+    sample_start = sample_end - monitoring_df[duration_column].to_numpy(dtype=float)
+
+    # CPU time of each job in each measurement interval, shape: (samples, jobs)
+    cpu_time = np.zeros((len(monitoring_df), len(job_results)))
+    io_bytes = np.zeros((len(job_results), 2))
+    for job_idx, result in enumerate(job_results):
+        job_samples = process_df[
+            (process_df['pid'] == result.pid)
+            & (process_df['monotonic_time'] >= result.start_monotonic)
+            & (process_df['monotonic_time'] <= result.end_monotonic)
+        ].sort_values('monotonic_time')
+
+        times = np.concatenate(
+            [[result.start_monotonic], job_samples['monotonic_time'], [result.end_monotonic]]
+        )
+        cpu_seconds = np.maximum.accumulate(
+            np.concatenate([[0.0], job_samples['cpu_seconds'], [result.cpu_seconds]])
+        )
+        cpu_time[:, job_idx] = np.interp(sample_end, times, cpu_seconds) - np.interp(
+            sample_start, times, cpu_seconds
+        )
+
+        if len(job_samples) > 0:
+            io_bytes[job_idx] = job_samples[['read_bytes', 'write_bytes']].iloc[-1]
+
+    overlap = np.clip(
+        np.minimum(sample_end[:, None], job_df['end_monotonic'].to_numpy(dtype=float)[None, :])
+        - np.maximum(sample_start[:, None], job_df['start_monotonic'].to_numpy(dtype=float)[None, :]),
+        0,
+        None,
+    )
+    cpu_time_sum = cpu_time.sum(axis=1, keepdims=True)
+    overlap_sum = overlap.sum(axis=1, keepdims=True)
+    weights = np.where(
+        cpu_time_sum > 0,
+        np.divide(cpu_time, cpu_time_sum, out=np.zeros_like(cpu_time), where=cpu_time_sum > 0),
+        np.divide(overlap, overlap_sum, out=np.zeros_like(overlap), where=overlap_sum > 0),
+    )
+
+    if len(cpu_columns) > 0:
+        values = monitoring_df[cpu_columns].to_numpy(dtype=float)
+        job_df[cpu_columns] = weights.T @ np.nan_to_num(values)
+
+    energy_components: list[str] = [col for col in ENERGY_COMPONENT_COLUMNS if col in job_df.columns]
+    if 'energy_consumed' in job_df.columns and len(energy_components) > 0:
+        job_df['energy_consumed'] = job_df[energy_components].sum(axis=1)
+
+    job_df['io_read_bytes'], job_df['io_write_bytes'] = io_bytes[:, 0], io_bytes[:, 1]
+
+    return job_df
+
+
+def add_energy_per_progress(
+    result_df: pd.DataFrame,
+    progress_df: pd.DataFrame,
+    energy_column: str = 'energy_consumed',
+) -> pd.DataFrame:
+    """Adds the encoded frames and seconds of each job and its energy per frame and per encoded second.
+
+    Parameters
+    ----------
+    result_df : pd.DataFrame
+        One row per job with its `pid`, e.g. from `apportion_monitoring_by_cpu_time`, modified in place
+    progress_df : pd.DataFrame
+        Progress samples of the jobs, see `ProgressMonitor.to_dataframe`
+    energy_column : str, optional
+        Column of the consumed energy, by default 'energy_consumed'
+
+    Returns
+    -------
+    pd.DataFrame
+        The modified `result_df`, jobs without progress samples have missing values
+    """
+    final_progress = progress_df.groupby('pid')[['frame', 'out_time_seconds']].max()
+    pids = result_df['pid'].astype(float)
+    result_df['frames'] = pids.map(final_progress['frame']).to_numpy()
+    result_df['encoded_seconds'] = pids.map(final_progress['out_time_seconds']).to_numpy()
+
+    if energy_column in result_df.columns:
+        result_df['energy_per_frame'] = result_df[energy_column] / result_df['frames']
+        result_df['energy_per_encoded_second'] = result_df[energy_column] / result_df['encoded_seconds']
+
+    return result_df
+
+
+def add_realtime_factor(
+    result_df: pd.DataFrame,
+    content_seconds,
+    elapsed_column: str = 'elapsed_seconds',
+    energy_column: str = 'energy_consumed',
+) -> pd.DataFrame:
+    """Adds the achieved speed multiple of an encoding to its results.
+
+    The `realtime_factor` is the number of encoded content seconds per wall clock second,
+    i.e. `1.0` for an encoding paced in real time. If the results contain the consumed
+    energy, the `energy_per_content_second` is added as well.
+
+    Parameters
+    ----------
+    result_df : pd.DataFrame
+        Results containing the elapsed time of the encoding, modified in place
+    content_seconds : float | list[float]
+        Duration of the encoded video in seconds, one value per row or one for all rows
+    elapsed_column : str, optional
+        Column of the wall clock time in seconds, by default 'elapsed_seconds'
+    energy_column : str, optional
+        Column of the consumed energy, by default 'energy_consumed'
+
+    Returns
+    -------
+    pd.DataFrame
+        The provided dataframe
+    """
+    result_df['content_seconds'] = content_seconds
+    result_df['realtime_factor'] = result_df['content_seconds'] / result_df[elapsed_column]
+
+    if energy_column in result_df.columns:
+        result_df['energy_per_content_second'] = (
+            result_df[energy_column] / result_df['content_seconds']
+        )
+
+    return result_df
+
+
 def add_idle_energy_to_encoding_results(
     encoding_results_df: pd.DataFrame,
-    idle_df: pd.DataFrame
+    idle_baseline: 'IdleBaseline | pd.DataFrame'
 ) -> None:
-    idle_df = idle_df.transpose()
-    idle_df_seconds = float(idle_df['cpu_energy']) / float(idle_df['cpu_energy_per_second'])
-    cpu_idle_energy_per_second = float(idle_df['cpu_energy_per_second'])
-    gpu_idle_energy_per_second = float(idle_df['gpu_energy'][0]) / idle_df_seconds
-    mem_idle_energy_per_second = float(idle_df['ram_energy'][0]) / idle_df_seconds
-    
+    '''Adds the idle energy in kWh of each encoding's `duration` per component.
+
+    `idle_baseline` is an `IdleBaseline` or the one column idle CSV of
+    `IdleTimeEnergyMeasurement.measure_idle_energy_consumption` of older results.
+    '''
+    if isinstance(idle_baseline, pd.DataFrame):
+        idle_series = idle_baseline.iloc[:, 0]
+        idle_df_seconds = float(idle_series['cpu_energy']) / float(idle_series['cpu_energy_per_second'])
+        cpu_idle_energy_per_second = float(idle_series['cpu_energy_per_second'])
+        gpu_idle_energy_per_second = float(idle_series['gpu_energy']) / idle_df_seconds
+        mem_idle_energy_per_second = float(idle_series['ram_energy']) / idle_df_seconds
+    else:
+        cpu_idle_energy_per_second = idle_baseline.get_energy_per_second('cpu')
+        gpu_idle_energy_per_second = idle_baseline.get_energy_per_second('gpu')
+        mem_idle_energy_per_second = idle_baseline.get_energy_per_second('ram')
+
     encoding_results_df['idle_energy.duration.cpu'] = encoding_results_df['duration'] * cpu_idle_energy_per_second
     encoding_results_df['idle_energy.duration.gpu'] = encoding_results_df['duration'] * gpu_idle_energy_per_second
     encoding_results_df['idle_energy.duration.mem'] = encoding_results_df['duration'] * mem_idle_energy_per_second
@@ -2,10 +2,12 @@ import os
 from math import ceil
 from pathlib import Path
 
+import pandas as pd
 from pydantic import BaseModel
 
 from greem.video.video_info import VideoInfo
 from greem.utility.configuration_classes import (
+    Pacing,
     Representation,
     EncodingConfig,
     EncodingConfigDTO,
@@ -156,6 +158,7 @@ def create_dash_ffmpeg_cmd(
     codec: str,
     segment_seconds: int = 4,
     pretty_print: bool = False,
+    pacing: Pacing = Pacing.LIVE,
 ) -> str:
     """Creates dash ffmpeg command with the provided parameters
 
@@ -175,6 +178,8 @@ def create_dash_ffmpeg_cmd(
         the length in seconds of each dash segment, by default 4
     pretty_print : bool, optional
         more readable cmd string formatting for debugging (Note, will not be executable), by default False
+    pacing : Pacing, optional
+        read the input in real time (LIVE) or as fast as possible (VOD), by default LIVE
 
     Returns
     -------
@@ -182,10 +187,10 @@ def create_dash_ffmpeg_cmd(
         ffmpeg command for DASH segments
     """
 
-    cmd: list[str] = [
-        "ffmpeg",
-        f"-re -i {input_file_path}",
-    ]
+    cmd: list[str] = ["ffmpeg"]
+    if pacing.get_input_flag():
+        cmd.append(pacing.get_input_flag())
+    cmd.append(f"-i {input_file_path}")
 
     cmd.extend(get_representation_ffmpeg_flags(renditions, preset, codec))
     fps: int = ceil(VideoInfo(input_file_path).get_fps())
@@ -196,8 +201,9 @@ def create_dash_ffmpeg_cmd(
             f"-keyint_min {keyframe}",
             f"-g {keyframe}",
             f"-seg_duration {segment_seconds}",
-            f'-init_seg_name "{output_dir}/\$RepresentationID\$/init.\$ext\$"',
-            f'-media_seg_name "{output_dir}/\$RepresentationID\$/seg-\$Number%05d\$.\$ext\$"',
+            # single quotes keep the DASH templates intact for shells and `shlex`
+            f"-init_seg_name '{output_dir}/$RepresentationID$/init.$ext$'",
+            f"-media_seg_name '{output_dir}/$RepresentationID$/seg-$Number%05d$.$ext$'",
             '-adaptation_sets "id=0,streams=v  id=1,streams=a"',
             f"-f dash {output_dir}/manifest.mpd",
         ]
@@ -263,15 +269,27 @@ def create_one_video_multiple_representation_command(
     cuda_mode: bool = False,
     quiet_mode: bool = False,
     pretty_print: bool = False,
+    use_filter_complex: bool = False,
+    cascade_scaling: bool = False,
 ) -> str:
-    """_summary_
+    """Creates an FFmpeg command that encodes one video into all representations of `encoding_config`.
+
+    By default each output scales and converts the framerate on its own (`-s` and `-filter:v fps=`,
+    or `-filter:v fps=,scale_cuda=` in `cuda_mode`). With `use_filter_complex` the video is decoded once, the framerate is converted once and a
+    `split` filter graph feeds the scaler of each representation, see `get_split_filter_complex`.
 
     Parameters
     ----------
     input_video_file_path : str
-        _description_
-    output_directories : list[str]
-        _description_
+        path of the video that is encoded
+    output_result_path : str
+        root directory, each output is stored in the output directory of its `EncodingConfigDTO`
+    encoding_config : EncodingConfig
+        the first codec, preset and framerate are used for all representations
+    use_filter_complex : bool, optional
+        decode and convert the framerate once for all representations, by default False
+    cascade_scaling : bool, optional
+        only with `use_filter_complex`, scale each representation from the next larger one, by default False
 
     class EncodingConfig(BaseModel):
     '''Represents the configuration for the video encoding'''
@@ -300,27 +318,45 @@ def create_one_video_multiple_representation_command(
         cmd.append(QUIET_FLAG)
 
     input_name: str = input_video_file_path.split("/")[-1].split(".")[0]
-    cmd.append(f"-i {input_video_file_path}")
 
     codec: str = encoding_config.codecs[0]
     preset: str = encoding_config.presets[0]
     framerate: int = encoding_config.framerate[0]
 
+    # all variants decode on the GPU in cuda mode, so they only differ in how the outputs are scaled
+    if cuda_mode:
+        cmd.append(f"{CUDA_ENC_FLAG} -hwaccel_output_format cuda")
+    cmd.append(f"-i {input_video_file_path}")
+
+    output_labels: list[str] = []
+    if use_filter_complex:
+        filter_complex, output_labels = get_split_filter_complex(
+            encoding_config.representations, framerate, cuda_mode, cascade=cascade_scaling
+        )
+        cmd.append(f'-filter_complex "{filter_complex}"')
+
     # add encoding outputs
-    for r in encoding_config.representations:
+    for idx, r in enumerate(encoding_config.representations):
         height, width, bitrate = r.height, r.width, r.bitrate
         encoding_codec = get_lib_codec(codec, cuda_mode)
         # create DTO for output dir
         dto = EncodingConfigDTO(
             codec=codec, preset=preset, representation=r, framerate=framerate
         )
+        # scaling and framerate are either part of the filter graph or done per output
+        if use_filter_complex:
+            filter_flags: list[str] = [f'-map "{output_labels[idx]}" -map "0:a?"']
+        elif cuda_mode:
+            # frames stay on the GPU, `-s` would insert a software scaler
+            filter_flags = [f'-filter:v "fps={framerate},scale_cuda={width}:{height}"']
+        else:
+            filter_flags = [f"-s {width}x{height}", f"-filter:v fps={framerate}"]
         sub_cmd: list[str] = [
-            f"-s {width}x{height}",
+            *filter_flags,
             "-acodec copy",
             f"-vcodec {encoding_codec}",
             f"-minrate {bitrate}k -maxrate {bitrate}k -bufsize {5*bitrate}k",
             f"-preset {preset}",
-            f"-filter:v fps={framerate}",
             f"{output_result_path}/{dto.get_output_directory()}/{input_name}.mp4",
         ]
 
@@ -330,6 +366,144 @@ def create_one_video_multiple_representation_command(
     return join_string.join(cmd)
 
 
+def get_split_filter_complex(
+    representations: list[Representation],
+    framerate: int = 0,
+    cuda_mode: bool = False,
+    cascade: bool = False,
+) -> tuple[str, list[str]]:
+    """
+    Creates a filter graph that fans one decoded video stream out to all representations.
+
+    The input is decoded once, the framerate is converted once and the result is split
+    into one scaled stream per representation. If `cascade` is set, every representation
+    is scaled from the next larger one instead of the source (e.g. 2160p -> 1080p -> 720p),
+    so each scaler processes fewer pixels.
+
+    Parameters:
+        representations (list[Representation]): The representations the input is scaled to.
+        framerate (int): Target framerate, no conversion if zero. Defaults to 0.
+        cuda_mode (bool): If True, frames stay on the GPU and `scale_cuda` is used. Defaults to False.
+        cascade (bool): If True, scale each representation from the previous (larger) one. Defaults to False.
+
+    Returns:
+        tuple[str, list[str]]: The `-filter_complex` graph and the output labels in the order of `representations`.
+
+    Example:
+        >>> get_split_filter_complex([Representation(bitrate=145, height=360, width=640)], framerate=30)
+        ('[0:v]fps=30,split=1[s0];[s0]scale=640:360[v0]', ['[v0]'])
+        >>> get_split_filter_complex(
+                [Representation(bitrate=145, height=360, width=640), Representation(bitrate=3400, height=720, width=1280)],
+                cascade=True,
+            )
+        ('[0:v]scale=1280:720,split=2[v1][c0];[c0]scale=640:360[v0]', ['[v0]', '[v1]'])
+    """
+    scale_filter: str = "scale_cuda" if cuda_mode else "scale"
+    fps_filter: str = f"fps={framerate}," if framerate is not None and framerate > 0 else ""
+    output_labels: list[str] = [f"[v{idx}]" for idx in range(len(representations))]
+
+    if cascade:
+        # largest representation first, each one is the input of the next smaller one
+        order: list[int] = sorted(
+            range(len(representations)),
+            key=lambda idx: representations[idx].width * representations[idx].height,
+            reverse=True,
+        )
+        filter_chains: list[str] = []
+        chain_input: str = f"[0:v]{fps_filter}"
+        for step, idx in enumerate(order):
+            r = representations[idx]
+            chain: str = f"{chain_input}{scale_filter}={r.width}:{r.height}"
+            if step < len(order) - 1:
+                filter_chains.append(f"{chain},split=2{output_labels[idx]}[c{step}]")
+                chain_input = f"[c{step}]"
+            else:
+                filter_chains.append(f"{chain}{output_labels[idx]}")
+
+        return ";".join(filter_chains), output_labels
+
+    split_labels: list[str] = [f"[s{idx}]" for idx in range(len(representations))]
+
+    filter_chains: list[str] = [
+        f"[0:v]{fps_filter}split={len(representations)}{''.join(split_labels)}"
+    ]
+    for split_label, output_label, r in zip(split_labels, output_labels, representations):
+        filter_chains.append(f"{split_label}{scale_filter}={r.width}:{r.height}{output_label}")
+
+    return ";".join(filter_chains), output_labels
+
+
+def create_split_multiple_representation_command(
+    input_video_file_path: str,
+    output_result_path: str,
+    dto: EncodingConfigDTO,
+    representations: list[Representation],
+    cuda_mode: bool = False,
+    gpu_index: int = 0,
+    quiet_mode: bool = False,
+    pretty_print: bool = False,
+    cascade_scaling: bool = False,
+) -> str:
+    """
+    Creates an FFmpeg command that decodes a video once and encodes it into multiple representations.
+
+    The decoded stream is fanned out with a `split` filter graph, see `get_split_filter_complex`.
+    The representation of `dto` is ignored, `representations` are encoded instead.
+
+    Parameters:
+        input_video_file_path (str): Path to the input video file.
+        output_result_path (str): Root directory, each output is stored in the output directory of its `EncodingConfigDTO`.
+        dto (EncodingConfigDTO): Codec, preset, framerate and segment duration used for every representation.
+        representations (list[Representation]): The representations the video is encoded to.
+        cuda_mode (bool): If True, use CUDA for decoding, scaling and encoding. Defaults to False.
+        gpu_index (int): GPU used if cuda_mode is True. Defaults to 0.
+        quiet_mode (bool): If True, suppresses FFmpeg output. Defaults to False.
+        pretty_print (bool): If True, formats the command string for better readability. Defaults to False.
+        cascade_scaling (bool): If True, each representation is scaled from the next larger one. Defaults to False.
+
+    Returns:
+        str: The constructed FFmpeg command as a string.
+    """
+    cmd: list[str] = [
+        "ffmpeg",
+        "-y",
+        "-hide_banner",
+    ]
+
+    if quiet_mode:
+        cmd.append(QUIET_FLAG)
+
+    if cuda_mode:
+        cmd.append(
+            f"-hwaccel_device {gpu_index} {CUDA_ENC_FLAG} -hwaccel_output_format cuda"
+        )
+
+    cmd.append(f"-i {input_video_file_path}")
+
+    filter_complex, output_labels = get_split_filter_complex(
+        representations, dto.framerate, cuda_mode, cascade=cascade_scaling
+    )
+    cmd.append(f'-filter_complex "{filter_complex}"')
+
+    input_name: str = get_video_name(input_video_file_path)
+    encoding_codec: str = get_lib_codec(dto.codec, cuda_mode)
+
+    for output_label, r in zip(output_labels, representations):
+        output_dto = dto.model_copy(update={"representation": r})
+        bitrate: int = int(r.bitrate)
+        cmd.extend(
+            [
+                f'-map "{output_label}" -map "0:a?" -c:a copy',
+                f"-c:v {encoding_codec} -preset {dto.preset}",
+                f"-b:v {bitrate}k -minrate {bitrate}k -maxrate {bitrate}k -bufsize {5*bitrate}k",
+                f"{output_result_path}/{output_dto.get_output_directory()}/{input_name}.mp4",
+            ]
+        )
+
+    join_string: str = get_join_string(pretty_print)
+    return join_string.join(cmd)
+
+
 def create_multi_video_ffmpeg_command(
     video_input_file_paths: list[str],
     output_directories: list[str],
@@ -338,6 +512,7 @@ def create_multi_video_ffmpeg_command(
     gpu_count: int = 0,
     quiet_mode: bool = False,
     pretty_print: bool = False,
+    gpu_offset: int = 0,
 ) -> str:
     """
     Creates an FFmpeg command for encoding multiple video files.
@@ -348,6 +523,8 @@ def create_multi_video_ffmpeg_command(
         dto (EncodingConfigDTO): Data Transfer Object containing encoding configuration details.
         cuda_mode (bool): If True, use CUDA for hardware acceleration. Defaults to False.
         gpu_count (int): Number of GPUs to use for encoding. Effective only if cuda_mode is True. Defaults to 0.
+        gpu_offset (int): Offset added to the input index before it is mapped to a GPU,
+            used to spread single video commands across GPUs. Defaults to 0.
         quiet_mode (bool): If True, suppresses FFmpeg output. Defaults to False.
         pretty_print (bool): If True, formats the command string for better readability. Defaults to False.
 
@@ -382,7 +559,7 @@ def create_multi_video_ffmpeg_command(
     if cuda_mode and gpu_count > 0:
         cmd.extend(
             [
-                f"-hwaccel_device {idx % gpu_count} {CUDA_ENC_FLAG} -i {video}"
+                f"-hwaccel_device {(idx + gpu_offset) % gpu_count} {CUDA_ENC_FLAG} -i {video}"
                 for idx, video in enumerate(video_input_file_paths)
             ]
         )
@@ -589,44 +766,6 @@ def get_slice_video_command(
     return " ".join(cmd)
 
 
-def get_slice_video_commands(
-    input_video_path: str,
-    output_path: str,
-    output_file_name: str,
-    segment_duration: int,
-) -> list[str]:
-    """
-    - https://unix.stackexchange.com/questions/1670/how-can-i-use-ffmpeg-to-split-mpeg-video-into-10-minute-chunks
-    - https://stackoverflow.com/questions/18444194/cutting-the-videos-based-on-start-and-end-time-using-ffmpeg
-    """
-    video_info = VideoInfo(input_video_path)
-    max_duration = int(video_info.get_total_duration_in_sec())
-    cmd_list: list[str] = []
-
-    for start_segment in range(0, int(max_duration), segment_duration):
-        end_segment = start_segment + segment_duration
-        end_segment = end_segment if end_segment < max_duration else max_duration
-
-        cmd: list[str] = [
-            "ffmpeg -n",
-            "-loglevel error",
-            f"-i {input_video_path}",
-            f"-ss {start_segment}",
-            f"-to {end_segment}",
-            "-map 0",
-            "-strict -2",
-            "-async 1",
-            "-reset_timestamps 1",
-            # TODO
-            # f'{output_path}/{output_file_name}_{segment_duration}s_{start_segment //
-            #                                                         segment_duration}.mp4'
-        ]
-
-        cmd_list.append(" ".join(cmd))
-
-    return cmd_list
-
-
 def get_video_without_extension(video: str) -> str:
     return video.removesuffix(".webm").removesuffix(".mp4").removesuffix(".265")
 
@@ -643,40 +782,38 @@ def prepare_sliced_videos(
     input_dir: str,
     output_dir: str,
     dry_run: bool = False,
-) -> None:
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    max_concurrency: int = 1,
+) -> pd.DataFrame:
+    """Slices every video of `input_dir` into segments of each segment duration of the configs.
 
-    videos: set[str] = set()
-    durations: set[int] = set()
+    Every video is read once per duration, see `greem.video.segmenter.slice_videos`.
 
-    for config in encoding_configs:
-        videos.update(
-            [get_video_without_extension(file) for file in os.listdir(input_dir)]
-        )
+    Returns:
+        pd.DataFrame: manifest of the produced segments, also stored in `output_dir`.
+    """
+    # imported here, the segmenter depends on this module
+    from greem.video.segmenter import slice_videos
 
+    durations: set[int] = set()
+    for config in encoding_configs:
         durations.update(config.segment_duration)
 
-    input_files: list[str] = [
-        file
-        for file in os.listdir(input_dir)
-        if get_video_without_extension(file) in videos
-    ]
-    output_files: list[str] = [
-        get_video_without_extension(file) for file in input_files
+    input_paths: list[str] = [
+        f"{input_dir}/{file}" for file in sorted(os.listdir(input_dir))
+        if get_video_without_extension(file) != file
     ]
 
-    for duration in durations:
-        for input_file, output_file in zip(input_files, output_files):
-            cmd_list = get_slice_video_commands(
-                f"{input_dir}/{input_file}", output_dir, output_file, duration
-            )
+    manifest_df = slice_videos(
+        input_paths,
+        output_dir,
+        sorted(durations),
+        max_concurrency=max_concurrency,
+        dry_run=dry_run,
+    )
+    if dry_run:
+        print(manifest_df.to_string())
 
-            for cmd in cmd_list:
-                if not dry_run:
-                    os.system(cmd)
-                else:
-                    print(cmd)
+    return manifest_df
 
 
 class CodecProcessing(BaseModel):
@@ -713,7 +850,9 @@ class CodecProcessing(BaseModel):
         if self.quiet_mode:
             cmd.append(QUIET_FLAG)
 
-        cmd.append(f"-re -i {input_file_path}")
+        if dto.pacing.get_input_flag():
+            cmd.append(dto.pacing.get_input_flag())
+        cmd.append(f"-i {input_file_path}")
 
         # TODO the code for each codec here
         if dto.codec in ["avc", "h264", "hevc", "h265"]:
@@ -0,0 +1,162 @@
+"""
+Module for streaming the progress of running FFmpeg processes.
+
+FFmpeg started with `-progress pipe:1` periodically writes `key=value` lines to its
+stdout, each block ends with `progress=continue` (or `progress=end`). The `JobRunner`
+of a `ProgressMonitor` adds these arguments to every FFmpeg job, reads stdout without
+blocking while the process is running and passes every completed block to the monitor.
+The samples share the monotonic clock of the `HardwareTracker` and the `JobResult`s,
+so the throughput of a job can be followed while other jobs start or finish and the
+energy of a job can be normalised by its encoded frames and seconds.
+
+Classes:
+    ProgressParser: Incremental parser of the `-progress` output of one process.
+    ProgressMonitor: Stores the progress samples of all running FFmpeg processes.
+
+Functions:
+    is_ffmpeg_command(argv: list[str]) -> bool:
+        Returns `True` if the argv executes FFmpeg.
+    add_progress_args(argv: list[str]) -> list[str]:
+        Returns the argv of an FFmpeg command that reports its progress to stdout.
+    parse_progress_block(block: dict[str, str]) -> list[float]:
+        Converts the values of a progress block into the numeric `PROGRESS_COLUMNS`.
+"""
+
+import os
+import threading
+import time
+
+import pandas as pd
+
+from greem.utility.sampler import SampleRingBuffer
+
+PROGRESS_ARGS: list[str] = ["-progress", "pipe:1", "-nostats"]
+
+# columns of the values of a progress block, see `parse_progress_block`
+PROGRESS_COLUMNS: list[str] = [
+    "frame",
+    "fps",
+    "bitrate_kbps",
+    "total_size",
+    "out_time_seconds",
+    "speed",
+    "is_end",
+]
+PROGRESS_SAMPLE_COLUMNS: list[str] = ["monotonic_time", "pid", *PROGRESS_COLUMNS]
+
+
+def is_ffmpeg_command(argv: list[str]) -> bool:
+    """Returns `True` if the argv executes FFmpeg"""
+    return os.path.basename(argv[0]) == "ffmpeg"
+
+
+def add_progress_args(argv: list[str]) -> list[str]:
+    """Returns the argv of an FFmpeg command with `PROGRESS_ARGS`, unless it already reports its progress"""
+    if "-progress" in argv:
+        return argv
+
+    return [argv[0], *PROGRESS_ARGS, *argv[1:]]
+
+
+def _to_float(value: str | None, suffix: str = "") -> float:
+    if value is None:
+        return float("nan")
+    try:
+        return float(value.strip().removesuffix(suffix))
+    except ValueError:
+        # e.g. 'N/A' before the first frame was encoded
+        return float("nan")
+
+
+def parse_progress_block(block: dict[str, str]) -> list[float]:
+    """Converts the values of a progress block into the numeric `PROGRESS_COLUMNS`"""
+    return [
+        _to_float(block.get("frame")),
+        _to_float(block.get("fps")),
+        _to_float(block.get("bitrate"), "kbits/s"),
+        _to_float(block.get("total_size")),
+        _to_float(block.get("out_time_us")) / 1e6,
+        _to_float(block.get("speed"), "x"),
+        float(block.get("progress") == "end"),
+    ]
+
+
+class ProgressParser:
+    """Incremental parser of the `-progress` output of one process.
+
+    Example:
+        >>> parser = ProgressParser()
+        >>> parser.feed(b'frame=120\\nfps=60.0\\nspeed=2.01x\\nprogress=continue\\n')
+        [{'frame': '120', 'fps': '60.0', 'speed': '2.01x', 'progress': 'continue'}]
+    """
+
+    def __init__(self) -> None:
+        self._pending: bytes = b""
+        self._block: dict[str, str] = {}
+
+    def feed(self, data: bytes) -> list[dict[str, str]]:
+        """Parses a chunk of stdout and returns the blocks that were completed by it"""
+        lines: list[bytes] = (self._pending + data).split(b"\n")
+        # the last line is incomplete, it is continued by the next chunk
+        self._pending = lines.pop()
+
+        blocks: list[dict[str, str]] = []
+        for line in lines:
+            key, _, value = line.decode("utf-8", errors="replace").strip().partition("=")
+            if key == "":
+                continue
+            self._block[key] = value
+            if key == "progress":
+                blocks.append(self._block)
+                self._block = {}
+
+        return blocks
+
+
+class ProgressMonitor:
+    """Stores the progress samples of all running FFmpeg processes.
+
+    A `JobRunner` created with this monitor reports every progress block of its FFmpeg
+    jobs as one row with the `PROGRESS_SAMPLE_COLUMNS`. FFmpeg writes a block every
+    0.5 seconds by default (see `-stats_period`).
+
+    Example:
+        >>> progress_monitor = ProgressMonitor()
+        >>> results = JobRunner(max_concurrency=4, progress_monitor=progress_monitor).run(jobs)
+        >>> progress_monitor.to_dataframe()
+    """
+
+    def __init__(self, capacity: int = 65536) -> None:
+        self.buffer = SampleRingBuffer(PROGRESS_SAMPLE_COLUMNS, capacity)
+        self._running_fps: dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, pid: int, block: dict[str, str]) -> None:
+        """Stores a progress block of the process `pid`"""
+        values: list[float] = parse_progress_block(block)
+        with self._lock:
+            self.buffer.append([time.monotonic(), pid, *values])
+            if block.get("progress") == "end":
+                self._running_fps.pop(pid, None)
+            else:
+                self._running_fps[pid] = values[PROGRESS_COLUMNS.index("fps")]
+
+    def get_running_fps(self) -> dict[int, float]:
+        """Returns the last reported fps of every process that did not finish yet"""
+        with self._lock:
+            return dict(self._running_fps)
+
+    def clear(self) -> None:
+        """Removes all samples"""
+        with self._lock:
+            self.buffer.clear()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Returns all samples, see `SampleRingBuffer.to_dataframe`"""
+        with self._lock:
+            return self.buffer.to_dataframe()
+
+    def get_final_progress(self) -> pd.DataFrame:
+        """Returns the last sample of each process, indexed by `pid`"""
+        progress_df = self.to_dataframe()
+        return progress_df.groupby("pid").last()
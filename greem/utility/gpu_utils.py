@@ -15,6 +15,8 @@ DEFAULT_UPDATE_QUERY_KEY_LIST: list[str] = [
     "memory.used",
     "utilization.gpu",
     "utilization.memory",
+    "utilization.encoder",
+    "utilization.decoder",
     "temperature.gpu",
     "temperature.memory",
     "power.draw",
@@ -0,0 +1,284 @@
+"""
+Module for measuring the idle power of a host once and reusing it across testbed runs.
+
+Measuring the idle power takes minutes, but it only changes with the hardware, the
+CPU frequency governor, the number of GPUs or the source of the energy measurements. An `IdleBaseline` stores the mean and
+variance of the idle power per component (CPU, GPU, RAM), the `IdleBaselineStore`
+keeps the latest baseline per `BaselineKey` in a JSON file. A testbed reuses a stored
+baseline and only measures again if it is stale: too old, measured before the last
+reboot or too noisy to be subtracted reliably.
+
+Classes:
+    BaselineKey: Frozen dataclass identifying the system state an idle baseline is valid for.
+    IdleBaseline: Idle power per component of a system.
+    IdleBaselineStore: JSON file of the latest idle baseline per key.
+
+Functions:
+    get_hardware_fingerprint() -> str:
+        Returns a short hash of the CPU model, CPU count, memory size and kernel release.
+    get_cpu_governor(cpu_root: str) -> str:
+        Returns the CPU frequency governors in use.
+    measure_idle_baseline(key: BaselineKey, idle_time_in_seconds: float, ...) -> IdleBaseline:
+        Measures the idle power with a `HardwareTracker`.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from greem.hardware.rapl import JOULES_PER_KWH
+from greem.utility.monitoring import EnergySource, HardwareTracker
+
+HOST_NAME: str = os.uname()[1]
+CPU_ROOT: str = "/sys/devices/system/cpu"
+BOOT_ID_PATH: str = "/proc/sys/kernel/random/boot_id"
+DEFAULT_STORE_PATH: str = os.path.expanduser("~/.cache/greem/idle_baselines.json")
+
+# component of the baseline and the `HardwareTracker` column of its power in W
+IDLE_POWER_COLUMNS: dict[str, str] = {"cpu": "cpu_power", "gpu": "gpu_power", "ram": "ram_power"}
+
+
+def _read_first_line(file_path: str, default: str = "") -> str:
+    try:
+        with open(file_path, "r", encoding="utf-8") as file:
+            return file.readline().strip()
+    except OSError:
+        return default
+
+
+def get_hardware_fingerprint() -> str:
+    """Returns a short hash of the CPU model, CPU count, memory size and kernel release"""
+    cpu_model: str = ""
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as cpuinfo:
+            cpu_model = next((line.split(":", 1)[1].strip() for line in cpuinfo if line.startswith("model name")), "")
+    except OSError:
+        pass
+
+    memory_total: str = _read_first_line("/proc/meminfo")
+    hardware: str = "|".join([cpu_model, str(os.cpu_count()), memory_total, os.uname().release])
+
+    return hashlib.sha256(hardware.encode("utf-8")).hexdigest()[:16]
+
+
+def get_cpu_governor(cpu_root: str = CPU_ROOT) -> str:
+    """Returns the CPU frequency governors in use, comma separated, or 'unknown'"""
+    governors: set[str] = {
+        _read_first_line(governor_path)
+        for governor_path in glob.glob(f"{cpu_root}/cpu[0-9]*/cpufreq/scaling_governor")
+    }
+    governors.discard("")
+
+    return ",".join(sorted(governors)) or "unknown"
+
+
+@dataclass(frozen=True)
+class BaselineKey:
+    """
+    Identifies the system state an idle baseline is valid for.
+
+    Attributes:
+        host (str): Name of the host.
+        hardware_fingerprint (str): Hash of the hardware, see `get_hardware_fingerprint`.
+        governor (str): CPU frequency governors, see `get_cpu_governor`.
+        gpu_count (int): Number of GPUs that are monitored.
+        energy_source (str): Value of the `EnergySource` the idle power is measured with, it has to
+            match the source of the measurements the baseline is subtracted from.
+    """
+
+    host: str
+    hardware_fingerprint: str
+    governor: str
+    gpu_count: int
+    energy_source: str
+
+    @classmethod
+    def current(cls, gpu_count: int = 0, energy_source: EnergySource = EnergySource.CODECARBON) -> "BaselineKey":
+        """Returns the key of the current system"""
+        return cls(
+            host=HOST_NAME,
+            hardware_fingerprint=get_hardware_fingerprint(),
+            governor=get_cpu_governor(),
+            gpu_count=gpu_count,
+            energy_source=energy_source.value,
+        )
+
+
+@dataclass
+class IdleBaseline:
+    """
+    Idle power per component of a system.
+
+    Attributes:
+        key (BaselineKey): The system state the baseline was measured in.
+        measured_at (datetime): End of the measurement.
+        duration_seconds (float): Length of the measurement.
+        sample_count (int): Number of power samples.
+        power (dict[str, float]): Mean idle power in W per component, see `IDLE_POWER_COLUMNS`.
+        power_variance (dict[str, float]): Variance of the idle power samples in W² per component.
+        boot_id (str): Boot ID of the kernel during the measurement. Defaults to the current one.
+    """
+
+    key: BaselineKey
+    measured_at: datetime
+    duration_seconds: float
+    sample_count: int
+    power: dict[str, float]
+    power_variance: dict[str, float]
+    boot_id: str = field(default_factory=lambda: _read_first_line(BOOT_ID_PATH))
+
+    @classmethod
+    def from_samples(cls, key: BaselineKey, samples_df: pd.DataFrame, duration_seconds: float) -> "IdleBaseline":
+        """Computes the baseline from the power columns of `HardwareTracker.to_dataframe()`,
+        components that were not measured have an idle power of 0 W"""
+        power: dict[str, float] = {}
+        power_variance: dict[str, float] = {}
+        for component, column in IDLE_POWER_COLUMNS.items():
+            values = samples_df[column].dropna().to_numpy(dtype=float) if column in samples_df else np.empty(0)
+            power[component] = float(values.mean()) if len(values) > 0 else 0.0
+            power_variance[component] = float(values.var(ddof=1)) if len(values) > 1 else 0.0
+
+        return cls(
+            key=key,
+            measured_at=datetime.now(),
+            duration_seconds=duration_seconds,
+            sample_count=len(samples_df),
+            power=power,
+            power_variance=power_variance,
+        )
+
+    @classmethod
+    def from_dict(cls, baseline_dict: dict) -> "IdleBaseline":
+        baseline_dict = dict(baseline_dict)
+        baseline_dict["key"] = BaselineKey(**baseline_dict["key"])
+        baseline_dict["measured_at"] = datetime.fromisoformat(baseline_dict["measured_at"])
+
+        return cls(**baseline_dict)
+
+    def to_dict(self) -> dict:
+        baseline_dict: dict = asdict(self)
+        baseline_dict["measured_at"] = self.measured_at.isoformat()
+
+        return baseline_dict
+
+    def get_energy_per_second(self, component: str) -> float:
+        """Idle energy of a component in kWh per second, the unit of the CodeCarbon energy columns"""
+        return self.power[component] / JOULES_PER_KWH
+
+    def get_relative_std(self, component: str) -> float:
+        """Standard deviation of the idle power of a component relative to its mean"""
+        if self.power[component] <= 0:
+            return 0.0
+
+        return float(np.sqrt(self.power_variance[component]) / self.power[component])
+
+
+class IdleBaselineStore:
+    """JSON file of the latest idle baseline per `BaselineKey`.
+
+    A stored baseline is stale if it is older than `max_age`, if it was measured before
+    the last reboot (with `invalidate_on_reboot`) or if the relative standard deviation
+    of a component exceeds `max_relative_std`.
+
+    Example:
+        >>> store = IdleBaselineStore()
+        >>> baseline = store.get_or_measure(
+        ...     BaselineKey.current(), lambda key: measure_idle_baseline(key, idle_time_in_seconds=120)
+        ... )
+    """
+
+    def __init__(
+        self,
+        file_path: str = DEFAULT_STORE_PATH,
+        max_age: timedelta = timedelta(days=7),
+        max_relative_std: float = 0.25,
+        invalidate_on_reboot: bool = True,
+    ) -> None:
+        self.file_path: str = file_path
+        self.max_age: timedelta = max_age
+        self.max_relative_std: float = max_relative_std
+        self.invalidate_on_reboot: bool = invalidate_on_reboot
+        self._baselines: dict[BaselineKey, IdleBaseline] = self._load()
+
+    def __len__(self) -> int:
+        return len(self._baselines)
+
+    def is_stale(self, baseline: IdleBaseline) -> bool:
+        """Returns `True` if the baseline has to be measured again"""
+        if datetime.now() - baseline.measured_at > self.max_age:
+            return True
+        if self.invalidate_on_reboot and baseline.boot_id != _read_first_line(BOOT_ID_PATH):
+            return True
+
+        return any(baseline.get_relative_std(component) > self.max_relative_std for component in baseline.power)
+
+    def get(self, key: BaselineKey) -> IdleBaseline | None:
+        """Returns the baseline of `key` unless it is missing or stale"""
+        baseline: IdleBaseline | None = self._baselines.get(key)
+        if baseline is None or self.is_stale(baseline):
+            return None
+
+        return baseline
+
+    def put(self, baseline: IdleBaseline) -> None:
+        """Stores the baseline, replacing the previous baseline of its key"""
+        self._baselines[baseline.key] = baseline
+        self._save()
+
+    def get_or_measure(self, key: BaselineKey, measure: Callable[[BaselineKey], IdleBaseline]) -> IdleBaseline:
+        """Returns the stored baseline of `key` or measures and stores a new one if there is no valid one"""
+        baseline: IdleBaseline | None = self.get(key)
+        if baseline is None:
+            baseline = measure(key)
+            self.put(baseline)
+
+        return baseline
+
+    def _load(self) -> dict[BaselineKey, IdleBaseline]:
+        if not os.path.exists(self.file_path):
+            return {}
+
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as store_file:
+                baselines: list[IdleBaseline] = [
+                    IdleBaseline.from_dict(baseline_dict) for baseline_dict in json.load(store_file)["baselines"]
+                ]
+        except (ValueError, KeyError, TypeError) as err:
+            # a truncated store or one written with an older schema is measured again
+            print(f"Ignoring unreadable idle baseline store {self.file_path}: {err!r}")
+            return {}
+
+        return {baseline.key: baseline for baseline in baselines}
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        tmp_path: str = f"{self.file_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as store_file:
+            json.dump({"baselines": [baseline.to_dict() for baseline in self._baselines.values()]}, store_file, indent=2)
+        # a crash while writing never leaves a corrupted store behind
+        os.replace(tmp_path, self.file_path)
+
+
+def measure_idle_baseline(
+    key: BaselineKey,
+    idle_time_in_seconds: float = 120,
+    measure_power_secs: float = 1,
+    energy_source: EnergySource = EnergySource.CODECARBON,
+) -> IdleBaseline:
+    """Measures the idle power of the system with a `HardwareTracker` for `idle_time_in_seconds`"""
+    tracker = HardwareTracker(
+        measure_power_secs=measure_power_secs, cuda_enabled=key.gpu_count > 0, energy_source=energy_source
+    )
+    tracker.start()
+    time.sleep(idle_time_in_seconds)
+    tracker.stop()
+
+    return IdleBaseline.from_samples(key, tracker.to_dataframe(), idle_time_in_seconds)
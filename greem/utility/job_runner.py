@@ -0,0 +1,444 @@
+"""
+Module for executing external processes (e.g. FFmpeg) without a shell.
+
+Every job is launched directly with an argv list, a configurable number of jobs
+is executed concurrently and for each job the monotonic start/end times, the
+exit status, the peak resident set size and the captured stderr are recorded.
+With a `ProgressMonitor`, the `-progress` output of FFmpeg jobs is streamed while
+they are running.
+
+Classes:
+    Job: Dataclass representing a single process that should be executed.
+    JobResult: Dataclass representing the outcome of an executed `Job`.
+    JobRunner: asyncio based runner that executes `Job`s concurrently.
+
+Functions:
+    run_cmd(cmd: str | list[str]) -> JobResult:
+        Executes a single command and blocks until it is finished.
+"""
+
+import asyncio
+import functools
+import os
+import selectors
+import shlex
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Callable, Coroutine, TypeVar
+
+from greem.utility.ffmpeg_progress import ProgressMonitor, ProgressParser, add_progress_args, is_ffmpeg_command
+
+if TYPE_CHECKING:
+    from greem.monitoring.metrics_exporter import MetricsExporter
+    from greem.utility.cgroups import CgroupLimits, CgroupManager
+    from greem.utility.perf_counters import PerfCounterCapture
+    from greem.utility.process_accounting import ProcessAccountant
+
+T = TypeVar("T")
+
+# only the tail of stderr is kept, FFmpeg can be very chatty on long encodes
+STDERR_TAIL_BYTES: int = 64 * 1024
+READ_CHUNK_BYTES: int = 4096
+
+
+@dataclass
+class Job:
+    """
+    Represents a single process that should be executed by the `JobRunner`.
+
+    Attributes:
+        argv (list[str]): The program and its arguments, e.g. `['ffmpeg', '-i', 'input.mp4', ...]`.
+        name (str): Human readable identifier of the job, e.g. the video name. Defaults to ''.
+        metadata (dict): Arbitrary values that are passed through to the `JobResult`. Defaults to an empty dict.
+        cgroup_limits (CgroupLimits | None): Limits of the cgroup of the job, replaces the limits of the
+            `CgroupManager` of the runner. Defaults to None.
+    """
+
+    argv: list[str]
+    name: str = ""
+    metadata: dict = field(default_factory=dict)
+    cgroup_limits: "CgroupLimits | None" = None
+
+    @classmethod
+    def from_cmd(cls, cmd: str | list[str], name: str = "", **metadata) -> "Job":
+        """Creates a `Job` from a command string as it would be typed into a shell.
+
+        Quoting is resolved with `shlex`, so the command strings created in
+        `greem.utility.ffmpeg` can be used without spawning a shell.
+
+        Parameters
+        ----------
+        cmd : str | list[str]
+            The command string or an already split argv list
+        name : str, optional
+            identifier of the job, by default ''
+
+        Returns
+        -------
+        Job
+            The job representing the command
+        """
+        argv: list[str] = shlex.split(cmd) if isinstance(cmd, str) else list(cmd)
+        if len(argv) == 0:
+            raise ValueError("empty command provided")
+
+        return cls(argv=argv, name=name, metadata=metadata)
+
+    def __str__(self) -> str:
+        return shlex.join(self.argv)
+
+
+@dataclass
+class JobResult:
+    """
+    Represents the outcome of an executed `Job`.
+
+    Attributes:
+        job (Job): The executed job.
+        pid (int): Process ID the job was running with.
+        returncode (int): Exit status of the process, negative values represent the terminating signal.
+        start_monotonic (float): `time.monotonic()` right before the process was spawned.
+        end_monotonic (float): `time.monotonic()` right after the process was reaped.
+        start_time (datetime): Wall clock time corresponding to `start_monotonic`.
+        end_time (datetime): Wall clock time corresponding to `end_monotonic`.
+        peak_rss_kb (int): Peak resident set size of the process in KiB.
+        stderr (str): Tail of the captured stderr output.
+        cpu_seconds (float): User and system CPU time of the process. Defaults to 0.
+        cgroup_stats (dict[str, float]): Resource usage of the cgroup of the job, see `CGROUP_STAT_COLUMNS`
+            of `greem.utility.cgroups`. Empty if the job did not run in its own cgroup.
+        perf_counters (dict[str, float]): Hardware performance counters or scheduler statistics of the job,
+            see `greem.utility.perf_counters`. Empty if they were not captured.
+    """
+
+    job: Job
+    pid: int
+    returncode: int
+    start_monotonic: float
+    end_monotonic: float
+    start_time: datetime
+    end_time: datetime
+    peak_rss_kb: int
+    stderr: str = field(repr=False)
+    cpu_seconds: float = 0.0
+    cgroup_stats: dict[str, float] = field(default_factory=dict)
+    perf_counters: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        """Elapsed time of the job in seconds, based on the monotonic clock"""
+        return self.end_monotonic - self.start_monotonic
+
+    @property
+    def elapsed_time(self) -> timedelta:
+        """Elapsed time of the job, based on the monotonic clock"""
+        return timedelta(seconds=self.elapsed_seconds)
+
+    @property
+    def succeeded(self) -> bool:
+        """`True` if the process exited with status zero"""
+        return self.returncode == 0
+
+    def to_dict(self) -> dict:
+        """Returns the result as a flat Python dictionary, e.g. to create a `pandas DataFrame` row"""
+        result_dict: dict = {
+            "job_name": self.job.name,
+            "pid": self.pid,
+            "returncode": self.returncode,
+            "start_monotonic": self.start_monotonic,
+            "end_monotonic": self.end_monotonic,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "elapsed_seconds": self.elapsed_seconds,
+            "peak_rss_kb": self.peak_rss_kb,
+            "cpu_seconds": self.cpu_seconds,
+        }
+        result_dict.update(self.cgroup_stats)
+        result_dict.update(self.perf_counters)
+        result_dict.update(self.job.metadata)
+
+        return result_dict
+
+
+class JobRunner:
+    """Executes `Job`s concurrently with asyncio.
+
+    At most `max_concurrency` processes are running at the same time, a new job
+    is started as soon as a running one finishes. If a `process_accountant` is
+    provided, every spawned process is registered with it until it was reaped.
+    If a `progress_monitor` is provided, FFmpeg jobs are started with `-progress pipe:1`
+    and their progress is reported to it while they are running. If a `metrics_exporter`
+    is provided, it is notified when jobs are queued, started and finished. If a
+    `cgroup_manager` is provided, every job runs in its own cgroup v2 and its resource
+    usage is read from the cgroup when it finished. If a `perf_capture` is provided, the
+    hardware performance counters of every job are captured.
+
+    Example:
+        >>> runner = JobRunner(max_concurrency=4)
+        >>> results = runner.run([Job.from_cmd(cmd) for cmd in cmd_list])
+        >>> [r.returncode for r in results]
+        [0, 0, 0, 0, 0]
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 1,
+        log_failures: bool = True,
+        process_accountant: "ProcessAccountant | None" = None,
+        progress_monitor: "ProgressMonitor | None" = None,
+        metrics_exporter: "MetricsExporter | None" = None,
+        cgroup_manager: "CgroupManager | None" = None,
+        perf_capture: "PerfCounterCapture | None" = None,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be bigger than zero")
+
+        self.max_concurrency: int = max_concurrency
+        self.log_failures: bool = log_failures
+        self.process_accountant: "ProcessAccountant | None" = process_accountant
+        self.progress_monitor: "ProgressMonitor | None" = progress_monitor
+        self.metrics_exporter: "MetricsExporter | None" = metrics_exporter
+        self.cgroup_manager: "CgroupManager | None" = cgroup_manager
+        self.perf_capture: "PerfCounterCapture | None" = perf_capture
+        self._semaphore: asyncio.Semaphore | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def run(self, jobs: list[Job]) -> list[JobResult]:
+        """Executes all jobs and blocks until every job is finished.
+
+        Parameters
+        ----------
+        jobs : list[Job]
+            The jobs to execute
+
+        Returns
+        -------
+        list[JobResult]
+            The results in the same order as the provided `jobs`
+        """
+        return self.run_coroutine(self.run_async(jobs))
+
+    def run_coroutine(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """Runs a coroutine that awaits `run_job_async` of this runner, e.g. a pipeline
+        of dependent jobs, and blocks until it is finished"""
+        try:
+            return asyncio.run(coroutine)
+        finally:
+            self._release()
+
+    def run_job(self, job: Job) -> JobResult:
+        """Executes a single job and blocks until it is finished"""
+        return self.run([job])[0]
+
+    async def run_async(self, jobs: list[Job]) -> list[JobResult]:
+        """Executes all jobs concurrently, limited by `max_concurrency`.
+
+        Returns
+        -------
+        list[JobResult]
+            The results in the same order as the provided `jobs`
+        """
+        return list(await asyncio.gather(*[self.run_job_async(job) for job in jobs]))
+
+    async def run_job_async(self, job: Job) -> JobResult:
+        """Executes a single job as soon as a concurrency slot is available.
+
+        Can be awaited from multiple coroutines, all of them share the same
+        concurrency limit of this runner.
+        """
+        self._bind_to_running_loop()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.add_queued_jobs(1)
+
+        async with self._semaphore:
+            if self.metrics_exporter is not None:
+                self.metrics_exporter.job_started()
+            loop = asyncio.get_running_loop()
+            start_time: datetime = datetime.now()
+            start_monotonic: float = time.monotonic()
+
+            argv: list[str] = job.argv
+            on_progress: Callable[[dict[str, str]], None] | None = None
+            if self.progress_monitor is not None:
+                report_progress: bool = is_ffmpeg_command(job.argv)
+                argv = add_progress_args(job.argv) if report_progress else job.argv
+            else:
+                report_progress = False
+
+            perf_output_path: str | None = None
+            if self.perf_capture is not None:
+                argv, perf_output_path = self.perf_capture.wrap_argv(argv)
+
+            cgroup_path: str | None = None
+            if self.cgroup_manager is not None:
+                try:
+                    cgroup_path = self.cgroup_manager.create_job_cgroup(job.cgroup_limits)
+                    argv = self.cgroup_manager.wrap_argv(cgroup_path, argv)
+                except OSError as err:
+                    print(f"job {job.name or job.argv[0]} runs without its own cgroup: {err}")
+
+            try:
+                process = subprocess.Popen(
+                    argv,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE if report_progress else subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                )
+                pid: int = process.pid
+                if perf_output_path is not None:
+                    # perf forks the job, it is followed by the PID of the job rather than the one of perf
+                    pid = await loop.run_in_executor(
+                        self._executor, self.perf_capture.resolve_job_pid, process.pid
+                    )
+                if self.process_accountant is not None:
+                    self.process_accountant.add_process(pid)
+                if self.perf_capture is not None:
+                    self.perf_capture.add_process(pid)
+                if report_progress:
+                    on_progress = functools.partial(self.progress_monitor.record, pid)
+                try:
+                    returncode, peak_rss_kb, cpu_seconds, stderr = await loop.run_in_executor(
+                        self._executor, JobRunner._wait_for_process, process, on_progress
+                    )
+                finally:
+                    if self.process_accountant is not None:
+                        self.process_accountant.remove_process(pid)
+            except OSError as err:
+                # same exit status a shell reports for a command that can not be executed
+                pid, returncode, peak_rss_kb, cpu_seconds, stderr = -1, 127, 0, 0.0, str(err)
+
+            end_monotonic: float = time.monotonic()
+            end_time: datetime = start_time + timedelta(
+                seconds=end_monotonic - start_monotonic
+            )
+
+            cgroup_stats: dict[str, float] = {}
+            if cgroup_path is not None:
+                cgroup_stats = self.cgroup_manager.read_stats(cgroup_path)
+                self.cgroup_manager.remove_job_cgroup(cgroup_path)
+
+            perf_counters: dict[str, float] = {}
+            if self.perf_capture is not None:
+                perf_counters = self.perf_capture.collect(pid, perf_output_path)
+
+        result = JobResult(
+            job=job,
+            pid=pid,
+            returncode=returncode,
+            start_monotonic=start_monotonic,
+            end_monotonic=end_monotonic,
+            start_time=start_time,
+            end_time=end_time,
+            peak_rss_kb=peak_rss_kb,
+            stderr=stderr,
+            cpu_seconds=cpu_seconds,
+            cgroup_stats=cgroup_stats,
+            perf_counters=perf_counters,
+        )
+
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.job_finished(result)
+        if self.log_failures and not result.succeeded:
+            print(f"job {job.name or job.argv[0]} failed ({returncode}): {stderr[-500:]}")
+
+        return result
+
+    def _bind_to_running_loop(self) -> None:
+        # asyncio primitives are bound to an event loop, `run` creates a new one per call
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+
+        self._release()
+
+        self._loop = loop
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="job-runner"
+        )
+
+    def _release(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = None
+        self._semaphore = None
+        self._loop = None
+
+    @staticmethod
+    def _wait_for_process(
+        process: subprocess.Popen,
+        on_progress: Callable[[dict[str, str]], None] | None = None,
+    ) -> tuple[int, int, float, str]:
+        """Drains stderr (and the progress on stdout) and reaps the process with `os.wait4` to get its resource usage"""
+        stderr_tail = bytearray()
+        if process.stdout is None:
+            while chunk := process.stderr.read(READ_CHUNK_BYTES):
+                stderr_tail.extend(chunk)
+                if len(stderr_tail) > STDERR_TAIL_BYTES:
+                    del stderr_tail[:-STDERR_TAIL_BYTES]
+        else:
+            JobRunner._drain_pipes(process, stderr_tail, on_progress)
+        process.stderr.close()
+
+        _, status, rusage = os.wait4(process.pid, 0)
+        # let Popen know that the process was already reaped
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+        return (
+            process.returncode,
+            rusage.ru_maxrss,
+            rusage.ru_utime + rusage.ru_stime,
+            stderr_tail.decode("utf-8", errors="replace"),
+        )
+
+    @staticmethod
+    def _drain_pipes(
+        process: subprocess.Popen,
+        stderr_tail: bytearray,
+        on_progress: Callable[[dict[str, str]], None] | None,
+    ) -> None:
+        """Reads stderr and stdout as soon as data is available, so neither pipe blocks the process"""
+        parser = ProgressParser()
+        with selectors.DefaultSelector() as selector:
+            selector.register(process.stdout, selectors.EVENT_READ)
+            selector.register(process.stderr, selectors.EVENT_READ)
+
+            while len(selector.get_map()) > 0:
+                for key, _ in selector.select():
+                    chunk: bytes = os.read(key.fd, READ_CHUNK_BYTES)
+                    if len(chunk) == 0:
+                        selector.unregister(key.fileobj)
+                    elif key.fileobj is process.stdout:
+                        for block in parser.feed(chunk):
+                            if on_progress is not None:
+                                on_progress(block)
+                    else:
+                        stderr_tail.extend(chunk)
+                        if len(stderr_tail) > STDERR_TAIL_BYTES:
+                            del stderr_tail[:-STDERR_TAIL_BYTES]
+        process.stdout.close()
+
+
+def run_cmd(
+    cmd: str | list[str], name: str = "", metrics_exporter: "MetricsExporter | None" = None
+) -> JobResult:
+    """Executes a single command without a shell and blocks until it is finished.
+
+    Parameters
+    ----------
+    cmd : str | list[str]
+        The command string or an already split argv list
+    name : str, optional
+        identifier of the job, by default ''
+    metrics_exporter : MetricsExporter | None, optional
+        exporter whose job counters are updated by the command, by default None
+
+    Returns
+    -------
+    JobResult
+        The result of the executed command
+    """
+    return JobRunner(max_concurrency=1, metrics_exporter=metrics_exporter).run_job(Job.from_cmd(cmd, name=name))
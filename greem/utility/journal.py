@@ -0,0 +1,254 @@
+"""
+Module for making long running testbed campaigns resumable.
+
+The `CampaignJournal` is an append-only JSON lines file. After a job finished, its
+measurements are appended to the journal together with a `JournalKey` that identifies
+the work that was done. A restarted campaign loads the journal, skips every key that
+was already completed and reuses the journaled measurements for its result files.
+
+Writes are buffered and only flushed and fsynced in batches, so recording a job
+does not add the latency of a disk sync to every job.
+
+Classes:
+    JournalKey: Frozen dataclass identifying a single unit of work of a campaign.
+    CampaignJournal: Append-only journal of completed work and its measurements.
+
+Functions:
+    get_config_hash(config: BaseModel) -> str:
+        Returns a short, stable hash of a configuration class.
+"""
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import IO
+
+import pandas as pd
+from pydantic import BaseModel
+
+from greem.utility.configuration_classes import EncodingConfigDTO
+
+HOST_NAME: str = os.uname()[1]
+
+
+def get_config_hash(config: BaseModel) -> str:
+    """Returns a short hash of the configuration, changing any value results in a different hash"""
+    config_json: str = json.dumps(config.model_dump(mode="json"), sort_keys=True)
+    return hashlib.sha256(config_json.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class JournalKey:
+    """
+    Identifies a single unit of work of a campaign.
+
+    Attributes:
+        host (str): Name of the host that executed the work.
+        config_hash (str): Hash of the configuration file the work belongs to, see `get_config_hash`.
+        video (str): Name of the encoded video, or a comma separated list if one job encodes multiple videos.
+        dto (str): JSON representation of the `EncodingConfigDTO`.
+        repetition (int): Index of the test repetition.
+        run (str): Additional description of the campaign step, e.g. the parallel mode and the
+            number of videos in flight. Defaults to ''.
+    """
+
+    host: str
+    config_hash: str
+    video: str
+    dto: str
+    repetition: int
+    run: str = ""
+
+    @classmethod
+    def create(
+        cls,
+        config: BaseModel,
+        video: str,
+        dto: EncodingConfigDTO,
+        repetition: int,
+        run: str = "",
+        host: str = HOST_NAME,
+    ) -> "JournalKey":
+        """Creates the key of `video` encoded with `dto`, the config is only stored as its hash"""
+        return cls(
+            host=host,
+            config_hash=get_config_hash(config),
+            video=video,
+            dto=dto.model_dump_json(),
+            repetition=repetition,
+            run=run,
+        )
+
+
+class CampaignJournal:
+    """Append-only journal of the completed work of a campaign.
+
+    Every line of the journal file is a JSON object containing the `JournalKey`, the time
+    the work was recorded, the measurements as a list of records and their column types.
+    A partially written last line, e.g. after a crash, is ignored when the journal is loaded.
+
+    Example:
+        >>> journal = CampaignJournal('results/journal.jsonl')
+        >>> key = JournalKey.create(encoding_config, 'video_1', dto, repetition=0)
+        >>> if not journal.is_completed(key):
+        ...     result_df = encode(...)
+        ...     journal.record(key, result_df)
+        >>> journal.close()
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        resume: bool = True,
+        sync_every: int = 32,
+        sync_interval_seconds: float = 10.0,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        file_path : str
+            path of the JSON lines file, parent directories are created on the first write
+        resume : bool, optional
+            if False, an existing journal is truncated instead of loaded, by default True
+        sync_every : int, optional
+            number of records after which the journal is fsynced, by default 32
+        sync_interval_seconds : float, optional
+            maximum time in seconds a record stays unsynced, checked when recording, by default 10.0
+        """
+        if sync_every < 1:
+            raise ValueError("sync_every must be bigger than zero")
+
+        self.file_path: str = file_path
+        self.sync_every: int = sync_every
+        self.sync_interval_seconds: float = sync_interval_seconds
+
+        self._entries: dict[JournalKey, dict] = {}
+        self._file: IO[str] | None = None
+        self._unsynced_records: int = 0
+        self._last_sync: float = time.monotonic()
+
+        if resume:
+            self._load()
+        elif os.path.exists(file_path):
+            os.remove(file_path)
+
+    def __enter__(self) -> "CampaignJournal":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_completed(self, key: JournalKey) -> bool:
+        """Returns `True` if measurements for the key were already recorded"""
+        return key in self._entries
+
+    def get_measurements(self, key: JournalKey) -> pd.DataFrame:
+        """Returns the journaled measurements of a completed key, an empty dataframe otherwise"""
+        entry: dict = self._entries.get(key, {})
+        measurements_df = pd.DataFrame(entry.get("measurements", []))
+
+        # JSON only knows strings and numbers, restore the original column types
+        for column, dtype in entry.get("dtypes", {}).items():
+            if column not in measurements_df.columns:
+                continue
+            if dtype.startswith("datetime"):
+                measurements_df[column] = pd.to_datetime(measurements_df[column])
+            elif dtype.startswith("timedelta"):
+                measurements_df[column] = pd.to_timedelta(measurements_df[column])
+            elif dtype != "object":
+                measurements_df[column] = measurements_df[column].astype(dtype)
+
+        return measurements_df
+
+    def record(self, key: JournalKey, measurements: pd.DataFrame | dict) -> None:
+        """Appends the measurements of a completed key to the journal.
+
+        The entry is written to the file buffer immediately, but only synced to disk
+        once `sync_every` records are pending or `sync_interval_seconds` have passed.
+        """
+        if not isinstance(measurements, pd.DataFrame):
+            measurements = pd.DataFrame([measurements])
+
+        entry: dict = {
+            "key": asdict(key),
+            "recorded_at": datetime.now().isoformat(),
+            # round trip through pandas JSON to convert timestamps and numpy types
+            "measurements": json.loads(
+                measurements.to_json(orient="records", date_format="iso")
+            ),
+            "dtypes": {str(col): str(dtype) for col, dtype in measurements.dtypes.items()},
+        }
+
+        self._open().write(json.dumps(entry) + "\n")
+        self._entries[key] = entry
+        self._unsynced_records += 1
+
+        if (
+            self._unsynced_records >= self.sync_every
+            or time.monotonic() - self._last_sync >= self.sync_interval_seconds
+        ):
+            self.sync()
+
+    def record_if_succeeded(self, key: JournalKey, measurements: pd.DataFrame) -> bool:
+        """Records the measurements of a key only if every command of it exited with returncode 0.
+
+        `measurements` has one row per command with the `returncode` column of `JobResult.to_dict`.
+        A key with a failed command is not recorded, so a resumed campaign executes it again.
+        Returns `True` if the key was recorded.
+        """
+        if len(measurements) == 0 or not measurements["returncode"].eq(0).all():
+            return False
+
+        self.record(key, measurements)
+        return True
+
+    def sync(self) -> None:
+        """Flushes all pending records and syncs the journal file to disk"""
+        if self._file is not None and self._unsynced_records > 0:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+        self._unsynced_records = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        """Syncs pending records and closes the journal file"""
+        self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self) -> IO[str]:
+        if self._file is None:
+            Path(self.file_path).parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.file_path, "a", encoding="utf-8")
+
+            # terminate an incomplete last line, otherwise the next entry would be lost as well
+            if self._file.tell() > 0:
+                with open(self.file_path, "rb") as journal_file:
+                    journal_file.seek(-1, os.SEEK_END)
+                    if journal_file.read(1) != b"\n":
+                        self._file.write("\n")
+
+        return self._file
+
+    def _load(self) -> None:
+        if not os.path.exists(self.file_path):
+            return
+
+        with open(self.file_path, "r", encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    entry: dict = json.loads(line)
+                except json.JSONDecodeError:
+                    # the last line might be incomplete if the campaign crashed while writing
+                    continue
+
+                self._entries[JournalKey(**entry["key"])] = entry
@@ -1,15 +1,42 @@
-from os import system
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
+from enum import Enum
 from typing import OrderedDict
 
 from codecarbon import OfflineEmissionsTracker
 from codecarbon.output import EmissionsData
-from codecarbon.external.scheduler import PeriodicScheduler
 from nvitop import ResourceMetricCollector
 
+import numpy as np
 import pandas as pd
 
+from greem.hardware.rapl import JOULES_PER_KWH, RAPL_ROOT, RaplReader
+from greem.utility.job_runner import JobResult, run_cmd
+from greem.utility.sampler import Sampler
+
+# numeric values of the CodeCarbon measurements, they form the fixed schema of the samples
+CODECARBON_COLUMNS: list[str] = [
+    data_field.name for data_field in fields(EmissionsData) if data_field.type in (float, int, "float", "int")
+]
+# GPU columns of the RAPL samples, they are computed from the nvitop power draw like CodeCarbon does
+RAPL_GPU_COLUMNS: list[str] = ["gpu_power", "gpu_energy"]
+# suffix of the nvitop keys with the mean power draw of a device within the sample interval
+NVITOP_POWER_SUFFIX: str = "/power_usage (W)/mean"
+
+
+class EnergySource(Enum):
+    """Source of the CPU and RAM energy measured by the `HardwareTracker`.
+
+    Attributes:
+        CODECARBON: Measurements of CodeCarbon's `OfflineEmissionsTracker`.
+        RAPL: Energy counters of Intel RAPL read directly from sysfs, see `greem.hardware.rapl`.
+            Supports sampling intervals down to 10 ms but does not estimate emissions. With CUDA,
+            the GPU energy is integrated from the nvitop power draw, so `energy_consumed` includes
+            the GPUs like the one of CodeCarbon.
+    """
+    CODECARBON = "codecarbon"
+    RAPL = "rapl"
+
 
 @dataclass
 class NviTopData():
@@ -34,21 +61,16 @@ class BaseMonitoring(ABC):
         cuda_enabled (bool): Flag indicating if CUDA is enabled for GPU monitoring. Defaults to False.
         tracker (OfflineEmissionsTracker): Instance of OfflineEmissionsTracker for tracking emissions.
         country_iso_code (str): ISO code of the country for localization of emissions data. Defaults to 'AUT' (Austria).
-        collected_codecarbon_data (list[EmissionsData]): List to store collected emissions data. Defaults to an empty list.
-        collected_nvitop_data (list): List to store collected NVITop data. Defaults to an empty list.
         gpu_collector (ResourceMetricCollector): Collector for GPU resource metrics.
     """
     measure_power_secs: float = 1
     cuda_enabled: bool = False
     tracker: OfflineEmissionsTracker = None
     country_iso_code: str = 'AUT'
-    collected_codecarbon_data: list[EmissionsData] = field(
-        default_factory=list)
-    collected_nvitop_data: list = field(default_factory=list)
     gpu_collector: ResourceMetricCollector = None
 
     @abstractmethod
-    def monitor_process(self, cmd: str):
+    def monitor_process(self, cmd: str | list[str]):
         raise NotImplementedError('Do not use the abstract method!')
 
     def __post_init__(self):
@@ -59,7 +81,7 @@ class BaseMonitoring(ABC):
                 country_iso_code=self.country_iso_code,
                 log_level='error',
             )
-        if self.cuda_enabled:
+        if self.cuda_enabled and self.gpu_collector is None:
             self.gpu_collector = ResourceMetricCollector(
                 interval=self.measure_power_secs)
 
@@ -79,102 +101,189 @@ class BaseMonitoring(ABC):
 class HardwareTracker(BaseMonitoring):
     """Monitoring class that fetches the hardware state 
     with CodeCarbon and nvitop but also keeps intermediate results.
+
+    The measurements are taken by a `Sampler` thread and stored as fixed-schema numeric
+    samples in a preallocated ring buffer, see `greem.utility.sampler`.
     
     Attributes:
         measure_power_secs (float): Interval in seconds for measuring power consumption. Defaults to 1 second.
         cuda_enabled (bool): Flag indicating if CUDA is enabled for GPU monitoring. Defaults to False.
         tracker (OfflineEmissionsTracker): Instance of OfflineEmissionsTracker for tracking emissions.
         country_iso_code (str): ISO code of the country for localization of emissions data. Defaults to 'AUT' (Austria).
-        collected_codecarbon_data (list[EmissionsData]): List to store collected emissions data. Defaults to an empty list.
-        collected_nvitop_data (list): List to store collected NVITop data. Defaults to an empty list.
         gpu_collector (ResourceMetricCollector): Collector for GPU resource metrics.
+        buffer_capacity (int): Number of samples that are kept in memory. Defaults to 65536.
+        spill_path (str | None): File that receives the samples once the buffer is full,
+            if `None` the oldest samples are overwritten. Defaults to None.
+        energy_source (EnergySource): Source of the CPU and RAM energy. Defaults to `EnergySource.CODECARBON`.
+        rapl_root (str): powercap sysfs directory used by `EnergySource.RAPL`. Defaults to '/sys/class/powercap'.
+        energy_consumed_total (float): Energy in kWh of all samples since the tracker was created,
+            it is not reset by `clear()`. Defaults to 0.
     """
-    _scheduler: PeriodicScheduler = None
+    buffer_capacity: int = 65536
+    spill_path: str | None = None
+    energy_source: EnergySource = EnergySource.CODECARBON
+    rapl_root: str = RAPL_ROOT
+    _sampler: Sampler = None
+    _rapl_reader: RaplReader = None
+    energy_consumed_total: float = 0.0
+    _nvitop_columns: dict[str, int] = field(default_factory=dict)
+    _energy_column: int = -1
+    _duration_column: int = -1
+    _gpu_power_columns: list[int] = field(default_factory=list)
 
-    def monitor_process(self, cmd: str, project_name: str = 'monitoring') -> None:
-        """Monitors a process that is executed in the CLI of the sytem.
+    def monitor_process(self, cmd: str | list[str], project_name: str = 'monitoring') -> JobResult:
+        """Monitors a process that is executed by the job runner of the system.
         The measurement interval is defined by `measure_power_secs`
 
         Parameters
         ----------
-        cmd : str
-            The command executed in the CLI
+        cmd : str | list[str]
+            The command (or argv list) to be executed
         project_name : str, optional
             Description of the monitored process, 
             useful if many different processes are monitored in sequence, by default 'monitoring'
+
+        Returns
+        -------
+        JobResult
+            Timing, exit status, peak RSS and stderr of the executed process
         """
-        self.flush_monitoring_data(delta=True)
+        self._sampler.reset(self._reset_measurement_interval)
         self.tracker._project_name = project_name
-        system(cmd)
+        result = run_cmd(cmd, name=project_name)
         self._fetch_hardware_metrics()
 
+        return result
+
     def __post_init__(self) -> None:
         super().__post_init__()
-        self.collected_codecarbon_data = []
-        self.collected_nvitop_data = []
-        self._scheduler = PeriodicScheduler(
-            function=self._fetch_hardware_metrics,
-            interval=self.measure_power_secs
-        )
+        if self.energy_source == EnergySource.RAPL:
+            self._rapl_reader = RaplReader(self.rapl_root)
+        self._sampler = self._create_sampler(nvitop_columns=[])
 
     def start(self) -> None:
         """Start the monitoring libraries
         """
-        self.tracker.start()
+        if self.energy_source == EnergySource.CODECARBON:
+            self.tracker.start()
         if self.cuda_enabled:
             self.gpu_collector.start(tag='nvitop')
+            # the nvitop metrics depend on the devices, their names define the schema of the samples
+            nvitop_columns = sorted(self.gpu_collector.collect())
+            self.gpu_collector.clear()
+            self._sampler = self._create_sampler(nvitop_columns)
 
-        self._scheduler.start()
+        self._sampler.reset(self._reset_measurement_interval)
+        self._sampler.start()
 
     def stop(self) -> None:
         """Stop the monitoring libraries
         """
-        self._scheduler.stop()
-        self.tracker.stop()
+        self._sampler.stop()
+        if self.energy_source == EnergySource.CODECARBON:
+            self.tracker.stop()
         if self.cuda_enabled:
             self.gpu_collector.deactivate()
 
     def clear(self) -> None:
         """Clears the collected data and monitored value
         """
-        self.collected_codecarbon_data.clear()
-        self.collected_nvitop_data.clear()
-        self.flush_monitoring_data(delta=True)
+        self._sampler.clear()
+        self._sampler.reset(self._reset_measurement_interval)
+
+    def _reset_measurement_interval(self) -> None:
+        # runs under the lock of the sampler, it shares the delta state with `_read_sample`
+        if self.energy_source == EnergySource.CODECARBON:
+            self.flush_monitoring_data(delta=True)
+            return
+
+        self._rapl_reader.reset()
+        if self.cuda_enabled:
+            self.gpu_collector.clear()
+
+    def _create_sampler(self, nvitop_columns: list[str]) -> Sampler:
+        if self._rapl_reader is None:
+            energy_columns: list[str] = CODECARBON_COLUMNS
+        else:
+            energy_columns = [*self._rapl_reader.columns, *(RAPL_GPU_COLUMNS if self.cuda_enabled else [])]
+        self._nvitop_columns = {
+            key: len(energy_columns) + idx for idx, key in enumerate(nvitop_columns)
+        }
+        self._energy_column = energy_columns.index('energy_consumed')
+        self._duration_column = energy_columns.index('duration')
+        self._gpu_power_columns = [
+            idx for key, idx in self._nvitop_columns.items() if key.endswith(NVITOP_POWER_SUFFIX)
+        ]
+        return Sampler(
+            read_sample=self._read_sample,
+            columns=[*energy_columns, *nvitop_columns],
+            interval=self.measure_power_secs,
+            capacity=self.buffer_capacity,
+            spill_path=self.spill_path,
+        )
+
+    def _read_sample(self, row: np.ndarray) -> None:
+        if self._rapl_reader is not None:
+            self._rapl_reader.read_sample(row)
+        else:
+            emissions_data = self.tracker._prepare_emissions_data(delta=True)
+            for idx, column in enumerate(CODECARBON_COLUMNS):
+                row[idx] = getattr(emissions_data, column)
+
+        if self.cuda_enabled:
+            for key, value in self.gpu_collector.collect().items():
+                # metrics of devices that were not present at the start are dropped
+                idx = self._nvitop_columns.get(key)
+                if idx is not None:
+                    row[idx] = value
+            self.gpu_collector.clear()
+            if self._rapl_reader is not None:
+                self._add_gpu_energy(row)
+
+        if not np.isnan(row[self._energy_column]):
+            self.energy_consumed_total += row[self._energy_column]
+
+    def _add_gpu_energy(self, row: np.ndarray) -> None:
+        """Adds the energy of the GPUs to a RAPL sample, from the mean power draw of all devices in its interval"""
+        gpu_power_values: np.ndarray = row[self._gpu_power_columns]
+        if len(gpu_power_values) == 0 or np.isnan(gpu_power_values).all():
+            return
+
+        rapl_column_count: int = len(self._rapl_reader.columns)
+        gpu_power: float = float(np.nansum(gpu_power_values))
+        gpu_energy: float = gpu_power * row[self._duration_column] / JOULES_PER_KWH
+        row[rapl_column_count] = gpu_power
+        row[rapl_column_count + 1] = gpu_energy
+        row[self._energy_column] += gpu_energy
 
     def _fetch_hardware_metrics(self) -> None:
-        emissions_data, nvitop_data = self.flush_monitoring_data(
-            delta=True)
-        self.collected_codecarbon_data.append(emissions_data)
-        self.collected_nvitop_data.append(nvitop_data)
+        self._sampler.sample_once()
+
+    def get_last_sample(self) -> dict[str, float] | None:
+        """Returns the most recent sample, see `to_dataframe` for its columns"""
+        return self._sampler.get_last_sample()
+
+    @property
+    def skipped_ticks(self) -> int:
+        """Number of samples the sampling thread skipped because taking a sample was too slow"""
+        return self._sampler.skipped_ticks
 
     def to_dataframe(self) -> pd.DataFrame:
         """Returns all collected measurements as a `pandas DataFrame`.
         
         If the `cuda_enabled` parameter is set to `True`, this also includes in-depth CUDA measurements based on `nvitop`.
+        Only the numeric CodeCarbon values are sampled, metrics that are missing in a sample are `NaN`.
+        With `EnergySource.RAPL`, the CodeCarbon values are replaced by the columns of `RaplReader`
+        and, with CUDA, the `gpu_power` and `gpu_energy` computed from the nvitop power draw.
+        The `monotonic_time` column marks the end of each measurement interval and shares
+        its clock with the `JobResult`s of the job runner. `sample_seconds` and `sample_cpu_seconds`
+        contain the wall clock and CPU time that was spent on taking each sample.
+
+        The returned dataframe shares its memory with the sample buffer, it stays valid after `clear()`.
 
         Returns
         -------
         pd.DataFrame
             The dataframe containing all measurements
         """
-        collected_data: list[dict] = []
-
-        if not self.cuda_enabled:
-            collected_data = [d.values for d in self.collected_codecarbon_data]
-
-        if self.cuda_enabled and (len(self.collected_nvitop_data) == len(self.collected_codecarbon_data)):
-            max_length: int = 0
-            for carbon, nvi in zip(self.collected_codecarbon_data, self.collected_nvitop_data):
-                carbon_dict = carbon.values
-                nvi_dict = nvi.values
-                carbon_dict.update(nvi_dict)
-                collected_data.append(carbon_dict)
-
-                # used to ensure that faulty dictionaries are not included in dataframe
-                if len(carbon_dict) > max_length:
-                    max_length = len(carbon_dict)
-
-            collected_data = [
-                d for d in collected_data if len(d) == max_length]
-
-        return pd.DataFrame(collected_data)
+        return self._sampler.to_dataframe()
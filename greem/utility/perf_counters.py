@@ -0,0 +1,322 @@
+"""
+Module for capturing hardware performance counters of the jobs of the `JobRunner`.
+
+The energy of an encode alone does not explain why one preset costs more than another.
+With `perf` available, every job is wrapped in `perf stat`, which counts the
+instructions, cycles, cache and branch misses of the job and all of its threads. The
+counts and the derived IPC and miss rates are added to the `JobResult` of the job.
+
+If perf events are not available (no `perf` binary, `perf_event_paranoid` too strict
+or a virtual machine without a PMU), the scheduler statistics of all threads of a job
+are sampled from `/proc/<pid>/task/<tid>/schedstat` instead: the time the job was
+running on a CPU, the time it was waiting for a CPU and the number of timeslices.
+
+Classes:
+    PerfCounterCapture: Captures the counters of jobs with `perf stat` or from `schedstat`.
+
+Functions:
+    is_perf_available(perf_executable: str) -> bool:
+        Returns `True` if `perf stat` can count hardware events of a process.
+    parse_perf_stat_csv(content: str) -> dict[str, float]:
+        Parses the CSV output (`perf stat -x,`) into the counts of every event.
+    parse_schedstat(content: str) -> tuple[int, int, int]:
+        Returns the run time, the wait time and the timeslices of a `schedstat` file.
+    get_child_pids(pid: int, proc_root: str) -> list[int]:
+        Returns the PIDs of the child processes of a process.
+"""
+
+import functools
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from greem.utility.process_accounting import PROC_ROOT
+
+DEFAULT_EVENTS: list[str] = [
+    "instructions",
+    "cycles",
+    "cache-references",
+    "cache-misses",
+    "branches",
+    "branch-misses",
+    "task-clock",
+    "context-switches",
+    "cpu-migrations",
+]
+
+# columns of the schedstat fallback, see `PerfCounterCapture.collect`
+SCHEDSTAT_COLUMNS: list[str] = ["schedstat.run_seconds", "schedstat.wait_seconds", "schedstat.timeslices"]
+
+
+@functools.lru_cache(maxsize=None)
+def is_perf_available(perf_executable: str = "perf") -> bool:
+    """Returns `True` if `perf stat` can count the instructions of a process"""
+    if shutil.which(perf_executable) is None:
+        return False
+
+    try:
+        result = subprocess.run(
+            [perf_executable, "stat", "-x", ",", "-e", "instructions", "--", "true"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            timeout=10,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+    counts: dict[str, float] = parse_perf_stat_csv(result.stderr.decode("utf-8", errors="replace"))
+    return result.returncode == 0 and counts.get("perf.instructions", float("nan")) > 0
+
+
+def _to_column(event: str) -> str:
+    # modifiers such as `instructions:u` are not part of the column name
+    return "perf." + event.split(":")[0].replace("-", "_")
+
+
+def parse_perf_stat_csv(content: str) -> dict[str, float]:
+    """Parses the CSV output of `perf stat -x,` into `perf.<event>` counts.
+
+    Events that were not counted or are not supported are `NaN`. The IPC and the
+    cache and branch miss rates are derived if their events were counted.
+    """
+    counts: dict[str, float] = {}
+    for line in content.splitlines():
+        if line.startswith("#") or line.strip() == "":
+            continue
+
+        fields: list[str] = line.split(",")
+        if len(fields) < 3:
+            continue
+        try:
+            counts[_to_column(fields[2])] = float(fields[0])
+        except ValueError:
+            # '<not counted>' or '<not supported>'
+            counts[_to_column(fields[2])] = float("nan")
+
+    derived: dict[str, tuple[str, str]] = {
+        "perf.ipc": ("perf.instructions", "perf.cycles"),
+        "perf.cache_miss_rate": ("perf.cache_misses", "perf.cache_references"),
+        "perf.branch_miss_rate": ("perf.branch_misses", "perf.branches"),
+    }
+    for column, (numerator, denominator) in derived.items():
+        if numerator in counts and denominator in counts:
+            counts[column] = counts[numerator] / counts[denominator] if counts[denominator] > 0 else float("nan")
+
+    return counts
+
+
+def parse_schedstat(content: str) -> tuple[int, int, int]:
+    """Returns the run time (ns), the run queue wait time (ns) and the timeslices of a `schedstat` file"""
+    run_ns, wait_ns, timeslices = content.split()[:3]
+    return int(run_ns), int(wait_ns), int(timeslices)
+
+
+def get_child_pids(pid: int, proc_root: str = PROC_ROOT) -> list[int]:
+    """Returns the PIDs of the child processes of `pid`"""
+    try:
+        with open(f"{proc_root}/{pid}/task/{pid}/children", "r", encoding="utf-8") as file:
+            return [int(child_pid) for child_pid in file.read().split()]
+    except FileNotFoundError:
+        if not os.path.isdir(f"{proc_root}/{pid}"):
+            return []
+    except (OSError, ValueError):
+        return []
+
+    # kernels without CONFIG_PROC_CHILDREN, find the children by their parent PID
+    child_pids: list[int] = []
+    for entry in os.listdir(proc_root):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"{proc_root}/{entry}/stat", "r", encoding="utf-8") as file:
+                # the command name can contain spaces, the fields after it can not
+                fields: list[str] = file.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == pid:
+            child_pids.append(int(entry))
+
+    return sorted(child_pids)
+
+
+def _is_running(pid: int, proc_root: str) -> bool:
+    try:
+        with open(f"{proc_root}/{pid}/stat", "r", encoding="utf-8") as file:
+            return file.read().rsplit(")", 1)[1].split()[0] not in ("Z", "X")
+    except (OSError, IndexError):
+        return False
+
+
+class PerfCounterCapture:
+    """Captures the hardware performance counters of jobs with `perf stat` or, as a fallback, from `schedstat`.
+
+    A `JobRunner` created with this capture wraps every job with `wrap_argv`, registers
+    the spawned process with `add_process` and adds the result of `collect` to the
+    `JobResult`. With `perf`, the spawned process is `perf stat`, which forks the job;
+    `resolve_job_pid` returns the PID of the forked job, which is used for the
+    `JobResult.pid` and everything else that follows the job by its PID. The schedstat
+    fallback samples the threads of the registered processes every `interval` seconds in
+    a thread that is started with `start()`, threads that exit between two samples lose
+    at most one interval.
+
+    Example:
+        >>> perf_capture = PerfCounterCapture()
+        >>> with perf_capture:
+        ...     results = JobRunner(max_concurrency=4, perf_capture=perf_capture).run(jobs)
+        >>> results[0].to_dict()['perf.ipc']
+        2.31
+    """
+
+    def __init__(
+        self,
+        events: list[str] | None = None,
+        use_perf: bool | None = None,
+        interval: float = 0.1,
+        perf_executable: str = "perf",
+        proc_root: str = PROC_ROOT,
+    ) -> None:
+        if interval <= 0:
+            raise ValueError(f"The sampling interval has to be positive, got {interval}")
+
+        self.events: list[str] = list(events) if events is not None else list(DEFAULT_EVENTS)
+        self.use_perf: bool = is_perf_available(perf_executable) if use_perf is None else use_perf
+        self.interval: float = interval
+        self.perf_executable: str = perf_executable
+        self.proc_root: str = proc_root
+        # latest schedstat values of every thread of the registered processes
+        self._thread_stats: dict[int, dict[int, tuple[int, int, int]]] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "PerfCounterCapture":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb) -> None:
+        self.stop()
+
+    @property
+    def source(self) -> str:
+        """`perf` or `schedstat`"""
+        return "perf" if self.use_perf else "schedstat"
+
+    def start(self) -> None:
+        """Starts the sampling thread of the schedstat fallback"""
+        if self.use_perf or (self._thread is not None and self._thread.is_alive()):
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="greem-perf-counters", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the sampling thread"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wrap_argv(self, argv: list[str]) -> tuple[list[str], str | None]:
+        """Returns the argv that captures the counters of `argv` and the file perf writes them to"""
+        if not self.use_perf:
+            return argv, None
+
+        file_descriptor, output_path = tempfile.mkstemp(prefix="greem-perf-", suffix=".csv")
+        os.close(file_descriptor)
+        perf_argv: list[str] = [
+            self.perf_executable, "stat", "-x", ",", "-e", ",".join(self.events), "-o", output_path, "--"
+        ]
+
+        return [*perf_argv, *argv], output_path
+
+    def resolve_job_pid(self, pid: int, timeout: float = 5.0) -> int:
+        """Returns the PID of the job that was forked by the spawned `perf stat` process.
+
+        Falls back to `pid` if the job was not wrapped, perf exited without forking it
+        or it was not forked within `timeout` seconds.
+        """
+        if not self.use_perf:
+            return pid
+
+        deadline: float = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            child_pids: list[int] = get_child_pids(pid, self.proc_root)
+            if len(child_pids) > 0:
+                return child_pids[0]
+            if not _is_running(pid, self.proc_root):
+                break
+            time.sleep(0.001)
+
+        return pid
+
+    def add_process(self, pid: int) -> None:
+        """Starts sampling the threads of a process, only used by the schedstat fallback"""
+        if self.use_perf:
+            return
+
+        with self._lock:
+            self._thread_stats[pid] = {}
+        self.sample_once()
+
+    def sample_once(self) -> None:
+        """Samples the threads of all registered processes immediately"""
+        with self._lock:
+            for pid, thread_stats in self._thread_stats.items():
+                try:
+                    thread_ids: list[str] = os.listdir(f"{self.proc_root}/{pid}/task")
+                except OSError:
+                    # the process exited between two samples
+                    continue
+
+                for thread_id in thread_ids:
+                    try:
+                        with open(f"{self.proc_root}/{pid}/task/{thread_id}/schedstat", "r", encoding="utf-8") as file:
+                            thread_stats[int(thread_id)] = parse_schedstat(file.read())
+                    except (OSError, ValueError):
+                        continue
+
+    def collect(self, pid: int, output_path: str | None = None) -> dict[str, float]:
+        """Returns the counters of a finished job and stops capturing them.
+
+        Parameters
+        ----------
+        pid : int
+            PID of the spawned process
+        output_path : str | None, optional
+            The file returned by `wrap_argv`, by default None
+
+        Returns
+        -------
+        dict[str, float]
+            The `perf.<event>` counts and derived rates, or the `SCHEDSTAT_COLUMNS`
+        """
+        if output_path is not None:
+            try:
+                with open(output_path, "r", encoding="utf-8") as output_file:
+                    return parse_perf_stat_csv(output_file.read())
+            except OSError:
+                return {}
+            finally:
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+
+        with self._lock:
+            thread_stats = self._thread_stats.pop(pid, {})
+        if len(thread_stats) == 0:
+            return dict.fromkeys(SCHEDSTAT_COLUMNS, float("nan"))
+
+        run_ns, wait_ns, timeslices = (sum(values) for values in zip(*thread_stats.values()))
+        return {
+            "schedstat.run_seconds": run_ns / 1e9,
+            "schedstat.wait_seconds": wait_ns / 1e9,
+            "schedstat.timeslices": timeslices,
+        }
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.sample_once()
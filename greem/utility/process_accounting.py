@@ -0,0 +1,159 @@
+"""
+Module for sampling the CPU time and I/O of individual processes from `/proc`.
+
+When several encodes share the machine, the energy measured by the `HardwareTracker`
+belongs to all of them. The `ProcessAccountant` periodically reads `/proc/<pid>/stat`
+and `/proc/<pid>/io` of every registered process, so the CPU energy of a measurement
+interval can be shared by the CPU time each process consumed in that interval,
+see `greem.utility.dataframe.apportion_monitoring_by_cpu_time`.
+
+Classes:
+    ProcessAccountant: Thread that samples the cumulative CPU time and I/O of processes.
+
+Functions:
+    parse_proc_stat(stat: str) -> float:
+        Returns the CPU time (user + system) in seconds of a `/proc/<pid>/stat` file.
+    parse_proc_io(io: str) -> tuple[int, int]:
+        Returns the bytes read from and written to storage of a `/proc/<pid>/io` file.
+"""
+
+import os
+import threading
+import time
+
+import pandas as pd
+
+from greem.utility.sampler import SampleRingBuffer
+
+PROC_ROOT: str = "/proc"
+CLOCK_TICKS_PER_SECOND: int = os.sysconf("SC_CLK_TCK")
+
+PROCESS_SAMPLE_COLUMNS: list[str] = [
+    "monotonic_time",
+    "pid",
+    "cpu_seconds",
+    "read_bytes",
+    "write_bytes",
+]
+
+# position of utime and stime after the closing parenthesis of the command name
+_UTIME_FIELD: int = 11
+_STIME_FIELD: int = 12
+
+
+def parse_proc_stat(stat: str) -> float:
+    """Returns the CPU time (user + system) in seconds of a `/proc/<pid>/stat` file.
+
+    The command name may contain spaces and parentheses, so the fields are counted
+    from the last closing parenthesis.
+    """
+    fields: list[str] = stat[stat.rindex(")") + 2 :].split()
+    ticks: int = int(fields[_UTIME_FIELD]) + int(fields[_STIME_FIELD])
+
+    return ticks / CLOCK_TICKS_PER_SECOND
+
+
+def parse_proc_io(io: str) -> tuple[int, int]:
+    """Returns the bytes read from and written to storage of a `/proc/<pid>/io` file"""
+    values: dict[str, int] = {}
+    for line in io.splitlines():
+        key, _, value = line.partition(":")
+        values[key] = int(value)
+
+    return values.get("read_bytes", 0), values.get("write_bytes", 0)
+
+
+class ProcessAccountant:
+    """Thread that samples the cumulative CPU time and I/O of processes.
+
+    Processes are registered with `add_process` when they are spawned, e.g. by a
+    `JobRunner` that was created with this accountant, and removed once they were
+    reaped. Every `interval` seconds one row per registered process with the
+    `PROCESS_SAMPLE_COLUMNS` is stored. Processes that exited in the meantime are
+    skipped, their final CPU time is part of their `JobResult`.
+
+    Example:
+        >>> accountant = ProcessAccountant(interval=0.1)
+        >>> runner = JobRunner(max_concurrency=4, process_accountant=accountant)
+        >>> with accountant:
+        ...     results = runner.run(jobs)
+        >>> accountant.to_dataframe()
+    """
+
+    def __init__(self, interval: float = 0.25, capacity: int = 65536, proc_root: str = PROC_ROOT) -> None:
+        if interval <= 0:
+            raise ValueError(f"The sampling interval has to be positive, got {interval}")
+
+        self.interval: float = interval
+        self.proc_root: str = proc_root
+        self.buffer = SampleRingBuffer(PROCESS_SAMPLE_COLUMNS, capacity)
+        self._pids: set[int] = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "ProcessAccountant":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb) -> None:
+        self.stop()
+
+    def add_process(self, pid: int) -> None:
+        """Starts sampling a process"""
+        with self._lock:
+            self._pids.add(pid)
+
+    def remove_process(self, pid: int) -> None:
+        """Stops sampling a process, should be called as soon as it was reaped"""
+        with self._lock:
+            self._pids.discard(pid)
+
+    def start(self) -> None:
+        """Starts the sampling thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="greem-process-accountant", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the sampling thread"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sample_once(self) -> None:
+        """Samples all registered processes immediately"""
+        with self._lock:
+            for pid in self._pids:
+                try:
+                    with open(f"{self.proc_root}/{pid}/stat", "r", encoding="utf-8") as stat_file:
+                        cpu_seconds: float = parse_proc_stat(stat_file.read())
+                except (FileNotFoundError, ProcessLookupError, ValueError, IndexError):
+                    # the process exited between two samples
+                    continue
+
+                try:
+                    with open(f"{self.proc_root}/{pid}/io", "r", encoding="utf-8") as io_file:
+                        read_bytes, write_bytes = parse_proc_io(io_file.read())
+                except (OSError, ValueError):
+                    read_bytes, write_bytes = float("nan"), float("nan")
+
+                self.buffer.append([time.monotonic(), pid, cpu_seconds, read_bytes, write_bytes])
+
+    def clear(self) -> None:
+        """Removes all samples, registered processes are kept"""
+        with self._lock:
+            self.buffer.clear()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Returns all samples, see `SampleRingBuffer.to_dataframe`"""
+        with self._lock:
+            return self.buffer.to_dataframe()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.sample_once()
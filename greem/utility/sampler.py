@@ -0,0 +1,278 @@
+"""
+Module for sampling numeric hardware metrics with a low and constant overhead.
+
+A `Sampler` runs a dedicated thread that periodically calls a read function. The read
+function writes one sample with a fixed schema directly into a row of a preallocated
+NumPy ring buffer, so a tick neither allocates per-sample objects nor grows lists.
+When the buffer is full, its rows are spilled to a binary file (if configured) or the
+oldest samples are overwritten. Each sample also records the wall clock and CPU time
+that was spent on taking it, i.e. the overhead of the monitoring itself.
+
+Classes:
+    SampleRingBuffer: Preallocated buffer of fixed-schema float samples.
+    Sampler: Thread that periodically writes samples into a `SampleRingBuffer`.
+"""
+
+import os
+import threading
+import time
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+# columns that the `Sampler` appends to the columns of the read function
+SAMPLER_COLUMNS: list[str] = ["monotonic_time", "sample_seconds", "sample_cpu_seconds"]
+
+
+class SampleRingBuffer:
+    """Preallocated buffer of fixed-schema float samples.
+
+    Samples are stored as rows of a `(capacity, len(columns))` float64 array, missing
+    values are `NaN`. If the buffer is full and a `spill_path` is provided, all rows are
+    appended to the spill file as raw float64 values and the buffer is reused. Without a
+    `spill_path`, the oldest samples are overwritten and counted in `dropped_samples`.
+
+    `to_dataframe` returns a DataFrame that shares the memory of the buffer as long as
+    no sample was spilled or overwritten. A buffer whose rows were handed out is never
+    written to again, a new one is allocated instead, so returned DataFrames stay valid.
+
+    Example:
+        >>> buffer = SampleRingBuffer(['cpu_power', 'gpu_power'], capacity=1024)
+        >>> buffer.append([35.2, 120.5])
+        >>> buffer.to_dataframe()
+           cpu_power  gpu_power
+        0       35.2      120.5
+    """
+
+    def __init__(self, columns: list[str], capacity: int = 65536, spill_path: str | None = None) -> None:
+        if capacity < 1:
+            raise ValueError(f"The capacity has to be positive, got {capacity}")
+        if len(set(columns)) != len(columns):
+            raise ValueError(f"The columns have to be unique, got {columns}")
+
+        self.columns: list[str] = list(columns)
+        self.capacity: int = capacity
+        self.spill_path: str | None = spill_path
+        self.dropped_samples: int = 0
+        self._buffer: np.ndarray = np.full((capacity, len(columns)), np.nan)
+        self._size: int = 0
+        self._next_row: int = 0
+        self._spilled_rows: int = 0
+        self._is_exported: bool = False
+
+        if self.spill_path is not None:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            open(self.spill_path, "wb").close()
+
+    def __len__(self) -> int:
+        return self._spilled_rows + self._size
+
+    def claim_row(self) -> np.ndarray:
+        """Returns the next row of the buffer as a `NaN` filled view that the caller writes the sample into"""
+        if self._next_row == self.capacity:
+            self._make_room()
+        if self._is_exported and self._next_row < self._size:
+            # the row is part of a DataFrame that was returned by `to_dataframe`
+            self._detach()
+
+        row: np.ndarray = self._buffer[self._next_row]
+        row.fill(np.nan)
+        self._next_row += 1
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            self.dropped_samples += 1
+
+        return row
+
+    def append(self, values) -> None:
+        """Appends one sample, `values` are ordered like `columns`"""
+        self.claim_row()[:] = values
+
+    def clear(self) -> None:
+        """Removes all samples, including the spilled ones"""
+        if self._is_exported:
+            self._detach()
+        self._size = 0
+        self._next_row = 0
+        self._spilled_rows = 0
+        self.dropped_samples = 0
+        if self.spill_path is not None:
+            open(self.spill_path, "wb").close()
+
+    def get_last(self) -> dict[str, float] | None:
+        """Returns a copy of the most recent sample in the buffer without exporting the buffer"""
+        if self._size == 0:
+            return None
+
+        return dict(zip(self.columns, self._buffer[self._next_row - 1].tolist()))
+
+    def get_last_rows(self, count: int) -> np.ndarray:
+        """Returns a copy of the `count` most recent samples in the buffer, spilled samples are not included"""
+        count = min(count, self._size)
+        # without a wrap around `_next_row` equals `_size`, so the indices never become negative
+        rows: np.ndarray = np.arange(self._next_row - count, self._next_row) % self.capacity
+
+        return self._buffer[rows]
+
+    def to_array(self) -> np.ndarray:
+        """Returns all samples in the order they were taken.
+
+        Without spilled or overwritten samples this is a view of the buffer.
+        """
+        if self._size < self.capacity or self._next_row == self.capacity:
+            samples: np.ndarray = self._buffer[: self._size]
+        else:
+            # the buffer wrapped around, the oldest sample is the next row to be overwritten
+            samples = np.concatenate(
+                [self._buffer[self._next_row :], self._buffer[: self._next_row]]
+            )
+
+        if self._spilled_rows > 0:
+            spilled: np.ndarray = np.fromfile(self.spill_path, dtype=np.float64)
+            samples = np.concatenate([spilled.reshape(-1, len(self.columns)), samples])
+
+        return samples
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Returns all samples as a DataFrame, see `to_array` for when its memory is shared with the buffer"""
+        samples: np.ndarray = self.to_array()
+        if np.shares_memory(samples, self._buffer):
+            self._is_exported = True
+
+        return pd.DataFrame(samples, columns=self.columns, copy=False)
+
+    def _make_room(self) -> None:
+        if self.spill_path is None:
+            self._next_row = 0
+            return
+
+        if self._is_exported:
+            self._detach()
+        with open(self.spill_path, "ab") as spill_file:
+            self._buffer[: self._size].tofile(spill_file)
+        self._spilled_rows += self._size
+        self._size = 0
+        self._next_row = 0
+
+    def _detach(self) -> None:
+        self._buffer = self._buffer.copy()
+        self._is_exported = False
+
+
+class Sampler:
+    """Thread that periodically writes samples into a `SampleRingBuffer`.
+
+    The `read_sample` function receives a `NaN` filled row and writes the values of the
+    `columns` into it. The sampler appends the `SAMPLER_COLUMNS`: the `time.monotonic()`
+    after the sample was taken and the wall clock and CPU time spent in `read_sample`.
+
+    Ticks are scheduled on a fixed grid of `interval` seconds. If taking a sample
+    takes longer than the interval, the missed ticks are skipped instead of running
+    late samples back to back.
+
+    Example:
+        >>> def read_sample(row):
+        ...     row[0] = read_cpu_power()
+        >>> with Sampler(read_sample, ['cpu_power'], interval=0.5) as sampler:
+        ...     run_cmd(cmd)
+        >>> sampler.to_dataframe()
+    """
+
+    def __init__(
+        self,
+        read_sample: Callable[[np.ndarray], None],
+        columns: list[str],
+        interval: float = 1,
+        capacity: int = 65536,
+        spill_path: str | None = None,
+    ) -> None:
+        if interval <= 0:
+            raise ValueError(f"The sampling interval has to be positive, got {interval}")
+
+        self.read_sample: Callable[[np.ndarray], None] = read_sample
+        self.interval: float = interval
+        self.skipped_ticks: int = 0
+        self.buffer = SampleRingBuffer([*columns, *SAMPLER_COLUMNS], capacity, spill_path)
+        self._column_count: int = len(columns)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "Sampler":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb) -> None:
+        self.stop()
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Starts the sampling thread, the first sample is taken after one interval"""
+        if self.is_running:
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="greem-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the sampling thread without taking a final sample"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sample_once(self) -> None:
+        """Takes a sample immediately, also works while the sampling thread is running"""
+        with self._lock:
+            row: np.ndarray = self.buffer.claim_row()
+            wall_start, cpu_start = time.perf_counter(), time.thread_time()
+            self.read_sample(row[: self._column_count])
+            cpu_end, wall_end = time.thread_time(), time.perf_counter()
+
+            row[self._column_count] = time.monotonic()
+            row[self._column_count + 1] = wall_end - wall_start
+            row[self._column_count + 2] = cpu_end - cpu_start
+
+    def clear(self) -> None:
+        """Removes all samples"""
+        with self._lock:
+            self.buffer.clear()
+            self.skipped_ticks = 0
+
+    def reset(self, reset_state: Callable[[], None]) -> None:
+        """Calls `reset_state` while no sample is taken, e.g. to restart the delta of counters the read function uses"""
+        with self._lock:
+            reset_state()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Returns all samples, see `SampleRingBuffer.to_dataframe`"""
+        with self._lock:
+            return self.buffer.to_dataframe()
+
+    def get_last_samples(self, count: int) -> pd.DataFrame:
+        """Returns a copy of the `count` most recent samples, e.g. the samples of a job that just finished"""
+        with self._lock:
+            return pd.DataFrame(self.buffer.get_last_rows(count), columns=self.buffer.columns)
+
+    def get_last_sample(self) -> dict[str, float] | None:
+        """Returns the most recent sample, e.g. to report it while the sampler is running"""
+        with self._lock:
+            return self.buffer.get_last()
+
+    def _run(self) -> None:
+        next_tick: float = time.monotonic() + self.interval
+        while not self._stop_event.wait(max(0.0, next_tick - time.monotonic())):
+            self.sample_once()
+
+            next_tick += self.interval
+            now: float = time.monotonic()
+            if next_tick <= now:
+                missed_ticks: int = int((now - next_tick) // self.interval) + 1
+                self.skipped_ticks += missed_ticks
+                next_tick += missed_ticks * self.interval
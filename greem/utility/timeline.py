@@ -0,0 +1,317 @@
+"""
+Module for aligning monitoring streams of different sources on one monotonic timeline.
+
+The sources record time differently: the `HardwareTracker`, `NvidiaTop` and the
+`JobRunner` use `time.monotonic()`, CodeCarbon and the NVML stream of `GpuMonitoring`
+write wall clock timestamps and power meter traces count seconds since their start.
+A `ClockReference` maps wall clock times onto the monotonic clock, so every stream gets
+a `monotonic_time` column. The streams are then joined with `pd.merge_asof` within a
+tolerance (or resampled onto a regular grid) and sliced by the start and end of jobs,
+instead of being concatenated by row position.
+
+Phases of a testbed that consist of several commands (e.g. demux, decode and scale of
+one video) are marked with a `PhaseRecorder`, which records only their begin and end
+on the monotonic clock while a single monitor runs continuously.
+
+Classes:
+    ClockReference: Pair of a monotonic and a wall clock time taken at the same moment.
+    PhaseRecorder: Records the begin and end of named phases on the monotonic clock.
+
+Functions:
+    add_monotonic_time(df: pd.DataFrame, time_column: str, clock: ClockReference) -> pd.DataFrame:
+        Returns a copy of a stream with wall clock timestamps that is sorted by its monotonic time.
+    align_streams(streams: dict[str, pd.DataFrame], tolerance: float, period: float | None) -> pd.DataFrame:
+        Joins multiple streams on the timeline of the first one or on a regular grid.
+    get_job_markers(results: list[JobResult]) -> list[tuple[str, float, float]]:
+        Returns the name, start and end of executed jobs.
+    get_job_sample_indices(sample_times: np.ndarray, job_starts: np.ndarray, job_ends: np.ndarray) -> tuple:
+        Returns the indices of all (job, sample) pairs of samples taken while a job was running.
+    slice_by_jobs(df: pd.DataFrame, markers: list[tuple[str, float, float]]) -> pd.DataFrame:
+        Returns the samples of a stream that belong to each job.
+"""
+
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterator
+
+import numpy as np
+import pandas as pd
+
+from greem.utility.job_runner import JobResult
+
+TIME_COLUMN: str = "monotonic_time"
+
+
+@dataclass(frozen=True)
+class ClockReference:
+    """
+    Pair of a monotonic and a wall clock time taken at the same moment.
+
+    Attributes:
+        monotonic (float): `time.monotonic()` of the reference moment.
+        wall_time (datetime): Local wall clock time of the reference moment.
+    """
+
+    monotonic: float
+    wall_time: datetime
+
+    @classmethod
+    def now(cls) -> "ClockReference":
+        return cls(monotonic=time.monotonic(), wall_time=datetime.now())
+
+    def to_monotonic(self, wall_times) -> np.ndarray:
+        """Converts wall clock times (datetimes or timestamp strings) into monotonic times"""
+        timestamps = pd.to_datetime(pd.Series(wall_times))
+        return self.monotonic + (timestamps - pd.Timestamp(self.wall_time)).dt.total_seconds().to_numpy()
+
+
+class PhaseRecorder:
+    """Records the begin and end of named phases on the monotonic clock.
+
+    A marker is only a pair of `time.monotonic()` calls, so phases can be marked around
+    every command without starting or stopping a monitor. The values of a continuous
+    monitor are assigned to the phases afterwards, e.g. with
+    `greem.utility.dataframe.integrate_monitoring_over_intervals`. Phases with the same
+    name may be recorded multiple times, but not overlap each other.
+
+    Example:
+        >>> phase_recorder = PhaseRecorder()
+        >>> with phase_recorder.phase('decode', video_name='Beauty') as metadata:
+        ...     metadata['returncode'] = run_cmd(decoding_cmd).returncode
+        >>> phase_recorder.to_dataframe()
+          phase  start_monotonic  end_monotonic  elapsed_seconds video_name  returncode
+        0  decode       1021.53         1025.12             3.59     Beauty           0
+    """
+
+    def __init__(self) -> None:
+        self._open_phases: dict[str, tuple[float, dict[str, Any]]] = {}
+        self._phases: list[dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._phases)
+
+    def begin(self, name: str, **metadata) -> dict[str, Any]:
+        """Marks the begin of a phase and returns its metadata, which can be extended until it ends"""
+        if name in self._open_phases:
+            raise ValueError(f"the phase {name} has already begun")
+
+        self._open_phases[name] = (time.monotonic(), metadata)
+        return metadata
+
+    def end(self, name: str) -> float:
+        """Marks the end of a phase and returns its length in seconds"""
+        end_monotonic: float = time.monotonic()
+        if name not in self._open_phases:
+            raise ValueError(f"the phase {name} has not begun")
+
+        start_monotonic, metadata = self._open_phases.pop(name)
+        self._phases.append(
+            {
+                "phase": name,
+                "start_monotonic": start_monotonic,
+                "end_monotonic": end_monotonic,
+                "elapsed_seconds": end_monotonic - start_monotonic,
+                **metadata,
+            }
+        )
+
+        return end_monotonic - start_monotonic
+
+    @contextmanager
+    def phase(self, name: str, **metadata) -> Iterator[dict[str, Any]]:
+        """Marks the code of the `with` block as a phase, even if it raises"""
+        phase_metadata: dict[str, Any] = self.begin(name, **metadata)
+        try:
+            yield phase_metadata
+        finally:
+            self.end(name)
+
+    def get_markers(self) -> list[tuple[str, float, float]]:
+        """Returns the name, start and end of the finished phases, see `slice_by_jobs`"""
+        return [(phase["phase"], phase["start_monotonic"], phase["end_monotonic"]) for phase in self._phases]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Returns one row per finished phase with its name, start, end, length and metadata"""
+        if len(self._phases) == 0:
+            return pd.DataFrame(columns=["phase", "start_monotonic", "end_monotonic", "elapsed_seconds"])
+
+        return pd.DataFrame(self._phases)
+
+    def clear(self) -> None:
+        """Removes all finished phases"""
+        self._phases = []
+
+
+def add_monotonic_time(
+    df: pd.DataFrame, time_column: str, clock: ClockReference, output_column: str = TIME_COLUMN
+) -> pd.DataFrame:
+    """Returns a copy of `df` with the monotonic time of its wall clock `time_column`, sorted by it"""
+    timeline_df = df.copy()
+    timeline_df[output_column] = clock.to_monotonic(df[time_column])
+
+    return timeline_df.sort_values(output_column, kind="stable", ignore_index=True)
+
+
+def align_streams(
+    streams: dict[str, pd.DataFrame],
+    tolerance: float = 1.0,
+    period: float | None = None,
+    direction: str = "nearest",
+    time_column: str = TIME_COLUMN,
+    prefix_columns: bool = True,
+) -> pd.DataFrame:
+    """Joins monitoring streams that share a monotonic `time_column`.
+
+    Without a `period`, every row of the first stream is joined with the sample of each
+    other stream that is closest in time (see `direction` of `pd.merge_asof`), samples
+    further away than `tolerance` seconds are missing. With a `period`, all streams are
+    resampled to the mean of regular intervals of `period` seconds and joined by interval.
+
+    Parameters
+    ----------
+    streams : dict[str, pd.DataFrame]
+        Streams by their name, the first one defines the timeline unless `period` is given
+    tolerance : float, optional
+        Maximum time difference of joined samples in seconds, by default 1.0
+    period : float | None, optional
+        Length of the resampling intervals in seconds, by default None
+    direction : str, optional
+        `backward`, `forward` or `nearest`, see `pd.merge_asof`, by default "nearest"
+    time_column : str, optional
+        Monotonic time of the samples, by default "monotonic_time"
+    prefix_columns : bool, optional
+        If `True` the columns of the joined streams are prefixed with `<name>.`,
+        otherwise only the columns that already exist are, by default True
+
+    Returns
+    -------
+    pd.DataFrame
+        The aligned streams, sorted by `time_column`
+    """
+    if len(streams) == 0:
+        return pd.DataFrame()
+
+    names: list[str] = list(streams)
+    if period is not None:
+        return _resample_streams(streams, period, time_column)
+
+    aligned_df = streams[names[0]].sort_values(time_column, kind="stable", ignore_index=True)
+    for name in names[1:]:
+        stream_df = streams[name].sort_values(time_column, kind="stable", ignore_index=True)
+        # the time of the joined sample is kept to verify the alignment
+        stream_df[f"{name}.{time_column}"] = stream_df[time_column]
+        if prefix_columns:
+            stream_df.columns = [
+                column if column == time_column or column.startswith(f"{name}.") else f"{name}.{column}"
+                for column in stream_df.columns
+            ]
+
+        aligned_df = pd.merge_asof(
+            aligned_df,
+            stream_df,
+            on=time_column,
+            tolerance=tolerance,
+            direction=direction,
+            suffixes=("", f".{name}"),
+        )
+
+    return aligned_df
+
+
+def get_job_markers(results: list[JobResult]) -> list[tuple[str, float, float]]:
+    """Returns the name, monotonic start and end of executed jobs"""
+    return [(result.job.name, result.start_monotonic, result.end_monotonic) for result in results]
+
+
+def get_job_sample_indices(
+    sample_times: np.ndarray, job_starts: np.ndarray, job_ends: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the indices of all (job, sample) pairs where the sample time lies within `(start, end]` of the job.
+
+    The jobs may overlap and the samples do not have to be sorted. The ranges of each
+    job are found by binary search, so the memory is linear in the number of pairs
+    instead of the product of samples and jobs.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        The job indices and the sample indices, ordered by job and then by sample time
+    """
+    sample_times = np.asarray(sample_times, dtype=float)
+    order = np.argsort(sample_times, kind="stable")
+    sorted_times = sample_times[order]
+
+    first = np.searchsorted(sorted_times, np.asarray(job_starts, dtype=float), side="right")
+    last = np.searchsorted(sorted_times, np.asarray(job_ends, dtype=float), side="right")
+    counts = np.maximum(last - first, 0)
+
+    job_idx = np.repeat(np.arange(len(counts)), counts)
+    # position of every pair within the range of its job
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    return job_idx, order[np.repeat(first, counts) + offsets]
+
+
+def slice_by_jobs(
+    df: pd.DataFrame,
+    markers: list[tuple[str, float, float]],
+    time_column: str = TIME_COLUMN,
+    job_column: str = "job",
+) -> pd.DataFrame:
+    """Returns the samples taken while each job was running.
+
+    A sample belongs to a job if its time lies within `(start, end]`, samples of
+    concurrently running jobs are returned once per job.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Samples with a monotonic `time_column`
+    markers : list[tuple[str, float, float]]
+        Name, start and end of each job, see `get_job_markers`
+    time_column : str, optional
+        Monotonic time of the samples, by default "monotonic_time"
+    job_column : str, optional
+        Column the name of the job is written to, by default "job"
+
+    Returns
+    -------
+    pd.DataFrame
+        The samples of all jobs, ordered by job
+    """
+    if len(markers) == 0 or len(df) == 0:
+        return df.iloc[0:0].assign(**{job_column: pd.Series(dtype=object)})
+
+    sample_times = df[time_column].to_numpy(dtype=float)
+    job_starts = np.array([marker[1] for marker in markers], dtype=float)
+    job_ends = np.array([marker[2] for marker in markers], dtype=float)
+
+    job_idx, sample_idx = get_job_sample_indices(sample_times, job_starts, job_ends)
+
+    sliced_df = df.iloc[sample_idx].reset_index(drop=True)
+    sliced_df.insert(0, job_column, [markers[idx][0] for idx in job_idx])
+
+    return sliced_df
+
+
+def _resample_streams(streams: dict[str, pd.DataFrame], period: float, time_column: str) -> pd.DataFrame:
+    """Mean of each stream per interval of `period` seconds, joined by interval"""
+    if period <= 0:
+        raise ValueError(f"The resampling period has to be positive, got {period}")
+
+    resampled_dfs: list[pd.DataFrame] = []
+    for name, stream_df in streams.items():
+        intervals = np.floor(stream_df[time_column].to_numpy(dtype=float) / period).astype(np.int64)
+        numeric_df = stream_df.drop(columns=time_column).select_dtypes("number")
+        resampled_df = numeric_df.groupby(intervals).mean()
+        resampled_df.columns = [f"{name}.{column}" for column in resampled_df.columns]
+        resampled_dfs.append(resampled_df)
+
+    aligned_df = pd.concat(resampled_dfs, axis=1).sort_index()
+    # intervals without any sample are kept as missing values
+    aligned_df = aligned_df.reindex(np.arange(aligned_df.index.min(), aligned_df.index.max() + 1))
+    aligned_df.insert(0, time_column, (aligned_df.index.to_numpy() + 1) * period)
+
+    return aligned_df.reset_index(drop=True)
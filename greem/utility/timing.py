@@ -1,16 +1,56 @@
-from os import system
+import json
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
 import pandas as pd
 from codecarbon import OfflineEmissionsTracker
+from nvitop import Device
 
 import time
 
 from greem.utility.configuration_classes import Representation
+from greem.utility.idle_baseline import (
+    BaselineKey,
+    IdleBaseline,
+    IdleBaselineStore,
+    measure_idle_baseline,
+)
+from greem.utility.job_runner import JobResult, run_cmd
+from greem.utility.monitoring import EnergySource
 
 
 class IdleTimeEnergyMeasurement():
 
+    @staticmethod
+    def get_idle_baseline(
+        result_path: str = 'idle_baseline.json',
+        idle_time_in_seconds: float = 120,
+        cuda_enabled: bool = False,
+        store: IdleBaselineStore | None = None,
+        energy_source: EnergySource = EnergySource.CODECARBON,
+    ) -> IdleBaseline:
+        '''Returns the stored idle baseline of this system and only measures it if it is missing or stale.
+
+        The baseline is measured once and reused by every testbed until it is stale, see `IdleBaselineStore`.
+        It is measured with the `energy_source` of the testbed, so it is subtracted from measurements of the same source.
+
+        The used baseline is also written to `result_path`, next to the results it belongs to,
+        it is loaded again with `IdleBaseline.from_dict`.
+        '''
+        store = store or IdleBaselineStore()
+        baseline = store.get_or_measure(
+            BaselineKey.current(gpu_count=Device.count() if cuda_enabled else 0, energy_source=energy_source),
+            lambda key: measure_idle_baseline(
+                key, idle_time_in_seconds=idle_time_in_seconds, energy_source=energy_source
+            ),
+        )
+
+        if not result_path.endswith('.json'):
+            raise Exception('JSON extension expected')
+        with open(result_path, 'w', encoding='utf-8') as result_file:
+            json.dump(baseline.to_dict(), result_file, indent=2)
+
+        return baseline
+
     @staticmethod
     def measure_idle_energy_consumption(
         idle_time_in_seconds: float = 120,
@@ -63,14 +103,14 @@ class TimingMetadata():
         return ret_dict
 
 
-def measure_time_of_system_cmd(cmd: str) -> tuple[datetime, datetime, timedelta]:
-    start_time: datetime = datetime.now()
-    system(cmd)
-    end_time: datetime = datetime.now()
+def measure_time_of_system_cmd(cmd: str | list[str]) -> tuple[datetime, datetime, timedelta]:
+    """Executes `cmd` with the job runner and returns its start, end and elapsed time.
 
-    elapsed_time: timedelta = end_time - start_time
+    The elapsed time is measured with the monotonic clock.
+    """
+    result: JobResult = run_cmd(cmd)
 
-    return start_time, end_time, elapsed_time
+    return result.start_time, result.end_time, result.elapsed_time
 
 
 if __name__ == '__main__':
@@ -0,0 +1,323 @@
+"""
+Module for indexing video datasets with ffprobe.
+
+A dataset directory is probed once with a bounded number of concurrent ffprobe
+processes and the results are stored as a columnar catalog (parquet) next to the
+videos. Later runs only probe new or modified files, so metadata lookups and the
+input selection of the testbeds read from the catalog instead of re-probing.
+
+Classes:
+    VideoCatalog: Catalog of the videos of a dataset directory.
+
+Functions:
+    probe_video_file(file_path: str) -> dict:
+        Probes a video with ffprobe and returns its catalog row.
+    find_catalog_row(file_path: str) -> dict | None:
+        Returns the up-to-date catalog row of a video without probing it.
+    parse_ffprobe_output(ffprobe_output: dict, file_path: str) -> dict:
+        Converts the JSON output of ffprobe into a catalog row.
+"""
+
+import json
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from typing import Callable
+
+import pandas as pd
+
+from greem.utility.video_metadata import VideoMetadata
+
+CATALOG_FILE_NAME: str = "catalog.parquet"
+
+VIDEO_FILE_EXTENSIONS: tuple[str, ...] = (".265", ".264", ".mp4", ".mkv", ".webm", ".y4m")
+
+CATALOG_COLUMNS: list[str] = [
+    "file_name",
+    "size",
+    "mtime_ns",
+    "codec",
+    "width",
+    "height",
+    "fps",
+    "frames",
+    "duration",
+    "bitrate",
+    "probe_error",
+    "ffprobe_json",
+]
+
+FFPROBE_CMD: list[str] = [
+    "ffprobe",
+    "-v",
+    "quiet",
+    "-print_format",
+    "json",
+    "-show_format",
+    "-show_streams",
+]
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def parse_ffprobe_output(ffprobe_output: dict, file_path: str) -> dict:
+    """Converts the JSON output of ffprobe into a catalog row.
+
+    Raw bitstreams (e.g. `.265`) neither report a frame count nor a duration, in this
+    case the duration is derived from the file size and bitrate and the frame count
+    from the duration and frame rate, where available.
+
+    Parameters
+    ----------
+    ffprobe_output : dict
+        parsed JSON output of `ffprobe -show_format -show_streams`
+    file_path : str
+        path of the probed video
+
+    Returns
+    -------
+    dict
+        row with the `CATALOG_COLUMNS`
+    """
+    stat = os.stat(file_path)
+    video_streams: list[dict] = [
+        stream
+        for stream in ffprobe_output.get("streams", [])
+        if stream.get("codec_type") == "video"
+    ]
+    stream: dict = video_streams[0] if len(video_streams) > 0 else {}
+    video_format: dict = ffprobe_output.get("format", {})
+
+    fps: float = float("nan")
+    for rate_key in ["avg_frame_rate", "r_frame_rate"]:
+        try:
+            rate = Fraction(stream.get(rate_key, ""))
+        except (ValueError, ZeroDivisionError):
+            continue
+        if rate > 0:
+            fps = float(rate)
+            break
+
+    bitrate: float = _to_float(video_format.get("bit_rate", stream.get("bit_rate")))
+    duration: float = _to_float(video_format.get("duration", stream.get("duration")))
+    if pd.isna(duration) and bitrate > 0:
+        duration = stat.st_size * 8 / bitrate
+
+    frames: float = _to_float(stream.get("nb_frames"))
+    if pd.isna(frames) and not pd.isna(duration) and not pd.isna(fps):
+        frames = round(duration * fps)
+
+    return {
+        "file_name": os.path.basename(file_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "codec": stream.get("codec_name"),
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "fps": fps,
+        "frames": frames,
+        "duration": duration,
+        "bitrate": bitrate,
+        "probe_error": None if len(stream) > 0 else "no video stream found",
+        "ffprobe_json": json.dumps(ffprobe_output),
+    }
+
+
+def probe_video_file(file_path: str) -> dict:
+    """Probes a video with ffprobe and returns its catalog row"""
+    try:
+        process = subprocess.run(
+            [*FFPROBE_CMD, file_path], capture_output=True, text=True, check=False
+        )
+        ffprobe_output: dict = json.loads(process.stdout) if process.stdout else {}
+    except (OSError, json.JSONDecodeError) as err:
+        row: dict = parse_ffprobe_output({}, file_path)
+        row["probe_error"] = str(err)
+        return row
+
+    return parse_ffprobe_output(ffprobe_output, file_path)
+
+
+def _has_probe_error(row: dict) -> bool:
+    return not pd.isna(row.get("probe_error"))
+
+
+# loaded catalogs, keyed by path and modification time of the parquet file
+_loaded_catalogs: dict[tuple[str, int], pd.DataFrame] = {}
+
+
+def find_catalog_row(file_path: str) -> dict | None:
+    """Returns the catalog row of a video if the catalog of its directory contains
+    an up-to-date entry that was probed successfully, `None` otherwise. The video
+    directory is not probed."""
+    catalog_path: str = os.path.join(os.path.dirname(file_path) or ".", CATALOG_FILE_NAME)
+    if not os.path.exists(catalog_path):
+        return None
+
+    catalog_key = (os.path.abspath(catalog_path), os.stat(catalog_path).st_mtime_ns)
+    if catalog_key not in _loaded_catalogs:
+        _loaded_catalogs[catalog_key] = pd.read_parquet(catalog_path).set_index("file_name")
+    catalog_df = _loaded_catalogs[catalog_key]
+
+    file_name: str = os.path.basename(file_path)
+    if file_name not in catalog_df.index:
+        return None
+
+    row: dict = catalog_df.loc[file_name].to_dict()
+    stat = os.stat(file_path)
+    if row["size"] != stat.st_size or row["mtime_ns"] != stat.st_mtime_ns or _has_probe_error(row):
+        return None
+
+    return {"file_name": file_name, **row}
+
+
+class VideoCatalog:
+    """Catalog of the videos of a dataset directory.
+
+    Example:
+        >>> catalog = VideoCatalog.from_directory('../../dataset/Inter4K/60fps/HEVC')
+        >>> catalog.get_file_names(min_duration=5)
+        ['1.265', '10.265', ...]
+        >>> catalog.get_video_metadata('1.265').format.duration
+        '5.000000'
+    """
+
+    def __init__(self, video_dir: str, catalog_df: pd.DataFrame) -> None:
+        self.video_dir: str = video_dir
+        self.catalog_df: pd.DataFrame = catalog_df
+
+    @classmethod
+    def from_directory(
+        cls,
+        video_dir: str,
+        catalog_path: str | None = None,
+        extensions: tuple[str, ...] = VIDEO_FILE_EXTENSIONS,
+        max_workers: int | None = None,
+        probe: Callable[[str], dict] = probe_video_file,
+    ) -> "VideoCatalog":
+        """Loads the catalog of a dataset directory and probes new or modified videos.
+
+        The videos are probed by a pool of `max_workers` threads that each drive one
+        ffprobe process, so at most `max_workers` ffprobe processes run at the same time.
+        Videos that could not be probed are probed again on every load, e.g. files that
+        were still being copied. The updated catalog is written back to `catalog_path`.
+
+        Parameters
+        ----------
+        video_dir : str
+            dataset directory containing the videos
+        catalog_path : str | None, optional
+            parquet file of the catalog, by default `catalog.parquet` inside of `video_dir`
+        extensions : tuple[str, ...], optional
+            file extensions of the videos that are indexed, by default `VIDEO_FILE_EXTENSIONS`
+        max_workers : int | None, optional
+            maximum number of concurrent ffprobe processes, by default the number of CPUs
+        probe : Callable[[str], dict], optional
+            function returning the catalog row of a video, by default `probe_video_file`
+
+        Returns
+        -------
+        VideoCatalog
+            catalog containing one row per video of the directory, sorted by file name
+        """
+        catalog_path = catalog_path or os.path.join(video_dir, CATALOG_FILE_NAME)
+        cached_df: pd.DataFrame = (
+            pd.read_parquet(catalog_path)
+            if os.path.exists(catalog_path)
+            else pd.DataFrame(columns=CATALOG_COLUMNS)
+        )
+        cached_rows: dict[str, dict] = {
+            row["file_name"]: row for row in cached_df.to_dict(orient="records")
+        }
+
+        rows: list[dict] = []
+        paths_to_probe: list[str] = []
+        for file_name in sorted(os.listdir(video_dir)):
+            if not file_name.endswith(extensions):
+                continue
+
+            stat = os.stat(os.path.join(video_dir, file_name))
+            cached_row: dict | None = cached_rows.get(file_name)
+            if (
+                cached_row is not None
+                and cached_row["size"] == stat.st_size
+                and cached_row["mtime_ns"] == stat.st_mtime_ns
+                and not _has_probe_error(cached_row)
+            ):
+                rows.append(cached_row)
+            else:
+                paths_to_probe.append(os.path.join(video_dir, file_name))
+
+        if len(paths_to_probe) > 0:
+            with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+                rows.extend(executor.map(probe, paths_to_probe))
+
+        catalog_df = pd.DataFrame(rows, columns=CATALOG_COLUMNS)
+        catalog_df = catalog_df.sort_values("file_name", ignore_index=True)
+
+        if len(paths_to_probe) > 0 or len(catalog_df) != len(cached_df):
+            catalog_df.to_parquet(catalog_path, index=False)
+
+        return cls(video_dir, catalog_df)
+
+    def __len__(self) -> int:
+        return len(self.catalog_df)
+
+    def get(self, file_name: str) -> dict:
+        """Returns the catalog row of a video, `file_name` may also be a path"""
+        rows = self.catalog_df[self.catalog_df["file_name"] == os.path.basename(file_name)]
+        if len(rows) == 0:
+            raise KeyError(f"{file_name} is not part of the catalog of {self.video_dir}")
+
+        return rows.iloc[0].to_dict()
+
+    def get_video_metadata(self, file_name: str) -> VideoMetadata:
+        """Returns the full ffprobe metadata of a video without probing it again"""
+        return VideoMetadata.from_dict(json.loads(self.get(file_name)["ffprobe_json"]))
+
+    def get_file_names(
+        self,
+        extensions: tuple[str, ...] = VIDEO_FILE_EXTENSIONS,
+        codec: str | None = None,
+        min_duration: float | None = None,
+        min_height: int | None = None,
+        fps: float | None = None,
+    ) -> list[str]:
+        """Selects the input videos of a testbed, only the provided filters are applied.
+
+        Returns
+        -------
+        list[str]
+            sorted file names of the matching videos
+        """
+        catalog_df = self.catalog_df
+        mask = catalog_df["file_name"].str.endswith(extensions)
+
+        if codec is not None:
+            mask &= catalog_df["codec"] == codec
+        if min_duration is not None:
+            mask &= catalog_df["duration"] >= min_duration
+        if min_height is not None:
+            mask &= catalog_df["height"] >= min_height
+        if fps is not None:
+            mask &= (catalog_df["fps"] - fps).abs() < 0.01
+
+        return sorted(catalog_df.loc[mask, "file_name"])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Indexes a video dataset directory")
+    parser.add_argument("video_dir", help="dataset directory containing the videos")
+    parser.add_argument("--workers", type=int, default=None, help="concurrent ffprobe processes")
+    arguments = parser.parse_args()
+
+    catalog = VideoCatalog.from_directory(arguments.video_dir, max_workers=arguments.workers)
+    print(catalog.catalog_df.drop(columns=["ffprobe_json"]).to_string())
@@ -152,7 +152,19 @@ class VideoMetadata:
         return vm
 
     @classmethod
-    def from_file(cls: Type["VideoMetadata"], file_path: str) -> Type["VideoMetadata"]:
+    def from_file(
+        cls: Type["VideoMetadata"], file_path: str, use_catalog: bool = True
+    ) -> Type["VideoMetadata"]:
+        """Probes the video with ffprobe, unless the dataset catalog of its directory
+        already contains an up-to-date entry (see `greem.utility.video_catalog`)"""
+        if use_catalog:
+            # imported here, the catalog module depends on this module
+            from greem.utility.video_catalog import find_catalog_row
+
+            catalog_row: dict | None = find_catalog_row(file_path)
+            if catalog_row is not None:
+                return cls.from_dict(json.loads(catalog_row["ffprobe_json"]))
+
         cmd = [
             "ffprobe",
             "-v",
@@ -0,0 +1,484 @@
+"""
+Module for slicing videos into segments of a fixed duration.
+
+Each input is read once by a single stream copy pass that cuts the video at keyframes.
+Only segments whose boundaries do not coincide with keyframes are re-encoded, starting
+from the keyframe in front of the segment, so slicing a video is linear in its length.
+A segment is never joined from copied and re-encoded parts: the parameter sets of the
+source encoder and of the re-encode differ and are stored out-of-band in mp4, the
+concat demuxer would only keep the ones of the first part.
+Many inputs are sliced concurrently by sharing one `JobRunner`.
+
+All streams are kept (`-map 0`), only the first video stream is re-encoded and all other
+streams are stream copied. Stream copy cuts at keyframes, for open-GOP streams the
+leading frames of a copied segment might reference the previous GOP.
+
+Classes:
+    SegmentPart: Dataclass representing a time range that is either stream copied or re-encoded.
+    SegmentPlan: Dataclass representing a planned segment consisting of `SegmentPart`s.
+    VideoKeyframes: Dataclass representing the keyframes and timing of a video.
+
+Functions:
+    probe_keyframes(input_path: str) -> VideoKeyframes:
+        Reads the keyframe timestamps of a video from its packets without decoding it.
+    plan_segments(keyframes: VideoKeyframes, segment_duration: int) -> list[SegmentPlan]:
+        Splits a video into segments and decides which parts can be stream copied.
+    slice_videos(input_paths: list[str], output_dir: str, segment_durations: list[int]) -> pd.DataFrame:
+        Slices all videos and returns the manifest of the produced segments.
+"""
+
+import asyncio
+import bisect
+import json
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+from dataclasses import dataclass, field
+from fractions import Fraction
+
+import pandas as pd
+
+from greem.utility.ffmpeg import get_lib_codec
+from greem.utility.job_runner import Job, JobRunner
+
+MANIFEST_FILE_NAME: str = "segment_manifest.csv"
+
+# encoder settings of the re-encoded segments, high quality since they are the source of all encodes
+REENCODE_ARGS: list[str] = ["-preset", "medium", "-crf", "16"]
+
+
+@dataclass(frozen=True)
+class SegmentPart:
+    """
+    A time range of the input video, in seconds of the presentation timeline.
+
+    Attributes:
+        start (float): Start time of the part.
+        end (float): End time of the part (exclusive).
+        stream_copy (bool): `True` if the part starts at a keyframe and ends at a keyframe or the end of the video.
+    """
+
+    start: float
+    end: float
+    stream_copy: bool
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class SegmentPlan:
+    """
+    A planned segment of the input video.
+
+    Attributes:
+        index (int): Index of the segment within the video.
+        start (float): Start time of the segment in the input video.
+        end (float): End time of the segment in the input video (exclusive).
+        parts (list[SegmentPart]): Consecutive parts that make up the segment.
+    """
+
+    index: int
+    start: float
+    end: float
+    parts: list[SegmentPart] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def copied_duration(self) -> float:
+        return sum(part.duration for part in self.parts if part.stream_copy)
+
+    @property
+    def reencoded_duration(self) -> float:
+        return sum(part.duration for part in self.parts if not part.stream_copy)
+
+
+@dataclass
+class VideoKeyframes:
+    """
+    Keyframes and timing of a video.
+
+    Attributes:
+        keyframes (list[float]): Presentation times of the keyframes in seconds, sorted.
+        duration (float): Duration of the video in seconds.
+        fps (float): Frame rate of the video.
+        codec (str): Codec name reported by ffprobe, e.g. 'hevc'.
+    """
+
+    keyframes: list[float]
+    duration: float
+    fps: float
+    codec: str
+
+
+def probe_keyframes(input_path: str) -> VideoKeyframes:
+    """Reads the keyframe timestamps of a video from its packets without decoding it.
+
+    Raw bitstreams (e.g. `.265`) do not carry timestamps, in this case the timestamps
+    are derived from the packet index and the frame rate.
+
+    Raises:
+        RuntimeError: If ffprobe fails or the video does not contain a video stream.
+    """
+    cmd: list[str] = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "stream=codec_name,avg_frame_rate,r_frame_rate:format=duration:packet=pts_time,dts_time,flags",
+        "-print_format",
+        "json",
+        input_path,
+    ]
+    process = subprocess.run(cmd, capture_output=True, text=True, check=False)
+    if process.returncode != 0 or len(process.stdout) == 0:
+        raise RuntimeError(f"ffprobe failed for {input_path}: {process.stderr.strip()}")
+
+    return parse_keyframes(json.loads(process.stdout))
+
+
+def parse_keyframes(ffprobe_output: dict) -> VideoKeyframes:
+    """Converts the ffprobe output of `probe_keyframes` into `VideoKeyframes`"""
+    streams: list[dict] = ffprobe_output.get("streams", [])
+    if len(streams) == 0:
+        raise RuntimeError("no video stream found")
+    stream: dict = streams[0]
+
+    fps: float = 0.0
+    for rate_key in ["avg_frame_rate", "r_frame_rate"]:
+        try:
+            fps = float(Fraction(stream.get(rate_key, "")))
+        except (ValueError, ZeroDivisionError):
+            continue
+        if fps > 0:
+            break
+
+    keyframes: list[float] = []
+    last_time: float = 0.0
+    packets: list[dict] = ffprobe_output.get("packets", [])
+    for idx, packet in enumerate(packets):
+        time_value: str = packet.get("pts_time", packet.get("dts_time", "N/A"))
+        packet_time: float = (
+            float(time_value) if time_value != "N/A" else idx / fps if fps > 0 else 0.0
+        )
+        last_time = max(last_time, packet_time)
+        if "K" in packet.get("flags", ""):
+            keyframes.append(packet_time)
+
+    frame_duration: float = 1 / fps if fps > 0 else 0.0
+    try:
+        duration: float = float(ffprobe_output.get("format", {}).get("duration", "N/A"))
+    except ValueError:
+        duration = last_time + frame_duration
+
+    return VideoKeyframes(
+        keyframes=sorted(keyframes),
+        duration=duration,
+        fps=fps,
+        codec=stream.get("codec_name", ""),
+    )
+
+
+def plan_segments(
+    keyframes: VideoKeyframes, segment_duration: int, tolerance: float | None = None
+) -> list[SegmentPlan]:
+    """Splits a video into segments of `segment_duration` seconds, the last segment may be shorter.
+
+    A segment is stream copied if both of its boundaries coincide with a keyframe (or the
+    end of the video), otherwise it contains a partial GOP and is re-encoded completely.
+    Each `SegmentPlan` therefore consists of exactly one `SegmentPart`. A boundary that
+    coincides with a keyframe is moved to the timestamp of the keyframe, so the copy pass
+    cuts exactly there and the manifest reports the actual start of the segment.
+
+    Parameters
+    ----------
+    keyframes : VideoKeyframes
+        keyframes and timing of the video, see `probe_keyframes`
+    segment_duration : int
+        duration of the segments in seconds
+    tolerance : float | None, optional
+        maximum distance in seconds between a boundary and a keyframe to treat them as equal,
+        by default half a frame
+
+    Returns
+    -------
+    list[SegmentPlan]
+        the planned segments in presentation order
+    """
+    if segment_duration <= 0:
+        raise ValueError("segment_duration must be bigger than zero")
+
+    if tolerance is None:
+        tolerance = 0.5 / keyframes.fps if keyframes.fps > 0 else 1e-3
+
+    duration: float = keyframes.duration
+    # a stream copy may always run until the end of the video
+    cut_points: list[float] = [k for k in keyframes.keyframes if k < duration - tolerance]
+    cut_points.append(duration)
+
+    plans: list[SegmentPlan] = []
+    nominal_start: float = 0.0
+    start_keyframe: float | None = _find_keyframe(cut_points, nominal_start, tolerance)
+    while nominal_start < duration - tolerance:
+        nominal_end: float = min(nominal_start + segment_duration, duration)
+        end_keyframe: float | None = _find_keyframe(cut_points, nominal_end, tolerance)
+
+        start: float = start_keyframe if start_keyframe is not None else nominal_start
+        end: float = end_keyframe if end_keyframe is not None else nominal_end
+        stream_copy: bool = start_keyframe is not None and end_keyframe is not None
+
+        plan = SegmentPlan(index=len(plans), start=start, end=end)
+        plan.parts.append(SegmentPart(start, end, stream_copy=stream_copy))
+
+        plans.append(plan)
+        nominal_start, start_keyframe = nominal_end, end_keyframe
+
+    return plans
+
+
+def _find_keyframe(cut_points: list[float], boundary: float, tolerance: float) -> float | None:
+    """Returns the cut point closest to `boundary` if it is at most `tolerance` away"""
+    idx: int = bisect.bisect_left(cut_points, boundary)
+    candidates: list[float] = cut_points[max(idx - 1, 0) : idx + 1]
+    closest: float | None = min(candidates, key=lambda k: abs(k - boundary), default=None)
+
+    return closest if closest is not None and abs(closest - boundary) <= tolerance else None
+
+
+def get_segment_file_path(
+    output_dir: str, video_name: str, segment_duration: int, index: int
+) -> str:
+    """Returns the path of a segment, e.g. `output_dir/video_4s_0.mp4`"""
+    return f"{output_dir}/{video_name}_{segment_duration}s_{index}.mp4"
+
+
+def get_copy_pass_job(input_path: str, plans: list[SegmentPlan], piece_dir: str) -> Job | None:
+    """Creates the stream copy pass that cuts the video at the boundaries of all copied parts.
+
+    The segment muxer writes one piece per range between consecutive cut times,
+    i.e. `piece_00000.mp4` is the range from zero to the first cut time. The cut times
+    are the keyframe timestamps chosen by `plan_segments`.
+    """
+    if not any(part.stream_copy for plan in plans for part in plan.parts):
+        return None
+
+    cut_times: list[float] = get_copy_cut_times(plans)
+
+    argv: list[str] = [
+        "ffmpeg",
+        "-y",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-fflags",
+        "+genpts",
+        "-i",
+        input_path,
+        "-map",
+        "0",
+        "-c",
+        "copy",
+        "-f",
+        "segment",
+        "-segment_format",
+        "mp4",
+        "-reset_timestamps",
+        "1",
+    ]
+    if len(cut_times) > 0:
+        # the segment muxer cuts at the first keyframe at or after each time, FFmpeg parses
+        # times with microsecond precision, rounding down never skips the keyframe
+        argv.extend(["-segment_times", ",".join(_format_cut_time(t) for t in cut_times)])
+    argv.append(f"{piece_dir}/piece_%05d.mp4")
+
+    return Job(argv, name=os.path.basename(input_path), metadata={"stage": "copy"})
+
+
+def _format_cut_time(time_value: float) -> str:
+    # the small offset only absorbs the floating point error of times that are whole microseconds
+    return f"{math.floor(time_value * 1e6 + 1e-3) / 1e6:.6f}"
+
+
+def get_copy_cut_times(plans: list[SegmentPlan]) -> list[float]:
+    """Returns the cut times of the copy pass, all boundaries of copied parts except zero and the end"""
+    video_end: float = plans[-1].end if len(plans) > 0 else 0.0
+    cut_times: set[float] = set()
+    for plan in plans:
+        for part in plan.parts:
+            if part.stream_copy:
+                cut_times.update([part.start, part.end])
+
+    return sorted(t for t in cut_times if 0 < t < video_end)
+
+
+def get_reencode_job(
+    input_path: str, part: SegmentPart, codec: str, output_path: str
+) -> Job:
+    """Re-encodes the first video stream of a part, input seeking only decodes from the keyframe in front
+    of the part. All other streams are stream copied."""
+    argv: list[str] = [
+        "ffmpeg",
+        "-y",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-ss",
+        f"{part.start:.6f}",
+        "-i",
+        input_path,
+        "-t",
+        f"{part.duration:.6f}",
+        "-map",
+        "0",
+        "-c",
+        "copy",
+        "-c:v:0",
+        get_lib_codec(codec),
+        *REENCODE_ARGS,
+        output_path,
+    ]
+
+    return Job(argv, name=os.path.basename(input_path), metadata={"stage": "reencode"})
+
+
+def _get_video_name(input_path: str) -> str:
+    return os.path.basename(input_path).rsplit(".", 1)[0]
+
+
+async def _slice_video(
+    runner: JobRunner,
+    input_path: str,
+    output_dir: str,
+    segment_duration: int,
+    keyframes: VideoKeyframes,
+) -> list[dict]:
+    video_name: str = _get_video_name(input_path)
+    plans: list[SegmentPlan] = plan_segments(keyframes, segment_duration)
+    cut_times: list[float] = [0.0] + get_copy_cut_times(plans)
+
+    with tempfile.TemporaryDirectory(dir=output_dir, prefix=f".{video_name}_") as tmp_dir:
+        part_paths: dict[tuple[int, int], str] = {}
+        jobs: list[Job] = []
+
+        copy_job = get_copy_pass_job(input_path, plans, tmp_dir)
+        if copy_job is not None:
+            jobs.append(copy_job)
+
+        for plan in plans:
+            for part_idx, part in enumerate(plan.parts):
+                if part.stream_copy:
+                    piece_idx: int = cut_times.index(part.start)
+                    part_paths[(plan.index, part_idx)] = f"{tmp_dir}/piece_{piece_idx:05d}.mp4"
+                else:
+                    part_path = f"{tmp_dir}/reencode_{plan.index}_{part_idx}.mp4"
+                    part_paths[(plan.index, part_idx)] = part_path
+                    jobs.append(get_reencode_job(input_path, part, keyframes.codec, part_path))
+
+        # the copy pass and all re-encodes are independent of each other
+        results = await asyncio.gather(*[runner.run_job_async(job) for job in jobs])
+        stage_succeeded: bool = all(result.succeeded for result in results)
+
+        if stage_succeeded:
+            for plan in plans:
+                segment_path = get_segment_file_path(output_dir, video_name, segment_duration, plan.index)
+                shutil.move(part_paths[(plan.index, 0)], segment_path)
+
+    rows: list[dict] = _get_manifest_rows(video_name, output_dir, segment_duration, plans)
+    for row in rows:
+        row["succeeded"] = stage_succeeded
+
+    return rows
+
+
+def _get_manifest_rows(
+    video_name: str, output_dir: str, segment_duration: int, plans: list[SegmentPlan]
+) -> list[dict]:
+    return [
+        {
+            "video": video_name,
+            "segment_duration": segment_duration,
+            "segment_index": plan.index,
+            "file_path": get_segment_file_path(output_dir, video_name, segment_duration, plan.index),
+            "start_pts": plan.start,
+            "duration": plan.duration,
+            "copied_duration": plan.copied_duration,
+            "reencoded_duration": plan.reencoded_duration,
+            "num_parts": len(plan.parts),
+        }
+        for plan in plans
+    ]
+
+
+def slice_videos(
+    input_paths: list[str],
+    output_dir: str,
+    segment_durations: list[int],
+    max_concurrency: int = 1,
+    dry_run: bool = False,
+) -> pd.DataFrame:
+    """Slices all videos into segments of each duration and writes the segment manifest.
+
+    Parameters
+    ----------
+    input_paths : list[str]
+        paths of the videos that are sliced
+    output_dir : str
+        directory of the segments and of the manifest `segment_manifest.csv`
+    segment_durations : list[int]
+        durations of the segments in seconds, each video is sliced once per duration
+    max_concurrency : int, optional
+        maximum number of FFmpeg processes running at the same time, by default 1
+    dry_run : bool, optional
+        if True, only the planned segments are returned, by default False
+
+    Returns
+    -------
+    pd.DataFrame
+        the manifest, one row per segment with its start PTS and duration in the input video
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    runner = JobRunner(max_concurrency=max_concurrency)
+
+    async def slice_all() -> list[list[dict]]:
+        loop = asyncio.get_running_loop()
+        # probing only reads the packet headers, one probe per input is enough for all durations
+        video_keyframes: list[VideoKeyframes] = await asyncio.gather(
+            *[loop.run_in_executor(None, probe_keyframes, path) for path in input_paths]
+        )
+
+        if dry_run:
+            return [
+                _get_manifest_rows(
+                    _get_video_name(input_path),
+                    output_dir,
+                    segment_duration,
+                    plan_segments(keyframes, segment_duration),
+                )
+                for input_path, keyframes in zip(input_paths, video_keyframes)
+                for segment_duration in segment_durations
+            ]
+
+        return await asyncio.gather(
+            *[
+                _slice_video(runner, input_path, output_dir, segment_duration, keyframes)
+                for input_path, keyframes in zip(input_paths, video_keyframes)
+                for segment_duration in segment_durations
+            ]
+        )
+
+    rows: list[dict] = [row for video_rows in runner.run_coroutine(slice_all()) for row in video_rows]
+    manifest_df = pd.DataFrame(rows)
+
+    if not dry_run:
+        manifest_df.to_csv(f"{output_dir}/{MANIFEST_FILE_NAME}", index=False)
+
+    return manifest_df
+
@@ -1,6 +1,7 @@
 import os
 from dataclasses import dataclass, field
 from greem.utility.configuration_classes import Representation
+from greem.utility.job_runner import run_cmd
 
 
 @dataclass
@@ -80,7 +81,7 @@ class StreamingContainer:
         for stream in audio_stream_dir_paths:
             os.system(f'cat {stream} >> {audio_tmp_output}')
             
-        os.system(f'ffmpeg -i {video_tmp_output} -i {audio_tmp_output} -c:v copy -c:a aac {output_file_path} -y')
+        run_cmd(['ffmpeg', '-i', video_tmp_output, '-i', audio_tmp_output, '-c:v', 'copy', '-c:a', 'aac', output_file_path, '-y'])
         
         os.remove(video_tmp_output)
         os.remove(audio_tmp_output)
@@ -1,15 +1,242 @@
 import cv2
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from math import ceil
+from pathlib import Path
+from typing import Callable
+import json
 import subprocess
 import os
 
+VIDEO_FILE_EXTENSIONS: tuple[str, ...] = (".265", ".264", ".mp4", ".mkv", ".webm", ".y4m")
+
+# the probe cache is shared between testbed runs, override the location with GREEM_PROBE_CACHE
+PROBE_CACHE_PATH: str = os.environ.get(
+    "GREEM_PROBE_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "greem", "video_probe_cache.jsonl"),
+)
+
+
+@dataclass(frozen=True)
+class ProbedVideoInfo:
+    """
+    Metadata of a video file as reported by OpenCV.
+
+    Attributes:
+        fps (float): Frame rate of the video.
+        width (int): Width of the video in pixels.
+        height (int): Height of the video in pixels.
+        frame_count (int): Total number of frames of the video.
+    """
+
+    fps: float
+    width: int
+    height: int
+    frame_count: int
+
+
+def probe_video_metadata(file_path: str) -> ProbedVideoInfo:
+    """Opens the video with OpenCV and reads its metadata"""
+    video = cv2.VideoCapture(file_path)
+    try:
+        return ProbedVideoInfo(
+            fps=video.get(cv2.CAP_PROP_FPS),
+            width=ceil(video.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=ceil(video.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            frame_count=ceil(video.get(cv2.CAP_PROP_FRAME_COUNT)),
+        )
+    finally:
+        video.release()
+
+
+class ProbeCache:
+    """Cache of `ProbedVideoInfo`, so a video is only opened once, even across testbed runs.
+
+    Entries are keyed by the absolute path, size and modification time of the video file,
+    a changed file is probed again. A bounded in-process LRU is in front of an append-only
+    JSON lines file on disk that is loaded on the first lookup.
+
+    Example:
+        >>> cache = ProbeCache('results/probe_cache.jsonl')
+        >>> cache.warm('../dataset/ref_265')
+        >>> cache.get('../dataset/ref_265/video_1.265').fps
+        30.0
+    """
+
+    def __init__(
+        self,
+        file_path: str | None = PROBE_CACHE_PATH,
+        max_size: int = 4096,
+        probe: Callable[[str], ProbedVideoInfo] = probe_video_metadata,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        file_path : str | None, optional
+            JSON lines file of the on-disk cache, `None` only keeps the in-process LRU,
+            by default `PROBE_CACHE_PATH`
+        max_size : int, optional
+            maximum number of entries of the in-process LRU, by default 4096
+        probe : Callable[[str], ProbedVideoInfo], optional
+            function used to read the metadata of a video, by default `probe_video_metadata`
+        """
+        self.file_path: str | None = file_path
+        self.max_size: int = max_size
+        self.probe: Callable[[str], ProbedVideoInfo] = probe
+
+        self._lru: OrderedDict[tuple, ProbedVideoInfo] = OrderedDict()
+        self._disk_entries: dict[tuple, ProbedVideoInfo] | None = None
+
+    @staticmethod
+    def get_key(file_path: str) -> tuple[str, int, int]:
+        """Returns the cache key of a video file: (absolute path, size, mtime in ns)"""
+        stat = os.stat(file_path)
+        return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns
+
+    def get(self, file_path: str) -> ProbedVideoInfo:
+        """Returns the metadata of the video, the video is only probed on a cache miss.
+
+        Paths that do not exist (yet), e.g. segments of a dry run, are probed without caching.
+        """
+        try:
+            key = ProbeCache.get_key(file_path)
+        except OSError:
+            return self.probe(file_path)
+
+        metadata: ProbedVideoInfo | None = self._lru.get(key)
+        if metadata is not None:
+            self._lru.move_to_end(key)
+            return metadata
+
+        metadata = self._load_disk_entries().get(key)
+        if metadata is None:
+            metadata = self.probe(file_path)
+            # unreadable videos report zero fps, do not persist them
+            if metadata.fps > 0:
+                self._store(key, metadata)
+
+        self._lru[key] = metadata
+        if len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+
+        return metadata
+
+    def warm(
+        self,
+        video_dir: str,
+        extensions: tuple[str, ...] = VIDEO_FILE_EXTENSIONS,
+        max_workers: int = 4,
+    ) -> int:
+        """Probes all videos of a dataset directory that are not cached yet.
+
+        Returns
+        -------
+        int
+            number of videos in the directory
+        """
+        video_paths: list[str] = sorted(
+            os.path.join(video_dir, file_name)
+            for file_name in os.listdir(video_dir)
+            if file_name.endswith(extensions)
+        )
+
+        self._load_disk_entries()
+
+        # OpenCV releases the GIL while decoding, so probing in threads is effective
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            metadata_list = list(
+                executor.map(
+                    lambda path: (ProbeCache.get_key(path), self._probe_uncached(path)),
+                    video_paths,
+                )
+            )
+
+        for key, metadata in metadata_list:
+            if metadata is not None and metadata.fps > 0:
+                self._store(key, metadata)
+
+        return len(video_paths)
+
+    def clear(self) -> None:
+        """Clears the in-process LRU, the on-disk cache is kept"""
+        self._lru.clear()
+        self._disk_entries = None
+
+    def _probe_uncached(self, file_path: str) -> ProbedVideoInfo | None:
+        if ProbeCache.get_key(file_path) in self._load_disk_entries():
+            return None
+
+        return self.probe(file_path)
+
+    def _load_disk_entries(self) -> dict[tuple, ProbedVideoInfo]:
+        if self._disk_entries is not None:
+            return self._disk_entries
+
+        self._disk_entries = {}
+        if self.file_path is None or not os.path.exists(self.file_path):
+            return self._disk_entries
+
+        with open(self.file_path, "r", encoding="utf-8") as cache_file:
+            for line in cache_file:
+                try:
+                    entry: dict = json.loads(line)
+                    key = (entry["path"], entry["size"], entry["mtime_ns"])
+                    self._disk_entries[key] = ProbedVideoInfo(**entry["metadata"])
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue
+
+        return self._disk_entries
+
+    def _store(self, key: tuple[str, int, int], metadata: ProbedVideoInfo) -> None:
+        disk_entries = self._load_disk_entries()
+        if disk_entries.get(key) == metadata:
+            return
+        disk_entries[key] = metadata
+
+        if self.file_path is None:
+            return
+
+        path, size, mtime_ns = key
+        entry: dict = {
+            "path": path,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "metadata": asdict(metadata),
+        }
+        try:
+            Path(self.file_path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.file_path, "a", encoding="utf-8") as cache_file:
+                cache_file.write(json.dumps(entry) + "\n")
+        except OSError as err:
+            # the cache is an optimization, a read-only home directory must not stop a benchmark
+            print(f"could not write probe cache {self.file_path}: {err}")
+
+
+PROBE_CACHE = ProbeCache()
+
 
 class VideoInfo:
-    def __init__(self, file_path: str) -> None:
+    def __init__(self, file_path: str, probe_cache: ProbeCache = PROBE_CACHE) -> None:
         self.file_path = file_path
-        self.video = cv2.VideoCapture(self.file_path)
+        self.probe_cache = probe_cache
         self.ffprobe_values: dict = dict()
+        self._metadata: ProbedVideoInfo | None = None
+        self._video = None
+
+    @property
+    def video(self) -> cv2.VideoCapture:
+        """OpenCV capture of the video, only opened on access"""
+        if self._video is None:
+            self._video = cv2.VideoCapture(self.file_path)
+        return self._video
+
+    @property
+    def metadata(self) -> ProbedVideoInfo:
+        """Metadata of the video, looked up in the probe cache"""
+        if self._metadata is None:
+            self._metadata = self.probe_cache.get(self.file_path)
+        return self._metadata
 
     def _get_ffprobe_values(self):
         cmd = [
@@ -24,16 +251,16 @@ class VideoInfo:
         ]
 
     def get_fps(self) -> int:
-        return ceil(self.video.get(cv2.CAP_PROP_FPS))
+        return ceil(self.metadata.fps)
 
     def get_width(self) -> int:
-        return ceil(self.video.get(cv2.CAP_PROP_FRAME_WIDTH))
+        return self.metadata.width
 
     def get_height(self) -> int:
-        return ceil(self.video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        return self.metadata.height
 
     def get_total_frame_count(self) -> int:
-        return ceil(self.video.get(cv2.CAP_PROP_FRAME_COUNT))
+        return self.metadata.frame_count
 
     def get_total_duration_in_sec(self) -> float:
         return self.get_total_frame_count() / self.get_fps()